@@ -26,6 +26,7 @@ class Settings(BaseSettings):
     
     # WebSocket
     WS_MESSAGE_QUEUE: str = "redis://localhost"
+    WS_SEND_QUEUE_SIZE: int = 100  # Mensajes pendientes por socket antes de desconectarlo
     
     class Config:
         case_sensitive = True
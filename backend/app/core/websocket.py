@@ -7,27 +7,41 @@ from app.core.config import settings
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, List[WebSocket]] = {}
+        # Cola de salida y tarea de escritura por socket: un cliente lento
+        # no frena al resto
+        self.queues: Dict[WebSocket, asyncio.Queue] = {}
+        self.writers: Dict[WebSocket, asyncio.Task] = {}
 
     async def connect(self, websocket: WebSocket, document_id: str):
         await websocket.accept()
         if document_id not in self.active_connections:
             self.active_connections[document_id] = []
         self.active_connections[document_id].append(websocket)
+        self.queues[websocket] = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.writers[websocket] = asyncio.create_task(self._write(websocket, document_id))
 
     async def disconnect(self, websocket: WebSocket, document_id: str):
         if document_id in self.active_connections:
-            self.active_connections[document_id].remove(websocket)
+            if websocket in self.active_connections[document_id]:
+                self.active_connections[document_id].remove(websocket)
             if not self.active_connections[document_id]:
                 del self.active_connections[document_id]
+        self.queues.pop(websocket, None)
+        writer = self.writers.pop(websocket, None)
+        if writer and writer is not asyncio.current_task():
+            writer.cancel()
 
     async def broadcast(self, document_id: str, message: Any):
         if document_id in self.active_connections:
-            for connection in self.active_connections[document_id]:
+            for connection in list(self.active_connections[document_id]):
+                queue = self.queues.get(connection)
+                if queue is None:
+                    continue
                 try:
-                    await connection.send_json(message)
-                except Exception:
-                    # Remove dead connections
-                    await self.disconnect(connection, document_id)
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    # Consumidor lento: se desconecta para que recargue el estado
+                    asyncio.create_task(self._evict(connection, document_id))
 
     async def send_personal_message(self, message: Any, websocket: WebSocket):
         try:
@@ -38,3 +52,21 @@ class ConnectionManager:
                 if websocket in connections:
                     await self.disconnect(websocket, document_id)
                     break
+
+    async def _write(self, websocket: WebSocket, document_id: str):
+        queue = self.queues[websocket]
+        while True:
+            message = await queue.get()
+            try:
+                await websocket.send_json(message)
+            except Exception:
+                # Remove dead connections
+                await self.disconnect(websocket, document_id)
+                return
+
+    async def _evict(self, websocket: WebSocket, document_id: str):
+        await self.disconnect(websocket, document_id)
+        try:
+            await websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
@@ -0,0 +1,13 @@
+-- Archivo del chat de documentos (src/models/chat.py: ChatMessage).
+-- Mensajes que salen de la ventana caliente de Redis; la paginación por
+-- cursor (seq < before) usa la restricción única (document_id, seq).
+CREATE TABLE IF NOT EXISTS document_chat_messages (
+    id BIGSERIAL PRIMARY KEY,
+    document_id UUID NOT NULL REFERENCES documents (id),
+    seq BIGINT NOT NULL,
+    user_id VARCHAR NOT NULL,
+    content TEXT NOT NULL,
+    message_type VARCHAR NOT NULL DEFAULT 'text',
+    created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT (now() AT TIME ZONE 'utc'),
+    CONSTRAINT uq_document_chat_messages_seq UNIQUE (document_id, seq)
+);
@@ -0,0 +1,277 @@
+"""
+Benchmark del motor de filtros de anotaciones.
+
+Genera un expediente con muchas anotaciones y mide
+`AnnotationFilterEngine.apply_filter` en escenarios típicos del panel de
+búsqueda (primera página sin filtros, texto, etiquetas y autor, rango de
+páginas, recuadro, combinado y una página profunda) frente a la versión
+anterior de varias pasadas con ordenamiento completo. Verifica que ambas
+devuelvan lo mismo. Los escenarios con páginas o recuadro se miden también
+con el índice espacial, más una consulta de visor (una página y un
+recuadro) como la que hace el frontend al desplazarse. Todos los escenarios
+se miden además sobre el almacén columnar, junto con el resumen por tipo y
+página (con columnas y con los contadores en Redis, sobre fakeredis si está
+instalado). La búsqueda fuzzy se mide recorriendo el documento con
+SequenceMatcher (como antes), con el predicado compilado y con el índice de
+n-gramas, verificando que los tres acepten las mismas anotaciones.
+
+Uso:
+    python -m scripts.benchmarks.annotation_filter_benchmark --annotations 100000
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Any, Dict, List
+
+from scripts.benchmarks.common import LatencyRecorder, write_report
+from scripts.benchmarks.legal_corpus import generate_annotations
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de filtros de anotaciones")
+    parser.add_argument('--annotations', type=int, default=100000)
+    parser.add_argument('--pages', type=int, default=200, help="Páginas del documento")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help="No medir la implementación de varias pasadas")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Archivo JSON de salida")
+    return parser.parse_args()
+
+def scenarios(pages: int) -> Dict[str, Dict[str, Any]]:
+    """Parámetros de AnnotationFilter por escenario."""
+    return {
+        'first_page': {},
+        'text': {'content_query': 'PRISIÓN PREVENTIVA'},
+        'tags_user': {'tags': ['urgente', 'plazo'], 'users': ['user-3', 'user-7']},
+        'page_range': {'page_range': (pages // 4, pages // 2), 'sort_by': 'page', 'sort_order': 'asc'},
+        'position_box': {
+            'page_range': (1, pages // 10),
+            'position_box': {'x1': 0.1, 'y1': 0.1, 'x2': 0.5, 'y2': 0.4},
+            'sort_by': 'position', 'sort_order': 'asc'
+        },
+        'combined': {
+            'content_query': 'audiencia',
+            'types': ['comment', 'note'],
+            'created_after': datetime(2024, 3, 1),
+            'created_before': datetime(2024, 10, 1),
+            'page_range': (1, pages // 2)
+        },
+        'deep_page': {'offset': 20000, 'limit': 50},
+        'viewport': {
+            'page_range': (pages // 3, pages // 3),
+            'position_box': {'x1': 0.0, 'y1': 0.25, 'x2': 1.0, 'y2': 0.5},
+            'sort_by': 'position', 'sort_order': 'asc'
+        }
+    }
+
+def legacy_apply_filter(annotations: List[Dict[str, Any]], params) -> List[Dict[str, Any]]:
+    """Versión anterior: una pasada por filtro, ordenamiento completo."""
+    filtered = annotations
+    if params.content_query:
+        filtered = [a for a in filtered if params.content_query.lower() in a['content'].lower()]
+    if params.tags:
+        filtered = [a for a in filtered if any(tag in a.get('tags', []) for tag in params.tags)]
+    if params.types:
+        filtered = [a for a in filtered if a.get('type') in params.types]
+    if params.users:
+        filtered = [a for a in filtered if a.get('user_id') in params.users]
+    if params.created_after:
+        filtered = [a for a in filtered if a['created_at'] >= params.created_after]
+    if params.created_before:
+        filtered = [a for a in filtered if a['created_at'] <= params.created_before]
+    if params.updated_after:
+        filtered = [a for a in filtered if a['updated_at'] >= params.updated_after]
+    if params.updated_before:
+        filtered = [a for a in filtered if a['updated_at'] <= params.updated_before]
+    if params.page_range:
+        start, end = params.page_range
+        filtered = [a for a in filtered if start <= a['position']['page'] <= end]
+    if params.position_box:
+        box = params.position_box
+        filtered = [
+            a for a in filtered
+            if box['x1'] <= a['position']['x'] <= box['x2'] and box['y1'] <= a['position']['y'] <= box['y2']
+        ]
+
+    if params.sort_by == 'page':
+        key = lambda x: x['position']['page']
+    elif params.sort_by == 'position':
+        key = lambda x: (x['position']['page'], x['position']['y'], x['position']['x'])
+    else:
+        key = lambda x: x[params.sort_by]
+    filtered = sorted(filtered, key=key, reverse=params.sort_order == 'desc')
+    return filtered[params.offset:params.offset + params.limit]
+
+def legacy_summary(annotations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Resumen anterior: una pasada por tipo y por página."""
+    return {
+        "total": len(annotations),
+        "by_type": {
+            kind: len([a for a in annotations if a['type'] == kind])
+            for kind in ("note", "highlight", "comment")
+        },
+        "by_page": {
+            page: len([a for a in annotations if a['position']['page'] == page])
+            for page in set(a['position']['page'] for a in annotations)
+        }
+    }
+
+def fuzzy_queries(annotations: List[Dict[str, Any]]) -> List[str]:
+    """Consultas fuzzy: una frase corta y textos reales con errores de tipeo."""
+    rng = random.Random(7)
+    queries = ["Se rechaza la reposición"]
+    for annotation in rng.sample(annotations, 2):
+        chars = list(annotation['content'])
+        for _ in range(3):
+            chars[rng.randrange(len(chars))] = rng.choice("aeiosn")
+        queries.append("".join(chars))
+    return queries
+
+def engine_fuzzy_legacy(text: str, query: str, threshold: float = 0.8) -> bool:
+    """Versión anterior de la coincidencia fuzzy."""
+    return SequenceMatcher(None, text.lower(), query.lower()).ratio() >= threshold
+
+def main():
+    from src.documents.annotation_filters import AnnotationFilter, AnnotationFilterEngine, SortField, SortOrder
+    from src.documents.annotation_columns import AnnotationColumns
+    from src.documents.spatial_index import SpatialIndex
+    from src.documents.trigram_index import TrigramIndex
+    from src.services.annotation_stats import AnnotationStatsService
+
+    args = parse_args()
+    print(f"Generando {args.annotations} anotaciones...")
+    annotations = generate_annotations(args.annotations, pages=args.pages, seed=args.seed)
+    engine = AnnotationFilterEngine()
+    build = LatencyRecorder()
+    with build.measure('spatial_index_build'):
+        index = SpatialIndex.build(annotations)
+    with build.measure('text_index_build'):
+        text_index = TrigramIndex.build(annotations)
+    with build.measure('column_store_build'):
+        columns = AnnotationColumns.build(annotations)
+        columns.refresh()
+    for _ in range(args.repeat):
+        with build.measure('summary_columns'):
+            columns.summary()
+        with build.measure('summary_lists'):
+            legacy_summary(annotations)
+
+    # Contadores en Redis: un conteo inicial y luego lecturas del hash
+    try:
+        import fakeredis
+    except ImportError:
+        fakeredis = None
+    if fakeredis is not None:
+        stats = AnnotationStatsService(redis_client=fakeredis.FakeRedis())
+
+        async def load():
+            return annotations
+
+        with build.measure('counters_reconcile'):
+            asyncio.run(stats.reconcile('benchmark', load))
+        for _ in range(args.repeat):
+            with build.measure('summary_counters'):
+                counters = stats.get_summary('benchmark')
+        expected = legacy_summary(annotations)
+        if (counters['total'], counters['by_type'], counters['by_page']) != \
+                (expected['total'], expected['by_type'], dict(sorted(expected['by_page'].items()))):
+            print("ADVERTENCIA: los contadores no coinciden con el resumen")
+
+    results: Dict[str, Any] = {
+        'config': {
+            'annotations': args.annotations,
+            'pages': args.pages,
+            'repeat': args.repeat,
+            'seed': args.seed
+        },
+        'build': build.summary(),
+        'scenarios': {}
+    }
+
+    for name, options in scenarios(args.pages).items():
+        options = dict(options)
+        if 'sort_by' in options:
+            options['sort_by'] = SortField(options['sort_by'])
+            options['sort_order'] = SortOrder(options['sort_order'])
+        params = AnnotationFilter(**options)
+
+        recorder = LatencyRecorder()
+        for _ in range(args.repeat):
+            with recorder.measure('apply_filter'):
+                page = engine.apply_filter(annotations, params)
+            if params.page_range or params.position_box:
+                with recorder.measure('apply_filter_index'):
+                    indexed = engine.apply_filter(annotations, params, index)
+            with recorder.measure('apply_filter_columns'):
+                columnar = engine.apply_filter(annotations, params, columns=columns)
+            if not args.skip_legacy:
+                with recorder.measure('legacy'):
+                    legacy = legacy_apply_filter(annotations, params)
+
+        summary = recorder.summary()
+        result = {
+            'returned': len(page),
+            'latency': summary
+        }
+        line = f"{name:<14} p50 {summary['apply_filter']['p50_ms']:8.1f} ms"
+        if 'apply_filter_index' in summary:
+            result['same_result_index'] = [a['id'] for a in indexed] == [a['id'] for a in page]
+            line += f"   índice {summary['apply_filter_index']['p50_ms']:8.2f} ms"
+        result['same_result_columns'] = [a['id'] for a in columnar] == [a['id'] for a in page]
+        line += f"   columnas {summary['apply_filter_columns']['p50_ms']:7.2f} ms"
+        if not args.skip_legacy:
+            result['same_result'] = [a['id'] for a in page] == [a['id'] for a in legacy]
+            result['speedup'] = summary['legacy']['p50_ms'] / summary['apply_filter']['p50_ms']
+            line += (
+                f"   legacy {summary['legacy']['p50_ms']:8.1f} ms"
+                f"   x{result['speedup']:.1f}   {'ok' if result['same_result'] else 'DISTINTO'}"
+            )
+        print(line)
+        results['scenarios'][name] = result
+
+    results['fuzzy'] = {}
+    for query in fuzzy_queries(annotations):
+        recorder = LatencyRecorder()
+        if not args.skip_legacy:
+            with recorder.measure('legacy'):
+                legacy = [a['id'] for a in annotations if engine_fuzzy_legacy(a['content'], query)]
+        with recorder.measure('scan'):
+            check = engine.compile_predicate(AnnotationFilter(content_query=query), match_type='fuzzy')
+            scanned = [a['id'] for a in annotations if check(a)]
+        for _ in range(args.repeat):
+            with recorder.measure('index'):
+                indexed = text_index.search(query)
+        summary = recorder.summary()
+        result = {
+            'matches': len(indexed),
+            'latency': summary,
+            'same_result': indexed == scanned and (args.skip_legacy or scanned == legacy)
+        }
+        line = f"fuzzy {len(query):>4} car.  coincidencias {len(indexed):>6}"
+        if not args.skip_legacy:
+            line += f"   difflib {summary['legacy']['p50_ms']:8.0f} ms"
+        line += (
+            f"   compilado {summary['scan']['p50_ms']:8.0f} ms   índice {summary['index']['p50_ms']:7.1f} ms"
+            f"   {'ok' if result['same_result'] else 'DISTINTO'}"
+        )
+        print(line)
+        results['fuzzy'][query] = result
+
+    totals = results['build']
+    print(
+        f"índice {totals['spatial_index_build']['p50_ms']:.0f} ms, "
+        f"n-gramas {totals['text_index_build']['p50_ms']:.0f} ms, columnas {totals['column_store_build']['p50_ms']:.0f} ms; "
+        f"resumen {totals['summary_lists']['p50_ms']:.1f} ms -> {totals['summary_columns']['p50_ms']:.2f} ms"
+    )
+    if 'summary_counters' in totals:
+        print(
+            f"contadores: conteo inicial {totals['counters_reconcile']['p50_ms']:.0f} ms, "
+            f"resumen {totals['summary_counters']['p50_ms']:.2f} ms"
+        )
+    path = write_report('annotation_filter', results, args.output)
+    print(f"Reporte: {path}")
+
+if __name__ == "__main__":
+    main()
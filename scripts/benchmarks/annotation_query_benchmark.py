@@ -0,0 +1,181 @@
+"""
+Benchmark de búsqueda de anotaciones en Postgres.
+
+Carga un documento con muchas anotaciones (1M por defecto) en una base con
+el esquema de la aplicación y mide `AnnotationService.search_annotations`
+(filtros y cursor en SQL) frente a la ruta anterior: leer todas las
+anotaciones del documento y filtrar en Python con `AnnotationFilterEngine`.
+Para cada escenario guarda además el plan de ejecución, para comprobar que
+usa los índices compuestos y no ordena el documento completo.
+
+Requiere Postgres con las tablas `documents`, `users` y `annotations` y los
+índices del modelo, y un documento y un usuario existentes.
+
+Uso:
+    python -m scripts.benchmarks.annotation_query_benchmark \\
+        --dsn postgresql+psycopg2://postgres@localhost/first_court \\
+        --document-id <uuid> --user-id <uuid> --annotations 1000000
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List
+
+from scripts.benchmarks.common import LatencyRecorder, write_report
+from scripts.benchmarks.legal_corpus import generate_annotations
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda de anotaciones en Postgres")
+    parser.add_argument('--dsn', required=True, help="URL SQLAlchemy de la base")
+    parser.add_argument('--document-id', required=True, help="Documento existente donde cargar")
+    parser.add_argument('--user-id', required=True, help="Usuario existente como autor")
+    parser.add_argument('--annotations', type=int, default=1000000)
+    parser.add_argument('--pages', type=int, default=2000, help="Páginas del documento")
+    parser.add_argument('--batch', type=int, default=10000, help="Filas por INSERT")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--skip-load', action='store_true', help="Usar las anotaciones ya cargadas")
+    parser.add_argument('--skip-python', action='store_true',
+                        help="No medir la ruta de cargar todo y filtrar en Python")
+    parser.add_argument('--cleanup', action='store_true', help="Borrar las anotaciones al terminar")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Archivo JSON de salida")
+    return parser.parse_args()
+
+def scenarios(pages: int) -> Dict[str, Dict[str, Any]]:
+    """Parámetros de AnnotationFilter y tipo de texto por escenario."""
+    return {
+        'first_page': {},
+        'deep_cursor': {'pages_ahead': 20},
+        'text': {'content_query': 'prisión preventiva'},
+        'tags_type': {'tags': ['urgente'], 'types': ['comment']},
+        'dates': {'created_after': datetime(2024, 6, 1), 'created_before': datetime(2024, 6, 15)},
+        'page_range': {'page_range': (pages // 2, pages // 2 + 5), 'sort_by': 'page', 'sort_order': 'asc'},
+        'viewport': {
+            'page_range': (pages // 3, pages // 3),
+            'position_box': {'x1': 0.0, 'y1': 0.25, 'x2': 1.0, 'y2': 0.5},
+            'sort_by': 'position', 'sort_order': 'asc'
+        },
+        'fuzzy': {'content_query': 'prision preventiba', 'page_range': (1, pages // 20), 'match_type': 'fuzzy'}
+    }
+
+def load_annotations(session, args) -> float:
+    """Insertar las anotaciones sintéticas por lotes; devuelve segundos."""
+    from sqlalchemy import insert, text
+    from src.models.annotations import Annotation
+
+    document_id = uuid.UUID(args.document_id)
+    user_id = uuid.UUID(args.user_id)
+    started = time.perf_counter()
+    for offset in range(0, args.annotations, args.batch):
+        count = min(args.batch, args.annotations - offset)
+        rows = [
+            {
+                'id': uuid.uuid4(),
+                'document_id': document_id,
+                'user_id': user_id,
+                'content': {'text': a['content']},
+                'position': a['position'],
+                'type': a['type'],
+                'tags': a['tags'],
+                'created_at': a['created_at'],
+                'updated_at': a['updated_at']
+            }
+            for a in generate_annotations(count, pages=args.pages, seed=args.seed + offset)
+        ]
+        session.execute(insert(Annotation.__table__), rows)
+        session.commit()
+    session.execute(text("ANALYZE annotations"))
+    session.commit()
+    return time.perf_counter() - started
+
+def explain(session, statement) -> List[str]:
+    """Plan de ejecución de una consulta."""
+    from sqlalchemy import text
+    from sqlalchemy.dialects import postgresql
+
+    compiled = statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True})
+    return [row[0] for row in session.execute(text(f"EXPLAIN {compiled}"))]
+
+def python_search(session, engine, document_id, params) -> List[Dict[str, Any]]:
+    """Ruta anterior: todas las anotaciones del documento, filtro en Python."""
+    from src.services.annotations import AnnotationService
+
+    annotations = [
+        {**a.to_dict(), 'content': (a.content or {}).get('text', ''),
+         'created_at': a.created_at, 'updated_at': a.updated_at}
+        for a in AnnotationService(session).get_document_annotations(document_id)
+    ]
+    return engine.apply_filter(annotations, params)
+
+def main():
+    from sqlalchemy import create_engine, delete
+    from sqlalchemy.orm import sessionmaker
+    from src.documents.annotation_filters import AnnotationFilter, AnnotationFilterEngine, SortField, SortOrder
+    from src.models.annotations import Annotation
+    from src.services.annotations import AnnotationService
+
+    args = parse_args()
+    session = sessionmaker(bind=create_engine(args.dsn))()
+    document_id = uuid.UUID(args.document_id)
+    service = AnnotationService(session)
+    engine = AnnotationFilterEngine()
+
+    results: Dict[str, Any] = {
+        'config': {
+            'annotations': args.annotations,
+            'pages': args.pages,
+            'repeat': args.repeat,
+            'seed': args.seed
+        },
+        'scenarios': {}
+    }
+    if not args.skip_load:
+        print(f"Cargando {args.annotations} anotaciones...")
+        results['load_seconds'] = load_annotations(session, args)
+    results['stored'] = service.count_document_annotations(document_id)
+
+    for name, options in scenarios(args.pages).items():
+        options = dict(options)
+        match_type = options.pop('match_type', 'contains')
+        pages_ahead = options.pop('pages_ahead', 0)
+        if 'sort_by' in options:
+            options['sort_by'] = SortField(options['sort_by'])
+            options['sort_order'] = SortOrder(options['sort_order'])
+        params = AnnotationFilter(**options)
+
+        # Cursor de la página pedida, recorriendo las anteriores
+        cursor = None
+        for _ in range(pages_ahead):
+            cursor = service.search_annotations(document_id, params, match_type, cursor)['next_cursor']
+
+        recorder = LatencyRecorder()
+        for _ in range(args.repeat):
+            with recorder.measure('sql'):
+                page = service.search_annotations(document_id, params, match_type, cursor)
+        if not args.skip_python and not pages_ahead and match_type != 'fuzzy':
+            with recorder.measure('python'):
+                python_search(session, engine, document_id, params)
+
+        summary = recorder.summary()
+        plan = service.planner.plan(document_id, params, match_type, cursor)
+        result = {
+            'returned': len(page['annotations']),
+            'latency': summary,
+            'plan': explain(session, plan.statement.limit(params.limit + 1))
+        }
+        line = f"{name:<12} sql p50 {summary['sql']['p50_ms']:8.1f} ms"
+        if 'python' in summary:
+            line += f"   python {summary['python']['p50_ms']:9.0f} ms"
+        print(line)
+        results['scenarios'][name] = result
+
+    if args.cleanup:
+        session.execute(delete(Annotation).where(Annotation.document_id == document_id))
+        session.commit()
+
+    path = write_report('annotation_query', results, args.output)
+    print(f"Reporte: {path}")
+
+if __name__ == "__main__":
+    main()
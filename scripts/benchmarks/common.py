@@ -0,0 +1,95 @@
+"""
+Utilidades comunes para los benchmarks de rendimiento.
+Los reportes se escriben en JSON con metadatos del commit para poder
+compararlos entre versiones (`diff` o `jq`).
+"""
+import json
+import platform
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+RESULTS_DIR = PROJECT_ROOT / 'benchmarks' / 'results'
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, float]:
+    """Resumir latencias (en segundos) como milisegundos."""
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'mean_ms': (sum(values) / len(values) * 1000) if values else 0.0,
+        'p50_ms': percentile(values, 50) * 1000,
+        'p95_ms': percentile(values, 95) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+        'max_ms': (values[-1] * 1000) if values else 0.0
+    }
+
+class LatencyRecorder:
+    """Acumula latencias por operación."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """Medir la duración de un bloque."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - start)
+
+    def record(self, name: str, seconds: float):
+        """Registrar una muestra ya medida."""
+        self.samples.setdefault(name, []).append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Resumen de percentiles por operación."""
+        return {name: summarize_latencies(values) for name, values in self.samples.items()}
+
+def git_commit() -> Optional[str]:
+    """Commit actual del repositorio, si está disponible."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=PROJECT_ROOT,
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def write_report(name: str, results: Dict[str, Any], output: Optional[str] = None) -> Path:
+    """Escribir reporte JSON de un benchmark.
+
+    Args:
+        name: Nombre del benchmark
+        results: Resultados a guardar
+        output: Ruta del archivo; por defecto `benchmarks/results/<name>_<commit>.json`
+
+    Returns:
+        Ruta del archivo escrito
+    """
+    commit = git_commit()
+    path = Path(output) if output else RESULTS_DIR / f"{name}_{commit or 'local'}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    report = {
+        'benchmark': name,
+        'commit': commit,
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+    path.write_text(json.dumps(report, indent=2, sort_keys=True, default=str))
+    return path
@@ -0,0 +1,206 @@
+"""
+Benchmark del motor de diferencias de documentos.
+
+Genera una sentencia sintética con el formato `body.content` de Google Docs,
+le aplica ediciones típicas (correcciones de palabras, párrafos insertados y
+eliminados, un bloque movido, cambios de estilo) y compara
+`src.utils.diff.calculate_diff` contra el diff previo por caracteres con
+difflib: tiempo, tamaño del resultado y reconstrucción exacta con
+`apply_patch`.
+
+Uso:
+    python -m scripts.benchmarks.diff_benchmark --pages 100 --repeat 5
+"""
+import argparse
+import copy
+import difflib
+import json
+import random
+from typing import Any, Dict, List
+
+from scripts.benchmarks.common import LatencyRecorder, write_report
+from scripts.benchmarks.legal_corpus import generate_corpus
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de diff de documentos")
+    parser.add_argument('--pages', type=int, default=100, help="Páginas de la sentencia")
+    parser.add_argument('--paragraphs', type=int, default=12, help="Párrafos por página")
+    parser.add_argument('--edits', type=int, default=40, help="Ediciones de palabras")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por escenario")
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help="No medir el diff por caracteres de difflib")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Archivo JSON de salida")
+    return parser.parse_args()
+
+def _paragraph(text: str, bold: bool = False) -> Dict[str, Any]:
+    return {
+        'paragraph': {
+            'elements': [{'textRun': {'content': text + "\n", 'textStyle': {'bold': bold}}}],
+            'paragraphStyle': {'namedStyleType': 'NORMAL_TEXT'}
+        }
+    }
+
+def build_document(pages: int, paragraphs_per_page: int, seed: int) -> Dict[str, Any]:
+    """Sentencia sintética en formato Google Docs."""
+    document = next(generate_corpus(1, pages, paragraphs_per_page, seed=seed))
+    content: List[Dict[str, Any]] = [{'sectionBreak': {'sectionStyle': {}}}]
+    for page in document['pages']:
+        content.append(_paragraph(f"Página {page['pageNumber']}", bold=True))
+        content.extend(_paragraph(line) for line in page['text'].split("\n"))
+
+    # Índices como los entrega la API
+    index = 1
+    for element in content:
+        length = sum(
+            len(run['textRun']['content'])
+            for run in element.get('paragraph', {}).get('elements', [])
+        ) or 1
+        element['startIndex'] = index
+        element['endIndex'] = index + length
+        index += length
+
+    return {'documentId': document['id'], 'title': document['title'], 'body': {'content': content}}
+
+def _paragraph_indexes(document: Dict[str, Any]) -> List[int]:
+    return [i for i, e in enumerate(document['body']['content']) if 'paragraph' in e]
+
+def edit_words(document: Dict[str, Any], edits: int, rng: random.Random) -> Dict[str, Any]:
+    """Correcciones dispersas de una palabra."""
+    result = copy.deepcopy(document)
+    for index in rng.sample(_paragraph_indexes(result), edits):
+        run = result['body']['content'][index]['paragraph']['elements'][0]['textRun']
+        words = run['content'].split(' ')
+        position = rng.randrange(len(words))
+        words[position] = rng.choice(["imputado", "querellante", "S.S.", "artículo"])
+        run['content'] = ' '.join(words)
+    return result
+
+def edit_paragraphs(document: Dict[str, Any], edits: int, rng: random.Random) -> Dict[str, Any]:
+    """Párrafos insertados y eliminados."""
+    result = copy.deepcopy(document)
+    content = result['body']['content']
+    for _ in range(edits):
+        position = rng.randrange(1, len(content))
+        if rng.random() < 0.5:
+            content.insert(position, _paragraph("Se agrega considerando adicional."))
+        else:
+            del content[position]
+    return result
+
+def move_block(document: Dict[str, Any], size: int, rng: random.Random) -> Dict[str, Any]:
+    """Mover un bloque de párrafos a otra sección."""
+    result = copy.deepcopy(document)
+    content = result['body']['content']
+    start = rng.randrange(1, len(content) - size)
+    block = content[start:start + size]
+    del content[start:start + size]
+    target = rng.randrange(1, len(content))
+    content[target:target] = block
+    return result
+
+def restyle(document: Dict[str, Any], edits: int, rng: random.Random) -> Dict[str, Any]:
+    """Cambios solo de estilo (negrita) en párrafos."""
+    result = copy.deepcopy(document)
+    for index in rng.sample(_paragraph_indexes(result), edits):
+        style = result['body']['content'][index]['paragraph']['elements'][0]['textRun']['textStyle']
+        style['bold'] = not style['bold']
+    return result
+
+def legacy_diff(content1: Dict[str, Any], content2: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Diff anterior: difflib por caracteres sobre el texto plano."""
+    from src.utils.diff import _extract_text
+
+    text1 = _extract_text(content1)
+    text2 = _extract_text(content2)
+    changes = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, text1, text2).get_opcodes():
+        change = {'type': tag, 'content': None, 'position': {'start': i1, 'end': i2}}
+        if tag == 'replace':
+            change['old_content'] = text1[i1:i2]
+            change['new_content'] = text2[j1:j2]
+        elif tag == 'delete':
+            change['content'] = text1[i1:i2]
+        elif tag == 'insert':
+            change['content'] = text2[j1:j2]
+        changes.append(change)
+    return changes
+
+def run_scenario(
+    name: str,
+    base: Dict[str, Any],
+    target: Dict[str, Any],
+    repeat: int,
+    skip_legacy: bool
+) -> Dict[str, Any]:
+    from src.utils.diff import apply_patch, calculate_diff, strip_indices
+
+    recorder = LatencyRecorder()
+    for _ in range(repeat):
+        with recorder.measure('calculate_diff'):
+            changes = calculate_diff(base, target)
+        with recorder.measure('apply_patch'):
+            patched = apply_patch(base, changes)
+
+    result = {
+        'changes': sum(1 for c in changes if c['type'] != 'equal'),
+        'change_types': {
+            t: sum(1 for c in changes if c['type'] == t)
+            for t in sorted({c['type'] for c in changes})
+        },
+        'payload_bytes': len(json.dumps(changes, ensure_ascii=False).encode()),
+        'roundtrip_ok': patched == strip_indices(target)
+    }
+
+    if not skip_legacy:
+        # Una sola corrida: es varios órdenes de magnitud más lento
+        with recorder.measure('legacy_diff'):
+            legacy_changes = legacy_diff(base, target)
+        result['legacy_payload_bytes'] = len(json.dumps(legacy_changes, ensure_ascii=False).encode())
+
+    result['latency'] = recorder.summary()
+    print(
+        f"{name:>12}: diff p50 {result['latency']['calculate_diff']['p50_ms']:.1f} ms"
+        + (
+            f" (difflib {result['latency']['legacy_diff']['p50_ms']:.1f} ms)"
+            if not skip_legacy else ""
+        )
+        + f", {result['payload_bytes']} bytes, roundtrip {'ok' if result['roundtrip_ok'] else 'FALLA'}"
+    )
+    return result
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    base = build_document(args.pages, args.paragraphs, args.seed)
+    print(f"Sentencia: {len(base['body']['content'])} elementos, {args.pages} páginas")
+
+    scenarios = {
+        'identical': copy.deepcopy(base),
+        'word_edits': edit_words(base, args.edits, rng),
+        'paragraphs': edit_paragraphs(base, args.edits // 2, rng),
+        'moved_block': move_block(base, args.paragraphs * 2, rng),
+        'restyle': restyle(base, args.edits // 2, rng)
+    }
+
+    results: Dict[str, Any] = {
+        'config': {
+            'pages': args.pages,
+            'paragraphs_per_page': args.paragraphs,
+            'elements': len(base['body']['content']),
+            'edits': args.edits,
+            'repeat': args.repeat,
+            'seed': args.seed
+        },
+        'scenarios': {
+            name: run_scenario(name, base, target, args.repeat, args.skip_legacy)
+            for name, target in scenarios.items()
+        }
+    }
+
+    path = write_report('diff', results, args.output)
+    print(f"Reporte: {path}")
+
+if __name__ == "__main__":
+    main()
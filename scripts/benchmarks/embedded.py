@@ -0,0 +1,186 @@
+"""
+Backends embebidos para correr benchmarks sin Elasticsearch ni Redis.
+Implementan solo la parte de la API que usan `SearchService` y `SearchCache`;
+los números obtenidos sirven para comparar commits entre sí, no para
+estimar la latencia de un clúster real.
+"""
+import asyncio
+import fnmatch
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+class EmbeddedElasticsearch:
+    """Índice invertido en memoria con la interfaz async de Elasticsearch."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        """Inicializar backend.
+
+        Args:
+            latency_ms: Latencia de red simulada por request
+        """
+        self.latency_ms = latency_ms
+        self.indices: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.postings: Dict[str, Dict[str, set]] = {}
+        self.requests = 0
+
+    def index(self, index: str, id: str, document: Dict[str, Any]):
+        """Indexar un documento."""
+        self.indices.setdefault(index, {})[id] = document
+        postings = self.postings.setdefault(index, {})
+        for token in set(_tokens(document.get('text') or document.get('content') or '')):
+            postings.setdefault(token, set()).add(id)
+
+    async def search(self, index: str, body: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+        """Ejecutar una búsqueda."""
+        await self._round_trip()
+        return self._search(index, body)
+
+    async def msearch(self, body: List[Dict[str, Any]], **kwargs) -> Dict[str, Any]:
+        """Ejecutar varias búsquedas en un solo request."""
+        await self._round_trip()
+        responses = []
+        for header, search_body in zip(body[::2], body[1::2]):
+            try:
+                responses.append(self._search(header['index'], search_body))
+            except KeyError as e:
+                responses.append({'error': {'type': 'index_not_found_exception', 'reason': str(e)}, 'status': 404})
+        return {'responses': responses}
+
+    async def close(self):
+        """Compatibilidad con AsyncElasticsearch."""
+
+    async def _round_trip(self):
+        self.requests += 1
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+
+    def _search(self, index: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        docs = self.indices[index]
+        clause = body['query']['bool']['must'][0]
+        matcher, pattern = self._compile(clause, index)
+
+        hits = []
+        for doc_id in matcher:
+            source = docs[doc_id]
+            text = source.get('text', '')
+            match = pattern.search(text)
+            if not match:
+                continue
+            start, end = match.span()
+            hits.append({
+                '_id': doc_id,
+                '_score': 1.0,
+                '_source': source,
+                'highlight': {
+                    'text': [text[max(0, start - 40):start] + '<em>' + text[start:end] + '</em>' + text[end:end + 40]]
+                }
+            })
+
+        size = body.get('size', 10)
+        return {
+            'took': 0,
+            'hits': {'total': {'value': len(hits)}, 'hits': hits[:size]}
+        }
+
+    def _compile(self, clause: Dict[str, Any], index: str) -> Tuple[List[str], re.Pattern]:
+        """Traducir la cláusula a candidatos y una expresión regular."""
+        postings = self.postings.get(index, {})
+        if 'regexp' in clause:
+            value = clause['regexp']['text']['value']
+            return list(self.indices[index]), re.compile(value, re.IGNORECASE)
+
+        if 'match_phrase' in clause:
+            phrase = clause['match_phrase']['text']
+        else:
+            phrase = clause['match']['text']['query']
+
+        terms = _tokens(phrase)
+        candidates: Optional[set] = None
+        for term in terms:
+            ids = postings.get(term, set())
+            candidates = ids if candidates is None else candidates & ids
+        pattern = re.escape(phrase) if 'match_phrase' in clause else re.escape(terms[0]) if terms else ''
+        return sorted(candidates or []), re.compile(pattern, re.IGNORECASE)
+
+class InMemoryRedis:
+    """Subconjunto de la API síncrona de redis-py usado por `SearchCache`."""
+
+    def __init__(self):
+        self.data: Dict[bytes, Any] = {}
+        self.expiry: Dict[bytes, float] = {}
+
+    @staticmethod
+    def _key(key) -> bytes:
+        return key if isinstance(key, bytes) else str(key).encode()
+
+    def _alive(self, key: bytes) -> bool:
+        deadline = self.expiry.get(key)
+        if deadline is not None and deadline < time.monotonic():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return key in self.data
+
+    def get(self, key):
+        key = self._key(key)
+        return self.data[key] if self._alive(key) else None
+
+    def setex(self, key, ttl: int, value):
+        key = self._key(key)
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        self.expiry[key] = time.monotonic() + ttl
+
+    def incr(self, key, amount: int = 1):
+        key = self._key(key)
+        value = int(self.get(key) or 0) + amount
+        self.data[key] = str(value).encode()
+        return value
+
+    def expire(self, key, ttl: int):
+        self.expiry[self._key(key)] = time.monotonic() + ttl
+
+    def hincrby(self, key, field, amount: int = 1):
+        key = self._key(key)
+        bucket = self.data.setdefault(key, {})
+        field = self._key(field)
+        bucket[field] = str(int(bucket.get(field, b'0')) + amount).encode()
+
+    def hgetall(self, key):
+        key = self._key(key)
+        return dict(self.data.get(key, {})) if self._alive(key) else {}
+
+    def keys(self, pattern='*'):
+        pattern = pattern.decode() if isinstance(pattern, bytes) else pattern
+        return [k for k in list(self.data) if self._alive(k) and fnmatch.fnmatchcase(k.decode(), pattern)]
+
+    def delete(self, *keys):
+        for key in keys:
+            key = self._key(key)
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+
+    def pipeline(self):
+        return _InMemoryPipeline(self)
+
+class _InMemoryPipeline:
+    """Pipeline que ejecuta los comandos en orden al llamar `execute`."""
+
+    def __init__(self, redis: InMemoryRedis):
+        self.redis = redis
+        self.commands: List[Tuple[str, tuple]] = []
+
+    def __getattr__(self, name):
+        def command(*args):
+            self.commands.append((name, args))
+            return self
+        return command
+
+    def execute(self):
+        results = [getattr(self.redis, name)(*args) for name, args in self.commands]
+        self.commands = []
+        return results
@@ -0,0 +1,252 @@
+"""
+Generador de corpus jurídico chileno sintético para benchmarks.
+Produce resoluciones, escritos y actas de audiencia con RIT, tribunales e
+intervinientes verosímiles, junto con una mezcla realista de consultas.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List
+
+TRIBUNALES = [
+    "Juzgado de Garantía de Santiago",
+    "7° Juzgado de Garantía de Santiago",
+    "Juzgado de Garantía de Valparaíso",
+    "Tribunal de Juicio Oral en lo Penal de Concepción",
+    "Juzgado de Letras del Trabajo de Temuco",
+    "Juzgado de Familia de Antofagasta",
+    "1° Juzgado Civil de Puerto Montt"
+]
+
+NOMBRES = [
+    "Juan", "María", "José", "Ana", "Luis", "Carmen", "Pedro", "Rosa",
+    "Francisco", "Javiera", "Diego", "Camila", "Matías", "Valentina"
+]
+
+APELLIDOS = [
+    "González", "Muñoz", "Rojas", "Díaz", "Pérez", "Soto", "Contreras",
+    "Silva", "Martínez", "Sepúlveda", "Morales", "Rodríguez", "Fuentes"
+]
+
+MATERIAS = [
+    "robo con intimidación", "hurto simple", "lesiones menos graves",
+    "tráfico ilícito de estupefacientes", "estafa", "amenazas",
+    "despido injustificado", "cuidado personal", "cobro de pesos",
+    "violencia intrafamiliar", "receptación", "conducción en estado de ebriedad"
+]
+
+FRASES = {
+    "resolucion": [
+        "Se tiene por formalizada la investigación respecto del imputado {parte}.",
+        "Se decreta la medida cautelar de prisión preventiva por estimarse que la libertad del imputado constituye un peligro para la seguridad de la sociedad.",
+        "Atendido el mérito de los antecedentes, se fija un plazo de investigación de {dias} días.",
+        "Téngase presente y a sus antecedentes. Notifíquese por el estado diario.",
+        "Se acoge la solicitud de la defensa y se decreta el sobreseimiento definitivo conforme al artículo 250 del Código Procesal Penal.",
+        "Se rechaza el recurso de reposición interpuesto por el Ministerio Público."
+    ],
+    "escrito": [
+        "{parte}, abogado, por la parte querellante, en causa RIT {rit}, a S.S. respetuosamente digo:",
+        "Que vengo en solicitar se fije audiencia de revisión de medidas cautelares.",
+        "POR TANTO, ruego a S.S. tener por interpuesto el presente recurso de apelación.",
+        "En lo principal: solicita diligencias; primer otrosí: acompaña documentos; segundo otrosí: patrocinio y poder.",
+        "La conducta de mi representado no se subsume en el tipo penal de {materia}.",
+        "Se solicita la suspensión condicional del procedimiento en los términos del artículo 237."
+    ],
+    "acta": [
+        "En {tribunal}, a {dia} de {mes} de {anio}, siendo las {hora} horas, se lleva a efecto la audiencia de control de detención.",
+        "Comparecen el fiscal adjunto, la defensora penal pública y el imputado {parte}.",
+        "El tribunal declara ajustada a derecho la detención.",
+        "El Ministerio Público formaliza por el delito de {materia} en grado de consumado.",
+        "Se pone término a la audiencia, firmando los comparecientes.",
+        "La defensa se opone a la medida cautelar solicitada y pide arresto domiciliario nocturno."
+    ]
+}
+
+MESES = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+    "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+]
+
+TERMINOS_FRECUENTES = [
+    "prisión preventiva", "formalización", "sobreseimiento definitivo",
+    "control de detención", "recurso de apelación", "medida cautelar",
+    "suspensión condicional", "arresto domiciliario", "Ministerio Público",
+    "defensa penal pública"
+]
+
+DOCUMENT_TYPES = ["resolucion", "escrito", "acta"]
+
+ANNOTATION_TYPES = ["note", "highlight", "comment"]
+
+ANNOTATION_TAGS = [
+    "urgente", "prueba", "plazo", "cautelar", "jurisprudencia", "revisar",
+    "contradicción", "testigo", "pericia", "alegato"
+]
+
+def random_name(rng: random.Random) -> str:
+    """Nombre completo de un interviniente."""
+    return f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}"
+
+def random_rit(rng: random.Random) -> str:
+    """RIT con formato número-año."""
+    return f"{rng.randint(1, 15000)}-{rng.randint(2015, 2025)}"
+
+def _fill(template: str, rng: random.Random, case: Dict[str, Any]) -> str:
+    return template.format(
+        parte=rng.choice(case['parties']),
+        rit=case['rit'],
+        materia=case['materia'],
+        tribunal=case['tribunal'],
+        dias=rng.choice([30, 60, 90, 120]),
+        dia=rng.randint(1, 28),
+        mes=rng.choice(MESES),
+        anio=case['rit'].split('-')[1],
+        hora=f"{rng.randint(8, 17):02d}:{rng.choice(['00', '15', '30', '45'])}"
+    )
+
+def generate_corpus(
+    num_documents: int,
+    pages_per_document: int = 5,
+    paragraphs_per_page: int = 8,
+    seed: int = 42
+) -> Iterator[Dict[str, Any]]:
+    """Generar documentos sintéticos.
+
+    Args:
+        num_documents: Número de documentos
+        pages_per_document: Páginas por documento
+        paragraphs_per_page: Párrafos por página
+        seed: Semilla para reproducibilidad
+
+    Yields:
+        Documentos con metadatos y páginas
+    """
+    rng = random.Random(seed)
+    cases: List[Dict[str, Any]] = []
+
+    for i in range(num_documents):
+        # Varios documentos comparten causa, como en la realidad
+        if not cases or rng.random() < 0.3:
+            cases.append({
+                'rit': random_rit(rng),
+                'tribunal': rng.choice(TRIBUNALES),
+                'materia': rng.choice(MATERIAS),
+                'parties': [random_name(rng) for _ in range(rng.randint(2, 4))]
+            })
+        case = rng.choice(cases)
+        doc_type = rng.choice(DOCUMENT_TYPES)
+
+        pages = []
+        for page_number in range(1, pages_per_document + 1):
+            paragraphs = [
+                _fill(rng.choice(FRASES[doc_type]), rng, case)
+                for _ in range(paragraphs_per_page)
+            ]
+            pages.append({
+                'pageNumber': page_number,
+                'text': "\n".join(paragraphs),
+                'position': {'x': 0, 'y': 0}
+            })
+
+        yield {
+            'id': f"bench-{seed}-{i}",
+            'title': f"{doc_type.capitalize()} RIT {case['rit']} - {case['materia']}",
+            'content': "\n".join(page['text'] for page in pages),
+            'metadata': {
+                'type': doc_type,
+                'rit': case['rit'],
+                'tribunal': case['tribunal'],
+                'parties': case['parties']
+            },
+            'pages': pages
+        }
+
+def generate_query_mix(
+    documents: List[Dict[str, Any]],
+    num_queries: int,
+    seed: int = 42
+) -> List[Dict[str, Any]]:
+    """Generar una mezcla realista de consultas.
+
+    La distribución es sesgada (unos pocos documentos y términos concentran
+    la mayoría de las búsquedas), lo que permite medir la tasa de aciertos
+    del caché.
+
+    Returns:
+        Consultas con documento, texto, opciones y categoría
+    """
+    rng = random.Random(seed + 1)
+    # Pesos tipo Zipf sobre documentos
+    weights = [1 / (rank + 1) for rank in range(len(documents))]
+    queries = []
+
+    for _ in range(num_queries):
+        doc = rng.choices(documents, weights=weights)[0]
+        roll = rng.random()
+        if roll < 0.35:
+            kind, text, options = 'term', rng.choice(TERMINOS_FRECUENTES), {}
+        elif roll < 0.6:
+            kind = 'party'
+            text = rng.choice(doc['metadata']['parties']).split()[1]
+            options = {}
+        elif roll < 0.8:
+            kind, text, options = 'rit', doc['metadata']['rit'], {'wholeWord': True}
+        elif roll < 0.95:
+            kind, text, options = 'materia', rng.choice(MATERIAS), {'wholeWord': True}
+        else:
+            kind, text, options = 'regex', "art[ií]culo [0-9]+", {'useRegex': True}
+
+        queries.append({
+            'kind': kind,
+            'document_id': doc['id'],
+            'query': text,
+            'options': options
+        })
+
+    return queries
+
+def generate_annotations(
+    num_annotations: int,
+    pages: int = 200,
+    users: int = 25,
+    seed: int = 42
+) -> List[Dict[str, Any]]:
+    """Generar anotaciones de un expediente con el formato del filtro.
+
+    Args:
+        num_annotations: Número de anotaciones
+        pages: Páginas del documento
+        users: Autores distintos
+        seed: Semilla para reproducibilidad
+
+    Returns:
+        Anotaciones con contenido, etiquetas, autor, fechas y posición
+    """
+    rng = random.Random(seed)
+    phrases = [p for group in FRASES.values() for p in group]
+    case = {
+        'rit': random_rit(rng),
+        'tribunal': rng.choice(TRIBUNALES),
+        'materia': rng.choice(MATERIAS),
+        'parties': [random_name(rng) for _ in range(4)]
+    }
+    start = datetime(2024, 1, 1)
+    annotations = []
+
+    for i in range(num_annotations):
+        created = start + timedelta(minutes=rng.randint(0, 525600))
+        annotations.append({
+            'id': f"ann-{seed}-{i}",
+            'content': _fill(rng.choice(phrases), rng, case),
+            'tags': rng.sample(ANNOTATION_TAGS, rng.randint(0, 3)),
+            'type': rng.choice(ANNOTATION_TYPES),
+            'user_id': f"user-{rng.randint(1, users)}",
+            'created_at': created,
+            'updated_at': created + timedelta(minutes=rng.randint(0, 20000)),
+            'position': {
+                'page': rng.randint(1, pages),
+                'x': round(rng.random(), 4),
+                'y': round(rng.random(), 4)
+            }
+        })
+
+    return annotations
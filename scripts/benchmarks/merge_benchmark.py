@@ -0,0 +1,133 @@
+"""
+Benchmark del merge de tres vías de la sincronización offline.
+
+Genera documentos con miles de anotaciones, simula ediciones concurrentes del
+cliente (offline) y del servidor sobre la misma base y mide
+`three_way_merge` frente al merge anterior (`list(set(a + b))`, que falla con
+elementos diccionario).
+
+Uso:
+    python -m scripts.benchmarks.merge_benchmark --sizes 1000 5000 20000
+"""
+import argparse
+import copy
+import random
+from typing import Any, Dict
+
+from scripts.benchmarks.common import LatencyRecorder, write_report
+from scripts.benchmarks.legal_corpus import FRASES, random_name
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de merge de tres vías")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000],
+                        help="Anotaciones por documento")
+    parser.add_argument('--edit-ratio', type=float, default=0.05,
+                        help="Fracción de anotaciones editadas por cada lado")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Archivo JSON de salida")
+    return parser.parse_args()
+
+def build_document(size: int, rng: random.Random) -> Dict[str, Any]:
+    """Documento con `size` anotaciones."""
+    phrases = [p for group in FRASES.values() for p in group]
+    return {
+        'id': 'doc-bench',
+        'title': 'Sentencia definitiva',
+        'tags': ['penal', 'garantía'],
+        'annotations': [
+            {
+                'id': f"ann-{i}",
+                'type': rng.choice(['highlight', 'comment', 'note']),
+                'content': rng.choice(phrases),
+                'author': random_name(rng),
+                'pageNumber': rng.randint(1, 100),
+                'position': {'x': rng.random(), 'y': rng.random()}
+            }
+            for i in range(size)
+        ]
+    }
+
+def edit(document: Dict[str, Any], ratio: float, prefix: str, rng: random.Random) -> Dict[str, Any]:
+    """Editar, eliminar y agregar anotaciones sobre una copia."""
+    result = copy.deepcopy(document)
+    annotations = result['annotations']
+    count = max(1, int(len(annotations) * ratio))
+
+    for annotation in rng.sample(annotations, count):
+        annotation['content'] = f"{annotation['content']} ({prefix})"
+    for index in sorted(rng.sample(range(len(annotations)), count // 2), reverse=True):
+        del annotations[index]
+    for i in range(count // 2):
+        annotations.insert(
+            rng.randrange(len(annotations) + 1),
+            {'id': f"{prefix}-{i}", 'type': 'comment', 'content': prefix, 'pageNumber': 1}
+        )
+    return result
+
+def legacy_merge(client_state: Any, server_state: Any) -> Any:
+    """Merge anterior de SyncService._merge_states."""
+    if isinstance(client_state, dict) and isinstance(server_state, dict):
+        merged = server_state.copy()
+        for key, value in client_state.items():
+            merged[key] = legacy_merge(value, merged[key]) if key in merged else value
+        return merged
+    elif isinstance(client_state, list) and isinstance(server_state, list):
+        return list(set(client_state + server_state))
+    return client_state
+
+def run_size(size: int, args: argparse.Namespace, rng: random.Random) -> Dict[str, Any]:
+    from src.services.merge import three_way_merge
+
+    base = build_document(size, rng)
+    local = edit(base, args.edit_ratio, 'cliente', rng)
+    remote = edit(base, args.edit_ratio, 'servidor', rng)
+
+    recorder = LatencyRecorder()
+    for _ in range(args.repeat):
+        with recorder.measure('three_way_merge'):
+            merged, conflicts = three_way_merge(base, local, remote)
+        with recorder.measure('two_way_merge'):
+            three_way_merge(None, local, remote)
+
+    try:
+        legacy_merge(local, remote)
+        legacy_error = None
+    except TypeError as e:
+        legacy_error = str(e)
+
+    merged_ids = {a['id'] for a in merged['annotations']}
+    local_added = {a['id'] for a in local['annotations']} - {a['id'] for a in base['annotations']}
+    result = {
+        'annotations': size,
+        'merged_annotations': len(merged['annotations']),
+        'conflicts': len(conflicts),
+        'local_additions_kept': local_added <= merged_ids,
+        'legacy_error': legacy_error,
+        'latency': recorder.summary()
+    }
+    print(
+        f"{size:>6} anotaciones: p50 {result['latency']['three_way_merge']['p50_ms']:.1f} ms, "
+        f"{result['conflicts']} conflictos, legacy: {legacy_error or 'ok'}"
+    )
+    return result
+
+def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+
+    results: Dict[str, Any] = {
+        'config': {
+            'sizes': args.sizes,
+            'edit_ratio': args.edit_ratio,
+            'repeat': args.repeat,
+            'seed': args.seed
+        },
+        'sizes': {str(size): run_size(size, args, rng) for size in args.sizes}
+    }
+
+    path = write_report('merge', results, args.output)
+    print(f"Reporte: {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Benchmark de búsqueda sobre un corpus jurídico sintético.
+
+Genera resoluciones, escritos y actas, los carga en Elasticsearch local (o en
+el backend embebido), reproduce una mezcla de consultas contra
+`SearchService` y, opcionalmente, contra `/api/v1/search` de una API en
+ejecución, y escribe throughput, percentiles y tasa de aciertos de caché en
+un JSON comparable entre commits.
+
+Uso:
+    python -m scripts.benchmarks.search_benchmark --backend embedded --docs 500
+    python -m scripts.benchmarks.search_benchmark --backend es --docs 5000 \\
+        --api-url http://localhost:8000 --token $TOKEN
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from scripts.benchmarks.common import LatencyRecorder, summarize_latencies, write_report
+from scripts.benchmarks.embedded import EmbeddedElasticsearch, InMemoryRedis
+from scripts.benchmarks.legal_corpus import generate_corpus, generate_query_mix
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark de búsqueda")
+    parser.add_argument('--backend', choices=['es', 'embedded'], default='embedded')
+    parser.add_argument('--docs', type=int, default=500, help="Documentos a generar")
+    parser.add_argument('--pages', type=int, default=5, help="Páginas por documento")
+    parser.add_argument('--queries', type=int, default=5000, help="Consultas a reproducir")
+    parser.add_argument('--concurrency', type=int, default=16, help="Consultas en vuelo")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency-ms', type=float, default=1.0,
+                        help="Latencia simulada del backend embebido")
+    parser.add_argument('--api-url', help="URL base de la API para medir /api/v1/search")
+    parser.add_argument('--token', help="Token Bearer para la API")
+    parser.add_argument('--skip-load', action='store_true',
+                        help="No recargar el corpus en Elasticsearch")
+    parser.add_argument('--output', help="Archivo JSON de salida")
+    return parser.parse_args()
+
+async def load_elasticsearch(es, documents: List[Dict[str, Any]]):
+    """Cargar el corpus en Elasticsearch con el esquema que usan los servicios."""
+    from elasticsearch.helpers import async_bulk
+    from src.search.elasticsearch import ElasticsearchClient
+
+    # Índice general usado por /api/v1/search
+    ElasticsearchClient().create_indices()
+    actions = []
+    for doc in documents:
+        actions.append({
+            '_index': 'documents',
+            '_id': doc['id'],
+            '_source': {
+                'id': doc['id'],
+                'title': doc['title'],
+                'content': doc['content'],
+                'metadata': doc['metadata']
+            }
+        })
+        # Un índice por documento con sus páginas, usado por SearchService
+        for page in doc['pages']:
+            actions.append({
+                '_index': f"documents_{doc['id']}",
+                '_id': f"{doc['id']}-{page['pageNumber']}",
+                '_source': page
+            })
+    await async_bulk(es, actions, refresh='wait_for')
+
+def load_embedded(es: EmbeddedElasticsearch, documents: List[Dict[str, Any]]):
+    """Cargar el corpus en el backend embebido."""
+    for doc in documents:
+        for page in doc['pages']:
+            es.index(f"documents_{doc['id']}", f"{doc['id']}-{page['pageNumber']}", page)
+
+async def replay_service(service, queries: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """Reproducir consultas contra SearchService con concurrencia acotada."""
+    recorder = LatencyRecorder()
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+    cache_before = await service.cache.get_stats()
+
+    async def run(query: Dict[str, Any]):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await service.search_document(
+                    document_id=query['document_id'],
+                    query=query['query'],
+                    options=query['options']
+                )
+            except Exception:
+                errors += 1
+                return
+            elapsed = time.perf_counter() - start
+            recorder.record('all', elapsed)
+            recorder.record(query['kind'], elapsed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(q) for q in queries))
+    duration = time.perf_counter() - start
+
+    cache_after = await service.cache.get_stats()
+    hits = cache_after.get('cache_hits', 0) - cache_before.get('cache_hits', 0)
+    misses = cache_after.get('cache_misses', 0) - cache_before.get('cache_misses', 0)
+
+    return {
+        'queries': len(queries),
+        'errors': errors,
+        'duration_s': duration,
+        'throughput_qps': len(queries) / duration if duration else 0.0,
+        'latency': recorder.summary(),
+        'cache': {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else 0.0
+        },
+        'batching': service.batcher.get_stats()
+    }
+
+async def replay_api(
+    api_url: str,
+    token: Optional[str],
+    queries: List[Dict[str, Any]],
+    concurrency: int
+) -> Dict[str, Any]:
+    """Reproducir consultas contra /api/v1/search."""
+    import httpx
+
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+    headers = {'Authorization': f"Bearer {token}"} if token else {}
+
+    async with httpx.AsyncClient(base_url=api_url, headers=headers, timeout=30) as client:
+        async def run(query: Dict[str, Any]):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get('/api/v1/search', params={'q': query['query']})
+                if response.status_code != 200:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run(q) for q in queries))
+        duration = time.perf_counter() - start
+
+    return {
+        'queries': len(queries),
+        'errors': errors,
+        'duration_s': duration,
+        'throughput_qps': len(queries) / duration if duration else 0.0,
+        'latency': summarize_latencies(latencies)
+    }
+
+async def main():
+    args = parse_args()
+    random.seed(args.seed)
+
+    from src.services.search import SearchService
+
+    print(f"Generando corpus: {args.docs} documentos x {args.pages} páginas...")
+    documents = list(generate_corpus(args.docs, args.pages, seed=args.seed))
+    queries = generate_query_mix(documents, args.queries, seed=args.seed)
+
+    service = SearchService()
+    if args.backend == 'embedded':
+        es = EmbeddedElasticsearch(latency_ms=args.latency_ms)
+        load_embedded(es, documents)
+        service.es = es
+        service.batcher.es = es
+        service.cache.redis = InMemoryRedis()
+    elif not args.skip_load:
+        print("Cargando corpus en Elasticsearch...")
+        await load_elasticsearch(service.es, documents)
+
+    print(f"Reproduciendo {len(queries)} consultas (concurrencia {args.concurrency})...")
+    results: Dict[str, Any] = {
+        'config': {
+            'backend': args.backend,
+            'docs': args.docs,
+            'pages': args.pages,
+            'queries': args.queries,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+            'latency_ms': args.latency_ms if args.backend == 'embedded' else None
+        },
+        'search_service': await replay_service(service, queries, args.concurrency)
+    }
+
+    if args.api_url:
+        print(f"Reproduciendo consultas contra {args.api_url}/api/v1/search...")
+        results['api_search'] = await replay_api(args.api_url, args.token, queries, args.concurrency)
+
+    await service.es.close()
+
+    path = write_report('search', results, args.output)
+    summary = results['search_service']
+    print(
+        f"SearchService: {summary['throughput_qps']:.0f} q/s, "
+        f"p50 {summary['latency']['all']['p50_ms']:.2f} ms, "
+        f"p99 {summary['latency']['all']['p99_ms']:.2f} ms, "
+        f"cache hit rate {summary['cache']['hit_rate']:.1%}"
+    )
+    print(f"Reporte: {path}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
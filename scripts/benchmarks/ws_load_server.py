@@ -0,0 +1,86 @@
+"""
+Servidor de colaboración para las pruebas de carga de WebSocket.
+
+Monta el router de `src.routes.realtime` con el Redis local y reemplaza la
+autenticación por el parámetro `?user=` para poder abrir miles de clientes
+sin tokens. Agrega `/_loadtest/stats`, que informa memoria del proceso,
+conexiones abiertas y el retraso del event loop medido con una sonda.
+
+No exponer fuera de la máquina de pruebas.
+
+Uso (normalmente lo lanza `ws_load_test`):
+    python -m scripts.benchmarks.ws_load_server --port 8765
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, List
+
+from scripts.benchmarks.common import summarize_latencies
+
+PROBE_INTERVAL = 0.05
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Servidor para pruebas de carga WebSocket")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    return parser.parse_args()
+
+def build_app():
+    """App con el router de tiempo real y autenticación por query string."""
+    import psutil
+    from fastapi import FastAPI, WebSocket
+    from src.auth.dependencies import get_current_user
+    from src.routes import realtime
+
+    app = FastAPI()
+    app.include_router(realtime.router)
+
+    async def loadtest_user(websocket: WebSocket) -> Dict[str, Any]:
+        return {'id': websocket.query_params['user']}
+
+    app.dependency_overrides[get_current_user] = loadtest_user
+
+    lag_samples: List[float] = []
+    process = psutil.Process(os.getpid())
+
+    async def probe():
+        """Retraso del event loop: cuánto se atrasa un sleep corto."""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(PROBE_INTERVAL)
+            lag_samples.append(max(0.0, loop.time() - start - PROBE_INTERVAL))
+
+    @app.on_event("startup")
+    async def start_probe():
+        app.state.probe = asyncio.create_task(probe())
+
+    @app.get("/_loadtest/stats")
+    async def stats(reset: bool = False) -> Dict[str, Any]:
+        manager = realtime.manager
+        connections = sum(len(c) for c in manager.active_connections.values()) if manager else 0
+        result = {
+            'timestamp': time.time(),
+            'rss_bytes': process.memory_info().rss,
+            'connections': connections,
+            'rooms': len(manager.active_connections) if manager else 0,
+            'loop_lag': summarize_latencies(lag_samples)
+        }
+        if reset:
+            lag_samples.clear()
+        return result
+
+    return app
+
+def main():
+    import uvicorn
+
+    args = parse_args()
+    # permessage-deflate activo, como en producción
+    uvicorn.run(build_app(), host=args.host, port=args.port, log_level='warning',
+                ws_per_message_deflate=True)
+
+if __name__ == "__main__":
+    main()
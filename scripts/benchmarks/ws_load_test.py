@@ -0,0 +1,335 @@
+"""
+Prueba de carga del WebSocket de colaboración.
+
+Abre miles de clientes simulados contra
+`/ws/documents/{id}/collaboration`, repartidos en salas de audiencia: la
+mayoría solo observa y una fracción activa mueve el cursor, edita el
+documento (updates CRDT reales) y escribe en el chat. Mide:
+
+- latencia de fan-out (envío de un cliente -> recepción en los demás) por
+  tipo de mensaje; la de cursores incluye el tick de agrupación
+- mensajes por segundo enviados y recibidos
+- memoria del servidor por conexión (RSS antes y después de conectar)
+- retraso del event loop del servidor y del propio generador
+
+Por defecto lanza `ws_load_server` en un subproceso contra el Redis local
+(REDIS_HOST/REDIS_PORT). Con `--url` se apunta a un servidor ya en marcha;
+en ese caso no hay métricas del lado servidor.
+
+Para miles de clientes hay que subir el límite de descriptores
+(`ulimit -n 65536`).
+
+Uso:
+    python -m scripts.benchmarks.ws_load_test --clients 2000 --rooms 10 --duration 30
+    python -m scripts.benchmarks.ws_load_test --url ws://localhost:8000 --token $TOKEN
+"""
+import argparse
+import asyncio
+import base64
+import json
+import random
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from scripts.benchmarks.common import LatencyRecorder, summarize_latencies, write_report
+from scripts.benchmarks.legal_corpus import FRASES
+
+PATH = "/ws/documents/{document_id}/collaboration"
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Prueba de carga WebSocket")
+    parser.add_argument('--clients', type=int, default=1000, help="Clientes simultáneos")
+    parser.add_argument('--rooms', type=int, default=10, help="Documentos (salas)")
+    parser.add_argument('--active-ratio', type=float, default=0.05,
+                        help="Fracción de clientes que editan; el resto observa")
+    parser.add_argument('--cursor-hz', type=float, default=10, help="Movimientos de cursor/s por activo")
+    parser.add_argument('--update-hz', type=float, default=2, help="Updates de documento/s por activo")
+    parser.add_argument('--chat-per-min', type=float, default=2, help="Mensajes de chat/min por activo")
+    parser.add_argument('--duration', type=float, default=30, help="Segundos de tráfico")
+    parser.add_argument('--ramp', type=int, default=200, help="Conexiones nuevas por segundo")
+    parser.add_argument('--protocol', choices=['json', 'msgpack'], default='json')
+    parser.add_argument('--url', help="Servidor existente (ws://host:port); por defecto se lanza uno local")
+    parser.add_argument('--port', type=int, default=8765, help="Puerto del servidor local")
+    parser.add_argument('--token', help="Token Bearer para --url")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Archivo JSON de salida")
+    return parser.parse_args()
+
+class Stats:
+    """Contadores compartidos por todos los clientes (mismo proceso)."""
+
+    def __init__(self):
+        self.latency = LatencyRecorder()
+        self.sent: Dict[str, int] = {}
+        self.received: Dict[str, int] = {}
+        self.sent_at: Dict[str, float] = {}
+        self.connect_times: List[float] = []
+        self.connect_errors = 0
+        self.disconnects = 0
+        self.measuring = False
+
+    def count(self, counters: Dict[str, int], kind: str):
+        if self.measuring:
+            counters[kind] = counters.get(kind, 0) + 1
+
+class SimulatedClient:
+    """Un participante de la audiencia."""
+
+    def __init__(self, index: int, document_id: str, active: bool, args: argparse.Namespace,
+                 stats: Stats, rng: random.Random):
+        self.user_id = f"loadtest-{index}"
+        self.document_id = document_id
+        self.active = active
+        self.args = args
+        self.stats = stats
+        self.rng = rng
+        self.ws = None
+        self.counter = 0
+
+    async def connect(self, session, base_url: str):
+        from src.realtime.protocol import SUBPROTOCOL_MSGPACK
+
+        url = base_url + PATH.format(document_id=self.document_id)
+        headers = {'Authorization': f"Bearer {self.args.token}"} if self.args.token else {}
+        protocols = (SUBPROTOCOL_MSGPACK,) if self.args.protocol == 'msgpack' else ()
+        start = time.perf_counter()
+        try:
+            self.ws = await session.ws_connect(
+                url,
+                params=None if self.args.token else {'user': self.user_id},
+                headers=headers,
+                protocols=protocols,
+                compress=15,
+                heartbeat=None
+            )
+            self.stats.connect_times.append(time.perf_counter() - start)
+        except Exception:
+            self.stats.connect_errors += 1
+
+    async def send(self, message: Dict[str, Any]):
+        from src.realtime.protocol import MSGPACK
+
+        if self.args.protocol == 'msgpack':
+            await self.ws.send_bytes(MSGPACK.encode(message))
+        else:
+            await self.ws.send_str(json.dumps(message))
+
+    async def receive_loop(self):
+        """Contar mensajes recibidos y medir su latencia de fan-out."""
+        import aiohttp
+        from src.realtime.protocol import MSGPACK
+
+        async for frame in self.ws:
+            if frame.type == aiohttp.WSMsgType.BINARY:
+                message = MSGPACK.decode(frame.data)
+            elif frame.type == aiohttp.WSMsgType.TEXT:
+                message = json.loads(frame.data)
+            else:
+                break
+            now = time.perf_counter()
+            kind = message.get('type')
+            self.stats.count(self.stats.received, kind)
+            if not self.stats.measuring:
+                continue
+
+            if kind == 'presence_batch':
+                for update in message['updates']:
+                    sent = (update.get('position') or {}).get('t')
+                    if sent is not None:
+                        self.stats.latency.record('cursor', now - sent)
+            elif kind == 'document_update':
+                sent = self.stats.sent_at.get(message['update'])
+                if sent is not None:
+                    self.stats.latency.record('document_update', now - sent)
+            elif kind == 'chat_message':
+                sent = self.stats.sent_at.get(message['content'])
+                if sent is not None:
+                    self.stats.latency.record('chat', now - sent)
+        self.stats.disconnects += 1
+
+    async def traffic_loop(self, until: float):
+        """Generar tráfico de un cliente activo con llegadas de Poisson."""
+        from src.realtime.crdt import DocumentCRDT
+
+        replica = DocumentCRDT(self.user_id)
+        phrases = [p for group in FRASES.values() for p in group]
+        rates = {
+            'cursor_position': self.args.cursor_hz,
+            'document_update': self.args.update_hz,
+            'chat_message': self.args.chat_per_min / 60
+        }
+        total = sum(rates.values())
+        while time.perf_counter() < until:
+            await asyncio.sleep(self.rng.expovariate(total))
+            kind = self.rng.choices(list(rates), weights=list(rates.values()))[0]
+            self.counter += 1
+            if kind == 'cursor_position':
+                message = {
+                    'type': kind,
+                    'position': {'index': self.rng.randint(0, 5000), 't': time.perf_counter()}
+                }
+            elif kind == 'document_update':
+                text = self.rng.choice('abcdefghijklmnopqrstuvwxyz ')
+                update = base64.b64encode(
+                    replica.insert(self.rng.randint(0, len(replica.text)), text)
+                ).decode()
+                self.stats.sent_at[update] = time.perf_counter()
+                message = {'type': kind, 'update': update}
+            else:
+                content = f"{self.rng.choice(phrases)} #{self.user_id}-{self.counter}"
+                self.stats.sent_at[content] = time.perf_counter()
+                message = {'type': kind, 'content': content}
+            try:
+                await self.send(message)
+                self.stats.count(self.stats.sent, kind)
+            except Exception:
+                return
+
+async def loop_lag(samples: List[float], interval: float = 0.05):
+    """Sonda del retraso del event loop del generador."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - start - interval))
+
+async def server_stats(session, http_url: Optional[str], reset: bool = False) -> Optional[Dict[str, Any]]:
+    if not http_url:
+        return None
+    try:
+        async with session.get(f"{http_url}/_loadtest/stats", params={'reset': str(reset).lower()}) as response:
+            return await response.json()
+    except Exception:
+        return None
+
+def start_server(port: int) -> subprocess.Popen:
+    return subprocess.Popen([
+        sys.executable, '-m', 'scripts.benchmarks.ws_load_server', '--port', str(port)
+    ])
+
+async def wait_for_server(session, http_url: str, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if await server_stats(session, http_url):
+            return
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"El servidor de pruebas no respondió en {http_url}")
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    import aiohttp
+
+    rng = random.Random(args.seed)
+    stats = Stats()
+    server = None
+    if args.url:
+        base_url, http_url = args.url.rstrip('/'), None
+    else:
+        base_url = f"ws://127.0.0.1:{args.port}"
+        http_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port)
+
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        try:
+            if http_url:
+                await wait_for_server(session, http_url)
+            baseline = await server_stats(session, http_url)
+
+            rooms = [str(uuid.uuid4()) for _ in range(args.rooms)]
+            clients = [
+                SimulatedClient(i, rooms[i % args.rooms], rng.random() < args.active_ratio,
+                                args, stats, random.Random(args.seed + i))
+                for i in range(args.clients)
+            ]
+
+            print(f"Conectando {args.clients} clientes en {args.rooms} salas ({args.ramp}/s)...")
+            for start in range(0, len(clients), args.ramp):
+                batch = clients[start:start + args.ramp]
+                began = time.perf_counter()
+                await asyncio.gather(*(client.connect(session, base_url) for client in batch))
+                await asyncio.sleep(max(0.0, 1.0 - (time.perf_counter() - began)))
+            connected = [client for client in clients if client.ws is not None]
+            receivers = [asyncio.create_task(client.receive_loop()) for client in connected]
+
+            # Esperar a que se asienten los snapshots iniciales antes de medir memoria
+            await asyncio.sleep(2)
+            idle = await server_stats(session, http_url, reset=True)
+
+            active = [client for client in connected if client.active]
+            print(f"{len(connected)} conectados ({stats.connect_errors} errores), "
+                  f"{len(active)} activos; {args.duration:.0f} s de tráfico...")
+            client_lag: List[float] = []
+            probe = asyncio.create_task(loop_lag(client_lag))
+            stats.measuring = True
+            began = time.perf_counter()
+            until = began + args.duration
+            await asyncio.gather(*(client.traffic_loop(until) for client in active))
+            # Margen para los mensajes en vuelo
+            await asyncio.sleep(1)
+            stats.measuring = False
+            elapsed = time.perf_counter() - began
+            loaded = await server_stats(session, http_url)
+            probe.cancel()
+
+            for client in connected:
+                await client.ws.close()
+            await asyncio.gather(*receivers, return_exceptions=True)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+
+    memory = None
+    if baseline and idle and idle['connections']:
+        memory = {
+            'baseline_rss_bytes': baseline['rss_bytes'],
+            'idle_rss_bytes': idle['rss_bytes'],
+            'loaded_rss_bytes': loaded['rss_bytes'] if loaded else None,
+            'bytes_per_connection': (idle['rss_bytes'] - baseline['rss_bytes']) / idle['connections']
+        }
+
+    return {
+        'config': {k: v for k, v in vars(args).items() if k != 'token'},
+        'connections': {
+            'connected': len(connected),
+            'errors': stats.connect_errors,
+            'active': len(active),
+            'connect_latency': summarize_latencies(stats.connect_times)
+        },
+        'throughput': {
+            'duration_s': elapsed,
+            'sent_per_s': sum(stats.sent.values()) / elapsed,
+            'received_per_s': sum(stats.received.values()) / elapsed,
+            'sent': stats.sent,
+            'received': stats.received
+        },
+        'fanout_latency': stats.latency.summary(),
+        'memory': memory,
+        'server_loop_lag': loaded['loop_lag'] if loaded else None,
+        'client_loop_lag': summarize_latencies(client_lag)
+    }
+
+def main():
+    args = parse_args()
+    results = asyncio.run(run(args))
+
+    throughput = results['throughput']
+    print(f"Enviados {throughput['sent_per_s']:.0f} msg/s, recibidos {throughput['received_per_s']:.0f} msg/s")
+    for kind, summary in sorted(results['fanout_latency'].items()):
+        print(f"  fan-out {kind:<16} p50 {summary['p50_ms']:.1f} ms  p99 {summary['p99_ms']:.1f} ms")
+    if results['memory']:
+        print(f"Memoria por conexión: {results['memory']['bytes_per_connection'] / 1024:.1f} KiB")
+    if results['server_loop_lag']:
+        lag = results['server_loop_lag']
+        print(f"Retraso del loop del servidor: p99 {lag['p99_ms']:.1f} ms, máx {lag['max_ms']:.1f} ms")
+    if results['client_loop_lag']['p99_ms'] > 50:
+        print("Aviso: el generador está saturado; las latencias medidas incluyen su propio retraso")
+
+    path = write_report('ws_load', results, args.output)
+    print(f"Reporte: {path}")
+
+if __name__ == "__main__":
+    main()
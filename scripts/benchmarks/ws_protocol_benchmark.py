@@ -0,0 +1,144 @@
+"""
+Benchmark de bytes en el cable del protocolo WebSocket de colaboración.
+
+Genera una sesión sintética de una sala (tecleo, pegado de párrafos, frames
+de presencia, chat, entradas y snapshots de documento) y mide, por tipo de
+mensaje, el tamaño de cada frame con el codec JSON y con msgpack, con y sin
+compresión. La compresión emula permessage-deflate sin "context takeover"
+(deflate crudo por mensaje), el caso más conservador.
+
+Uso:
+    python -m scripts.benchmarks.ws_protocol_benchmark --users 10 --keystrokes 2000
+"""
+import argparse
+import base64
+import json
+import random
+import zlib
+from typing import Any, Dict, List, Tuple
+
+from scripts.benchmarks.common import LatencyRecorder, write_report
+from scripts.benchmarks.legal_corpus import FRASES, generate_corpus, random_name
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark del protocolo WebSocket")
+    parser.add_argument('--users', type=int, default=10, help="Participantes de la sala")
+    parser.add_argument('--keystrokes', type=int, default=2000, help="Caracteres tecleados")
+    parser.add_argument('--pages', type=int, default=20, help="Páginas del snapshot inicial")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="Archivo JSON de salida")
+    return parser.parse_args()
+
+def deflate(data: bytes) -> int:
+    """Tamaño de un mensaje comprimido con permessage-deflate (sin contexto)."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+    return len(compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)) - 4
+
+def build_session(args: argparse.Namespace, rng: random.Random) -> List[Tuple[str, Dict[str, Any]]]:
+    """Mensajes que el servidor envía durante una sesión típica."""
+    from src.realtime.crdt import DocumentCRDT
+
+    def b64(update: bytes) -> str:
+        return base64.b64encode(update).decode()
+
+    users = [random_name(rng).replace(' ', '.').lower() for _ in range(args.users)]
+    replicas = {user: DocumentCRDT(user) for user in users}
+    server = DocumentCRDT()
+    messages: List[Tuple[str, Dict[str, Any]]] = []
+
+    # Snapshot inicial del documento
+    document = next(generate_corpus(1, args.pages, 8, seed=args.seed))
+    server.apply_update(replicas[users[0]].insert(0, document['content']))
+    for user in users:
+        messages.append(('user_joined', {
+            'type': 'user_joined',
+            'user_id': user,
+            'participants': users
+        }))
+        messages.append(('document_state', {
+            'type': 'document_state',
+            'update': b64(server.snapshot()),
+            'state_vector': server.state_vector
+        }))
+    for user in users[1:]:
+        replicas[user].apply_update(server.snapshot())
+
+    phrases = [p for group in FRASES.values() for p in group]
+    for i in range(args.keystrokes):
+        user = rng.choice(users)
+        replica = replicas[user]
+        if rng.random() < 0.01:
+            kind, text = 'paste', rng.choice(phrases)
+        else:
+            kind, text = 'keystroke', rng.choice('abcdefghijklmnopqrstuvwxyz ')
+        update = replica.insert(rng.randint(0, len(replica.text)), text)
+        server.apply_update(update)
+        messages.append((f"document_update_{kind}", {
+            'type': 'document_update',
+            'user_id': user,
+            'update': b64(update)
+        }))
+
+        # Un frame de presencia cada ~3 teclas (tick de 30 Hz)
+        if i % 3 == 0:
+            messages.append(('presence_batch', {
+                'type': 'presence_batch',
+                'updates': [
+                    {'user_id': u, 'position': {'index': rng.randint(0, len(server.text)), 'page': rng.randint(1, args.pages)}}
+                    for u in rng.sample(users, rng.randint(1, len(users)))
+                ]
+            }))
+        if i % 100 == 0:
+            messages.append(('chat_message', {
+                'type': 'chat_message',
+                'user_id': user,
+                'content': rng.choice(phrases),
+                'message_type': 'text',
+                'timestamp': 'now'
+            }))
+    return messages
+
+def main():
+    from src.realtime.protocol import MSGPACK
+
+    args = parse_args()
+    rng = random.Random(args.seed)
+    messages = build_session(args, rng)
+
+    recorder = LatencyRecorder()
+    totals: Dict[str, Dict[str, int]] = {}
+    for kind, message in messages:
+        with recorder.measure('encode_json'):
+            as_json = json.dumps(message).encode()
+        with recorder.measure('encode_msgpack'):
+            as_msgpack = MSGPACK.encode(message)
+        sizes = totals.setdefault(kind, {
+            'messages': 0, 'json': 0, 'json_deflate': 0, 'msgpack': 0, 'msgpack_deflate': 0
+        })
+        sizes['messages'] += 1
+        sizes['json'] += len(as_json)
+        sizes['json_deflate'] += deflate(as_json)
+        sizes['msgpack'] += len(as_msgpack)
+        sizes['msgpack_deflate'] += deflate(as_msgpack)
+
+    overall = {key: sum(sizes[key] for sizes in totals.values()) for key in next(iter(totals.values()))}
+    print(f"{'tipo':<28}{'msgs':>7}{'json':>12}{'json+defl':>12}{'msgpack':>12}{'mp+defl':>12}")
+    for kind, sizes in sorted(totals.items()) + [('total', overall)]:
+        print(
+            f"{kind:<28}{sizes['messages']:>7}{sizes['json']:>12}{sizes['json_deflate']:>12}"
+            f"{sizes['msgpack']:>12}{sizes['msgpack_deflate']:>12}"
+        )
+    print(f"msgpack / json: {overall['msgpack'] / overall['json']:.2f}")
+
+    results = {
+        'config': vars(args),
+        'bytes': totals,
+        'total': overall,
+        'msgpack_ratio': overall['msgpack'] / overall['json'],
+        'latency': recorder.summary()
+    }
+    path = write_report('ws_protocol', results, args.output)
+    print(f"Reporte: {path}")
+
+if __name__ == "__main__":
+    main()
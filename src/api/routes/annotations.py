@@ -1,20 +1,50 @@
 """API endpoints para gestión de anotaciones."""
-from typing import Dict, Any, List, Optional
+import asyncio
+import json
+import os
+import tempfile
+from typing import Dict, Any, Iterator, List, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 
 from src.documents.annotations import AnnotationManager
 from src.documents.annotation_filters import (
-    AnnotationFilter, AnnotationFilterEngine,
+    AnnotationFilter,
     SortField, SortOrder
 )
-from src.documents.pdf_exporter import AnnotationPDFExporter
+from src.documents.pdf_exporter import AnnotationPDFExporter, shutdown_export_pool
 from src.auth.auth_manager import get_current_user
+from src.config import settings
+from src.database.redis import RedisPubSub, get_redis
 from src.models.user import User
+from src.monitoring.logger import Logger
+
+logger = Logger(__name__)
 
 router = APIRouter(prefix="/api/annotations", tags=["annotations"])
 
+# Tarea que repara periódicamente los contadores del resumen
+reconciliation_task: Optional[asyncio.Task] = None
+
+@router.on_event("startup")
+async def startup_event():
+    """Iniciar la reconciliación periódica de los contadores de anotaciones."""
+    global reconciliation_task
+    manager = AnnotationManager()
+    reconciliation_task = asyncio.create_task(
+        manager.stats.run_reconciliation(manager.get_annotations, manager.count_annotations)
+    )
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    """Detener la reconciliación y el pool de exportación a PDF."""
+    if reconciliation_task:
+        reconciliation_task.cancel()
+    shutdown_export_pool()
+
 # Modelos Pydantic
 class PositionModel(BaseModel):
     """Modelo para la posición de una anotación."""
@@ -54,6 +84,7 @@ class AnnotationSearchParams(BaseModel):
     sort_order: SortOrder = SortOrder.DESC
     limit: int = 50
     offset: int = 0
+    match_type: str = "contains"  # exact, contains, fuzzy
 
 # Rutas
 @router.post("")
@@ -85,13 +116,13 @@ async def search_annotations(
     params: AnnotationSearchParams,
     current_user: User = Depends(get_current_user)
 ) -> Dict[str, Any]:
-    """Búsqueda avanzada de anotaciones."""
+    """Búsqueda avanzada de anotaciones.
+    
+    Los filtros se resuelven sobre el almacén columnar del documento, que se
+    mantiene en memoria entre búsquedas.
+    """
     try:
         manager = AnnotationManager()
-        filter_engine = AnnotationFilterEngine()
-        
-        # Obtener todas las anotaciones del documento
-        annotations = await manager.get_annotations(document_id)
         
         # Crear filtro
         annotation_filter = AnnotationFilter(
@@ -111,21 +142,80 @@ async def search_annotations(
             offset=params.offset
         )
         
-        # Aplicar filtros
-        filtered_annotations = filter_engine.apply_filter(
-            annotations,
-            annotation_filter
+        result = await manager.search_annotations(
+            document_id,
+            annotation_filter,
+            match_type=params.match_type
         )
         
         return {
-            "total": len(annotations),
-            "filtered": len(filtered_annotations),
-            "annotations": [a.dict() for a in filtered_annotations]
+            "total": result["total"],
+            "filtered": len(result["annotations"]),
+            "annotations": [a.dict() for a in result["annotations"]]
         }
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/document/{document_id}/viewport")
+async def get_viewport_annotations(
+    document_id: str,
+    page: int,
+    x1: float,
+    y1: float,
+    x2: float,
+    y2: float,
+    current_user: User = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Anotaciones visibles en un recuadro de una página."""
+    try:
+        manager = AnnotationManager()
+        index = await manager.get_spatial_index(document_id)
+        annotations = index.query(
+            page_range=(page, page),
+            position_box={'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}
+        )
+        return {
+            "total": len(annotations),
+            "annotations": [a.dict() for a in annotations]
+        }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def publish_export_progress(document_id: str, user_id: str, progress: float):
+    """Enviar el avance de la exportación a los sockets del usuario en el canal del documento."""
+    try:
+        get_redis().publish(
+            RedisPubSub.document_channel(document_id),
+            json.dumps({
+                "origin": "annotation_export",
+                "message": {
+                    "type": "annotation_export_progress",
+                    "user_id": user_id,
+                    "progress": progress
+                }
+            })
+        )
+    except Exception as e:
+        # El avance es informativo: no interrumpe la exportación
+        logger.error(f"Error publishing export progress for {document_id}: {str(e)}")
+
+def upload_export(document_id: str, filename: str, path: str) -> str:
+    """Subir un PDF exportado a S3 y devolver una URL de descarga firmada."""
+    from src.storage.s3 import StorageManager
+    
+    storage = StorageManager()
+    key = storage.get_storage_path(document_id, filename)
+    with open(path, 'rb') as file:
+        storage.s3.upload_file(file, key, content_type="application/pdf")
+    return storage.s3.get_presigned_url(key)
+
+def stream_file(path: str) -> Iterator[bytes]:
+    """Leer un archivo por trozos."""
+    with open(path, 'rb') as file:
+        while chunk := file.read(settings.ANNOTATION_EXPORT_CHUNK_SIZE):
+            yield chunk
+
 @router.get("/document/{document_id}/export")
 async def export_annotations(
     document_id: str,
@@ -152,19 +242,39 @@ async def export_annotations(
         # Obtener información del documento
         doc_info = await manager.get_document_info(document_id)
         
-        # Exportar a PDF
-        exporter = AnnotationPDFExporter()
-        pdf_content = await exporter.export_annotations(
-            annotations=[a.dict() for a in annotations],
-            doc_info=doc_info
-        )
+        # Exportar a PDF en el pool de procesos, a un archivo temporal
+        filename = f"annotations_{document_id}.pdf"
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        try:
+            exporter = AnnotationPDFExporter()
+            await exporter.export_to_file(
+                annotations=[a.dict() for a in annotations],
+                doc_info=doc_info,
+                path=path,
+                progress=lambda value: publish_export_progress(document_id, str(current_user.id), value)
+            )
+            
+            # Exportaciones muy grandes: subir a S3 y redirigir a la URL firmada
+            if len(annotations) >= settings.ANNOTATION_EXPORT_S3_MIN_ANNOTATIONS:
+                url = await asyncio.get_running_loop().run_in_executor(
+                    None, upload_export, document_id, filename, path
+                )
+                os.unlink(path)
+                return RedirectResponse(url, status_code=303)
+        except BaseException:
+            os.unlink(path)
+            raise
         
-        return Response(
-            content=pdf_content.getvalue(),
+        # El archivo temporal se borra después de enviar la respuesta
+        return StreamingResponse(
+            stream_file(path),
             media_type="application/pdf",
             headers={
-                "Content-Disposition": f"attachment; filename=annotations_{document_id}.pdf"
-            }
+                "Content-Disposition": f"attachment; filename={filename}",
+                "Content-Length": str(os.path.getsize(path))
+            },
+            background=BackgroundTask(os.unlink, path)
         )
         
     except Exception as e:
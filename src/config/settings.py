@@ -29,7 +29,42 @@ REDIS_SSL = os.getenv('REDIS_SSL', '0').lower() in ('true', '1', 't')
 
 # Configuración de WebSocket
 WS_HEARTBEAT_INTERVAL = int(os.getenv('WS_HEARTBEAT_INTERVAL', '30'))  # segundos
+WS_PRESENCE_TTL = int(os.getenv('WS_PRESENCE_TTL', '90'))  # segundos sin heartbeat antes de expirar
 WS_MESSAGE_QUEUE_SIZE = int(os.getenv('WS_MESSAGE_QUEUE_SIZE', '100'))
+WS_SLOW_CONSUMER_POLICY = os.getenv('WS_SLOW_CONSUMER_POLICY', 'snapshot')  # snapshot, disconnect
+WS_PRESENCE_TICK_HZ = float(os.getenv('WS_PRESENCE_TICK_HZ', '30'))  # frames de cursores por segundo y sala
+WS_PRESENCE_RATE_LIMIT = float(os.getenv('WS_PRESENCE_RATE_LIMIT', '60'))  # updates enviados por segundo y conexión
+CRDT_SNAPSHOT_INTERVAL = int(os.getenv('CRDT_SNAPSHOT_INTERVAL', '200'))  # updates antes de compactar
+CRDT_MAX_DECODED_ITEMS = int(os.getenv('CRDT_MAX_DECODED_ITEMS', '1000000'))  # caracteres y borrados por update recibido
+
+# Sincronización offline
+SYNC_MAX_CONCURRENCY = int(os.getenv('SYNC_MAX_CONCURRENCY', '10'))  # entidades en paralelo
+SYNC_CHANGELOG_MAX_ENTRIES = int(os.getenv('SYNC_CHANGELOG_MAX_ENTRIES', '10000'))  # por stream
+SYNC_CHANGELOG_RETENTION = int(os.getenv('SYNC_CHANGELOG_RETENTION', str(7 * 24 * 3600)))  # segundos
+SYNC_CHANGELOG_COMPACT = os.getenv('SYNC_CHANGELOG_COMPACT', '1').lower() in ('true', '1', 't')
+SYNC_IDEMPOTENCY_TTL = int(os.getenv('SYNC_IDEMPOTENCY_TTL', str(30 * 24 * 3600)))  # segundos
+SYNC_IDEMPOTENCY_WINDOW = int(os.getenv('SYNC_IDEMPOTENCY_WINDOW', '100000'))  # secuencias por dispositivo
+SYNC_STATE_TTL = int(os.getenv('SYNC_STATE_TTL', str(30 * 24 * 3600)))  # segundos que se recuerda el último estado de una entidad
+
+# Historial de versiones
+VERSION_SNAPSHOT_INTERVAL = int(os.getenv('VERSION_SNAPSHOT_INTERVAL', '20'))  # revisiones entre snapshots
+VERSION_COMPRESSION_LEVEL = int(os.getenv('VERSION_COMPRESSION_LEVEL', '6'))  # zlib 1-9
+
+# Historial de chat
+CHAT_HOT_WINDOW = int(os.getenv('CHAT_HOT_WINDOW', '500'))  # mensajes recientes en Redis por documento
+CHAT_ARCHIVE_BATCH = int(os.getenv('CHAT_ARCHIVE_BATCH', '200'))  # mensajes por lote archivado en Postgres
+CHAT_PAGE_SIZE = int(os.getenv('CHAT_PAGE_SIZE', '50'))
+CHAT_MAX_PAGE_SIZE = int(os.getenv('CHAT_MAX_PAGE_SIZE', '200'))
+
+# Anotaciones
+ANNOTATION_INDEX_MAX_DOCUMENTS = int(os.getenv('ANNOTATION_INDEX_MAX_DOCUMENTS', '200'))  # índices espaciales en memoria
+ANNOTATION_FUZZY_BATCH = int(os.getenv('ANNOTATION_FUZZY_BATCH', '1000'))  # filas por lote al filtrar texto fuzzy en memoria
+ANNOTATION_BULK_MAX_ITEMS = int(os.getenv('ANNOTATION_BULK_MAX_ITEMS', '5000'))  # anotaciones por petición masiva
+ANNOTATION_STATS_RECONCILE_RETRIES = int(os.getenv('ANNOTATION_STATS_RECONCILE_RETRIES', '3'))  # reconteos si hay escrituras concurrentes
+ANNOTATION_STATS_RECONCILE_INTERVAL = int(os.getenv('ANNOTATION_STATS_RECONCILE_INTERVAL', '3600'))  # segundos entre reconciliaciones
+ANNOTATION_EXPORT_WORKERS = int(os.getenv('ANNOTATION_EXPORT_WORKERS', '2'))  # procesos que generan PDFs de anotaciones
+ANNOTATION_EXPORT_S3_MIN_ANNOTATIONS = int(os.getenv('ANNOTATION_EXPORT_S3_MIN_ANNOTATIONS', '5000'))  # desde aquí el PDF se sirve desde S3
+ANNOTATION_EXPORT_CHUNK_SIZE = int(os.getenv('ANNOTATION_EXPORT_CHUNK_SIZE', str(64 * 1024)))  # bytes por trozo al enviar el PDF
 
 # S3
 S3_BUCKET = os.getenv('S3_BUCKET', 'first-court-dev')
@@ -48,6 +83,10 @@ ES_USER = os.getenv('ES_USER', '')
 ES_PASSWORD = os.getenv('ES_PASSWORD', '')
 ES_VERIFY_CERTS = os.getenv('ES_VERIFY_CERTS', '1').lower() in ('true', '1', 't')
 
+# Batching de búsquedas (_msearch)
+SEARCH_BATCH_WINDOW_MS = float(os.getenv('SEARCH_BATCH_WINDOW_MS', '5'))  # milisegundos
+SEARCH_BATCH_MAX_SIZE = int(os.getenv('SEARCH_BATCH_MAX_SIZE', '20'))
+
 # Asegurar que existan los directorios necesarios
 CREDENTIALS_DIR.mkdir(exist_ok=True)
 TEMP_DIR.mkdir(exist_ok=True)
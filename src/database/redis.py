@@ -31,12 +31,17 @@ class RedisKeys:
     
     @staticmethod
     def document_presence(document_id: str) -> str:
-        """Key for document presence hash."""
-        return f"document:{document_id}:presence"
+        """Key for document presence sorted set (user -> last heartbeat)."""
+        return f"document:{document_id}:online"
     
     @staticmethod
     def document_chat(document_id: str) -> str:
-        """Key for document chat list."""
+        """Key for document chat hot window (sorted set scored by seq)."""
+        return f"document:{document_id}:chat:recent"
+    
+    @staticmethod
+    def document_chat_legacy(document_id: str) -> str:
+        """Key for the pre-window document chat list, copied once into the hot window."""
         return f"document:{document_id}:chat"
     
     @staticmethod
@@ -44,6 +49,23 @@ class RedisKeys:
         """Key for document cursors hash."""
         return f"document:{document_id}:cursors"
     
+    @staticmethod
+    def document_annotation_stats(document_id: str, scope: Optional[str] = None) -> str:
+        """Key for document annotation counters hash (total, type:, page:, user:, tag:).
+        
+        `scope` separates the counters of each annotation store.
+        """
+        if scope:
+            return f"document:{document_id}:annotations:{scope}:stats"
+        return f"document:{document_id}:annotations:stats"
+    
+    @staticmethod
+    def annotation_stats_documents(scope: Optional[str] = None) -> str:
+        """Key for the set of documents with annotation counters."""
+        if scope:
+            return f"annotations:{scope}:stats:documents"
+        return "annotations:stats:documents"
+    
     @staticmethod
     def user_sessions(user_id: str) -> str:
         """Key for user sessions set."""
@@ -0,0 +1,223 @@
+"""Almacén columnar de anotaciones por documento.
+
+Guarda las anotaciones de un documento como arreglos NumPy (página, x, y y
+fechas en microsegundos) y códigos enteros para tipo, autor y etiquetas, de
+modo que los filtros de metadatos, fechas y posición se resuelven con
+máscaras booleanas y los conteos del resumen con `np.bincount`. Solo el
+texto se sigue evaluando por anotación, y únicamente sobre las filas que
+pasan las máscaras.
+
+Altas, cambios y bajas marcan el almacén para reconstruir sus columnas en
+la próxima consulta.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.documents.spatial_index import SpatialIndexRegistry
+from src.services.annotation_stats import annotation_tags
+
+def _field(annotation: Any, field: str, default: Any = None) -> Any:
+    """Leer un campo de una anotación (dict o modelo)."""
+    if isinstance(annotation, dict):
+        return annotation.get(field, default)
+    return getattr(annotation, field, default)
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = _EPOCH.replace(tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+def _micros(value: datetime) -> int:
+    """Fecha como microsegundos desde epoch (UTC si trae zona horaria)."""
+    return (value - (_EPOCH_UTC if value.tzinfo is not None else _EPOCH)) // _MICROSECOND
+
+def _intern(values: Iterable[Any], vocabulary: Dict[Any, int]) -> np.ndarray:
+    """Códigos enteros de los valores, ampliando el vocabulario."""
+    return np.fromiter(
+        (vocabulary.setdefault(value, len(vocabulary)) for value in values),
+        dtype=np.int32
+    )
+
+class AnnotationColumns:
+    """Anotaciones de un documento en columnas."""
+
+    def __init__(self):
+        self._annotations: Dict[Any, Any] = {}  # id -> anotación, en orden de inserción
+        self._dirty = True
+        self.annotations: List[Any] = []
+
+        # Vocabularios de los códigos
+        self.type_codes: Dict[str, int] = {}
+        self.user_codes: Dict[str, int] = {}
+        self.tag_codes: Dict[str, int] = {}
+
+    @classmethod
+    def build(cls, annotations: Iterable[Any]) -> 'AnnotationColumns':
+        """Crear el almacén a partir de las anotaciones existentes."""
+        store = cls()
+        for annotation in annotations:
+            store._annotations[_field(annotation, 'id')] = annotation
+        return store
+
+    def __len__(self) -> int:
+        return len(self._annotations)
+
+    def add(self, annotation: Any):
+        """Agregar (o reemplazar) una anotación."""
+        annotation_id = _field(annotation, 'id')
+        self._annotations.pop(annotation_id, None)
+        self._annotations[annotation_id] = annotation
+        self._dirty = True
+
+    def update(self, annotation: Any):
+        """Actualizar una anotación conservando su orden."""
+        self._annotations[_field(annotation, 'id')] = annotation
+        self._dirty = True
+
+    def remove(self, annotation_id: Any) -> bool:
+        """Eliminar una anotación.
+
+        Returns:
+            False si no estaba en el almacén
+        """
+        if self._annotations.pop(annotation_id, None) is None:
+            return False
+        self._dirty = True
+        return True
+
+    def refresh(self):
+        """Reconstruir las columnas si hubo cambios."""
+        if not self._dirty:
+            return
+        annotations = self.annotations = list(self._annotations.values())
+        count = len(annotations)
+        positions = [_field(a, 'position') for a in annotations]
+
+        self.page = np.fromiter((p['page'] for p in positions), dtype=np.int32, count=count)
+        self.x = np.fromiter((p['x'] for p in positions), dtype=np.float64, count=count)
+        self.y = np.fromiter((p['y'] for p in positions), dtype=np.float64, count=count)
+        self.created_at = np.fromiter(
+            (_micros(_field(a, 'created_at')) for a in annotations), dtype=np.int64, count=count
+        )
+        self.updated_at = np.fromiter(
+            (_micros(_field(a, 'updated_at')) for a in annotations), dtype=np.int64, count=count
+        )
+        self.type = _intern((_field(a, 'type') for a in annotations), self.type_codes)
+        self.user = _intern((_field(a, 'user_id') for a in annotations), self.user_codes)
+
+        # Etiquetas en formato disperso: código de cada etiqueta y fila a la que pertenece
+        tags = [annotation_tags(a) for a in annotations]
+        self.tag = _intern((tag for row in tags for tag in row), self.tag_codes)
+        self.tag_row = np.repeat(
+            np.arange(count, dtype=np.int32),
+            np.fromiter((len(row) for row in tags), dtype=np.int32, count=count)
+        )
+        self._dirty = False
+
+    def _codes(self, values: Iterable[Any], vocabulary: Dict[Any, int]) -> np.ndarray:
+        return np.array([vocabulary[v] for v in values if v in vocabulary], dtype=np.int32)
+
+    def mask(self, filter_params) -> np.ndarray:
+        """Máscara de las filas que cumplen los filtros vectorizables.
+
+        Cubre tipos, autores, etiquetas, fechas, páginas y recuadro con la
+        misma semántica que AnnotationFilterEngine; el texto no se evalúa.
+        """
+        self.refresh()
+        mask = np.ones(len(self.annotations), dtype=bool)
+
+        if filter_params.types:
+            mask &= np.isin(self.type, self._codes(filter_params.types, self.type_codes))
+        if filter_params.users:
+            mask &= np.isin(self.user, self._codes(filter_params.users, self.user_codes))
+        if filter_params.tags:
+            tagged = np.zeros_like(mask)
+            tagged[self.tag_row[np.isin(self.tag, self._codes(filter_params.tags, self.tag_codes))]] = True
+            mask &= tagged
+
+        if filter_params.created_after:
+            mask &= self.created_at >= _micros(filter_params.created_after)
+        if filter_params.created_before:
+            mask &= self.created_at <= _micros(filter_params.created_before)
+        if filter_params.updated_after:
+            mask &= self.updated_at >= _micros(filter_params.updated_after)
+        if filter_params.updated_before:
+            mask &= self.updated_at <= _micros(filter_params.updated_before)
+
+        if filter_params.page_range:
+            first, last = filter_params.page_range
+            mask &= (self.page >= first) & (self.page <= last)
+        if filter_params.position_box:
+            box = filter_params.position_box
+            mask &= (self.x >= box['x1']) & (self.x <= box['x2'])
+            mask &= (self.y >= box['y1']) & (self.y <= box['y2'])
+
+        return mask
+
+    def sort_rows(self, rows: np.ndarray, sort_by: str, descending: bool, top: Optional[int] = None) -> np.ndarray:
+        """Ordenar filas de forma estable (los empates conservan su orden).
+
+        Con `top` y una sola clave, primero se descartan con `np.partition`
+        las filas que no pueden quedar entre las primeras `top`, conservando
+        todos los empates del límite.
+        """
+        if sort_by == 'position':
+            keys = [self.x[rows], self.y[rows], self.page[rows]]
+        elif sort_by == 'page':
+            keys = [self.page[rows]]
+        else:
+            keys = [getattr(self, sort_by)[rows]]
+        if descending:
+            keys = [-key for key in keys]
+
+        if top is not None and len(keys) == 1 and top < len(rows):
+            key = keys[0]
+            bound = np.partition(key, top - 1)[top - 1]
+            keep = np.flatnonzero(key <= bound)
+            rows, keys = rows[keep], [key[keep]]
+
+        return rows[np.lexsort(keys)]
+
+    def summary(self) -> Dict[str, Any]:
+        """Totales por tipo y por página."""
+        self.refresh()
+        by_type = np.bincount(self.type, minlength=len(self.type_codes))
+        by_page = np.bincount(self.page) if len(self.page) else np.zeros(0, dtype=np.int64)
+        return {
+            "total": len(self.annotations),
+            "by_type": {
+                name: int(by_type[self.type_codes[name]]) if name in self.type_codes else 0
+                for name in ("note", "highlight", "comment")
+            },
+            "by_page": {int(page): int(by_page[page]) for page in np.flatnonzero(by_page)}
+        }
+
+    def counts(self) -> Counter:
+        """Campos del hash de contadores (ver `annotation_stats`) con `np.bincount`."""
+        self.refresh()
+        counts = Counter({'total': len(self.annotations)})
+        columns = (
+            ('type', self.type, self.type_codes),
+            ('user', self.user, self.user_codes),
+            ('tag', self.tag, self.tag_codes)
+        )
+        for group, codes, vocabulary in columns:
+            totals = np.bincount(codes, minlength=len(vocabulary))
+            for value, code in vocabulary.items():
+                if totals[code]:
+                    counts[f"{group}:{value}"] = int(totals[code])
+        if len(self.page):
+            by_page = np.bincount(self.page)
+            for page in np.flatnonzero(by_page):
+                counts[f"page:{page}"] = int(by_page[page])
+        return counts
+
+class ColumnStoreRegistry(SpatialIndexRegistry):
+    """Almacenes columnares de los documentos consultados recientemente."""
+
+    index_type = AnnotationColumns
+
+# Almacenes del proceso
+column_stores = ColumnStoreRegistry()
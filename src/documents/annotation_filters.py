@@ -1,8 +1,22 @@
 """Módulo para filtros avanzados de anotaciones."""
-from typing import List, Dict, Any, Optional
+from typing import Callable, Iterable, Iterator, List, Dict, Any, Optional
 from datetime import datetime
 from dataclasses import dataclass
 from enum import Enum
+from operator import itemgetter
+import heapq
+
+import numpy as np
+
+from src.documents.annotation_columns import AnnotationColumns
+from src.documents.spatial_index import SpatialIndex
+from src.documents.trigram_index import TrigramIndex, lcs_length
+
+# El top-k con heap conviene mientras la página pedida sea chica frente al total
+TOP_K_RATIO = 16
+
+# Un rango de páginas usa el índice si deja menos de 1/INDEX_SELECTIVITY del total
+INDEX_SELECTIVITY = 4
 
 class SortField(str, Enum):
     """Campos por los que se puede ordenar."""
@@ -66,193 +80,298 @@ class AnnotationFilterEngine:
     
     def _fuzzy_match(self, text: str, query: str, threshold: float = 0.8) -> bool:
         """Coincidencia aproximada usando distancia de Levenshtein."""
-        from difflib import SequenceMatcher
-        return SequenceMatcher(None, text.lower(), query.lower()).ratio() >= threshold
+        return self._compile_fuzzy(query.lower(), threshold)(text)
     
-    def _filter_by_text(
+    def compile_predicate(
         self,
-        annotations: List[Dict[str, Any]],
-        query: str,
-        match_type: str = 'contains'
-    ) -> List[Dict[str, Any]]:
-        """Filtrar por contenido de texto."""
-        if not query:
-            return annotations
+        filter_params: AnnotationFilter,
+        match_type: str = 'contains',
+        skip_position: bool = False,
+        text_index: Optional[TrigramIndex] = None
+    ) -> Callable[[Dict[str, Any]], bool]:
+        """Compilar los filtros en un solo predicado.
+        
+        Args:
+            filter_params: Parámetros de filtrado
+            match_type: Tipo de coincidencia de texto (exact, contains, fuzzy)
+            skip_position: Omitir páginas y recuadro (ya resueltos por un índice)
+            text_index: Índice de n-gramas del documento para la coincidencia fuzzy
             
-        matcher = self.text_analyzers.get(match_type, self._contains_match)
-        return [
-            ann for ann in annotations
-            if matcher(ann['content'], query)
-        ]
+        Returns:
+            Función que indica si una anotación cumple el filtro
+        """
+        checks = self._compile_checks(filter_params, match_type, skip_position, text_index)
+        if not checks:
+            return lambda ann: True
+        if len(checks) == 1:
+            return checks[0]
+        return lambda ann: all(check(ann) for check in checks)
     
-    def _filter_by_metadata(
+    def compile_selector(
         self,
-        annotations: List[Dict[str, Any]],
-        tags: Optional[List[str]] = None,
-        types: Optional[List[str]] = None,
-        users: Optional[List[str]] = None
-    ) -> List[Dict[str, Any]]:
-        """Filtrar por metadatos."""
-        filtered = annotations
+        filter_params: AnnotationFilter,
+        match_type: str = 'contains',
+        skip_position: bool = False,
+        text_index: Optional[TrigramIndex] = None
+    ) -> Callable[[Iterable[Dict[str, Any]]], Iterator[Dict[str, Any]]]:
+        """Compilar los filtros en un generador de una sola pasada.
         
-        if tags:
-            filtered = [
-                ann for ann in filtered
-                if any(tag in ann.get('tags', []) for tag in tags)
-            ]
-            
-        if types:
-            filtered = [
-                ann for ann in filtered
-                if ann.get('type') in types
-            ]
-            
-        if users:
-            filtered = [
-                ann for ann in filtered
-                if ann.get('user_id') in users
-            ]
-            
-        return filtered
+        Cada condición es un `filter` encadenado sobre el anterior: equivale
+        a `all()` (una anotación que falla no llega a las siguientes) sin
+        armar un generador por anotación.
+        
+        Args:
+            filter_params: Parámetros de filtrado
+            match_type: Tipo de coincidencia de texto
+            skip_position: Omitir páginas y recuadro (ya resueltos por un índice)
+            text_index: Índice de n-gramas del documento para la coincidencia fuzzy
+        
+        Returns:
+            Función que recibe las anotaciones y produce las que cumplen
+        """
+        checks = self._compile_checks(filter_params, match_type, skip_position, text_index)
+        
+        def select(annotations: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+            matches = iter(annotations)
+            for check in checks:
+                matches = filter(check, matches)
+            return matches
+        
+        return select
     
-    def _filter_by_date(
+    def _compile_checks(
         self,
-        annotations: List[Dict[str, Any]],
-        created_after: Optional[datetime] = None,
-        created_before: Optional[datetime] = None,
-        updated_after: Optional[datetime] = None,
-        updated_before: Optional[datetime] = None
-    ) -> List[Dict[str, Any]]:
-        """Filtrar por fechas."""
-        filtered = annotations
+        filter_params: AnnotationFilter,
+        match_type: str = 'contains',
+        skip_position: bool = False,
+        text_index: Optional[TrigramIndex] = None
+    ) -> List[Callable[[Dict[str, Any]], bool]]:
+        """Armar una condición por cada filtro activo.
         
-        if created_after:
-            filtered = [
-                ann for ann in filtered
-                if ann['created_at'] >= created_after
-            ]
+        Cada valor del filtro se prepara una vez (consulta en minúsculas,
+        conjuntos para etiquetas, tipos y usuarios) y queda capturado en su
+        condición. Las condiciones se ordenan de la más barata a la más cara,
+        de modo que `all()` corte en la primera que falla.
+        
+        Returns:
+            Condiciones sobre una anotación
+        """
+        checks: List[Callable[[Dict[str, Any]], bool]] = []
+        
+        # Metadatos
+        if filter_params.types:
+            types = frozenset(filter_params.types)
+            checks.append(lambda ann: ann.get('type') in types)
             
-        if created_before:
-            filtered = [
-                ann for ann in filtered
-                if ann['created_at'] <= created_before
-            ]
+        if filter_params.users:
+            users = frozenset(filter_params.users)
+            checks.append(lambda ann: ann.get('user_id') in users)
             
-        if updated_after:
-            filtered = [
-                ann for ann in filtered
-                if ann['updated_at'] >= updated_after
-            ]
+        if filter_params.tags:
+            tags = frozenset(filter_params.tags)
+            checks.append(lambda ann: not tags.isdisjoint(ann.get('tags') or ()))
+        
+        # Fechas
+        if filter_params.created_after:
+            created_after = filter_params.created_after
+            checks.append(lambda ann: ann['created_at'] >= created_after)
             
-        if updated_before:
-            filtered = [
-                ann for ann in filtered
-                if ann['updated_at'] <= updated_before
-            ]
+        if filter_params.created_before:
+            created_before = filter_params.created_before
+            checks.append(lambda ann: ann['created_at'] <= created_before)
             
-        return filtered
-    
-    def _filter_by_position(
-        self,
-        annotations: List[Dict[str, Any]],
-        page_range: Optional[tuple[int, int]] = None,
-        position_box: Optional[Dict[str, float]] = None
-    ) -> List[Dict[str, Any]]:
-        """Filtrar por posición."""
-        filtered = annotations
-        
-        if page_range:
-            start, end = page_range
-            filtered = [
-                ann for ann in filtered
-                if start <= ann['position']['page'] <= end
-            ]
+        if filter_params.updated_after:
+            updated_after = filter_params.updated_after
+            checks.append(lambda ann: ann['updated_at'] >= updated_after)
             
-        if position_box:
-            filtered = [
-                ann for ann in filtered
-                if (
-                    position_box['x1'] <= ann['position']['x'] <= position_box['x2']
-                    and position_box['y1'] <= ann['position']['y'] <= position_box['y2']
-                )
-            ]
+        if filter_params.updated_before:
+            updated_before = filter_params.updated_before
+            checks.append(lambda ann: ann['updated_at'] <= updated_before)
+        
+        # Posición
+        if filter_params.page_range and not skip_position:
+            first_page, last_page = filter_params.page_range
+            checks.append(lambda ann: first_page <= ann['position']['page'] <= last_page)
             
-        return filtered
+        if filter_params.position_box and not skip_position:
+            box = filter_params.position_box
+            x1, y1, x2, y2 = box['x1'], box['y1'], box['x2'], box['y2']
+            checks.append(
+                lambda ann: x1 <= ann['position']['x'] <= x2 and y1 <= ann['position']['y'] <= y2
+            )
+        
+        # Texto al final: es la condición más cara
+        if filter_params.content_query:
+            query = filter_params.content_query.lower()
+            if match_type == 'exact':
+                checks.append(lambda ann: ann['content'].lower() == query)
+            elif match_type == 'fuzzy' and text_index is not None:
+                # El índice resuelve la consulta una vez para todo el documento
+                fuzzy_matches = frozenset(text_index.search(query))
+                checks.append(lambda ann: ann['id'] in fuzzy_matches)
+            elif match_type == 'fuzzy':
+                fuzzy = self._compile_fuzzy(query)
+                checks.append(lambda ann: fuzzy(ann['content']))
+            else:
+                checks.append(lambda ann: query in ann['content'].lower())
+        
+        return checks
+    
+    def _compile_fuzzy(self, query: str, threshold: float = 0.8) -> Callable[[str], bool]:
+        """Coincidencia aproximada reutilizando el análisis de la consulta.
+        
+        Antes de `ratio()` descarta por largo y por subsecuencia común más
+        larga, cotas superiores del mismo puntaje (el resultado no cambia).
+        """
+        from difflib import SequenceMatcher
+        # La consulta es la segunda secuencia: SequenceMatcher la indexa una vez
+        matcher = SequenceMatcher(None)
+        matcher.set_seq2(query)
+        length = len(query)
+        masks: Dict[str, int] = {}
+        for position, char in enumerate(query):
+            masks[char] = masks.get(char, 0) | (1 << position)
+        
+        def fuzzy(text: str) -> bool:
+            text = text.lower()
+            total = len(text) + length
+            if total and (
+                2.0 * min(len(text), length) / total < threshold
+                or 2.0 * lcs_length(text, masks, length) / total < threshold
+            ):
+                return False
+            matcher.set_seq1(text)
+            return matcher.ratio() >= threshold
+        
+        return fuzzy
+    
+    def _sort_key(self, sort_by: SortField) -> Callable[[Dict[str, Any]], Any]:
+        """Clave de ordenamiento."""
+        if sort_by == SortField.PAGE:
+            return lambda x: x['position']['page']
+        if sort_by == SortField.POSITION:
+            return lambda x: (x['position']['page'], x['position']['y'], x['position']['x'])
+        return itemgetter(SortField(sort_by).value)
     
     def _sort_annotations(
         self,
-        annotations: List[Dict[str, Any]],
+        annotations: Iterable[Dict[str, Any]],
         sort_by: SortField,
-        sort_order: SortOrder
+        sort_order: SortOrder,
+        top: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Ordenar anotaciones."""
+        """Ordenar anotaciones.
+        
+        Con `top` solo se devuelven las primeras `top` en orden, usando un
+        heap acotado (O(n log top)) en lugar de ordenar todo. El resultado es
+        el mismo que ordenar y cortar, incluido el orden de los empates.
+        """
+        key = self._sort_key(sort_by)
         reverse = sort_order == SortOrder.DESC
         
-        if sort_by == SortField.PAGE:
-            key = lambda x: x['position']['page']
-        elif sort_by == SortField.POSITION:
-            key = lambda x: (x['position']['page'], x['position']['y'], x['position']['x'])
-        else:
-            key = lambda x: x[sort_by]
+        if top is not None:
+            select = heapq.nlargest if reverse else heapq.nsmallest
+            return select(top, annotations, key=key)
             
         return sorted(annotations, key=key, reverse=reverse)
     
+    def _use_index(
+        self,
+        index: Optional[SpatialIndex],
+        filter_params: AnnotationFilter,
+        total: int
+    ) -> bool:
+        """Decidir si conviene partir de los candidatos del índice espacial.
+        
+        Con recuadro siempre; con solo rango de páginas, si este descarta la
+        mayor parte de las anotaciones (si no, una pasada lineal es más barata).
+        """
+        if index is None:
+            return False
+        if filter_params.position_box:
+            return True
+        if filter_params.page_range:
+            return index.count(filter_params.page_range) * INDEX_SELECTIVITY < total
+        return False
+    
+    def _apply_columns(
+        self,
+        columns: AnnotationColumns,
+        filter_params: AnnotationFilter,
+        match_type: str = 'contains',
+        text_index: Optional[TrigramIndex] = None
+    ) -> List[Dict[str, Any]]:
+        """Filtrar y ordenar sobre el almacén columnar."""
+        rows = np.flatnonzero(columns.mask(filter_params))
+        annotations = columns.annotations
+        
+        # El texto se evalúa solo en las filas que pasaron las máscaras
+        if filter_params.content_query and len(rows):
+            matches = self.compile_predicate(
+                AnnotationFilter(content_query=filter_params.content_query),
+                match_type,
+                text_index=text_index
+            )
+            rows = np.fromiter(
+                (row for row in rows.tolist() if matches(annotations[row])),
+                dtype=np.intp
+            )
+        
+        start = filter_params.offset
+        end = start + filter_params.limit
+        rows = columns.sort_rows(
+            rows,
+            SortField(filter_params.sort_by).value,
+            filter_params.sort_order == SortOrder.DESC,
+            top=end
+        )
+        return [annotations[row] for row in rows[start:end]]
+    
     def apply_filter(
         self,
         annotations: List[Dict[str, Any]],
-        filter_params: AnnotationFilter
+        filter_params: AnnotationFilter,
+        index: Optional[SpatialIndex] = None,
+        columns: Optional[AnnotationColumns] = None,
+        match_type: str = 'contains',
+        text_index: Optional[TrigramIndex] = None
     ) -> List[Dict[str, Any]]:
         """Aplicar filtros a las anotaciones.
         
         Args:
             annotations: Lista de anotaciones
             filter_params: Parámetros de filtrado
+            index: Índice espacial del documento; si se entrega y hay filtro de
+                  páginas o recuadro selectivo, los candidatos salen del índice
+                  (y los empates se ordenan por su orden de inserción en él)
+            columns: Almacén columnar del documento; si se entrega y no se usa
+                    el índice, los filtros salvo el texto se resuelven con
+                    máscaras sobre sus columnas y `annotations` no se recorre
+            match_type: Tipo de coincidencia de texto (exact, contains, fuzzy)
+            text_index: Índice de n-gramas del documento; con coincidencia
+                       fuzzy, las anotaciones que coinciden salen de él
             
         Returns:
             Lista de anotaciones filtradas
         """
-        # Aplicar filtros en secuencia
-        filtered = annotations
-        
-        # Filtro de texto
-        if filter_params.content_query:
-            filtered = self._filter_by_text(
-                filtered,
-                filter_params.content_query
-            )
-        
-        # Filtros de metadatos
-        filtered = self._filter_by_metadata(
-            filtered,
-            filter_params.tags,
-            filter_params.types,
-            filter_params.users
-        )
-        
-        # Filtros de fecha
-        filtered = self._filter_by_date(
-            filtered,
-            filter_params.created_after,
-            filter_params.created_before,
-            filter_params.updated_after,
-            filter_params.updated_before
-        )
+        total = len(columns) if columns is not None else len(annotations)
+        if self._use_index(index, filter_params, total):
+            candidates = index.query(filter_params.page_range, filter_params.position_box)
+            matches = self.compile_selector(filter_params, match_type, True, text_index)(candidates)
+        elif columns is not None:
+            return self._apply_columns(columns, filter_params, match_type, text_index)
+        else:
+            matches = self.compile_selector(filter_params, match_type, text_index=text_index)(annotations)
         
-        # Filtros de posición
-        filtered = self._filter_by_position(
-            filtered,
-            filter_params.page_range,
-            filter_params.position_box
-        )
+        # Si solo se pide una página pequeña, basta un top-k acotado
+        start = filter_params.offset
+        end = start + filter_params.limit
+        top = end if end * TOP_K_RATIO < total else None
         
-        # Ordenar resultados
-        filtered = self._sort_annotations(
-            filtered,
+        ordered = self._sort_annotations(
+            matches,
             filter_params.sort_by,
-            filter_params.sort_order
+            filter_params.sort_order,
+            top
         )
-        
-        # Aplicar paginación
-        start = filter_params.offset
-        end = start + filter_params.limit
-        return filtered[start:end]
+        return ordered[start:end]
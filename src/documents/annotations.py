@@ -1,17 +1,25 @@
 """Módulo para gestionar anotaciones en documentos."""
 from typing import Dict, Any, List, Optional
+from collections import Counter
 from datetime import datetime
 from uuid import uuid4
 
+from src.documents.annotation_columns import AnnotationColumns, column_stores
+from src.documents.annotation_filters import AnnotationFilter, AnnotationFilterEngine
+from src.documents.spatial_index import SpatialIndex, spatial_indexes
+from src.documents.trigram_index import TrigramIndex, text_indexes
 from src.integrations.google_drive import GoogleDriveClient
 from src.database.models import Annotation, User
+from src.services.annotation_stats import AnnotationStatsService, annotation_counts
 
 class AnnotationManager:
     """Gestor de anotaciones para documentos."""
     
-    def __init__(self):
+    def __init__(self, stats: Optional[AnnotationStatsService] = None):
         """Inicializar el gestor de anotaciones."""
         self.drive_client = GoogleDriveClient()
+        self.stats = stats or AnnotationStatsService()
+        self.filter_engine = AnnotationFilterEngine()
     
     async def create_annotation(
         self,
@@ -54,6 +62,10 @@ class AnnotationManager:
             
         # Guardar anotación en base de datos
         await annotation.save()
+        spatial_indexes.add(document_id, annotation)
+        column_stores.add(document_id, annotation)
+        text_indexes.add(document_id, annotation)
+        self.stats.record_created(document_id, annotation)
         
         return annotation
     
@@ -87,6 +99,70 @@ class AnnotationManager:
         annotations = await Annotation.find(filters).sort("created_at", -1).to_list()
         return annotations
     
+    async def get_spatial_index(self, document_id: str) -> SpatialIndex:
+        """Obtener el índice espacial de un documento, cargándolo si hace falta."""
+        index = spatial_indexes.get(document_id)
+        if index is None:
+            index = spatial_indexes.load(document_id, await self.get_annotations(document_id))
+        return index
+    
+    async def get_column_store(self, document_id: str) -> AnnotationColumns:
+        """Obtener el almacén columnar de un documento, cargándolo si hace falta."""
+        store = column_stores.get(document_id)
+        if store is None:
+            store = column_stores.load(document_id, await self.get_annotations(document_id))
+        return store
+    
+    async def get_text_index(self, document_id: str) -> TrigramIndex:
+        """Obtener el índice de n-gramas de un documento, cargándolo si hace falta."""
+        index = text_indexes.get(document_id)
+        if index is None:
+            index = text_indexes.load(document_id, await self.get_annotations(document_id))
+        return index
+    
+    async def search_annotations(
+        self,
+        document_id: str,
+        filter_params: AnnotationFilter,
+        match_type: str = 'contains'
+    ) -> Dict[str, Any]:
+        """Buscar anotaciones de un documento.
+        
+        Los filtros se resuelven sobre el almacén columnar del documento, que
+        queda en memoria entre búsquedas. Con páginas o recuadro se entrega
+        también el índice espacial, y el motor parte de sus candidatos cuando
+        el filtro es selectivo; la coincidencia fuzzy usa el índice de
+        n-gramas.
+        
+        Args:
+            document_id: ID del documento
+            filter_params: Parámetros de filtrado, orden y paginación
+            match_type: Tipo de coincidencia de texto (exact, contains, fuzzy)
+        
+        Returns:
+            Dict con el total del documento y la página de anotaciones
+        """
+        columns = await self.get_column_store(document_id)
+        index = None
+        if filter_params.page_range or filter_params.position_box:
+            index = await self.get_spatial_index(document_id)
+        text_index = None
+        if filter_params.content_query and match_type == 'fuzzy':
+            text_index = await self.get_text_index(document_id)
+        
+        annotations = self.filter_engine.apply_filter(
+            [],
+            filter_params,
+            index=index,
+            columns=columns,
+            match_type=match_type,
+            text_index=text_index
+        )
+        return {
+            "total": len(columns),
+            "annotations": annotations
+        }
+    
     async def update_annotation(
         self,
         annotation_id: str,
@@ -116,7 +192,14 @@ class AnnotationManager:
         update_data = {k: v for k, v in updates.items() if k in allowed_fields}
         update_data["updated_at"] = datetime.utcnow()
         
+        before = annotation_counts(annotation)
         await annotation.update(update_data)
+        if "position" in update_data:
+            spatial_indexes.update(annotation.document_id, annotation)
+        column_stores.update(annotation.document_id, annotation)
+        if "content" in update_data:
+            text_indexes.update(annotation.document_id, annotation)
+        self.stats.record_updated(annotation.document_id, before, annotation)
         return annotation
     
     async def delete_annotation(
@@ -142,6 +225,10 @@ class AnnotationManager:
             raise PermissionError("No tiene permisos para eliminar esta anotación")
             
         await annotation.delete()
+        spatial_indexes.remove(annotation.document_id, annotation.id)
+        column_stores.remove(annotation.document_id, annotation.id)
+        text_indexes.remove(annotation.document_id, annotation.id)
+        self.stats.record_deleted(annotation.document_id, annotation)
         return True
     
     async def get_annotation_summary(
@@ -154,19 +241,32 @@ class AnnotationManager:
             document_id: ID del documento
             
         Returns:
-            Dict con estadísticas de anotaciones
+            Dict con estadísticas de anotaciones (por tipo, página, autor y
+            etiqueta)
         """
-        annotations = await self.get_annotations(document_id)
+        summary = self.stats.get_summary(document_id)
+        if summary is None:
+            # Primera consulta: contar una vez y mantener desde ahí
+            await self.reconcile_annotation_summary(document_id)
+            summary = self.stats.get_summary(document_id)
+        return summary
+    
+    async def reconcile_annotation_summary(self, document_id: str) -> Dict[str, Any]:
+        """Recontar los contadores de un documento desde la base.
         
-        return {
-            "total": len(annotations),
-            "by_type": {
-                "note": len([a for a in annotations if a.type == "note"]),
-                "highlight": len([a for a in annotations if a.type == "highlight"]),
-                "comment": len([a for a in annotations if a.type == "comment"])
-            },
-            "by_page": {
-                page: len([a for a in annotations if a.position["page"] == page])
-                for page in set(a.position["page"] for a in annotations)
-            }
-        }
+        Returns:
+            Campos corregidos, con (guardado, real)
+        """
+        return await self.stats.reconcile(
+            document_id,
+            lambda: self.get_annotations(document_id),
+            self.count_annotations
+        )
+    
+    def count_annotations(self, document_id: str, annotations: List[Annotation]) -> Counter:
+        """Contar las anotaciones de un documento con `np.bincount`.
+        
+        Las anotaciones recién leídas reemplazan el almacén columnar del
+        documento, que queda al día para las búsquedas siguientes.
+        """
+        return column_stores.load(document_id, annotations).counts()
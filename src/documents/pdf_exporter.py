@@ -1,6 +1,21 @@
-"""Módulo para exportar anotaciones a PDF."""
-from typing import List, Dict, Any, Optional
+"""Módulo para exportar anotaciones a PDF.
+
+`doc.build` de ReportLab es CPU intensivo, así que la exportación corre en
+un pool de procesos: cada proceso conserva su exportador, con los estilos
+de etiqueta ya creados, y escribe el PDF en un archivo que el proceso web
+envía por trozos (o sube a S3) sin cargarlo completo en memoria. El avance
+de la maquetación llega al proceso web por una cola y se entrega a un
+callback opcional.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import asyncio
+import inspect
+import multiprocessing
+import os
+import queue as queue_module
+import tempfile
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -8,12 +23,65 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.units import inch
 from io import BytesIO
 
+from src.config import settings
+
+# Segundos entre lecturas de la cola de avance
+PROGRESS_POLL_INTERVAL = 0.05
+
+# Callback de avance: recibe la fracción maquetada (0.0 a 1.0)
+ProgressCallback = Callable[[float], Union[None, Awaitable[None]]]
+
+# Pool de procesos y gestor de colas de avance, creados al primer uso
+_executor: Optional[ProcessPoolExecutor] = None
+_queues: Optional[Any] = None
+
+# Exportador de cada proceso del pool
+_worker_exporter: Optional['AnnotationPDFExporter'] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor, _queues
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.ANNOTATION_EXPORT_WORKERS)
+        _queues = multiprocessing.Manager()
+    return _executor
+
+def shutdown_export_pool():
+    """Detener el pool de exportación (al apagar la aplicación)."""
+    global _executor, _queues
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _queues.shutdown()
+        _executor = _queues = None
+
+def _render_in_worker(
+    annotations: List[Dict[str, Any]],
+    doc_info: Dict[str, Any],
+    path: str,
+    progress_queue: Optional[Any]
+) -> int:
+    """Generar un PDF dentro de un proceso del pool."""
+    global _worker_exporter
+    if _worker_exporter is None:
+        _worker_exporter = AnnotationPDFExporter()
+    progress = progress_queue.put if progress_queue is not None else None
+    return _worker_exporter.render(annotations, doc_info, path, progress)
+
 class AnnotationPDFExporter:
     """Exportador de anotaciones a PDF."""
 
     def __init__(self):
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
+        self._tag_styles: Dict[str, ParagraphStyle] = {}  # color -> estilo de etiqueta
+        self._meta_table_style = TableStyle([
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.grey),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 2),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+        ])
+        self._tag_table_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ])
 
     def _setup_custom_styles(self):
         """Configurar estilos personalizados."""
@@ -30,6 +98,17 @@ class AnnotationPDFExporter:
             borderRadius=5
         ))
 
+    def _tag_style(self, color: str) -> ParagraphStyle:
+        """Estilo de etiqueta para un color, creado una sola vez."""
+        style = self._tag_styles.get(color)
+        if style is None:
+            style = self._tag_styles[color] = ParagraphStyle(
+                f"Tag-{color}",
+                parent=self.styles['Tag'],
+                backColor=colors.HexColor(color)
+            )
+        return style
+
     def _create_header(self, doc_info: Dict[str, Any]) -> List[Any]:
         """Crear encabezado del documento."""
         elements = []
@@ -93,58 +172,46 @@ class AnnotationPDFExporter:
         meta_table = Table(
             metadata,
             colWidths=[inch, 1.5*inch, inch, 1.5*inch],
-            style=TableStyle([
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.grey),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 2),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-            ])
+            style=self._meta_table_style
         )
         
         # Etiquetas
         if annotation.get('tags'):
             tags = [
-                Paragraph(
-                    tag['name'],
-                    ParagraphStyle(
-                        'Tag',
-                        parent=self.styles['Tag'],
-                        backColor=colors.HexColor(tag['color'])
-                    )
-                )
+                Paragraph(tag['name'], self._tag_style(tag['color']))
                 for tag in annotation['tags']
             ]
             tag_table = Table(
                 [tags],
                 colWidths=[inch]*len(tags),
-                style=TableStyle([
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ])
+                style=self._tag_table_style
             )
             elements.append(tag_table)
         
         elements.extend([content, meta_table, Spacer(1, 0.25*inch)])
         return elements
 
-    async def export_annotations(
+    def render(
         self,
         annotations: List[Dict[str, Any]],
         doc_info: Dict[str, Any],
-        output_path: Optional[str] = None
-    ) -> BytesIO:
-        """Exportar anotaciones a PDF.
+        output: Any,
+        progress: Optional[Callable[[float], Any]] = None
+    ) -> int:
+        """Generar el PDF de forma síncrona (CPU intensivo).
         
         Args:
             annotations: Lista de anotaciones
             doc_info: Información del documento
-            output_path: Ruta de salida opcional
+            output: Ruta o archivo de salida
+            progress: Recibe la fracción maquetada, como mucho una vez por
+                     punto porcentual
             
         Returns:
-            BytesIO con el contenido del PDF
+            Número de páginas generadas
         """
-        buffer = BytesIO()
         doc = SimpleDocTemplate(
-            output_path or buffer,
+            output,
             pagesize=letter,
             rightMargin=72,
             leftMargin=72,
@@ -165,11 +232,103 @@ class AnnotationPDFExporter:
         ):
             elements.extend(self._format_annotation(annotation))
         
+        if progress:
+            state = {'total': len(elements), 'reported': -1}
+            
+            def on_progress(kind: str, value: int):
+                if kind == 'SIZE_EST':
+                    state['total'] = value or 1
+                elif kind in ('PROGRESS', 'FINISHED'):
+                    percent = 100 if kind == 'FINISHED' else min(100, value * 100 // state['total'])
+                    if percent > state['reported']:
+                        state['reported'] = percent
+                        progress(percent / 100)
+            
+            doc.setProgressCallBack(on_progress)
+        
         # Generar PDF
         doc.build(elements)
+        return doc.page
+
+    async def export_to_file(
+        self,
+        annotations: List[Dict[str, Any]],
+        doc_info: Dict[str, Any],
+        path: str,
+        progress: Optional[ProgressCallback] = None
+    ) -> int:
+        """Generar el PDF en un proceso del pool, sin bloquear el event loop.
         
+        Args:
+            annotations: Lista de anotaciones
+            doc_info: Información del documento
+            path: Archivo de salida
+            progress: Callback de avance (puede ser async); corre en el
+                     event loop
+            
+        Returns:
+            Número de páginas generadas
+        """
+        loop = asyncio.get_running_loop()
+        executor = _get_executor()
+        queue = _queues.Queue() if progress else None
+        relay = asyncio.create_task(self._relay_progress(queue, progress)) if progress else None
+        try:
+            return await loop.run_in_executor(
+                executor, _render_in_worker, annotations, doc_info, path, queue
+            )
+        finally:
+            if relay:
+                # El proceso ya terminó de escribir en la cola: cerrar el relevo
+                queue.put(None)
+                await relay
+
+    async def _relay_progress(self, queue: Any, progress: ProgressCallback):
+        """Entregar al callback el avance que publica el proceso del pool.
+        
+        La cola se lee sin bloquear, cediendo el loop entre lecturas, para no
+        ocupar un thread del executor por cada exportación en curso.
+        """
+        while True:
+            try:
+                value = queue.get_nowait()
+            except queue_module.Empty:
+                await asyncio.sleep(PROGRESS_POLL_INTERVAL)
+                continue
+            if value is None:
+                return
+            result = progress(value)
+            if inspect.isawaitable(result):
+                await result
+
+    async def export_annotations(
+        self,
+        annotations: List[Dict[str, Any]],
+        doc_info: Dict[str, Any],
+        output_path: Optional[str] = None,
+        progress: Optional[ProgressCallback] = None
+    ) -> Optional[BytesIO]:
+        """Exportar anotaciones a PDF.
+        
+        Args:
+            annotations: Lista de anotaciones
+            doc_info: Información del documento
+            output_path: Ruta de salida opcional
+            progress: Callback de avance
+            
+        Returns:
+            BytesIO con el contenido del PDF, o None si se escribió en
+            output_path
+        """
         if output_path:
+            await self.export_to_file(annotations, doc_info, output_path, progress)
             return None
         
-        buffer.seek(0)
-        return buffer
+        fd, path = tempfile.mkstemp(suffix='.pdf')
+        os.close(fd)
+        try:
+            await self.export_to_file(annotations, doc_info, path, progress)
+            with open(path, 'rb') as file:
+                return BytesIO(file.read())
+        finally:
+            os.unlink(path)
@@ -0,0 +1,283 @@
+"""Índice espacial de anotaciones por documento y página.
+
+Cada página tiene un R-tree de puntos empaquetado con STR (Sort-Tile-
+Recursive). Altas, cambios y bajas actualizan las entradas de la página y la
+marcan para reconstruir su árbol en la próxima consulta; como las páginas
+tienen pocos cientos de anotaciones, la reconstrucción es barata y las
+consultas repetidas (desplazamiento del visor) usan el árbol ya armado en
+O(log n + k).
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right, insort
+from math import ceil, sqrt
+
+from src.config import settings
+
+# Hijos por nodo del R-tree
+NODE_CAPACITY = 16
+
+def _get(annotation: Any, field: str) -> Any:
+    """Leer un campo de una anotación (dict o modelo)."""
+    if isinstance(annotation, dict):
+        return annotation[field]
+    return getattr(annotation, field)
+
+class _Node:
+    """Nodo del R-tree: rectángulo envolvente e hijos (nodos o entradas)."""
+
+    __slots__ = ('x1', 'y1', 'x2', 'y2', 'children', 'leaf')
+
+    def __init__(self, children: List[Any], leaf: bool):
+        self.children = children
+        self.leaf = leaf
+        if leaf:
+            xs = [entry[0] for entry in children]
+            ys = [entry[1] for entry in children]
+            self.x1, self.x2, self.y1, self.y2 = min(xs), max(xs), min(ys), max(ys)
+        else:
+            self.x1 = min(child.x1 for child in children)
+            self.y1 = min(child.y1 for child in children)
+            self.x2 = max(child.x2 for child in children)
+            self.y2 = max(child.y2 for child in children)
+
+def _str_groups(items: List[Any], center) -> List[List[Any]]:
+    """Agrupar elementos en bloques de NODE_CAPACITY con STR."""
+    count = len(items)
+    slab_size = NODE_CAPACITY * ceil(sqrt(ceil(count / NODE_CAPACITY)))
+    items = sorted(items, key=lambda item: center(item)[0])
+    groups = []
+    for start in range(0, count, slab_size):
+        slab = sorted(items[start:start + slab_size], key=lambda item: center(item)[1])
+        groups.extend(slab[i:i + NODE_CAPACITY] for i in range(0, len(slab), NODE_CAPACITY))
+    return groups
+
+class _PageTree:
+    """Anotaciones de una página con su R-tree."""
+
+    __slots__ = ('entries', 'root', 'dirty')
+
+    def __init__(self):
+        # id -> (x, y, seq, anotación)
+        self.entries: Dict[Any, Tuple[float, float, int, Any]] = {}
+        self.root: Optional[_Node] = None
+        self.dirty = False
+
+    def query(self, x1: float, y1: float, x2: float, y2: float) -> Iterator[Tuple[float, float, int, Any]]:
+        """Entradas dentro del rectángulo (bordes incluidos)."""
+        if self.dirty:
+            self._rebuild()
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.x1 > x2 or node.x2 < x1 or node.y1 > y2 or node.y2 < y1:
+                continue
+            if node.leaf:
+                for entry in node.children:
+                    if x1 <= entry[0] <= x2 and y1 <= entry[1] <= y2:
+                        yield entry
+            else:
+                stack.extend(node.children)
+
+    def _rebuild(self):
+        entries = list(self.entries.values())
+        self.dirty = False
+        if not entries:
+            self.root = None
+            return
+        level = [_Node(group, leaf=True) for group in _str_groups(entries, lambda e: (e[0], e[1]))]
+        while len(level) > 1:
+            level = [
+                _Node(group, leaf=False)
+                for group in _str_groups(level, lambda n: ((n.x1 + n.x2) / 2, (n.y1 + n.y2) / 2))
+            ]
+        self.root = level[0]
+
+class SpatialIndex:
+    """Índice espacial de las anotaciones de un documento."""
+
+    def __init__(self):
+        self.pages: Dict[int, _PageTree] = {}
+        self.page_numbers: List[int] = []  # Ordenadas, para rangos de páginas
+        self.locations: Dict[Any, int] = {}  # id -> página
+        self._seq = 0
+
+    @classmethod
+    def build(cls, annotations: Iterable[Any]) -> 'SpatialIndex':
+        """Crear el índice a partir de las anotaciones existentes."""
+        index = cls()
+        for annotation in annotations:
+            index.add(annotation)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def add(self, annotation: Any):
+        """Agregar (o reemplazar) una anotación."""
+        annotation_id = _get(annotation, 'id')
+        if annotation_id in self.locations:
+            self.remove(annotation_id)
+
+        position = _get(annotation, 'position')
+        page = position['page']
+        tree = self.pages.get(page)
+        if tree is None:
+            tree = self.pages[page] = _PageTree()
+            insort(self.page_numbers, page)
+
+        self._seq += 1
+        tree.entries[annotation_id] = (position['x'], position['y'], self._seq, annotation)
+        tree.dirty = True
+        self.locations[annotation_id] = page
+
+    def update(self, annotation: Any):
+        """Actualizar una anotación (posiblemente movida de página)."""
+        annotation_id = _get(annotation, 'id')
+        page = self.locations.get(annotation_id)
+        if page is None:
+            self.add(annotation)
+            return
+
+        position = _get(annotation, 'position')
+        x, y, seq, _ = self.pages[page].entries[annotation_id]
+        if position['page'] != page:
+            self.remove(annotation_id)
+            self.add(annotation)
+            return
+
+        # Conserva su orden de inserción
+        tree = self.pages[page]
+        tree.entries[annotation_id] = (position['x'], position['y'], seq, annotation)
+        if (x, y) != (position['x'], position['y']):
+            tree.dirty = True
+
+    def remove(self, annotation_id: Any) -> bool:
+        """Eliminar una anotación.
+
+        Returns:
+            False si no estaba indexada
+        """
+        page = self.locations.pop(annotation_id, None)
+        if page is None:
+            return False
+        tree = self.pages[page]
+        del tree.entries[annotation_id]
+        tree.dirty = True
+        if not tree.entries:
+            del self.pages[page]
+            self.page_numbers.pop(bisect_left(self.page_numbers, page))
+        return True
+
+    def _pages_in(self, page_range: Optional[Tuple[int, int]]) -> List[int]:
+        if not page_range:
+            return self.page_numbers
+        first, last = page_range
+        return self.page_numbers[bisect_left(self.page_numbers, first):bisect_right(self.page_numbers, last)]
+
+    def count(self, page_range: Optional[Tuple[int, int]] = None) -> int:
+        """Anotaciones en un rango de páginas, sin recorrerlas."""
+        if not page_range:
+            return len(self.locations)
+        return sum(len(self.pages[page].entries) for page in self._pages_in(page_range))
+
+    def query(
+        self,
+        page_range: Optional[Tuple[int, int]] = None,
+        position_box: Optional[Dict[str, float]] = None
+    ) -> List[Any]:
+        """Anotaciones en un rango de páginas y/o un recuadro.
+
+        Args:
+            page_range: Páginas (inicio, fin), ambas incluidas
+            position_box: Recuadro {x1, y1, x2, y2}, bordes incluidos
+
+        Returns:
+            Anotaciones en orden de inserción en el índice
+        """
+        pages = self._pages_in(page_range)
+        entries: List[Tuple[float, float, int, Any]] = []
+        for page in pages:
+            tree = self.pages[page]
+            if position_box:
+                entries.extend(tree.query(
+                    position_box['x1'], position_box['y1'],
+                    position_box['x2'], position_box['y2']
+                ))
+            else:
+                entries.extend(tree.entries.values())
+
+        entries.sort(key=lambda entry: entry[2])
+        return [entry[3] for entry in entries]
+
+class SpatialIndexRegistry:
+    """Índices espaciales de los documentos consultados recientemente.
+
+    Los cambios de anotaciones se aplican solo a documentos con índice
+    cargado; los demás se indexan al consultarlos por primera vez.
+    """
+
+    index_type = SpatialIndex
+
+    def __init__(self, max_documents: Optional[int] = None):
+        self.max_documents = max_documents or settings.ANNOTATION_INDEX_MAX_DOCUMENTS
+        self._indexes: 'OrderedDict[str, SpatialIndex]' = OrderedDict()
+
+    def get(self, document_id: str) -> Optional[SpatialIndex]:
+        """Índice cargado de un documento, si existe."""
+        index = self._indexes.get(document_id)
+        if index is not None:
+            self._indexes.move_to_end(document_id)
+        return index
+
+    def load(self, document_id: str, annotations: Iterable[Any]) -> SpatialIndex:
+        """Obtener el índice de un documento o crearlo con sus anotaciones."""
+        index = self.get(document_id)
+        if index is None:
+            index = self._indexes[document_id] = self.index_type.build(annotations)
+            while len(self._indexes) > self.max_documents:
+                self._indexes.popitem(last=False)
+        return index
+
+    def add(self, document_id: str, annotation: Any):
+        index = self._indexes.get(document_id)
+        if index is not None:
+            index.add(annotation)
+
+    def update(self, document_id: str, annotation: Any):
+        index = self._indexes.get(document_id)
+        if index is not None:
+            index.update(annotation)
+
+    def remove(self, document_id: str, annotation_id: Any):
+        index = self._indexes.get(document_id)
+        if index is not None:
+            index.remove(annotation_id)
+
+    def add_many(self, document_id: str, annotations: Iterable[Any]):
+        """Aplicar un lote de altas con una sola búsqueda del índice."""
+        index = self._indexes.get(document_id)
+        if index is not None:
+            for annotation in annotations:
+                index.add(annotation)
+
+    def update_many(self, document_id: str, annotations: Iterable[Any]):
+        index = self._indexes.get(document_id)
+        if index is not None:
+            for annotation in annotations:
+                index.update(annotation)
+
+    def remove_many(self, document_id: str, annotation_ids: Iterable[Any]):
+        index = self._indexes.get(document_id)
+        if index is not None:
+            for annotation_id in annotation_ids:
+                index.remove(annotation_id)
+
+    def invalidate(self, document_id: str):
+        """Descartar el índice de un documento."""
+        self._indexes.pop(document_id, None)
+
+# Índices del proceso
+spatial_indexes = SpatialIndexRegistry()
@@ -0,0 +1,337 @@
+"""Índice de n-gramas para la búsqueda aproximada de anotaciones.
+
+La búsqueda fuzzy acepta una anotación si
+`SequenceMatcher(None, texto, consulta).ratio() >= threshold` (sobre el
+texto en minúsculas). El índice devuelve exactamente ese conjunto sin
+calcular `ratio()` sobre todo el documento, descartando antes con cotas
+superiores que nunca eliminan una coincidencia:
+
+1. Largo: `ratio <= 2 * min(la, lb) / (la + lb)`, así que solo una banda de
+   largos puede alcanzar el umbral, y cada largo exige un mínimo M de
+   caracteres coincidentes.
+2. Caracteres y n-gramas: M no supera los caracteres en común (la cota de
+   `quick_ratio`, calculada en bloque con conteos por carácter). Además, los
+   bloques coincidentes de SequenceMatcher son subcadenas comunes, disjuntas
+   y en orden; si suman M caracteres en k bloques, las cadenas comparten al
+   menos M - (n - 1) * k n-gramas, con k <= la + lb - 2M + 1. Los n-gramas
+   compartidos se cuentan con las listas invertidas; esta cota solo descarta
+   con umbrales altos (con 0.8 y trigramas suele ser cero o negativa).
+3. LCS: M nunca supera la subsecuencia común más larga, que se calcula
+   bit a bit en O(la) operaciones sobre enteros.
+
+Solo los candidatos que pasan las tres cotas se puntúan con `ratio()`.
+
+Las altas y cambios agregan entradas a las listas; las bajas solo marcan
+la entrada y las listas se compactan cuando las entradas muertas superan
+a las vivas.
+"""
+from array import array
+from collections import Counter
+from difflib import SequenceMatcher
+from math import ceil
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.documents.spatial_index import SpatialIndexRegistry
+
+# Largo de los n-gramas indexados
+GRAM_SIZE = 3
+
+# Caracteres con conteo propio; el resto comparte una columna
+CHAR_COLUMNS = 64
+
+# Entradas muertas a partir de las cuales se considera compactar
+COMPACT_MIN_DEAD = 1024
+
+def _get(annotation: Any, field: str) -> Any:
+    """Leer un campo de una anotación (dict o modelo)."""
+    if isinstance(annotation, dict):
+        return annotation.get(field)
+    return getattr(annotation, field, None)
+
+def annotation_text(annotation: Any) -> str:
+    """Texto de una anotación (el contenido puede ser texto o {'text': ...})."""
+    content = _get(annotation, 'content')
+    if isinstance(content, dict):
+        content = content.get('text')
+    return content or ''
+
+def grams(text: str, size: int = GRAM_SIZE) -> Set[str]:
+    """N-gramas distintos de un texto."""
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def lcs_length(text: str, masks: Dict[str, int], length: int) -> int:
+    """Largo de la subsecuencia común más larga con la consulta.
+
+    Algoritmo bit-paralelo de Hyyrö: cada bit representa una posición de la
+    consulta, cuyas posiciones por carácter vienen en `masks`.
+    """
+    full = (1 << length) - 1
+    row = full
+    for char in text:
+        matched = row & masks.get(char, 0)
+        row = ((row + matched) | (row - matched)) & full
+    return length - bin(row).count('1')
+
+def _min_matches(total: int, threshold: float) -> int:
+    """Caracteres coincidentes mínimos para que 2M/total alcance el umbral.
+
+    Usa la misma expresión de punto flotante que difflib.
+    """
+    matches = max(0, ceil(threshold * total / 2))
+    while matches > 0 and 2.0 * (matches - 1) / total >= threshold:
+        matches -= 1
+    while 2.0 * matches / total < threshold:
+        matches += 1
+    return matches
+
+class TrigramIndex:
+    """Índice de n-gramas del contenido de las anotaciones de un documento."""
+
+    def __init__(self, gram_size: int = GRAM_SIZE):
+        self.gram_size = gram_size
+        self._reset()
+
+    def _reset(self):
+        self.postings: Dict[str, array] = {}  # n-grama -> entradas que lo contienen
+        self.texts: List[Optional[str]] = []  # entrada -> texto en minúsculas (None si se eliminó)
+        self.ids: List[Any] = []  # entrada -> id de la anotación
+        self.lengths = array('i')  # entrada -> largo del texto (-1 si se eliminó)
+        self.chars = array('i')  # entrada -> conteo por columna de caracteres (CHAR_COLUMNS por entrada)
+        self.columns: Dict[str, int] = {}  # carácter -> columna
+        self.entries: Dict[Any, int] = {}  # id -> entrada viva
+        self.dead = 0
+
+    @classmethod
+    def build(cls, annotations: Iterable[Any]) -> 'TrigramIndex':
+        """Crear el índice a partir de las anotaciones existentes."""
+        index = cls()
+        for annotation in annotations:
+            index.add(annotation)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, annotation: Any):
+        """Agregar (o reemplazar) una anotación."""
+        self._insert(_get(annotation, 'id'), annotation_text(annotation).lower())
+
+    def update(self, annotation: Any):
+        """Actualizar el texto de una anotación."""
+        annotation_id = _get(annotation, 'id')
+        text = annotation_text(annotation).lower()
+        entry = self.entries.get(annotation_id)
+        if entry is None or self.texts[entry] != text:
+            self._insert(annotation_id, text)
+
+    def remove(self, annotation_id: Any) -> bool:
+        """Eliminar una anotación.
+
+        Returns:
+            False si no estaba indexada
+        """
+        entry = self.entries.pop(annotation_id, None)
+        if entry is None:
+            return False
+        self.texts[entry] = None
+        self.lengths[entry] = -1
+        self.dead += 1
+        if self.dead >= COMPACT_MIN_DEAD and self.dead > len(self.entries):
+            self._compact()
+        return True
+
+    def _insert(self, annotation_id: Any, text: str):
+        self.remove(annotation_id)
+        entry = len(self.texts)
+        self.texts.append(text)
+        self.ids.append(annotation_id)
+        self.lengths.append(len(text))
+        counts = [0] * CHAR_COLUMNS
+        for char, count in Counter(text).items():
+            counts[self._char_column(char)] += count
+        self.chars.extend(counts)
+        self.entries[annotation_id] = entry
+        postings = self.postings
+        for gram in grams(text, self.gram_size):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('i')
+            posting.append(entry)
+
+    def _char_column(self, char: str, grow: bool = True) -> int:
+        """Columna de un carácter; los que no caben comparten la última."""
+        column = self.columns.get(char)
+        if column is None:
+            if not grow or len(self.columns) >= CHAR_COLUMNS - 1:
+                return CHAR_COLUMNS - 1
+            column = self.columns[char] = len(self.columns)
+        return column
+
+    def _compact(self):
+        """Reconstruir las listas sin las entradas eliminadas."""
+        live = [(self.ids[entry], self.texts[entry]) for entry in sorted(self.entries.values())]
+        self._reset()
+        for annotation_id, text in live:
+            self._insert(annotation_id, text)
+
+    def search(self, query: str, threshold: float = 0.8) -> List[Any]:
+        """IDs de las anotaciones con `ratio() >= threshold` frente a la consulta.
+
+        Returns:
+            IDs en orden de inserción en el índice
+        """
+        query = query.lower()
+        query_length = len(query)
+        lengths = np.array(self.lengths, dtype=np.int32)
+        alive = lengths >= 0
+        if threshold <= 0:
+            return [self.ids[entry] for entry in np.flatnonzero(alive)]
+
+        # Cota 1: banda de largos; para cada largo, el M mínimo que exige el umbral
+        impossible = np.iinfo(np.int32).max
+        min_matches = np.full(int(lengths.max(initial=0)) + 1, impossible, dtype=np.int64)
+        for length in range(len(min_matches)):
+            total = length + query_length
+            if not total:
+                min_matches[length] = 0  # Dos textos vacíos: ratio 1.0
+            elif 2.0 * min(length, query_length) / total >= threshold:
+                min_matches[length] = _min_matches(total, threshold)
+        need = np.where(alive, min_matches[np.maximum(lengths, 0)], impossible)
+        candidates = need < impossible
+
+        # Cota 2a: caracteres en común (como quick_ratio), vectorizada
+        query_chars = np.zeros(CHAR_COLUMNS, dtype=np.int32)
+        for char, count in Counter(query).items():
+            query_chars[self._char_column(char, grow=False)] += count
+        chars = np.frombuffer(self.chars, dtype=np.int32).reshape(-1, CHAR_COLUMNS)
+        candidates &= np.minimum(chars, query_chars).sum(axis=1) >= need
+
+        # Cota 2b: n-gramas en común, solo donde la cota es positiva
+        blocks = np.maximum(lengths, 0) + query_length - 2 * need + 1
+        need_grams = need - (self.gram_size - 1) * blocks
+        if np.any(candidates & (need_grams > 0)):
+            # Cada n-grama presente cuenta tantas veces como aparece en la consulta:
+            # nunca menos que las ocurrencias compartidas, así que la cota sigue valiendo
+            shared = np.zeros(len(lengths), dtype=np.int64)
+            query_grams = Counter(query[i:i + self.gram_size] for i in range(query_length - self.gram_size + 1))
+            for gram, count in query_grams.items():
+                posting = self.postings.get(gram)
+                if posting is not None:
+                    shared[np.frombuffer(posting, dtype=np.int32)] += count
+            candidates &= shared >= need_grams
+
+        # Cota 3 (LCS) y puntaje exacto
+        masks: Dict[str, int] = {}
+        for position, char in enumerate(query):
+            masks[char] = masks.get(char, 0) | (1 << position)
+        matcher = SequenceMatcher(None)
+        matcher.set_seq2(query)
+        result = []
+        verdicts: Dict[str, bool] = {}  # Textos repetidos se puntúan una vez
+        for entry in np.flatnonzero(candidates):
+            text = self.texts[entry]
+            accepted = verdicts.get(text)
+            if accepted is None:
+                accepted = lcs_length(text, masks, query_length) >= need[entry]
+                if accepted:
+                    matcher.set_seq1(text)
+                    accepted = matcher.ratio() >= threshold
+                verdicts[text] = accepted
+            if accepted:
+                result.append(self.ids[entry])
+        return result
+
+class TrigramIndexRegistry(SpatialIndexRegistry):
+    """Índices de n-gramas de los documentos consultados recientemente.
+
+    Cada índice guarda la versión de la base con la que se construyó: número
+    de anotaciones del documento y su mayor `updated_at`. Al consultar se
+    entrega la versión actual y un índice de otra versión (porque otro
+    proceso escribió en el documento) se descarta. Las escrituras de este
+    proceso avanzan la versión guardada con lo que aplicaron, sin forzar una
+    reconstrucción; si la predicción no coincide, el índice solo se
+    reconstruye de más.
+    """
+
+    index_type = TrigramIndex
+
+    def __init__(self, max_documents: Optional[int] = None):
+        super().__init__(max_documents)
+        self._versions: Dict[str, Tuple[int, Any]] = {}
+
+    def get(self, document_id: str, version: Optional[Tuple[int, Any]] = None) -> Optional[TrigramIndex]:
+        """Índice cargado de un documento, si existe y corresponde a `version`."""
+        index = super().get(document_id)
+        if index is not None and version is not None and self._versions.get(document_id) != version:
+            self.invalidate(document_id)
+            return None
+        return index
+
+    def load(
+        self,
+        document_id: str,
+        annotations: Iterable[Any],
+        version: Optional[Tuple[int, Any]] = None
+    ) -> TrigramIndex:
+        """Obtener el índice de un documento o crearlo con sus anotaciones.
+
+        Args:
+            document_id: ID del documento
+            annotations: Anotaciones del documento, leídas después de `version`
+            version: (número de anotaciones, mayor updated_at) en la base
+        """
+        index = self.get(document_id, version)
+        if index is None:
+            index = super().load(document_id, annotations)
+            self._versions[document_id] = version
+            for evicted in self._versions.keys() - self._indexes.keys():
+                del self._versions[evicted]
+        return index
+
+    def add(self, document_id: str, annotation: Any):
+        super().add(document_id, annotation)
+        self._advance(document_id, 1, [annotation])
+
+    def update(self, document_id: str, annotation: Any):
+        super().update(document_id, annotation)
+        self._advance(document_id, 0, [annotation])
+
+    def remove(self, document_id: str, annotation_id: Any):
+        super().remove(document_id, annotation_id)
+        self._advance(document_id, -1, [])
+
+    def add_many(self, document_id: str, annotations: Iterable[Any]):
+        annotations = list(annotations)
+        super().add_many(document_id, annotations)
+        self._advance(document_id, len(annotations), annotations)
+
+    def update_many(self, document_id: str, annotations: Iterable[Any]):
+        annotations = list(annotations)
+        super().update_many(document_id, annotations)
+        self._advance(document_id, 0, annotations)
+
+    def remove_many(self, document_id: str, annotation_ids: Iterable[Any]):
+        annotation_ids = list(annotation_ids)
+        super().remove_many(document_id, annotation_ids)
+        self._advance(document_id, -len(annotation_ids), [])
+
+    def invalidate(self, document_id: str):
+        """Descartar el índice de un documento."""
+        super().invalidate(document_id)
+        self._versions.pop(document_id, None)
+
+    def _advance(self, document_id: str, added: int, annotations: List[Any]):
+        """Versión esperada de la base tras una escritura de este proceso."""
+        version = self._versions.get(document_id)
+        if version is None or document_id not in self._indexes:
+            return
+        count, latest = version
+        stamps = [stamp for stamp in (_get(a, 'updated_at') for a in annotations) if stamp is not None]
+        if latest is not None:
+            stamps.append(latest)
+        self._versions[document_id] = (count + added, max(stamps) if stamps else None)
+
+# Índices del proceso
+text_indexes = TrigramIndexRegistry()
@@ -12,14 +12,17 @@ from src.utils.diff import calculate_diff, apply_patch
 class GoogleDocsClient:
     """Client for interacting with Google Docs API."""
     
-    def __init__(self, auth_manager=None):
+    def __init__(self, auth_manager=None, version_store=None):
         """Initialize the Google Docs client.
         
         Args:
             auth_manager: Optional AuthManager instance. If not provided,
                          a new one will be created.
+            version_store: Optional VersionStore holding captured revisions.
+                          Without it, revision content is not available.
         """
         self.auth_manager = auth_manager or AuthManager()
+        self.version_store = version_store
         self.service = None
         self.drive_service = None
         self._init_service()
@@ -122,13 +125,59 @@ class GoogleDocsClient:
             revision_id: ID of the revision to retrieve
             
         Returns:
-            Document content at specified revision
+            Revision with 'id', 'modifiedTime', 'lastModifyingUser' and
+            'content'. Revisions captured in the version store are rebuilt
+            locally; for others only Drive metadata is available and
+            'content' is None.
         """
-        return self.drive_service.revisions().get(
+        if self.version_store:
+            entry = self.version_store.get_entry(document_id, revision_id)
+            if entry is not None:
+                return {
+                    'id': revision_id,
+                    'modifiedTime': entry.get('modifiedTime', entry.get('capturedAt')),
+                    'lastModifyingUser': entry.get('lastModifyingUser'),
+                    'content': self.version_store.get_version(document_id, revision_id)
+                }
+        
+        revision = self.drive_service.revisions().get(
             fileId=document_id,
             revisionId=revision_id,
             fields='id,modifiedTime,lastModifyingUser'
         ).execute()
+        return {
+            'id': revision['id'],
+            'modifiedTime': revision.get('modifiedTime'),
+            'lastModifyingUser': revision.get('lastModifyingUser'),
+            'content': None
+        }
+    
+    def capture_version(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Store the current revision of a document in the version store.
+        
+        Only the revision ID is fetched when the revision is already stored,
+        so calling this often is cheap.
+        
+        Args:
+            document_id: ID of the document
+            
+        Returns:
+            Version store entry for the current revision, or None without a store
+        """
+        if not self.version_store:
+            return None
+        
+        head = self.get_document(document_id, include_content=False)
+        if self.version_store.has_version(document_id, head['revisionId']):
+            return None
+        
+        document = self.get_document(document_id)
+        return self.version_store.add_version(
+            document_id,
+            document['revisionId'],
+            document,
+            {'title': document.get('title'), 'capturedAt': datetime.utcnow().isoformat()}
+        )
     
     def list_document_versions(self, document_id: str) -> List[Dict[str, Any]]:
         """List all versions of a document.
@@ -172,8 +221,13 @@ class GoogleDocsClient:
         Returns:
             List of changes between versions
         """
-        start_content = self.get_document(document_id, revision_id=start_revision_id)
-        end_content = self.get_document(document_id, revision_id=end_revision_id)
+        if not self.version_store:
+            raise ValueError("A version store is required to compare revisions")
+        
+        start_content = self.version_store.get_version(document_id, start_revision_id)
+        end_content = self.version_store.get_version(document_id, end_revision_id)
+        if start_content is None or end_content is None:
+            raise ValueError("Revision not found in version store")
         
         return calculate_diff(start_content, end_content)
     
@@ -193,6 +193,44 @@ class GoogleDriveClient:
         
         return result
     
+    @retry_with_backoff()
+    def has_access(self, file_id: str, email: str) -> bool:
+        """Check whether a user can read a file.
+        
+        Accepts direct user permissions, the user's domain and public
+        ("anyone") permissions; group memberships are not resolved.
+        
+        Returns:
+            False if the file does not exist or the user has no permission
+        """
+        email = email.lower()
+        domain = email.rsplit('@', 1)[-1]
+        page_token = None
+        while True:
+            try:
+                result = self.service.permissions().list(
+                    fileId=file_id,
+                    fields='nextPageToken,permissions(type,emailAddress,domain)',
+                    pageSize=100,
+                    pageToken=page_token
+                ).execute()
+            except HttpError as e:
+                if e.resp.status == 404:
+                    return False
+                raise
+            
+            for permission in result.get('permissions', []):
+                if permission['type'] == 'anyone':
+                    return True
+                if permission['type'] == 'domain' and permission.get('domain', '').lower() == domain:
+                    return True
+                if permission.get('emailAddress', '').lower() == email:
+                    return True
+            
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return False
+    
     def search_files(self, query: str, parent_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Search for files in Google Drive.
         
@@ -2,8 +2,8 @@
 from datetime import datetime
 from typing import Dict, Any, Optional
 from uuid import UUID, uuid4
-from sqlalchemy import Column, DateTime, ForeignKey, String, JSON
-from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, JSON
+from sqlalchemy.dialects.postgresql import JSONB, UUID as PostgresUUID
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -16,8 +16,10 @@ class Annotation(Base):
     id = Column(PostgresUUID(as_uuid=True), primary_key=True, default=uuid4)
     document_id = Column(PostgresUUID(as_uuid=True), ForeignKey('documents.id'), nullable=False)
     user_id = Column(PostgresUUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
-    content = Column(JSON, nullable=False)  # Contenido de la anotación (texto, dibujo, etc)
-    position = Column(JSON, nullable=False)  # Posición en el documento
+    content = Column(JSONB, nullable=False)  # Contenido de la anotación (texto, dibujo, etc)
+    position = Column(JSONB, nullable=False)  # Posición en el documento {x, y, page}
+    type = Column(String(20), nullable=False, default='note')  # note, highlight, comment
+    tags = Column(JSONB, nullable=False, default=list)  # Lista de etiquetas
     metadata = Column(JSON, nullable=True)   # Metadatos adicionales
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -34,6 +36,8 @@ class Annotation(Base):
             'user_id': str(self.user_id),
             'content': self.content,
             'position': self.position,
+            'type': self.type,
+            'tags': self.tags or [],
             'metadata': self.metadata,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
@@ -48,5 +52,20 @@ class Annotation(Base):
             user_id=UUID(data['user_id']),
             content=data['content'],
             position=data['position'],
+            type=data.get('type', 'note'),
+            tags=data.get('tags') or [],
             metadata=data.get('metadata')
         )
+
+# Índices para los filtros y la paginación por cursor de AnnotationQueryPlanner.
+# Cada orden tiene su índice (documento, clave, id) con las mismas expresiones
+# que usa el planificador, para que el recorrido por cursor no ordene en memoria.
+ANNOTATION_PAGE = Annotation.position['page'].astext.cast(Integer)
+ANNOTATION_X = Annotation.position['x'].astext.cast(Float)
+ANNOTATION_Y = Annotation.position['y'].astext.cast(Float)
+
+Index('ix_annotations_document_created', Annotation.document_id, Annotation.created_at, Annotation.id)
+Index('ix_annotations_document_updated', Annotation.document_id, Annotation.updated_at, Annotation.id)
+Index('ix_annotations_document_position', Annotation.document_id, ANNOTATION_PAGE, ANNOTATION_Y, ANNOTATION_X, Annotation.id)
+Index('ix_annotations_document_type_user', Annotation.document_id, Annotation.type, Annotation.user_id)
+Index('ix_annotations_tags', Annotation.tags, postgresql_using='gin')
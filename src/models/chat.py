@@ -0,0 +1,35 @@
+"""Models for archived document chat messages."""
+from datetime import datetime
+from typing import Dict, Any
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, String, Text, UniqueConstraint
+from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
+
+from .base import Base
+
+class ChatMessage(Base):
+    """Chat message moved out of the Redis hot window."""
+
+    __tablename__ = 'document_chat_messages'
+    __table_args__ = (
+        # Identifica el mensaje y sirve la paginación por cursor (seq < before)
+        UniqueConstraint('document_id', 'seq', name='uq_document_chat_messages_seq'),
+    )
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    document_id = Column(PostgresUUID(as_uuid=True), ForeignKey('documents.id'), nullable=False)
+    seq = Column(BigInteger, nullable=False)  # Secuencia por documento asignada en Redis
+    user_id = Column(String, nullable=False)
+    content = Column(Text, nullable=False)
+    message_type = Column(String, nullable=False, default='text')
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to the realtime chat message format."""
+        return {
+            'type': 'chat_message',
+            'seq': self.seq,
+            'user_id': self.user_id,
+            'content': self.content,
+            'message_type': self.message_type,
+            'timestamp': self.created_at.isoformat()
+        }
@@ -1,6 +1,7 @@
 """Metrics collection and reporting."""
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator
 import time
+from contextlib import contextmanager
 from datetime import datetime
 from dataclasses import dataclass, field
 from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, push_to_gateway
@@ -15,6 +16,8 @@ class MetricsManager:
     # Contadores
     http_requests: Counter = field(init=False)
     ws_connections: Counter = field(init=False)
+    ws_messages_dropped: Counter = field(init=False)
+    ws_slow_consumers: Counter = field(init=False)
     document_operations: Counter = field(init=False)
     search_queries: Counter = field(init=False)
     errors: Counter = field(init=False)
@@ -23,6 +26,9 @@ class MetricsManager:
     request_duration: Histogram = field(init=False)
     document_size: Histogram = field(init=False)
     search_latency: Histogram = field(init=False)
+    search_batch_size: Histogram = field(init=False)
+    search_batch_fill: Histogram = field(init=False)
+    operation_latency: Histogram = field(init=False)
     
     # Gauges
     active_users: Gauge = field(init=False)
@@ -46,6 +52,20 @@ class MetricsManager:
             registry=self.registry
         )
         
+        self.ws_messages_dropped = Counter(
+            'ws_messages_dropped_total',
+            'WebSocket messages not delivered to a connection',
+            ['reason'],
+            registry=self.registry
+        )
+        
+        self.ws_slow_consumers = Counter(
+            'ws_slow_consumers_total',
+            'WebSocket connections whose send queue overflowed',
+            ['action'],
+            registry=self.registry
+        )
+        
         self.document_operations = Counter(
             'document_operations_total',
             'Total document operations',
@@ -89,6 +109,27 @@ class MetricsManager:
             registry=self.registry
         )
         
+        self.search_batch_size = Histogram(
+            'search_batch_size',
+            'Number of queries per msearch batch',
+            buckets=(1, 2, 4, 8, 16, 32, 64),
+            registry=self.registry
+        )
+        
+        self.search_batch_fill = Histogram(
+            'search_batch_fill_ratio',
+            'Fill ratio of msearch batches relative to max size',
+            buckets=(0.1, 0.25, 0.5, 0.75, 1.0),
+            registry=self.registry
+        )
+        
+        self.operation_latency = Histogram(
+            'operation_latency_seconds',
+            'Latency of internal operations in seconds',
+            ['component', 'operation'],
+            registry=self.registry
+        )
+        
         # Gauges
         self.active_users = Gauge(
             'active_users',
@@ -120,6 +161,14 @@ class MetricsManager:
         """Track WebSocket connection."""
         self.ws_connections.labels(document_id=document_id).inc()
     
+    def track_ws_dropped(self, reason: str, count: int = 1):
+        """Track WebSocket messages dropped before delivery."""
+        self.ws_messages_dropped.labels(reason=reason).inc(count)
+    
+    def track_ws_slow_consumer(self, action: str):
+        """Track a slow WebSocket consumer being evicted or downgraded."""
+        self.ws_slow_consumers.labels(action=action).inc()
+    
     def track_document_operation(self, operation: str, status: str = 'success'):
         """Track document operation."""
         self.document_operations.labels(
@@ -132,6 +181,11 @@ class MetricsManager:
         self.search_queries.labels(type=query_type).inc()
         self.search_latency.labels(type=query_type).observe(duration)
     
+    def track_search_batch(self, size: int, max_size: int):
+        """Track msearch batch fill."""
+        self.search_batch_size.observe(size)
+        self.search_batch_fill.observe(size / max_size if max_size else 1.0)
+    
     def track_error(self, error_type: str, component: str):
         """Track error."""
         self.errors.labels(type=error_type, component=component).inc()
@@ -160,5 +214,35 @@ class MetricsManager:
             except Exception as e:
                 print(f"Error pushing metrics: {e}")
 
+class ComponentMetrics:
+    """Latency metrics scoped to a component."""
+    
+    def __init__(self, component: str, manager: MetricsManager):
+        """Initialize component metrics."""
+        self.component = component
+        self.manager = manager
+    
+    @contextmanager
+    def measure_latency(self, operation: str) -> Iterator[None]:
+        """Measure the latency of a block of code."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.manager.operation_latency.labels(
+                component=self.component,
+                operation=operation
+            ).observe(time.perf_counter() - start)
+
 # Instancia global
 metrics = MetricsManager()
+
+# Métricas por componente
+document_metrics = ComponentMetrics('documents', metrics)
+search_metrics = ComponentMetrics('search', metrics)
+sync_metrics = ComponentMetrics('sync', metrics)
+preferences_metrics = ComponentMetrics('preferences', metrics)
+meeting_metrics = ComponentMetrics('meetings', metrics)
+thumbnail_metrics = ComponentMetrics('thumbnails', metrics)
+optimization_metrics = ComponentMetrics('optimization', metrics)
+security_metrics = ComponentMetrics('security', metrics)
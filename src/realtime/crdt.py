@@ -0,0 +1,386 @@
+"""Sequence CRDT for collaborative document editing.
+
+RGA-style replicated text: every character is an item identified by a
+Lamport timestamp `(clock, client)` and anchored to the item on its left
+(its origin) when it was inserted. Concurrent inserts after the same origin
+are ordered by descending id, which yields the same text on every replica
+regardless of delivery order. Deletions leave tombstones so that later
+inserts can still reference them.
+
+Updates are exchanged in a compact binary format (unsigned varints, runs of
+consecutive characters from one client, deleted ranges), similar in spirit to
+Yjs updates. A snapshot is an update containing the whole document with the
+content of deleted runs dropped.
+"""
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.config import settings
+
+ItemId = Tuple[int, str]  # (clock, client)
+
+UPDATE_VERSION = 1
+
+class _Item:
+    """Single character of the replicated sequence."""
+
+    __slots__ = ('id', 'origin', 'content', 'deleted')
+
+    def __init__(self, item_id: ItemId, origin: Optional[ItemId], content: str, deleted: bool = False):
+        self.id = item_id
+        self.origin = origin
+        self.content = content
+        self.deleted = deleted
+
+class DocumentCRDT:
+    """Replicated text document."""
+
+    def __init__(self, client_id: str = 'server'):
+        """Initialize an empty document.
+
+        Args:
+            client_id: ID used for local operations
+        """
+        self.client_id = client_id
+        self.clock = 0
+        self.items: List[_Item] = []
+        self.index: Dict[ItemId, _Item] = {}
+        self.state_vector: Dict[str, int] = {}
+        self._pending_items: List[_Item] = []
+        self._pending_deletes: Set[ItemId] = set()
+        self._hint = 0
+
+    @classmethod
+    def from_update(cls, update: bytes, client_id: str = 'server') -> 'DocumentCRDT':
+        """Build a document from a snapshot or update."""
+        document = cls(client_id)
+        document.apply_update(update)
+        return document
+
+    @property
+    def text(self) -> str:
+        """Visible document text."""
+        return ''.join(item.content for item in self.items if not item.deleted)
+
+    @property
+    def pending(self) -> int:
+        """Operations waiting for causally earlier updates."""
+        return len(self._pending_items) + len(self._pending_deletes)
+
+    # Operaciones locales
+
+    def insert(self, position: int, text: str) -> bytes:
+        """Insert text at a visible position.
+
+        Returns:
+            Update to send to other replicas
+        """
+        origin = self._visible_item(position - 1).id if position > 0 else None
+        created = []
+        for char in text:
+            self.clock += 1
+            item = _Item((self.clock, self.client_id), origin, char)
+            self._integrate(item)
+            created.append(item)
+            origin = item.id
+        return encode_update(created, [])
+
+    def delete(self, position: int, length: int) -> bytes:
+        """Delete `length` visible characters starting at `position`.
+
+        Returns:
+            Update to send to other replicas
+        """
+        targets = []
+        visible = 0
+        for item in self.items:
+            if item.deleted:
+                continue
+            if visible >= position + length:
+                break
+            if visible >= position:
+                targets.append(item)
+            visible += 1
+        for item in targets:
+            item.deleted = True
+        return encode_update([], [item.id for item in targets])
+
+    # Operaciones remotas
+
+    def apply_update(self, update: bytes) -> Optional[bytes]:
+        """Merge an update from another replica.
+
+        Applying the same update twice, or updates in any order, converges
+        to the same state. Items whose origin is not known yet are kept
+        pending until it arrives. State vectors assume each client's updates
+        arrive in order, as they do over a single WebSocket.
+
+        Args:
+            update: Binary update
+
+        Returns:
+            Update containing only the effective changes, or None if the
+            update added nothing new
+        """
+        items, deletes = decode_update(update)
+        self._pending_items.extend(items)
+        self._pending_deletes.update(deletes)
+
+        # Un origen siempre tiene un reloj menor: ordenar por id integra
+        # los orígenes primero y conserva el orden de cada cliente
+        integrated: List[_Item] = []
+        remaining: List[_Item] = []
+        blocked: Set[str] = set()
+        for item in sorted(self._pending_items, key=lambda i: i.id):
+            existing = self.index.get(item.id)
+            if existing is not None:
+                if item.deleted and not existing.deleted:
+                    self._pending_deletes.add(item.id)
+                continue
+            if item.id[1] in blocked or (item.origin is not None and item.origin not in self.index):
+                blocked.add(item.id[1])
+                remaining.append(item)
+                continue
+            self._integrate(item)
+            integrated.append(item)
+        self._pending_items = remaining
+
+        deleted = []
+        for item_id in list(self._pending_deletes):
+            item = self.index.get(item_id)
+            if item is None:
+                continue
+            self._pending_deletes.discard(item_id)
+            if not item.deleted:
+                item.deleted = True
+                deleted.append(item_id)
+
+        if not integrated and not deleted:
+            return None
+        integrated_ids = {item.id for item in integrated}
+        return encode_update(integrated, [i for i in deleted if i not in integrated_ids])
+
+    def encode_state_as_update(self, state_vector: Optional[Dict[str, int]] = None) -> bytes:
+        """Encode what a replica with `state_vector` is missing.
+
+        Without a state vector the result is a full snapshot: deleted runs
+        keep only their length.
+
+        Args:
+            state_vector: Highest clock seen per client by the other replica
+        """
+        state_vector = state_vector or {}
+        items = [
+            item for item in self.items
+            if item.id[0] > state_vector.get(item.id[1], 0)
+        ]
+        # Borrados de items que el otro ya tiene
+        deletes = [
+            item.id for item in self.items
+            if item.deleted and item.id[0] <= state_vector.get(item.id[1], 0)
+        ]
+        return encode_update(items, deletes)
+
+    def snapshot(self) -> bytes:
+        """Compacted full state for late joiners."""
+        return self.encode_state_as_update()
+
+    def _visible_item(self, position: int) -> _Item:
+        """Item at a visible position."""
+        visible = 0
+        for item in self.items:
+            if item.deleted:
+                continue
+            if visible == position:
+                return item
+            visible += 1
+        raise IndexError(f"Position {position} out of range")
+
+    def _integrate(self, item: _Item):
+        """Place an item in the sequence (RGA rule)."""
+        if item.origin is None:
+            position = 0
+        else:
+            origin = self.index[item.origin]
+            if self._hint < len(self.items) and self.items[self._hint] is origin:
+                position = self._hint + 1
+            else:
+                position = self.items.index(origin) + 1
+        # Saltar inserciones concurrentes más recientes tras el mismo origen
+        while position < len(self.items) and self.items[position].id > item.id:
+            position += 1
+
+        self.items.insert(position, item)
+        self.index[item.id] = item
+        self._hint = position
+        clock, client = item.id
+        self.clock = max(self.clock, clock)
+        self.state_vector[client] = max(self.state_vector.get(client, 0), clock)
+
+# Codificación binaria
+
+def encode_update(items: List[_Item], deletes: List[ItemId]) -> bytes:
+    """Encode items and deleted ids as a binary update."""
+    clients: Dict[str, int] = {}
+
+    def client_index(client: str) -> int:
+        return clients.setdefault(client, len(clients))
+
+    # Agrupar caracteres consecutivos del mismo cliente en runs
+    runs: List[List[_Item]] = []
+    for item in sorted(items, key=lambda i: (i.id[1], i.id[0])):
+        if runs:
+            last = runs[-1][-1]
+            if (
+                item.id == (last.id[0] + 1, last.id[1])
+                and item.origin == last.id
+                and item.deleted == last.deleted
+            ):
+                runs[-1].append(item)
+                continue
+        runs.append([item])
+
+    body = bytearray()
+    _write_uint(body, len(runs))
+    for run in runs:
+        first = run[0]
+        _write_uint(body, client_index(first.id[1]))
+        _write_uint(body, first.id[0])
+        if first.origin is None:
+            _write_uint(body, 0)
+        else:
+            _write_uint(body, 1)
+            _write_uint(body, client_index(first.origin[1]))
+            _write_uint(body, first.origin[0])
+        _write_uint(body, len(run))
+        _write_uint(body, 1 if first.deleted else 0)
+        if not first.deleted:
+            _write_bytes(body, ''.join(item.content for item in run).encode())
+
+    ranges = _delete_ranges(deletes)
+    _write_uint(body, len(ranges))
+    for client, clock, length in ranges:
+        _write_uint(body, client_index(client))
+        _write_uint(body, clock)
+        _write_uint(body, length)
+
+    header = bytearray()
+    _write_uint(header, UPDATE_VERSION)
+    _write_uint(header, len(clients))
+    for client in clients:
+        _write_bytes(header, client.encode())
+    return bytes(header + body)
+
+def decode_update(update: bytes, max_items: Optional[int] = None) -> Tuple[List[_Item], List[ItemId]]:
+    """Decode a binary update into items and deleted ids.
+
+    Lengths come from the peer, so they are checked before anything is
+    allocated: a content run cannot be longer than the bytes left, and
+    tombstone runs plus delete ranges together cannot exceed `max_items`.
+
+    Args:
+        update: Encoded update
+        max_items: Most items and deleted ids to decode
+                  (default CRDT_MAX_DECODED_ITEMS)
+
+    Raises:
+        ValueError: If the update is malformed or too large
+    """
+    budget = max_items if max_items is not None else settings.CRDT_MAX_DECODED_ITEMS
+
+    def reserve(length: int):
+        nonlocal budget
+        if length > budget:
+            raise ValueError("Update exceeds the decoded size limit")
+        budget -= length
+
+    try:
+        version, pos = _read_uint(update, 0)
+        if version != UPDATE_VERSION:
+            raise ValueError(f"Unsupported update version {version}")
+
+        count, pos = _read_uint(update, pos)
+        clients = []
+        for _ in range(count):
+            raw, pos = _read_bytes(update, pos)
+            clients.append(raw.decode())
+
+        items: List[_Item] = []
+        count, pos = _read_uint(update, pos)
+        for _ in range(count):
+            client, pos = _read_uint(update, pos)
+            clock, pos = _read_uint(update, pos)
+            has_origin, pos = _read_uint(update, pos)
+            origin = None
+            if has_origin:
+                origin_client, pos = _read_uint(update, pos)
+                origin_clock, pos = _read_uint(update, pos)
+                origin = (origin_clock, clients[origin_client])
+            length, pos = _read_uint(update, pos)
+            deleted, pos = _read_uint(update, pos)
+            if deleted:
+                reserve(length)
+                content = [''] * length
+            else:
+                # Cada carácter ocupa al menos un byte
+                if length > len(update) - pos:
+                    raise ValueError("Run length exceeds the update size")
+                reserve(length)
+                raw, pos = _read_bytes(update, pos)
+                content = list(raw.decode())
+                if len(content) != length:
+                    raise ValueError("Run length mismatch")
+            for offset, char in enumerate(content):
+                item_id = (clock + offset, clients[client])
+                items.append(_Item(item_id, origin, char, bool(deleted)))
+                origin = item_id
+
+        deletes: List[ItemId] = []
+        count, pos = _read_uint(update, pos)
+        for _ in range(count):
+            client, pos = _read_uint(update, pos)
+            clock, pos = _read_uint(update, pos)
+            length, pos = _read_uint(update, pos)
+            reserve(length)
+            deletes.extend((clock + offset, clients[client]) for offset in range(length))
+    except (IndexError, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed update: {str(e)}")
+
+    return items, deletes
+
+def _delete_ranges(deletes: List[ItemId]) -> List[Tuple[str, int, int]]:
+    """Group deleted ids into (client, clock, length) ranges."""
+    ranges: List[Tuple[str, int, int]] = []
+    for clock, client in sorted(deletes, key=lambda i: (i[1], i[0])):
+        if ranges:
+            last_client, last_clock, length = ranges[-1]
+            if last_client == client and last_clock + length == clock:
+                ranges[-1] = (client, last_clock, length + 1)
+                continue
+        ranges.append((client, clock, 1))
+    return ranges
+
+def _write_uint(buffer: bytearray, value: int):
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def _read_uint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def _write_bytes(buffer: bytearray, value: bytes):
+    _write_uint(buffer, len(value))
+    buffer.extend(value)
+
+def _read_bytes(data: bytes, pos: int) -> Tuple[bytes, int]:
+    length, pos = _read_uint(data, pos)
+    if pos + length > len(data):
+        raise IndexError("Truncated update")
+    return data[pos:pos + length], pos + length
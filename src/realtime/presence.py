@@ -0,0 +1,108 @@
+"""Coalescing of cursor and selection updates.
+
+Presence updates are high-frequency and only the latest one per user
+matters, so instead of broadcasting every mouse move they are kept per
+room (latest wins) and flushed as a single batched frame at a fixed tick.
+A token bucket per connection caps how often its updates go out: an update
+over the limit still replaces the pending value and is sent on a later tick.
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+import asyncio
+from src.monitoring.logger import Logger
+from src.monitoring.metrics import metrics
+
+logger = Logger(__name__)
+
+class PresenceCoalescer:
+    """Per-room latest-wins buffer of presence updates."""
+
+    def __init__(
+        self,
+        flush: Callable[[str, List[Dict[str, Any]]], Awaitable[None]],
+        tick_hz: float,
+        rate_limit: float
+    ):
+        """Create the coalescer.
+
+        Args:
+            flush: Coroutine called with (document_id, updates) once per tick
+            tick_hz: Flushes per second for each active room
+            rate_limit: Updates per second sent for each connection
+        """
+        self.flush = flush
+        self.interval = 1.0 / tick_hz
+        self.rate_limit = rate_limit
+        self.pending: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._buckets: Dict[Tuple[str, str], Tuple[float, float]] = {}
+
+    def push(self, document_id: str, user_id: str, field: str, value: Any):
+        """Record a presence update for the next tick.
+
+        Args:
+            document_id: Room of the user
+            user_id: Author of the update
+            field: Presence field ('position' or 'selection')
+            value: New value, replacing any unsent one
+        """
+        room = self.pending.setdefault(document_id, {})
+        update = room.setdefault(user_id, {'user_id': user_id})
+        if field in update:
+            # Reemplaza una actualización que nunca llegó a enviarse
+            metrics.track_ws_dropped('coalesced')
+        update[field] = value
+
+        task = self.tasks.get(document_id)
+        if task is None or task.done():
+            self.tasks[document_id] = asyncio.create_task(self._run(document_id))
+
+    def remove_user(self, document_id: str, user_id: str):
+        """Forget pending updates and rate state of a user leaving the room."""
+        self.pending.get(document_id, {}).pop(user_id, None)
+        self._buckets.pop((document_id, user_id), None)
+
+    async def stop(self):
+        """Cancel all tick tasks, discarding pending updates."""
+        tasks = list(self.tasks.values())
+        self.tasks.clear()
+        self.pending.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, document_id: str):
+        """Flush the room every tick until a tick has nothing to send."""
+        while True:
+            await asyncio.sleep(self.interval)
+            updates = self.pending.pop(document_id, None)
+            if not updates:
+                # Sala inactiva: la tarea termina y se reinicia con el próximo update
+                if self.tasks.get(document_id) is asyncio.current_task():
+                    del self.tasks[document_id]
+                return
+            # Usuarios sobre el límite: su último valor espera al próximo tick
+            ready = []
+            for user_id, update in updates.items():
+                if self._take_token(document_id, user_id):
+                    ready.append(update)
+                else:
+                    metrics.track_ws_dropped('rate_limited')
+                    self.pending.setdefault(document_id, {})[user_id] = update
+            if not ready:
+                continue
+            try:
+                await self.flush(document_id, ready)
+            except Exception as e:
+                logger.error(f"Error flushing presence for document {document_id}: {str(e)}")
+
+    def _take_token(self, document_id: str, user_id: str) -> bool:
+        """Token bucket allowing `rate_limit` updates per second."""
+        now = asyncio.get_running_loop().time()
+        key = (document_id, user_id)
+        tokens, last = self._buckets.get(key, (self.rate_limit, now))
+        tokens = min(self.rate_limit, tokens + (now - last) * self.rate_limit)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            return False
+        self._buckets[key] = (tokens - 1, now)
+        return True
@@ -0,0 +1,144 @@
+"""Wire codecs for the collaboration WebSocket.
+
+Clients negotiate the format with the `Sec-WebSocket-Protocol` header:
+
+- `firstcourt.msgpack.v1`: binary msgpack frames. Message types and field
+  names are replaced by small integers and CRDT updates travel as raw
+  bytes instead of base64.
+- Anything else (or no header): JSON text frames, as before.
+
+Internally messages are always dicts with string keys and base64 updates;
+translation happens only at the socket boundary. Compression of large
+frames is left to the server's permessage-deflate extension (enabled by
+default in uvicorn, `--ws-per-message-deflate`).
+"""
+from typing import Any, Dict, Optional
+import base64
+import msgpack
+from fastapi import WebSocket
+
+SUBPROTOCOL_MSGPACK = 'firstcourt.msgpack.v1'
+
+# Tipos de mensaje (no reutilizar números: los clientes antiguos dependen de ellos)
+MESSAGE_TYPES: Dict[str, int] = {
+    'user_joined': 1,
+    'user_left': 2,
+    'cursor_position': 3,
+    'selection': 4,
+    'presence_batch': 5,
+    'document_update': 6,
+    'document_state': 7,
+    'sync_request': 8,
+    'chat_message': 9,
+    'heartbeat': 10
+}
+
+# Campos; la clave 0 es siempre el tipo de mensaje
+FIELDS: Dict[str, int] = {
+    'type': 0,
+    'user_id': 1,
+    'participants': 2,
+    'position': 3,
+    'selection': 4,
+    'updates': 5,
+    'update': 6,
+    'state_vector': 7,
+    'content': 8,
+    'message_type': 9,
+    'timestamp': 10
+}
+
+# Campos con datos binarios que en JSON viajan en base64
+BINARY_FIELDS = {'update'}
+
+# Campos cuyo valor es un objeto del mensaje (se traducen sus claves)
+NESTED_FIELDS = {'updates'}
+
+_TYPE_NAMES = {number: name for name, number in MESSAGE_TYPES.items()}
+_FIELD_NAMES = {number: name for name, number in FIELDS.items()}
+
+class JSONCodec:
+    """JSON text frames (default and fallback for old clients)."""
+
+    name = 'json'
+    subprotocol: Optional[str] = None
+
+    def encode(self, message: Dict[str, Any]) -> Any:
+        """Prepare a message for sending (JSON serializes on write)."""
+        return message
+
+    async def write(self, websocket: WebSocket, frame: Any):
+        """Write an encoded frame."""
+        await websocket.send_json(frame)
+
+    async def receive(self, websocket: WebSocket) -> Dict[str, Any]:
+        """Read and decode the next message."""
+        return await websocket.receive_json()
+
+class MsgpackCodec:
+    """Binary msgpack frames with integer types and field ids."""
+
+    name = 'msgpack'
+    subprotocol = SUBPROTOCOL_MSGPACK
+
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        """Encode a message as a compact msgpack frame."""
+        return msgpack.packb(_compact(message), use_bin_type=True)
+
+    def decode(self, frame: bytes) -> Dict[str, Any]:
+        """Decode a msgpack frame into the internal message format.
+
+        Raises:
+            ValueError: If the frame is not a valid message
+        """
+        try:
+            data = msgpack.unpackb(frame, raw=False, strict_map_key=False)
+        except Exception as e:
+            raise ValueError(f"Invalid msgpack frame: {str(e)}")
+        if not isinstance(data, dict):
+            raise ValueError("Invalid msgpack frame: expected a map")
+        return _expand(data)
+
+    async def write(self, websocket: WebSocket, frame: bytes):
+        """Write an encoded frame."""
+        await websocket.send_bytes(frame)
+
+    async def receive(self, websocket: WebSocket) -> Dict[str, Any]:
+        """Read and decode the next message."""
+        return self.decode(await websocket.receive_bytes())
+
+JSON = JSONCodec()
+MSGPACK = MsgpackCodec()
+
+def negotiate_codec(websocket: WebSocket):
+    """Pick the codec for a connection from the subprotocols it offers."""
+    scope = getattr(websocket, 'scope', None)
+    offered = scope.get('subprotocols', []) if isinstance(scope, dict) else []
+    if SUBPROTOCOL_MSGPACK in offered:
+        return MSGPACK
+    return JSON
+
+def _compact(message: Dict[str, Any]) -> Dict[Any, Any]:
+    compact: Dict[Any, Any] = {}
+    for key, value in message.items():
+        if key == 'type':
+            value = MESSAGE_TYPES.get(value, value)
+        elif key in BINARY_FIELDS and isinstance(value, str):
+            value = base64.b64decode(value)
+        elif key in NESTED_FIELDS and isinstance(value, list):
+            value = [_compact(item) if isinstance(item, dict) else item for item in value]
+        compact[FIELDS.get(key, key)] = value
+    return compact
+
+def _expand(compact: Dict[Any, Any]) -> Dict[str, Any]:
+    message: Dict[str, Any] = {}
+    for key, value in compact.items():
+        key = _FIELD_NAMES.get(key, key) if isinstance(key, int) else key
+        if key == 'type':
+            value = _TYPE_NAMES.get(value, value)
+        elif key in BINARY_FIELDS and isinstance(value, bytes):
+            value = base64.b64encode(value).decode()
+        elif key in NESTED_FIELDS and isinstance(value, list):
+            value = [_expand(item) if isinstance(item, dict) else item for item in value]
+        message[str(key)] = value
+    return message
@@ -0,0 +1,125 @@
+"""Per-connection outgoing queues for WebSocket broadcasts.
+
+Each socket gets a bounded queue drained by its own writer task, so a slow
+client only delays itself. Enqueuing never blocks; when the queue is full
+the overflow callback decides what to do with the connection.
+"""
+from typing import Any, Callable, Iterable, Optional
+import asyncio
+from fastapi import WebSocket
+from src.monitoring.logger import Logger
+from src.realtime.protocol import JSON
+
+logger = Logger(__name__)
+
+class ConnectionSender:
+    """Bounded send queue with a dedicated writer task."""
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int,
+        on_overflow: Optional[Callable[['ConnectionSender'], Any]] = None,
+        on_error: Optional[Callable[['ConnectionSender'], Any]] = None,
+        codec=JSON
+    ):
+        """Start the writer task.
+
+        Args:
+            websocket: Connection to write to
+            max_queue: Maximum pending messages
+            on_overflow: Called (once per overflow) when a message does not fit
+            on_error: Called when sending fails (e.g. client disconnected)
+            codec: Wire format negotiated by the client
+        """
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.on_overflow = on_overflow
+        self.on_error = on_error
+        self.codec = codec
+        self.overflowed = False
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self._writer = asyncio.create_task(self._write())
+
+    def send(self, message: Any) -> bool:
+        """Encode and enqueue a message without waiting.
+
+        Returns:
+            False if the message was dropped
+        """
+        return self.send_frame(self.codec.encode(message))
+
+    def send_frame(self, frame: Any) -> bool:
+        """Enqueue a frame already encoded with this sender's codec.
+
+        Lets a broadcast encode once per codec instead of once per socket.
+
+        Returns:
+            False if the frame was dropped
+        """
+        if self.closed:
+            return False
+        if self.overflowed:
+            self.dropped += 1
+            return False
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.dropped += 1
+            if self.on_overflow:
+                self.on_overflow(self)
+            return False
+
+    def reset(self, messages: Iterable[Any] = ()) -> int:
+        """Discard pending messages and enqueue replacements.
+
+        Used to downgrade a slow consumer to a single snapshot.
+
+        Returns:
+            Number of discarded messages
+        """
+        discarded = 0
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+            discarded += 1
+        self.overflowed = False
+        for message in messages:
+            self.queue.put_nowait(self.codec.encode(message))
+        self.dropped += discarded
+        return discarded
+
+    async def close(self):
+        """Stop the writer task, discarding pending messages."""
+        if self.closed:
+            return
+        self.closed = True
+        self._writer.cancel()
+        try:
+            await self._writer
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    async def drain(self):
+        """Wait until all queued messages have been written."""
+        await self.queue.join()
+
+    async def _write(self):
+        while True:
+            frame = await self.queue.get()
+            try:
+                await self.codec.write(self.websocket, frame)
+                self.sent += 1
+            except Exception as e:
+                logger.error(f"Error sending WebSocket message: {str(e)}")
+                self.closed = True
+                self.reset()
+                if self.on_error:
+                    self.on_error(self)
+                return
+            finally:
+                self.queue.task_done()
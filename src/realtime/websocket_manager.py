@@ -1,41 +1,106 @@
 """WebSocket manager for real-time collaboration."""
-from typing import Dict, Set, Any, Optional
+from typing import Dict, List, Set, Any, Optional
+import asyncio
+import base64
 import json
-from fastapi import WebSocket, WebSocketDisconnect
+import time
+import uuid
+from datetime import datetime
+from fastapi import WebSocket
 from redis import Redis
+from redis import asyncio as aioredis
 from src.config import settings
+from src.database.redis import RedisKeys, RedisPubSub
+from src.monitoring.logger import Logger
+from src.monitoring.metrics import metrics
+from src.realtime.crdt import DocumentCRDT
+from src.realtime.presence import PresenceCoalescer
+from src.realtime.protocol import JSON, negotiate_codec
+from src.services.chat_history import ChatHistoryService
+from src.realtime.send_queue import ConnectionSender
+
+logger = Logger(__name__)
 
 class ConnectionManager:
     """Manage WebSocket connections and real-time collaboration."""
     
-    def __init__(self, redis_client: Redis):
-        """Initialize the connection manager."""
+    def __init__(self, redis_client: Redis, pubsub_client: Optional[aioredis.Redis] = None,
+                 chat_history: Optional[ChatHistoryService] = None):
+        """Initialize the connection manager.
+        
+        Args:
+            redis_client: Redis client for state and publishing
+            pubsub_client: Async Redis client used to receive events from
+                          other workers; defaults to one on REDIS_URL
+            chat_history: Chat storage; defaults to Redis only
+        """
         self.redis = redis_client
+        self.chat = chat_history or ChatHistoryService(redis_client)
         self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
         self.document_participants: Dict[str, Set[str]] = {}
+        self.documents: Dict[str, DocumentCRDT] = {}
+        
+        # Cola de salida y tarea de escritura por socket
+        self.senders: Dict[str, Dict[str, ConnectionSender]] = {}
+        
+        # Cursores y selecciones: se envía el último de cada usuario por tick
+        self.presence = PresenceCoalescer(
+            self._flush_presence,
+            settings.WS_PRESENCE_TICK_HZ,
+            settings.WS_PRESENCE_RATE_LIMIT
+        )
+        
+        # Fan-out entre workers: cada sala se suscribe a su canal mientras
+        # tenga miembros locales
+        self.worker_id = uuid.uuid4().hex
+        self._pubsub_client = pubsub_client
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        
+        # Heartbeat de presencia de las conexiones de este worker
+        self._heartbeat: Optional[asyncio.Task] = None
+        
+    async def stop(self):
+        """Stop listening for events from other workers."""
+        await self.presence.stop()
+        if self._heartbeat:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        if self._listener:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub:
+            await self._pubsub.aclose()
+            self._pubsub = None
         
     async def connect(self, websocket: WebSocket, document_id: str, user_id: str):
-        """Connect a user to a document's collaboration session."""
-        await websocket.accept()
+        """Connect a user to a document's collaboration session.
+        
+        Returns:
+            Codec negotiated with the client, used to read its messages
+        """
+        codec = negotiate_codec(websocket)
+        await websocket.accept(subprotocol=codec.subprotocol)
         
         # Inicializar estructuras si no existen
         if document_id not in self.active_connections:
             self.active_connections[document_id] = {}
             self.document_participants[document_id] = set()
+            await self._subscribe(document_id)
             
-        # Agregar conexión
+        # Agregar conexión; si el usuario se reconecta, la cola del socket
+        # anterior sigue ligada a ese socket y se descarta
         self.active_connections[document_id][user_id] = websocket
         self.document_participants[document_id].add(user_id)
+        previous = self.senders.get(document_id, {}).pop(user_id, None)
+        if previous is not None:
+            await previous.close()
+        self._sender(document_id, user_id, codec)
         
         # Actualizar presencia en Redis
-        self.redis.hset(
-            f"document:{document_id}:presence",
-            user_id,
-            json.dumps({
-                "status": "active",
-                "last_activity": "now"
-            })
-        )
+        self.heartbeat(document_id, user_id)
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
         
         # Notificar a otros usuarios
         await self.broadcast_to_document(
@@ -47,10 +112,33 @@ class ConnectionManager:
             },
             exclude_user=None  # Enviar a todos, incluido el nuevo usuario
         )
+        
+        # Estado actual del documento en un solo snapshot
+        await self.send_document_state(document_id, user_id)
+        return codec
     
-    async def disconnect(self, document_id: str, user_id: str):
-        """Disconnect a user from a document's collaboration session."""
+    async def disconnect(self, document_id: str, user_id: str,
+                         websocket: Optional[WebSocket] = None):
+        """Disconnect a user from a document's collaboration session.
+        
+        Args:
+            document_id: Document of the session
+            user_id: User to disconnect
+            websocket: Socket that ended; if the user has since reconnected
+                      on another socket, the newer connection is kept
+        """
+        current = self.active_connections.get(document_id, {}).get(user_id)
+        if websocket is not None and current is not None and current is not websocket:
+            return
+        
         # Eliminar conexión
+        self.presence.remove_user(document_id, user_id)
+        sender = self.senders.get(document_id, {}).pop(user_id, None)
+        if sender:
+            await sender.close()
+        if not self.senders.get(document_id, True):
+            del self.senders[document_id]
+        
         if document_id in self.active_connections:
             self.active_connections[document_id].pop(user_id, None)
             self.document_participants[document_id].discard(user_id)
@@ -59,9 +147,16 @@ class ConnectionManager:
             if not self.active_connections[document_id]:
                 del self.active_connections[document_id]
                 del self.document_participants[document_id]
+                if document_id in self.documents:
+                    self._compact_document(document_id)
+                    del self.documents[document_id]
+                await self._unsubscribe(document_id)
         
         # Actualizar presencia en Redis
-        self.redis.hdel(f"document:{document_id}:presence", user_id)
+        try:
+            self.redis.zrem(RedisKeys.document_presence(document_id), user_id)
+        except Exception as e:
+            logger.error(f"Error removing presence of {user_id}: {str(e)}")
         
         # Notificar a otros usuarios
         await self.broadcast_to_document(
@@ -75,36 +170,184 @@ class ConnectionManager:
     
     async def broadcast_to_document(self, document_id: str, message: Dict[str, Any],
                                   exclude_user: Optional[str] = None):
-        """Broadcast a message to all users in a document."""
+        """Broadcast a message to all users in a document, on every worker."""
+        await self._deliver_local(document_id, message, exclude_user)
+        
+        try:
+            self.redis.publish(
+                RedisPubSub.document_channel(document_id),
+                json.dumps({
+                    "origin": self.worker_id,
+                    "exclude_user": exclude_user,
+                    "message": message
+                })
+            )
+        except Exception as e:
+            logger.error(f"Error publishing to document {document_id}: {str(e)}")
+    
+    async def _deliver_local(self, document_id: str, message: Dict[str, Any],
+                           exclude_user: Optional[str] = None):
+        """Queue a message for the sockets connected to this worker.
+        
+        Never waits on a socket: each one is written by its own task. The
+        message is encoded once per codec in use.
+        """
         if document_id in self.active_connections:
-            for user_id, connection in self.active_connections[document_id].items():
+            frames: Dict[str, Any] = {}
+            for user_id in list(self.active_connections[document_id]):
                 if exclude_user and user_id == exclude_user:
                     continue
-                    
-                try:
-                    await connection.send_json(message)
-                except WebSocketDisconnect:
-                    await self.disconnect(document_id, user_id)
+                sender = self._sender(document_id, user_id)
+                if sender:
+                    codec = sender.codec
+                    if codec.name not in frames:
+                        frames[codec.name] = codec.encode(message)
+                    sender.send_frame(frames[codec.name])
     
     async def send_cursor_position(self, document_id: str, user_id: str,
                                  position: Dict[str, Any]):
-        """Broadcast cursor position to other users."""
+        """Queue a cursor position for the next presence frame."""
+        self.presence.push(document_id, user_id, "position", position)
+    
+    async def send_selection(self, document_id: str, user_id: str,
+                           selection: Dict[str, Any]):
+        """Queue a text selection for the next presence frame."""
+        self.presence.push(document_id, user_id, "selection", selection)
+    
+    async def _flush_presence(self, document_id: str, updates: List[Dict[str, Any]]):
+        """Broadcast one tick of coalesced presence updates as a single frame."""
         message = {
-            "type": "cursor_position",
-            "user_id": user_id,
-            "position": position
+            "type": "presence_batch",
+            "updates": updates
         }
-        await self.broadcast_to_document(document_id, message, exclude_user=user_id)
+        # Con un solo autor no tiene sentido devolverle su propio cursor
+        exclude_user = updates[0]["user_id"] if len(updates) == 1 else None
+        await self.broadcast_to_document(document_id, message, exclude_user=exclude_user)
     
     async def send_document_update(self, document_id: str, user_id: str,
-                                 update: Dict[str, Any]):
-        """Broadcast document updates to all users."""
+                                 update: str):
+        """Merge a CRDT update and broadcast its effective changes.
+        
+        Args:
+            document_id: Document being edited
+            user_id: Author of the update
+            update: Base64-encoded binary CRDT update
+        """
+        document = self._get_document(document_id)
+        try:
+            effective = document.apply_update(base64.b64decode(update))
+        except ValueError as e:
+            logger.error(f"Invalid document update from {user_id}: {str(e)}")
+            return
+        
+        # Duplicado o ya conocido: nada que propagar
+        if effective is None:
+            return
+        
+        pending = self.redis.rpush(f"document:{document_id}:crdt:updates", effective)
+        if pending >= settings.CRDT_SNAPSHOT_INTERVAL:
+            self._compact_document(document_id)
+        
         message = {
             "type": "document_update",
             "user_id": user_id,
-            "update": update
+            "update": base64.b64encode(effective).decode()
         }
-        await self.broadcast_to_document(document_id, message)
+        await self.broadcast_to_document(document_id, message, exclude_user=user_id)
+    
+    async def send_document_state(self, document_id: str, user_id: str,
+                                state_vector: Optional[Dict[str, int]] = None):
+        """Send a user the document state they are missing.
+        
+        Without a state vector the user receives the compacted snapshot.
+        """
+        sender = self._sender(document_id, user_id)
+        if sender is None:
+            return
+        
+        sender.send(self._document_state_message(document_id, state_vector))
+    
+    def _document_state_message(self, document_id: str,
+                              state_vector: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """Build the message carrying a document snapshot or delta."""
+        document = self._get_document(document_id)
+        return {
+            "type": "document_state",
+            "update": base64.b64encode(document.encode_state_as_update(state_vector)).decode(),
+            "state_vector": document.state_vector
+        }
+    
+    def _sender(self, document_id: str, user_id: str,
+               codec=JSON) -> Optional[ConnectionSender]:
+        """Get (or start) the send queue of a connected socket."""
+        sender = self.senders.get(document_id, {}).get(user_id)
+        if sender is None:
+            websocket = self.active_connections.get(document_id, {}).get(user_id)
+            if websocket is None:
+                return None
+            sender = ConnectionSender(
+                websocket,
+                settings.WS_MESSAGE_QUEUE_SIZE,
+                on_overflow=lambda s: self._handle_slow_consumer(document_id, user_id, s),
+                on_error=lambda s: asyncio.create_task(self.disconnect(document_id, user_id, s.websocket)),
+                codec=codec
+            )
+            self.senders.setdefault(document_id, {})[user_id] = sender
+        return sender
+    
+    def _handle_slow_consumer(self, document_id: str, user_id: str,
+                            sender: ConnectionSender):
+        """Downgrade or evict a socket whose send queue overflowed."""
+        if settings.WS_SLOW_CONSUMER_POLICY == 'snapshot':
+            # Reemplazar lo pendiente por un único snapshot del documento
+            try:
+                discarded = sender.reset([self._document_state_message(document_id)])
+                metrics.track_ws_dropped('overflow', discarded)
+                metrics.track_ws_slow_consumer('snapshot')
+                return
+            except Exception as e:
+                logger.error(f"Error downgrading {user_id} to snapshot: {str(e)}")
+        
+        metrics.track_ws_slow_consumer('disconnect')
+        asyncio.create_task(self._evict(document_id, user_id))
+    
+    async def _evict(self, document_id: str, user_id: str):
+        """Close a slow socket and remove it from the room."""
+        websocket = self.active_connections.get(document_id, {}).get(user_id)
+        await self.disconnect(document_id, user_id, websocket)
+        if websocket is not None:
+            try:
+                await websocket.close(code=1013)  # Try again later
+            except Exception:
+                pass
+    
+    def _get_document(self, document_id: str) -> DocumentCRDT:
+        """Get the merged document, loading snapshot and pending updates."""
+        document = self.documents.get(document_id)
+        if document is None:
+            document = DocumentCRDT()
+            snapshot = self.redis.get(f"document:{document_id}:crdt:snapshot")
+            if snapshot:
+                document.apply_update(snapshot)
+            for update in self.redis.lrange(f"document:{document_id}:crdt:updates", 0, -1):
+                document.apply_update(update)
+            self.documents[document_id] = document
+        return document
+    
+    def _compact_document(self, document_id: str):
+        """Fold stored updates into a new snapshot."""
+        document = self._get_document(document_id)
+        updates_key = f"document:{document_id}:crdt:updates"
+        
+        # Incluir updates que otro proceso haya guardado antes de recortar
+        updates = self.redis.lrange(updates_key, 0, -1)
+        for update in updates:
+            document.apply_update(update)
+        
+        pipeline = self.redis.pipeline()
+        pipeline.set(f"document:{document_id}:crdt:snapshot", document.snapshot())
+        pipeline.ltrim(updates_key, len(updates), -1)
+        pipeline.execute()
     
     async def send_chat_message(self, document_id: str, user_id: str,
                               content: str, message_type: str = "text"):
@@ -114,25 +357,125 @@ class ConnectionManager:
             "user_id": user_id,
             "content": content,
             "message_type": message_type,
-            "timestamp": "now"
+            "timestamp": datetime.utcnow().isoformat()
         }
         
-        # Guardar mensaje en Redis
-        self.redis.rpush(
-            f"document:{document_id}:chat",
-            json.dumps(message)
-        )
+        # Guardar mensaje en la ventana caliente; lo antiguo pasa a Postgres
+        message = self.chat.append(document_id, message)
+        if self.chat.needs_archive(document_id):
+            asyncio.create_task(self.chat.archive(document_id))
         
         await self.broadcast_to_document(document_id, message)
     
+    async def _subscribe(self, document_id: str):
+        """Subscribe to a document channel and make sure the listener runs."""
+        try:
+            if self._pubsub is None:
+                client = self._pubsub_client or aioredis.Redis.from_url(settings.REDIS_URL)
+                self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+            await self._pubsub.subscribe(RedisPubSub.document_channel(document_id))
+            if self._listener is None or self._listener.done():
+                self._listener = asyncio.create_task(self._listen())
+        except Exception as e:
+            logger.error(f"Error subscribing to document {document_id}: {str(e)}")
+    
+    async def _unsubscribe(self, document_id: str):
+        """Unsubscribe from a document channel with no local members."""
+        if self._pubsub is None:
+            return
+        try:
+            await self._pubsub.unsubscribe(RedisPubSub.document_channel(document_id))
+        except Exception as e:
+            logger.error(f"Error unsubscribing from document {document_id}: {str(e)}")
+    
+    async def _listen(self):
+        """Deliver events published by other workers to local sockets."""
+        while self._pubsub is not None and self._pubsub.subscribed:
+            try:
+                event = await self._pubsub.get_message(timeout=1.0)
+                if event and event.get('type') == 'message':
+                    await self._handle_remote_event(event['channel'], event['data'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error receiving document event: {str(e)}")
+                await asyncio.sleep(1)
+    
+    async def _handle_remote_event(self, channel: Any, data: Any):
+        """Handle an event published on a document channel."""
+        if isinstance(channel, bytes):
+            channel = channel.decode()
+        event = json.loads(data)
+        if event.get('origin') == self.worker_id:
+            return
+        
+        # document:{id}:events
+        document_id = channel.split(':', 1)[1].rsplit(':', 1)[0]
+        message = event['message']
+        
+        # Mantener al día la copia local del documento
+        if message.get('type') == 'document_update' and document_id in self.documents:
+            try:
+                self.documents[document_id].apply_update(base64.b64decode(message['update']))
+            except ValueError as e:
+                logger.error(f"Invalid remote document update: {str(e)}")
+        
+        await self._deliver_local(document_id, message, event.get('exclude_user'))
+    
     def get_document_participants(self, document_id: str) -> Set[str]:
         """Get all active participants in a document."""
         return self.document_participants.get(document_id, set())
     
+    def heartbeat(self, document_id: str, user_id: str):
+        """Mark a user as present in a document now."""
+        self._refresh_presence({document_id: [user_id]})
+    
+    async def _heartbeat_loop(self):
+        """Refresh presence of every local connection while any remains.
+        
+        If the worker dies its users stop being refreshed and expire after
+        WS_PRESENCE_TTL seconds.
+        """
+        while self.active_connections:
+            await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
+            try:
+                self._refresh_presence({
+                    document_id: list(connections)
+                    for document_id, connections in self.active_connections.items()
+                })
+            except Exception as e:
+                logger.error(f"Error refreshing presence: {str(e)}")
+    
+    def _refresh_presence(self, members: Dict[str, List[str]]):
+        """Write heartbeats for several rooms in a single round-trip."""
+        now = time.time()
+        pipeline = self.redis.pipeline(transaction=False)
+        for document_id, user_ids in members.items():
+            if not user_ids:
+                continue
+            key = RedisKeys.document_presence(document_id)
+            pipeline.zadd(key, {user_id: now for user_id in user_ids})
+            pipeline.zremrangebyscore(key, '-inf', now - settings.WS_PRESENCE_TTL)
+            # Salas abandonadas desaparecen solas
+            pipeline.expire(key, settings.WS_PRESENCE_TTL)
+        pipeline.execute()
+    
     def get_user_presence(self, document_id: str) -> Dict[str, Any]:
-        """Get presence information for all users in a document."""
-        presence = self.redis.hgetall(f"document:{document_id}:presence")
+        """Get presence information for all users in a document.
+        
+        Users without a heartbeat in the last WS_PRESENCE_TTL seconds
+        (e.g. from a crashed worker) are pruned and not returned.
+        """
+        key = RedisKeys.document_presence(document_id)
+        now = time.time()
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.zremrangebyscore(key, '-inf', now - settings.WS_PRESENCE_TTL)
+        pipeline.zrange(key, 0, -1, withscores=True)
+        _, presence = pipeline.execute()
         return {
-            k.decode(): json.loads(v.decode())
-            for k, v in presence.items()
+            (user_id.decode() if isinstance(user_id, bytes) else user_id): {
+                "status": "active",
+                "last_activity": last_seen
+            }
+            for user_id, last_seen in presence
         }
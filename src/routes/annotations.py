@@ -1,21 +1,55 @@
 """Routes for document annotations."""
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from uuid import UUID
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
-from src.database import get_db
+from src.config import settings
+from src.database import SessionLocal, get_db
+from src.documents.annotation_filters import AnnotationFilter
 from src.models.annotations import Annotation
-from src.services.annotations import AnnotationService
+from src.services.annotation_stats import AnnotationStatsService
+from src.services.annotations import STATS_SCOPE, AnnotationService
 from src.auth.dependencies import get_current_user
 from src.schemas.annotations import (
     AnnotationCreate,
     AnnotationUpdate,
-    AnnotationResponse
+    AnnotationResponse,
+    AnnotationBulkCreate,
+    AnnotationBulkUpdate,
+    AnnotationBulkDelete,
+    AnnotationBulkResponse,
+    AnnotationSearch,
+    AnnotationSearchResponse
 )
 
 router = APIRouter(prefix="/api/v1/documents", tags=["annotations"])
 
+# Task that periodically repairs the summary counters
+reconciliation_task: Optional[asyncio.Task] = None
+
+async def load_document_annotations(document_id: str) -> List[Annotation]:
+    """Load a document's annotations in a session of its own."""
+    session = SessionLocal()
+    try:
+        return AnnotationService(session).get_document_annotations(UUID(document_id))
+    finally:
+        session.close()
+
+@router.on_event("startup")
+async def startup_event():
+    """Start the periodic reconciliation of the annotation counters."""
+    global reconciliation_task
+    stats = AnnotationStatsService(scope=STATS_SCOPE)
+    reconciliation_task = asyncio.create_task(stats.run_reconciliation(load_document_annotations))
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    """Stop the reconciliation."""
+    if reconciliation_task:
+        reconciliation_task.cancel()
+
 @router.get("/{document_id}/annotations", response_model=List[AnnotationResponse])
 async def get_document_annotations(
     document_id: UUID,
@@ -27,6 +61,50 @@ async def get_document_annotations(
     annotations = service.get_document_annotations(document_id)
     return [annotation.to_dict() for annotation in annotations]
 
+@router.get("/{document_id}/annotations/summary")
+async def get_annotation_summary(
+    document_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Get a document's annotation counts by type, page, user and tag."""
+    return await AnnotationService(db).get_annotation_summary(document_id)
+
+@router.post("/{document_id}/annotations/search", response_model=AnnotationSearchResponse)
+async def search_annotations(
+    document_id: UUID,
+    params: AnnotationSearch,
+    db: Session = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Search a document's annotations.
+    
+    Filters, ordering and pagination run in the database; send the received
+    `next_cursor` as `cursor` to get the next page.
+    """
+    service = AnnotationService(db)
+    annotation_filter = AnnotationFilter(
+        **params.dict(exclude={'cursor', 'match_type'})
+    )
+    try:
+        result = service.search_annotations(
+            document_id,
+            annotation_filter,
+            match_type=params.match_type,
+            cursor=params.cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return {
+        'total': service.count_document_annotations(document_id),
+        'filtered': len(result['annotations']),
+        'annotations': [annotation.to_dict() for annotation in result['annotations']],
+        'next_cursor': result['next_cursor']
+    }
+
 @router.post("/{document_id}/annotations", response_model=AnnotationResponse, status_code=status.HTTP_201_CREATED)
 async def create_annotation(
     document_id: UUID,
@@ -94,3 +172,68 @@ async def delete_annotation(
         )
         
     service.delete_annotation(annotation_id)
+
+
+def check_bulk_size(count: int):
+    """Reject bulk requests over the configured size."""
+    if count > settings.ANNOTATION_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"At most {settings.ANNOTATION_BULK_MAX_ITEMS} annotations per request"
+        )
+
+@router.post("/{document_id}/annotations/bulk", response_model=AnnotationBulkResponse)
+async def bulk_create_annotations(
+    document_id: UUID,
+    request: AnnotationBulkCreate,
+    db: Session = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Create many annotations in one transaction, reporting the items that failed."""
+    check_bulk_size(len(request.annotations))
+    service = AnnotationService(db)
+    items = [
+        {**annotation.dict(), 'document_id': str(document_id), 'user_id': str(current_user['id'])}
+        for annotation in request.annotations
+    ]
+    result = service.bulk_create_annotations(items)
+    return {
+        'annotations': [annotation.to_dict() for annotation in result['annotations']],
+        'errors': result['errors']
+    }
+
+@router.patch("/{document_id}/annotations/bulk", response_model=AnnotationBulkResponse)
+async def bulk_update_annotations(
+    document_id: UUID,
+    request: AnnotationBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Update many annotations in one transaction, reporting the items that failed."""
+    check_bulk_size(len(request.annotations))
+    service = AnnotationService(db)
+    result = service.bulk_update_annotations(
+        [annotation.dict(exclude_unset=True) for annotation in request.annotations],
+        document_id=document_id,
+        user_id=UUID(current_user['id'])
+    )
+    return {
+        'annotations': [annotation.to_dict() for annotation in result['annotations']],
+        'errors': result['errors']
+    }
+
+@router.post("/{document_id}/annotations/bulk/delete", response_model=AnnotationBulkResponse)
+async def bulk_delete_annotations(
+    document_id: UUID,
+    request: AnnotationBulkDelete,
+    db: Session = Depends(get_db),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Delete many annotations in one transaction, reporting the items that failed."""
+    check_bulk_size(len(request.ids))
+    service = AnnotationService(db)
+    return service.bulk_delete_annotations(
+        request.ids,
+        document_id=document_id,
+        user_id=UUID(current_user['id'])
+    )
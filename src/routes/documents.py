@@ -16,6 +16,7 @@ from src.monitoring.metrics import document_metrics
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 ws_manager = WebSocketManager()
+version_service = VersionService()
 logger = Logger(__name__)
 
 # Modelos de datos
@@ -119,12 +120,26 @@ async def get_versions(
     """Obtener historial de versiones de un documento."""
     try:
         with document_metrics.measure_latency("get_versions"):
-            versions = await VersionService.get_versions(id, current_user)
+            versions = await version_service.get_versions(id, current_user)
             return {"versions": versions}
     except Exception as e:
         logger.error(f"Error getting versions for document {id}: {str(e)}")
         raise HTTPException(status_code=404, detail="VERSION_NOT_FOUND")
 
+@router.get("/{id}/versions/{revision_id}")
+async def get_version(
+    id: str,
+    revision_id: str,
+    current_user = Depends(get_current_user)
+) -> Dict:
+    """Obtener el contenido de una versión de un documento."""
+    try:
+        with document_metrics.measure_latency("get_version"):
+            return await version_service.get_version(id, revision_id, current_user)
+    except Exception as e:
+        logger.error(f"Error getting version {revision_id} of document {id}: {str(e)}")
+        raise HTTPException(status_code=404, detail="VERSION_NOT_FOUND")
+
 # WebSocket para colaboración en tiempo real
 @router.websocket("/{id}/collaboration")
 async def document_collaboration(
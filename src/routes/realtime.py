@@ -1,12 +1,16 @@
 """Real-time collaboration endpoints."""
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from uuid import UUID
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from redis import Redis
 
 from src.realtime.websocket_manager import ConnectionManager
-from src.database import get_redis
+from src.database import SessionLocal, get_redis
+from src.services.chat_history import ChatHistoryService
 from src.auth.dependencies import get_current_user
+from src.monitoring.logger import Logger
+
+logger = Logger(__name__)
 
 router = APIRouter(prefix="/ws", tags=["realtime"])
 
@@ -18,7 +22,13 @@ async def startup_event():
     """Initialize the connection manager on startup."""
     global manager
     redis = get_redis()
-    manager = ConnectionManager(redis)
+    manager = ConnectionManager(redis, chat_history=ChatHistoryService(redis, SessionLocal))
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    """Stop listening for events from other workers."""
+    if manager:
+        await manager.stop()
 
 @router.websocket("/documents/{document_id}/collaboration")
 async def document_collaboration(
@@ -28,11 +38,15 @@ async def document_collaboration(
 ):
     """WebSocket endpoint for document collaboration."""
     try:
-        await manager.connect(websocket, str(document_id), str(current_user['id']))
+        codec = await manager.connect(websocket, str(document_id), str(current_user['id']))
         
         while True:
             try:
-                data = await websocket.receive_json()
+                try:
+                    data = await codec.receive(websocket)
+                except ValueError as e:
+                    logger.error(f"Invalid message from {current_user['id']}: {str(e)}")
+                    continue
                 
                 # Manejar diferentes tipos de mensajes
                 if data['type'] == 'cursor_position':
@@ -42,6 +56,13 @@ async def document_collaboration(
                         data['position']
                     )
                     
+                elif data['type'] == 'selection':
+                    await manager.send_selection(
+                        str(document_id),
+                        str(current_user['id']),
+                        data['selection']
+                    )
+                    
                 elif data['type'] == 'document_update':
                     await manager.send_document_update(
                         str(document_id),
@@ -49,6 +70,16 @@ async def document_collaboration(
                         data['update']
                     )
                     
+                elif data['type'] == 'sync_request':
+                    await manager.send_document_state(
+                        str(document_id),
+                        str(current_user['id']),
+                        data.get('state_vector')
+                    )
+                    
+                elif data['type'] == 'heartbeat':
+                    manager.heartbeat(str(document_id), str(current_user['id']))
+                    
                 elif data['type'] == 'chat_message':
                     await manager.send_chat_message(
                         str(document_id),
@@ -61,7 +92,7 @@ async def document_collaboration(
                 break
                 
     finally:
-        await manager.disconnect(str(document_id), str(current_user['id']))
+        await manager.disconnect(str(document_id), str(current_user['id']), websocket)
 
 @router.get("/documents/{document_id}/presence")
 async def get_document_presence(
@@ -81,15 +112,14 @@ async def get_document_presence(
 @router.get("/documents/{document_id}/chat")
 async def get_document_chat(
     document_id: UUID,
+    before: Optional[int] = None,
     limit: int = 50,
     redis: Redis = Depends(get_redis),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ) -> Dict[str, Any]:
-    """Get recent chat messages for a document."""
-    messages = redis.lrange(f"document:{document_id}:chat", -limit, -1)
-    return {
-        "messages": [
-            json.loads(msg.decode())
-            for msg in messages
-        ]
-    }
+    """Get a page of chat messages for a document.
+    
+    Pass the returned `next_cursor` as `before` to get older messages.
+    """
+    service = ChatHistoryService(redis, SessionLocal)
+    return await service.history(str(document_id), before=before, limit=limit)
@@ -1,12 +1,37 @@
 """Search endpoints."""
 from typing import Dict, Any, Optional, List
 from uuid import UUID
+import asyncio
 from fastapi import APIRouter, Depends, Query
 from src.search.elasticsearch import ElasticsearchClient
+from src.search.suggest import suggest_index
+from src.search.suggest_sync import load_cases_from_db, track_case_writes
+from src.database import SessionLocal
 from src.auth.dependencies import get_current_user
+from src.monitoring.logger import Logger
+
+logger = Logger(__name__)
 
 router = APIRouter(prefix="/api/v1", tags=["search"])
 
+def load_suggest_index():
+    """Load every case with its participants into the suggestion index."""
+    session = SessionLocal()
+    try:
+        return load_cases_from_db(session, suggest_index)
+    finally:
+        session.close()
+
+@router.on_event("startup")
+async def startup_event():
+    """Build the suggestion index and keep it in sync with case writes."""
+    try:
+        track_case_writes(suggest_index)
+        count = await asyncio.to_thread(load_suggest_index)
+        logger.info(f"Índice de sugerencias cargado con {count} causas")
+    except Exception as e:
+        logger.error(f"Error cargando índice de sugerencias: {str(e)}")
+
 @router.get("/search")
 async def search_documents(
     q: str = Query(..., description="Search query"),
@@ -53,6 +78,19 @@ async def search_documents(
         "size": size
     }
 
+@router.get("/search/suggest")
+async def suggest(
+    q: str = Query(..., min_length=1, description="Prefix typed by the user"),
+    type: Optional[str] = Query(None, regex="^(case|party)$"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+) -> Dict[str, Any]:
+    """Typeahead suggestions for case numbers (RIT/RUC) and parties."""
+    return {
+        "query": q,
+        "suggestions": suggest_index.suggest(q, limit=limit, kind=type)
+    }
+
 @router.get("/documents/{document_id}/search")
 async def search_document_content(
     document_id: UUID,
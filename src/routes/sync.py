@@ -1,9 +1,11 @@
 """
 Endpoints para sincronización offline.
 """
-from fastapi import APIRouter, HTTPException, Depends, Body
-from typing import Dict, List
+from fastapi import APIRouter, HTTPException, Depends, Body, Query
+from typing import Dict, List, Optional
+import asyncio
 from src.auth.auth_manager import get_current_user
+from src.integrations.google_drive import GoogleDriveClient
 from src.services.sync import SyncService
 from src.monitoring.logger import Logger
 from src.monitoring.metrics import sync_metrics
@@ -31,7 +33,8 @@ async def sync_operations(
             result = await sync_service.sync(
                 operations=operations,
                 last_sync=last_sync,
-                device_id=device_id
+                device_id=device_id,
+                user_id=str(current_user.id)
             )
             return result
             
@@ -41,3 +44,53 @@ async def sync_operations(
             status_code=500,
             detail="SYNC_ERROR"
         )
+
+async def can_read_document(document_id: str, user) -> bool:
+    """Verificar en Drive que el usuario puede leer el documento."""
+    try:
+        drive_client = GoogleDriveClient()
+        return await asyncio.to_thread(drive_client.has_access, document_id, user.email)
+    except Exception as e:
+        logger.error(f"Error checking access to document {document_id}: {str(e)}")
+        return False
+
+@router.get("/sync/changes")
+async def get_changes(
+    cursor: Optional[str] = Query(None, description="Último cursor recibido"),
+    document_id: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=1000),
+    current_user = Depends(get_current_user)
+):
+    """Obtener cambios del servidor desde el último cursor.
+    
+    Args:
+        cursor: Cursor devuelto por la llamada anterior (vacío = desde el inicio)
+        document_id: Limitar a los cambios de un documento
+        limit: Máximo de cambios a devolver
+    """
+    if document_id and not await can_read_document(document_id, current_user):
+        raise HTTPException(
+            status_code=403,
+            detail="PERMISSION_DENIED"
+        )
+    
+    try:
+        with sync_metrics.measure_latency("changes_endpoint"):
+            return sync_service.change_log.get_changes(
+                cursor=cursor,
+                user_id=str(current_user.id),
+                document_id=document_id,
+                limit=limit
+            )
+            
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="INVALID_CURSOR"
+        )
+    except Exception as e:
+        logger.error(f"Error getting changes: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="SYNC_ERROR"
+        )
@@ -1,13 +1,16 @@
 """Schemas for document annotations."""
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from uuid import UUID
 from pydantic import BaseModel, Field
+from src.documents.annotation_filters import SortField, SortOrder
 
 class AnnotationBase(BaseModel):
     """Base schema for annotations."""
     content: Dict[str, Any] = Field(..., description="Content of the annotation")
     position: Dict[str, Any] = Field(..., description="Position in the document")
+    type: str = Field("note", description="Annotation type (note, highlight, comment)")
+    tags: List[str] = Field(default_factory=list, description="Annotation tags")
     metadata: Optional[Dict[str, Any]] = Field(None, description="Additional metadata")
 
 class AnnotationCreate(AnnotationBase):
@@ -18,6 +21,8 @@ class AnnotationUpdate(BaseModel):
     """Schema for updating annotations."""
     content: Optional[Dict[str, Any]] = None
     position: Optional[Dict[str, Any]] = None
+    type: Optional[str] = None
+    tags: Optional[List[str]] = None
     metadata: Optional[Dict[str, Any]] = None
 
 class AnnotationResponse(AnnotationBase):
@@ -31,3 +36,57 @@ class AnnotationResponse(AnnotationBase):
     class Config:
         """Pydantic config."""
         from_attributes = True
+
+class AnnotationBulkCreate(BaseModel):
+    """Schema for creating many annotations at once."""
+    annotations: List[AnnotationCreate] = Field(..., description="Annotations to create")
+
+class AnnotationBulkUpdateItem(AnnotationUpdate):
+    """Schema for one update in a bulk request."""
+    id: UUID
+
+class AnnotationBulkUpdate(BaseModel):
+    """Schema for updating many annotations at once."""
+    annotations: List[AnnotationBulkUpdateItem] = Field(..., description="Updates to apply")
+
+class AnnotationBulkDelete(BaseModel):
+    """Schema for deleting many annotations at once."""
+    ids: List[UUID] = Field(..., description="Annotations to delete")
+
+class AnnotationBulkError(BaseModel):
+    """An item of a bulk request that was not applied."""
+    index: int = Field(..., description="Position of the item in the request")
+    id: Optional[UUID] = None
+    error: str
+
+class AnnotationBulkResponse(BaseModel):
+    """Schema for bulk responses."""
+    annotations: List[AnnotationResponse] = Field(default_factory=list, description="Created or updated annotations")
+    deleted: List[UUID] = Field(default_factory=list, description="Deleted annotation IDs")
+    errors: List[AnnotationBulkError] = Field(default_factory=list, description="Items that were not applied")
+
+class AnnotationSearch(BaseModel):
+    """Schema for searching a document's annotations."""
+    content_query: Optional[str] = None
+    tags: Optional[List[str]] = None
+    types: Optional[List[str]] = None
+    users: Optional[List[UUID]] = None
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+    updated_after: Optional[datetime] = None
+    updated_before: Optional[datetime] = None
+    page_range: Optional[Tuple[int, int]] = None
+    position_box: Optional[Dict[str, float]] = Field(None, description="Box {x1, y1, x2, y2}")
+    sort_by: SortField = SortField.CREATED_AT
+    sort_order: SortOrder = SortOrder.DESC
+    limit: int = Field(50, ge=1)
+    offset: int = Field(0, ge=0)
+    cursor: Optional[str] = Field(None, description="next_cursor of the previous page")
+    match_type: str = Field("contains", description="Text match (exact, contains, fuzzy)")
+
+class AnnotationSearchResponse(BaseModel):
+    """Schema for search responses."""
+    total: int = Field(..., description="Annotations in the document")
+    filtered: int = Field(..., description="Annotations in this page")
+    annotations: List[AnnotationResponse] = Field(default_factory=list)
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, None on the last one")
@@ -0,0 +1,284 @@
+"""Índice de sugerencias (typeahead) para causas y partes.
+
+Trie en memoria sobre números de causa (RIT/RUC) y nombres de intervinientes,
+uno por tipo de entrada. Cada nodo guarda en caché las mejores sugerencias de su subárbol, de modo que
+una consulta cuesta O(largo del prefijo) y no depende del tamaño del índice.
+Al eliminar una entrada, la caché de cada nodo de sus caminos se recalcula
+de abajo hacia arriba a partir de las cachés de sus hijos, sin recorrer el
+subárbol.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from dataclasses import dataclass, field
+from bisect import bisect_left
+from heapq import merge, nsmallest
+from itertools import chain
+import re
+import unicodedata
+
+DEFAULT_MAX_SUGGESTIONS = 10
+
+_WORD_SPLIT = re.compile(r"[\s,.;:()]+")
+
+def normalize(text: str) -> str:
+    """Normalizar texto para comparación (minúsculas, sin tildes)."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+@dataclass
+class SuggestEntry:
+    """Entrada sugerible."""
+    key: str
+    kind: str  # case, party
+    label: str
+    weight: float = 1.0
+    payload: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def rank(self) -> Tuple[float, str, str]:
+        """Clave de orden: mayor peso primero, luego alfabético."""
+        return (-self.weight, self.label, self.key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializar entrada para la API."""
+        return {
+            "type": self.kind,
+            "label": self.label,
+            **self.payload
+        }
+
+class _TrieNode:
+    """Nodo del trie con caché de mejores claves del subárbol."""
+
+    __slots__ = ("children", "terminal", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.terminal: Set[str] = set()
+        self.top: List[Tuple[float, str, str]] = []
+
+class SuggestIndex:
+    """Índice de prefijos para sugerencias de causas y partes."""
+
+    def __init__(self, max_suggestions: int = DEFAULT_MAX_SUGGESTIONS):
+        """Inicializar índice.
+
+        Args:
+            max_suggestions: Máximo de sugerencias precalculadas por nodo
+        """
+        self.max_suggestions = max_suggestions
+        self.roots: Dict[str, _TrieNode] = {}
+        self.entries: Dict[str, SuggestEntry] = {}
+        self._terms: Dict[str, List[str]] = {}
+        self._case_parties: Dict[Any, Set[str]] = {}  # causa -> claves de sus partes
+
+    # Carga desde modelos
+
+    def load_cases(self, cases: Iterable[Any]):
+        """Reconstruir el índice a partir de causas y sus intervinientes.
+
+        Args:
+            cases: Instancias de `Case` con `participants` cargados
+        """
+        self.roots = {}
+        self.entries = {}
+        self._terms = {}
+        self._case_parties = {}
+        for case in cases:
+            self.upsert_case(case)
+
+    def upsert_case(self, case: Any):
+        """Agregar o actualizar una causa y sus partes en el índice."""
+        updated_at = getattr(case, "updated_at", None)
+        weight = updated_at.timestamp() if updated_at else 1.0
+
+        self.upsert(SuggestEntry(
+            key=f"case:{case.id}",
+            kind="case",
+            label=case.case_number,
+            weight=weight,
+            payload={
+                "case_id": case.id,
+                "case_number": case.case_number,
+                "title": case.title
+            }
+        ), terms=[case.case_number, _digits(case.case_number)])
+
+        parties: Set[str] = set()
+        for case_participant in getattr(case, "participants", None) or []:
+            participant = case_participant.participant
+            if participant is None:
+                continue
+            key = f"party:{case.id}:{participant.id}"
+            parties.add(key)
+            self.upsert(SuggestEntry(
+                key=key,
+                kind="party",
+                label=participant.name,
+                weight=weight,
+                payload={
+                    "participant_id": participant.id,
+                    "role": case_participant.role or participant.role,
+                    "case_id": case.id,
+                    "case_number": case.case_number
+                }
+            ), terms=_word_suffixes(participant.name))
+
+        # Partes que ya no intervienen en la causa
+        for key in self._case_parties.get(case.id, set()) - parties:
+            self.remove(key)
+        self._case_parties[case.id] = parties
+
+    def remove_case(self, case_id: Any):
+        """Eliminar una causa y sus partes del índice."""
+        self.remove(f"case:{case_id}")
+        for key in self._case_parties.pop(case_id, set()):
+            self.remove(key)
+
+    # Operaciones del trie
+
+    def upsert(self, entry: SuggestEntry, terms: Optional[Iterable[str]] = None):
+        """Agregar o reemplazar una entrada.
+
+        Args:
+            entry: Entrada a indexar
+            terms: Términos por los que debe encontrarse (por defecto, su label)
+        """
+        if entry.key in self.entries:
+            self.remove(entry.key)
+
+        normalized = sorted({normalize(t) for t in (terms or [entry.label]) if t})
+        normalized = [t for t in normalized if t]
+        self.entries[entry.key] = entry
+        self._terms[entry.key] = normalized
+
+        rank = entry.rank
+        root = self.roots.setdefault(entry.kind, _TrieNode())
+        for term in normalized:
+            node = root
+            self._offer(node, rank)
+            for char in term:
+                node = node.children.setdefault(char, _TrieNode())
+                self._offer(node, rank)
+            node.terminal.add(entry.key)
+
+    def remove(self, key: str):
+        """Eliminar una entrada del índice."""
+        if key not in self.entries:
+            return
+        entry = self.entries[key]
+        rank = entry.rank
+        root = self.roots[entry.kind]
+        # Nodos de todos los caminos de la entrada: (profundidad, nodo, padre, carácter)
+        visited = {id(root): (0, root, None, "")}
+        for term in self._terms.pop(key, []):
+            node = root
+            for depth, char in enumerate(term, 1):
+                child = node.children.get(char)
+                if child is None:
+                    break
+                visited.setdefault(id(child), (depth, child, node, char))
+                node = child
+            else:
+                node.terminal.discard(key)
+        # De abajo hacia arriba: podar ramas vacías y recalcular desde los
+        # hijos las cachés que contenían la entrada
+        for _, node, parent, char in sorted(visited.values(), key=lambda item: -item[0]):
+            if parent is not None and not node.children and not node.terminal:
+                del parent.children[char]
+            elif rank in node.top:
+                self._rebuild_top(node)
+        del self.entries[key]
+
+    def suggest(
+        self,
+        prefix: str,
+        limit: int = DEFAULT_MAX_SUGGESTIONS,
+        kind: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Obtener sugerencias para un prefijo.
+
+        Args:
+            prefix: Texto escrito por el usuario
+            limit: Número máximo de sugerencias
+            kind: Filtrar por tipo de entrada (case, party)
+
+        Returns:
+            Sugerencias ordenadas por relevancia
+        """
+        term = normalize(prefix)
+        if not term:
+            return []
+
+        kinds = [kind] if kind else list(self.roots)
+        nodes = [
+            node for node in (self._find(k, term) for k in kinds)
+            if node is not None
+        ]
+
+        if limit <= self.max_suggestions:
+            ranks = merge(*(node.top for node in nodes))
+        else:
+            # La caché no alcanza: recorrer los subárboles completos
+            ranks = sorted(
+                self.entries[key].rank
+                for node in nodes for key in self._collect(node)
+            )
+
+        results = []
+        for rank in ranks:
+            results.append(self.entries[rank[2]].to_dict())
+            if len(results) >= limit:
+                break
+        return results
+
+    def _find(self, kind: str, term: str) -> Optional[_TrieNode]:
+        """Obtener el nodo correspondiente a un prefijo normalizado."""
+        node = self.roots.get(kind)
+        for char in term:
+            if node is None:
+                return None
+            node = node.children.get(char)
+        return node
+
+    def _offer(self, node: _TrieNode, rank: Tuple[float, str, str]):
+        """Ofrecer una entrada a la caché ordenada de un nodo."""
+        top = node.top
+        if len(top) >= self.max_suggestions and rank >= top[-1]:
+            return
+        position = bisect_left(top, rank)
+        if position < len(top) and top[position] == rank:
+            return
+        top.insert(position, rank)
+        if len(top) > self.max_suggestions:
+            top.pop()
+
+    def _rebuild_top(self, node: _TrieNode):
+        """Recalcular la caché de un nodo desde sus terminales y las cachés de sus hijos."""
+        candidates = set(chain(
+            (self.entries[k].rank for k in node.terminal),
+            *(child.top for child in node.children.values())
+        ))
+        node.top = nsmallest(self.max_suggestions, candidates)
+
+    def _collect(self, node: _TrieNode) -> Set[str]:
+        """Obtener todas las claves del subárbol de un nodo."""
+        keys: Set[str] = set()
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            keys.update(current.terminal)
+            stack.extend(current.children.values())
+        return keys
+
+def _digits(text: str) -> str:
+    """Extraer solo los dígitos de un RIT/RUC (789-2023 -> 7892023)."""
+    return "".join(c for c in text or "" if c.isdigit())
+
+def _word_suffixes(name: str) -> List[str]:
+    """Términos para un nombre: el nombre completo desde cada palabra."""
+    words = [w for w in _WORD_SPLIT.split(name or "") if w]
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+# Instancia global
+suggest_index = SuggestIndex()
@@ -0,0 +1,118 @@
+"""Carga y sincronización del índice de sugerencias con la base de datos.
+
+El índice se construye desde `Case` con sus `CaseParticipant` y se mantiene
+al día con eventos de la sesión de SQLAlchemy: cada flush anota las causas
+afectadas (altas, cambios, bajas de la causa, de sus intervinientes o de un
+participante) y el commit las aplica al índice; un rollback las descarta.
+Así cualquier camino que escriba causas actualiza las sugerencias sin
+llamar al índice.
+"""
+from typing import Any, Dict, List, Optional
+from dataclasses import dataclass, field
+from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, selectinload
+
+from src.search.suggest import SuggestIndex, suggest_index
+
+_PENDING = "suggest_cases"  # clave en session.info
+
+@dataclass
+class _ParticipantSnapshot:
+    """Participante copiado al momento del flush."""
+    id: Any
+    name: str
+    role: Optional[str] = None
+
+@dataclass
+class _Party:
+    """Interviniente copiado de `CaseParticipant` al momento del flush."""
+    role: Optional[str]
+    participant: _ParticipantSnapshot
+
+@dataclass
+class _CaseSnapshot:
+    """Causa copiada al momento del flush, para aplicarla tras el commit."""
+    id: Any
+    case_number: str
+    title: str
+    updated_at: Optional[datetime] = None
+    participants: List[_Party] = field(default_factory=list)
+
+def load_cases_from_db(session: Session, index: SuggestIndex = suggest_index) -> int:
+    """Reconstruir el índice con todas las causas y sus intervinientes.
+
+    Returns:
+        Número de causas cargadas
+    """
+    from src.integrations.database.models import Case, CaseParticipant
+
+    cases = session.query(Case).options(
+        selectinload(Case.participants).selectinload(CaseParticipant.participant)
+    ).all()
+    index.load_cases(cases)
+    return len(cases)
+
+def track_case_writes(index: SuggestIndex = suggest_index, session_class: Any = Session):
+    """Registrar los eventos de sesión que mantienen el índice al día.
+
+    Args:
+        index: Índice a actualizar
+        session_class: Clase o fábrica de sesiones a escuchar
+    """
+    from src.integrations.database.models import Case, CaseParticipant, Participant
+
+    def snapshot(case, deleted) -> _CaseSnapshot:
+        parties = []
+        for cp in case.participants:
+            if cp in deleted or cp.participant is None:
+                continue
+            participant = cp.participant
+            parties.append(_Party(role=cp.role, participant=_ParticipantSnapshot(
+                id=participant.id,
+                name=participant.name,
+                role=participant.role
+            )))
+        return _CaseSnapshot(
+            id=case.id,
+            case_number=case.case_number,
+            title=case.title,
+            updated_at=case.updated_at,
+            participants=parties
+        )
+
+    def after_flush(session, flush_context):
+        pending: Dict[Any, Optional[_CaseSnapshot]] = session.info.setdefault(_PENDING, {})
+        deleted = set(session.deleted)
+        touched = {}
+        for obj in list(session.new) + list(session.dirty) + list(deleted):
+            if isinstance(obj, Case):
+                cases = [obj]
+            elif isinstance(obj, CaseParticipant):
+                # También la causa anterior si el interviniente se movió o se quitó
+                cases = [c for c in inspect(obj).attrs.case.history.sum() if c is not None]
+            elif isinstance(obj, Participant):
+                cases = [cp.case for cp in obj.case_participations if cp.case is not None]
+            else:
+                continue
+            for case in cases:
+                touched[id(case)] = case
+        for case in touched.values():
+            if case in deleted:
+                pending[case.id] = None
+            else:
+                pending[case.id] = snapshot(case, deleted)
+
+    def after_commit(session):
+        for case_id, case in session.info.pop(_PENDING, {}).items():
+            if case is None:
+                index.remove_case(case_id)
+            else:
+                index.upsert_case(case)
+
+    def after_rollback(session):
+        session.info.pop(_PENDING, None)
+
+    event.listen(session_class, "after_flush", after_flush)
+    event.listen(session_class, "after_commit", after_commit)
+    event.listen(session_class, "after_rollback", after_rollback)
@@ -0,0 +1,196 @@
+"""
+Planificador de consultas de anotaciones.
+Traduce un AnnotationFilter a una consulta SQL sobre el modelo Annotation:
+tipos y autores por igualdad, etiquetas con `?|` sobre JSONB, fechas por
+rango, páginas y recuadro sobre las claves de `position`, y texto con LIKE
+sin distinguir mayúsculas. La paginación es por cursor sobre la clave de
+orden más el id, servida por los índices compuestos del modelo. La
+coincidencia aproximada (fuzzy) de texto llega resuelta por el índice de
+n-gramas como una lista de IDs; sin índice se evalúa en memoria, sobre las
+filas que ya cumplen el resto del filtro.
+"""
+from typing import Any, Callable, Iterable, List, Optional
+from dataclasses import dataclass
+from datetime import datetime
+from uuid import UUID
+import base64
+import json
+from sqlalchemy import Select, and_, func, select, tuple_
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.sql.elements import ColumnElement
+from src.documents.annotation_filters import (
+    AnnotationFilter,
+    AnnotationFilterEngine,
+    SortField,
+    SortOrder
+)
+from src.models.annotations import ANNOTATION_PAGE, ANNOTATION_X, ANNOTATION_Y, Annotation
+
+# Texto de la anotación dentro de `content`
+ANNOTATION_TEXT = Annotation.content['text'].astext
+
+@dataclass
+class AnnotationQueryPlan:
+    """Consulta lista para ejecutar."""
+    statement: Select
+    sort_by: SortField
+    # Filtro de texto que no se pudo traducir a SQL (fuzzy)
+    residual: Optional[Callable[[Annotation], bool]] = None
+    # Filas a saltar en memoria (solo con filtro residual)
+    offset: int = 0
+
+class AnnotationQueryPlanner:
+    """Traduce filtros de anotaciones a SQL."""
+
+    def __init__(self):
+        self.filter_engine = AnnotationFilterEngine()
+
+    def sort_keys(self, sort_by: SortField) -> List[ColumnElement]:
+        """Expresiones de orden (sin el id de desempate)."""
+        sort_by = SortField(sort_by)
+        if sort_by == SortField.PAGE:
+            return [ANNOTATION_PAGE]
+        if sort_by == SortField.POSITION:
+            return [ANNOTATION_PAGE, ANNOTATION_Y, ANNOTATION_X]
+        return [getattr(Annotation, sort_by.value)]
+
+    def conditions(
+        self,
+        document_id: UUID,
+        filter_params: AnnotationFilter,
+        match_type: str = 'contains'
+    ) -> List[ColumnElement]:
+        """Condiciones SQL del filtro (el texto fuzzy queda fuera)."""
+        conditions = [Annotation.document_id == document_id]
+
+        # Metadatos
+        if filter_params.types:
+            conditions.append(Annotation.type.in_(filter_params.types))
+        if filter_params.users:
+            conditions.append(Annotation.user_id.in_(filter_params.users))
+        if filter_params.tags:
+            conditions.append(Annotation.tags.has_any(array(filter_params.tags)))
+
+        # Fechas
+        if filter_params.created_after:
+            conditions.append(Annotation.created_at >= filter_params.created_after)
+        if filter_params.created_before:
+            conditions.append(Annotation.created_at <= filter_params.created_before)
+        if filter_params.updated_after:
+            conditions.append(Annotation.updated_at >= filter_params.updated_after)
+        if filter_params.updated_before:
+            conditions.append(Annotation.updated_at <= filter_params.updated_before)
+
+        # Posición
+        if filter_params.page_range:
+            first, last = filter_params.page_range
+            conditions.append(ANNOTATION_PAGE.between(first, last))
+        if filter_params.position_box:
+            box = filter_params.position_box
+            conditions.append(ANNOTATION_X.between(box['x1'], box['x2']))
+            conditions.append(ANNOTATION_Y.between(box['y1'], box['y2']))
+
+        # Texto
+        if filter_params.content_query and match_type != 'fuzzy':
+            query = filter_params.content_query.lower()
+            if match_type == 'exact':
+                conditions.append(func.lower(ANNOTATION_TEXT) == query)
+            else:
+                conditions.append(func.lower(ANNOTATION_TEXT).contains(query, autoescape=True))
+
+        return conditions
+
+    def plan(
+        self,
+        document_id: UUID,
+        filter_params: AnnotationFilter,
+        match_type: str = 'contains',
+        cursor: Optional[str] = None,
+        fuzzy_matches: Optional[Iterable[UUID]] = None
+    ) -> AnnotationQueryPlan:
+        """Armar la consulta de una página de resultados.
+
+        Args:
+            document_id: ID del documento
+            filter_params: Parámetros de filtrado y orden
+            match_type: Tipo de coincidencia de texto (exact, contains, fuzzy)
+            cursor: Cursor devuelto por la página anterior; sin él se usa
+                   `offset` del filtro
+            fuzzy_matches: IDs que cumplen el texto fuzzy según el índice de
+                          n-gramas; sin ellos el texto se filtra en memoria
+
+        Returns:
+            Plan con la consulta ordenada, sin límite (lo pone quien ejecuta)
+        """
+        keys = self.sort_keys(filter_params.sort_by) + [Annotation.id]
+        descending = filter_params.sort_order == SortOrder.DESC
+        conditions = self.conditions(document_id, filter_params, match_type)
+        fuzzy_text = bool(filter_params.content_query) and match_type == 'fuzzy'
+        if fuzzy_text and fuzzy_matches is not None:
+            conditions.append(Annotation.id.in_(list(fuzzy_matches)))
+
+        # Cursor: fila (clave, id) estrictamente después de la última entregada
+        if cursor:
+            values = self.decode_cursor(cursor, filter_params.sort_by)
+            row = tuple_(*keys)
+            conditions.append(row < tuple_(*values) if descending else row > tuple_(*values))
+
+        statement = select(Annotation).where(and_(*conditions)).order_by(
+            *[key.desc() if descending else key.asc() for key in keys]
+        )
+        offset = 0 if cursor else filter_params.offset
+
+        residual = None
+        if fuzzy_text and fuzzy_matches is None:
+            fuzzy = self.filter_engine.compile_predicate(
+                AnnotationFilter(content_query=filter_params.content_query),
+                match_type='fuzzy'
+            )
+            residual = lambda annotation: fuzzy({'content': (annotation.content or {}).get('text') or ''})
+        elif offset:
+            # Sin filtro en memoria el desplazamiento lo resuelve la base
+            statement = statement.offset(offset)
+            offset = 0
+
+        return AnnotationQueryPlan(
+            statement=statement,
+            sort_by=SortField(filter_params.sort_by),
+            residual=residual,
+            offset=offset
+        )
+
+    def sort_values(self, annotation: Annotation, sort_by: SortField) -> List[Any]:
+        """Valores de la clave de orden de una anotación."""
+        sort_by = SortField(sort_by)
+        position = annotation.position
+        if sort_by == SortField.PAGE:
+            return [int(position['page'])]
+        if sort_by == SortField.POSITION:
+            return [int(position['page']), float(position['y']), float(position['x'])]
+        return [getattr(annotation, sort_by.value)]
+
+    def encode_cursor(self, annotation: Annotation, sort_by: SortField) -> str:
+        """Cursor opaco que apunta después de una anotación."""
+        values = [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in self.sort_values(annotation, sort_by)
+        ]
+        payload = json.dumps(values + [str(annotation.id)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor: str, sort_by: SortField) -> List[Any]:
+        """Valores (clave, id) de un cursor.
+
+        Raises:
+            ValueError: Si el cursor no es válido para el orden pedido
+        """
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            *key, annotation_id = values
+            if len(key) != len(self.sort_keys(sort_by)):
+                raise ValueError("orden distinto")
+            if SortField(sort_by) in (SortField.CREATED_AT, SortField.UPDATED_AT):
+                key = [datetime.fromisoformat(key[0])]
+            return key + [UUID(annotation_id)]
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Cursor inválido: {str(e)}")
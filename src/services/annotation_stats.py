@@ -0,0 +1,269 @@
+"""
+Contadores de anotaciones por documento.
+Cada documento tiene un hash en Redis con el total y los conteos por tipo,
+página, autor y etiqueta, que se ajusta con HINCRBY en cada alta, cambio y
+baja; el resumen se lee con un solo HGETALL sin recorrer las anotaciones.
+Los ajustes solo se aplican si el hash ya existe: un documento sin
+contadores se cuenta completo la primera vez que se pide su resumen. La
+reconciliación vuelve a contar desde la fuente de verdad y corrige las
+diferencias que hayan quedado (por ejemplo, un ajuste perdido entre la
+escritura en la base y la de Redis). Las operaciones masivas suman sus
+ajustes y los aplican en una sola transacción por documento.
+"""
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+import asyncio
+import redis
+from src.config import settings
+from src.database.redis import RedisKeys
+from src.monitoring.logger import Logger
+
+logger = Logger(__name__)
+
+# Campo con el número de ajustes aplicados, para detectar escrituras concurrentes
+SEQ_FIELD = '_seq'
+
+# Tipos que el resumen siempre informa, aunque no tengan anotaciones
+SUMMARY_TYPES = ("note", "highlight", "comment")
+
+def _field(annotation: Any, field: str) -> Any:
+    """Leer un campo de una anotación (dict o modelo)."""
+    if isinstance(annotation, dict):
+        return annotation.get(field)
+    return getattr(annotation, field, None)
+
+def annotation_tags(annotation: Any) -> List[Any]:
+    """Etiquetas distintas de una anotación (campo `tags` o `metadata['tags']`)."""
+    tags = _field(annotation, 'tags')
+    if tags is None:
+        tags = (_field(annotation, 'metadata') or {}).get('tags') or ()
+    return list(dict.fromkeys(tags))
+
+def annotation_counts(annotation: Any) -> Counter:
+    """Campos del hash a los que suma una anotación."""
+    counts = Counter({'total': 1})
+    counts[f"type:{_field(annotation, 'type')}"] += 1
+    counts[f"page:{int((_field(annotation, 'position') or {}).get('page', 0))}"] += 1
+    counts[f"user:{_field(annotation, 'user_id')}"] += 1
+    for tag in annotation_tags(annotation):
+        counts[f"tag:{tag}"] += 1
+    return counts
+
+def count_annotations(document_id: str, annotations: Iterable[Any]) -> Counter:
+    """Campos del hash de un documento contando anotación por anotación."""
+    counts = Counter()
+    for annotation in annotations:
+        counts.update(annotation_counts(annotation))
+    return counts
+
+class AnnotationStatsService:
+    """Resumen de anotaciones mantenido de forma incremental."""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None, scope: Optional[str] = None):
+        """Inicializar contadores.
+
+        Args:
+            redis_client: Cliente Redis; por defecto se conecta a REDIS_URL
+            scope: Almacén de anotaciones que se cuenta; cada uno tiene sus
+                  propias keys y su propia reconciliación
+        """
+        self.redis = redis_client or redis.Redis.from_url(settings.REDIS_URL)
+        self.scope = scope
+        self.config = {
+            'reconcile_retries': settings.ANNOTATION_STATS_RECONCILE_RETRIES,
+            'reconcile_interval': settings.ANNOTATION_STATS_RECONCILE_INTERVAL  # segundos
+        }
+
+    def record_created(self, document_id: str, annotation: Any) -> bool:
+        """Sumar una anotación nueva."""
+        return self._apply(document_id, annotation_counts(annotation))
+
+    def record_updated(self, document_id: str, before: Counter, annotation: Any) -> bool:
+        """Mover los conteos de una anotación modificada.
+
+        Args:
+            document_id: ID del documento
+            before: `annotation_counts` de la anotación antes del cambio
+            annotation: Anotación ya modificada
+        """
+        delta = annotation_counts(annotation)
+        delta.subtract(before)
+        return self._apply(document_id, delta)
+
+    def record_deleted(self, document_id: str, annotation: Any) -> bool:
+        """Restar una anotación eliminada."""
+        delta = Counter()
+        delta.subtract(annotation_counts(annotation))
+        return self._apply(document_id, delta)
+
+    def record_batch(
+        self,
+        document_id: str,
+        created: Iterable[Any] = (),
+        updated: Iterable[Tuple[Counter, Any]] = (),
+        deleted: Iterable[Any] = ()
+    ) -> bool:
+        """Aplicar los cambios de una operación masiva en una sola transacción.
+
+        Args:
+            document_id: ID del documento
+            created: Anotaciones nuevas
+            updated: Pares (`annotation_counts` previo, anotación modificada)
+            deleted: Anotaciones eliminadas
+        """
+        delta = Counter()
+        for annotation in created:
+            delta.update(annotation_counts(annotation))
+        for before, annotation in updated:
+            delta.update(annotation_counts(annotation))
+            delta.subtract(before)
+        for annotation in deleted:
+            delta.subtract(annotation_counts(annotation))
+        return self._apply(document_id, delta)
+
+    def _apply(self, document_id: str, delta: Counter) -> bool:
+        """Aplicar un ajuste en una transacción, solo si el hash existe.
+
+        Returns:
+            False si el documento no tiene contadores o Redis falló
+        """
+        delta = {field: amount for field, amount in delta.items() if amount}
+        if not delta:
+            return True
+        key = RedisKeys.document_annotation_stats(document_id, self.scope)
+
+        def adjust(pipeline):
+            if not pipeline.exists(key):
+                return False
+            pipeline.multi()
+            for field, amount in delta.items():
+                pipeline.hincrby(key, field, amount)
+            pipeline.hincrby(key, SEQ_FIELD, 1)
+            return True
+
+        try:
+            return self.redis.transaction(adjust, key, value_from_callable=True)
+        except Exception as e:
+            logger.error(f"Error actualizando contadores de anotaciones de {document_id}: {str(e)}")
+            return False
+
+    def get_summary(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Resumen del documento, o None si no tiene contadores."""
+        stored = self._read(document_id)
+        if stored is None:
+            return None
+        summary = {
+            "total": stored.get('total', 0),
+            "by_type": {name: 0 for name in SUMMARY_TYPES},
+            "by_page": {},
+            "by_user": {},
+            "by_tag": {}
+        }
+        groups = {'type': 'by_type', 'page': 'by_page', 'user': 'by_user', 'tag': 'by_tag'}
+        for field, count in stored.items():
+            group, _, value = field.partition(':')
+            if group not in groups or count <= 0:
+                continue
+            summary[groups[group]][int(value) if group == 'page' else value] = count
+        summary["by_page"] = dict(sorted(summary["by_page"].items()))
+        return summary
+
+    def _read(self, document_id: str) -> Optional[Dict[str, int]]:
+        stored = self.redis.hgetall(RedisKeys.document_annotation_stats(document_id, self.scope))
+        if not stored:
+            return None
+        return {
+            (field.decode() if isinstance(field, bytes) else field): int(count)
+            for field, count in stored.items()
+        }
+
+    async def reconcile(
+        self,
+        document_id: str,
+        load_annotations: Callable[[], Awaitable[Iterable[Any]]],
+        count: Callable[[str, Iterable[Any]], Counter] = count_annotations
+    ) -> Dict[str, Tuple[int, int]]:
+        """Recontar un documento y reemplazar sus contadores.
+
+        Si un ajuste llega mientras se cargan las anotaciones el conteo se
+        repite; el último de los `reconcile_retries` intentos se guarda sin
+        comprobar, así que el documento siempre queda con contadores.
+
+        Args:
+            document_id: ID del documento
+            load_annotations: Carga todas las anotaciones del documento
+            count: Calcula los campos del hash a partir de las anotaciones
+
+        Returns:
+            Campos que diferían, con (guardado, real); vacío si el documento
+            no tenía contadores
+        """
+        key = RedisKeys.document_annotation_stats(document_id, self.scope)
+        drift: Dict[str, Tuple[int, int]] = {}
+        for attempt in range(self.config['reconcile_retries']):
+            stored = self._read(document_id) or {}
+            counts = count(document_id, await load_annotations())
+
+            last = attempt == self.config['reconcile_retries'] - 1
+            with self.redis.pipeline() as pipeline:
+                try:
+                    # El último intento escribe sin WATCH: mejor un conteo
+                    # apenas desfasado que dejar el documento sin contadores
+                    if last:
+                        current = int(self.redis.hget(key, SEQ_FIELD) or 0)
+                    else:
+                        pipeline.watch(key)
+                        current = int(pipeline.hget(key, SEQ_FIELD) or 0)
+                        if current != stored.get(SEQ_FIELD, 0):
+                            continue
+                    pipeline.multi()
+                    pipeline.delete(key)
+                    pipeline.hset(key, mapping={'total': 0, **counts, SEQ_FIELD: current + 1})
+                    pipeline.sadd(RedisKeys.annotation_stats_documents(self.scope), document_id)
+                    pipeline.execute()
+                except redis.WatchError:
+                    continue
+
+            if stored:
+                drift = {
+                    field: (stored.get(field, 0), counts.get(field, 0))
+                    for field in set(stored) | set(counts)
+                    if field != SEQ_FIELD and stored.get(field, 0) != counts.get(field, 0)
+                }
+            break
+
+        if drift:
+            logger.warning(f"Contadores de anotaciones de {document_id} corregidos: {len(drift)} campos")
+        return drift
+
+    async def reconcile_all(
+        self,
+        load_annotations: Callable[[str], Awaitable[Iterable[Any]]],
+        count: Callable[[str, Iterable[Any]], Counter] = count_annotations
+    ) -> Dict[str, Dict[str, Tuple[int, int]]]:
+        """Reconciliar todos los documentos con contadores.
+
+        Returns:
+            Diferencias por documento (solo los que tenían)
+        """
+        result = {}
+        for member in self.redis.smembers(RedisKeys.annotation_stats_documents(self.scope)):
+            document_id = member.decode() if isinstance(member, bytes) else member
+            try:
+                drift = await self.reconcile(document_id, lambda: load_annotations(document_id), count)
+            except Exception as e:
+                logger.error(f"Error reconciliando anotaciones de {document_id}: {str(e)}")
+                continue
+            if drift:
+                result[document_id] = drift
+        return result
+
+    async def run_reconciliation(
+        self,
+        load_annotations: Callable[[str], Awaitable[Iterable[Any]]],
+        count: Callable[[str, Iterable[Any]], Counter] = count_annotations
+    ):
+        """Reconciliar periódicamente hasta que se cancele la tarea."""
+        while True:
+            await asyncio.sleep(self.config['reconcile_interval'])
+            await self.reconcile_all(load_annotations, count)
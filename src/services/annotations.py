@@ -1,15 +1,39 @@
 """Service for managing document annotations."""
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
 from uuid import UUID
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
+from src.config import settings
+from src.documents.annotation_filters import AnnotationFilter
+from src.documents.trigram_index import TrigramIndex, text_indexes
 from src.models.annotations import Annotation
+from src.monitoring.logger import Logger
+from src.services.annotation_query import AnnotationQueryPlanner
+from src.services.annotation_stats import AnnotationStatsService, annotation_counts
+
+logger = Logger(__name__)
+
+# Campos que acepta una actualización masiva
+UPDATABLE_FIELDS = ('content', 'position', 'type', 'tags', 'metadata')
+
+# Columnas NOT NULL: una actualización no puede dejarlas en null
+REQUIRED_FIELDS = ('content', 'position', 'type', 'tags')
+
+# Contadores del resumen de este almacén (separados de los de AnnotationManager)
+STATS_SCOPE = 'db'
 
 class AnnotationService:
     """Service for managing document annotations."""
     
-    def __init__(self, db_session: Session):
+    def __init__(self, db_session: Session, stats: Optional[AnnotationStatsService] = None):
         """Initialize the annotation service."""
         self.db = db_session
+        self.planner = AnnotationQueryPlanner()
+        self.stats = stats or AnnotationStatsService(scope=STATS_SCOPE)
     
     def create_annotation(self, data: Dict[str, Any]) -> Annotation:
         """Create a new annotation."""
@@ -17,6 +41,8 @@ class AnnotationService:
         self.db.add(annotation)
         self.db.commit()
         self.db.refresh(annotation)
+        text_indexes.add(str(annotation.document_id), annotation)
+        self.stats.record_created(str(annotation.document_id), annotation)
         return annotation
     
     def get_annotation(self, annotation_id: UUID) -> Optional[Annotation]:
@@ -35,12 +61,15 @@ class AnnotationService:
         if not annotation:
             return None
             
+        before = annotation_counts(annotation)
         for key, value in data.items():
             if hasattr(annotation, key):
                 setattr(annotation, key, value)
                 
         self.db.commit()
         self.db.refresh(annotation)
+        text_indexes.update(str(annotation.document_id), annotation)
+        self.stats.record_updated(str(annotation.document_id), before, annotation)
         return annotation
     
     def delete_annotation(self, annotation_id: UUID) -> bool:
@@ -49,8 +78,11 @@ class AnnotationService:
         if not annotation:
             return False
             
+        document_id, deleted = str(annotation.document_id), annotation.to_dict()
         self.db.delete(annotation)
         self.db.commit()
+        text_indexes.remove(document_id, annotation_id)
+        self.stats.record_deleted(document_id, deleted)
         return True
     
     def get_user_annotations(self, user_id: UUID, document_id: Optional[UUID] = None) -> List[Annotation]:
@@ -59,3 +91,308 @@ class AnnotationService:
         if document_id:
             query = query.filter(Annotation.document_id == document_id)
         return query.order_by(Annotation.created_at.desc()).all()
+
+    def count_document_annotations(self, document_id: UUID) -> int:
+        """Count the annotations of a document."""
+        return self.db.execute(
+            select(func.count()).select_from(Annotation).where(Annotation.document_id == document_id)
+        ).scalar_one()
+    
+    async def get_annotation_summary(self, document_id: UUID) -> Dict[str, Any]:
+        """Get a document's annotation summary from its counters.
+        
+        The first request for a document counts it once; from then on the
+        counters are kept up to date by every write, single or bulk.
+        """
+        summary = self.stats.get_summary(str(document_id))
+        if summary is None:
+            await self.reconcile_annotation_summary(document_id)
+            summary = self.stats.get_summary(str(document_id))
+        return summary
+    
+    async def reconcile_annotation_summary(self, document_id: UUID) -> Dict[str, Any]:
+        """Recount a document's counters from the database.
+        
+        Returns:
+            Fields that were corrected, with (stored, actual)
+        """
+        async def load() -> List[Annotation]:
+            return self.get_document_annotations(document_id)
+        return await self.stats.reconcile(str(document_id), load)
+    
+    def get_text_index(self, document_id: UUID) -> TrigramIndex:
+        """Get the n-gram index of a document's content, loading it if needed.
+        
+        The cached index is checked against the document's annotation count
+        and latest update, so writes from other workers trigger a rebuild.
+        """
+        version = tuple(self.db.execute(
+            select(func.count(), func.max(Annotation.updated_at))
+            .where(Annotation.document_id == document_id)
+        ).one())
+        index = text_indexes.get(str(document_id), version)
+        if index is None:
+            index = text_indexes.load(str(document_id), self.get_document_annotations(document_id), version)
+        return index
+    
+    def search_annotations(
+        self,
+        document_id: UUID,
+        filter_params: AnnotationFilter,
+        match_type: str = 'contains',
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Search a document's annotations in the database.
+        
+        Filters, ordering and pagination run in SQL. Fuzzy text matches come
+        from the document's n-gram index and are passed to SQL as ids.
+        
+        Returns:
+            Dict with the page of annotations and the cursor of the next page
+            (None on the last page)
+        """
+        fuzzy_matches = None
+        if filter_params.content_query and match_type == 'fuzzy':
+            fuzzy_matches = self.get_text_index(document_id).search(filter_params.content_query)
+        plan = self.planner.plan(document_id, filter_params, match_type, cursor, fuzzy_matches)
+        limit = filter_params.limit
+        
+        # Una fila de más indica si hay página siguiente
+        if plan.residual is None:
+            rows = self.db.execute(plan.statement.limit(limit + 1)).scalars().all()
+        else:
+            stream = self.db.execute(
+                plan.statement.execution_options(yield_per=settings.ANNOTATION_FUZZY_BATCH)
+            ).scalars()
+            rows = list(islice(filter(plan.residual, stream), plan.offset, plan.offset + limit + 1))
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.planner.encode_cursor(rows[-1], plan.sort_by)
+        return {
+            'annotations': rows,
+            'next_cursor': next_cursor
+        }
+
+    def bulk_create_annotations(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Create many annotations in a single transaction.
+        
+        Items that cannot be built are reported and skipped; the rest go to
+        the database as one executemany INSERT (sent as multi-row VALUES)
+        and one commit, and are read back with one query. If the database
+        rejects the batch nothing is created and every remaining item is
+        reported.
+        
+        Returns:
+            Dict with the created annotations (in request order) and the
+            errors, each with the index of its item
+        """
+        rows, positions, errors = [], [], []
+        now = datetime.utcnow()
+        for index, data in enumerate(items):
+            try:
+                annotation = Annotation.from_dict(data)
+                self._validate_position(annotation.position)
+            except (KeyError, TypeError, ValueError) as e:
+                errors.append(self._bulk_error(index, data.get('id'), f"Invalid annotation: {str(e)}"))
+                continue
+            rows.append({
+                'id': annotation.id,
+                'document_id': annotation.document_id,
+                'user_id': annotation.user_id,
+                'content': annotation.content,
+                'position': annotation.position,
+                'type': annotation.type,
+                'tags': annotation.tags,
+                'metadata': annotation.metadata,
+                'created_at': now,
+                'updated_at': now
+            })
+            positions.append(index)
+        
+        if not rows:
+            return {'annotations': [], 'errors': errors}
+        try:
+            self.db.execute(insert(Annotation), rows)
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error creating {len(rows)} annotations: {str(e)}")
+            errors.extend(self._bulk_error(index, row['id'], "Batch rejected by the database")
+                          for index, row in zip(positions, rows))
+            errors.sort(key=lambda error: error['index'])
+            return {'annotations': [], 'errors': errors}
+        
+        created = self._get_many([row['id'] for row in rows])
+        annotations = [created[row['id']] for row in rows]
+        for document_id, group in self._by_document(annotations).items():
+            text_indexes.add_many(document_id, group)
+            self.stats.record_batch(document_id, created=group)
+        return {'annotations': annotations, 'errors': errors}
+    
+    def bulk_update_annotations(
+        self,
+        updates: List[Dict[str, Any]],
+        document_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None
+    ) -> Dict[str, Any]:
+        """Update many annotations in a single transaction.
+        
+        Targets are loaded with one query; missing, foreign or duplicated
+        items are reported and skipped. The rest are written as one
+        executemany UPDATE by primary key and one commit.
+        
+        Args:
+            updates: Items with the annotation `id` and the fields to change
+            document_id: Only update annotations of this document
+            user_id: Only update annotations owned by this user
+            
+        Returns:
+            Dict with the updated annotations (in request order) and the errors
+        """
+        errors, rows, positions, seen = [], [], [], set()
+        existing = self._get_many([item['id'] for item in updates if item.get('id')])
+        now = datetime.utcnow()
+        for index, item in enumerate(updates):
+            annotation_id = item.get('id')
+            annotation = existing.get(annotation_id)
+            if annotation is None or (document_id and annotation.document_id != document_id):
+                errors.append(self._bulk_error(index, annotation_id, "Annotation not found"))
+            elif user_id and annotation.user_id != user_id:
+                errors.append(self._bulk_error(index, annotation_id, "Not authorized to update this annotation"))
+            elif annotation_id in seen:
+                errors.append(self._bulk_error(index, annotation_id, "Annotation repeated in the request"))
+            else:
+                values = {key: value for key, value in item.items() if key in UPDATABLE_FIELDS}
+                try:
+                    nulls = [key for key in REQUIRED_FIELDS if key in values and values[key] is None]
+                    if nulls:
+                        raise ValueError(f"{', '.join(nulls)} cannot be null")
+                    if 'position' in values:
+                        self._validate_position(values['position'])
+                except (KeyError, TypeError, ValueError) as e:
+                    errors.append(self._bulk_error(index, annotation_id, f"Invalid annotation: {str(e)}"))
+                    continue
+                seen.add(annotation_id)
+                rows.append({'id': annotation_id, **values, 'updated_at': now})
+                positions.append(index)
+        
+        if not rows:
+            return {'annotations': [], 'errors': errors}
+        before = {row['id']: annotation_counts(existing[row['id']]) for row in rows}
+        try:
+            self.db.execute(update(Annotation), rows)
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error updating {len(rows)} annotations: {str(e)}")
+            errors.extend(self._bulk_error(index, row['id'], "Batch rejected by the database")
+                          for index, row in zip(positions, rows))
+            errors.sort(key=lambda error: error['index'])
+            return {'annotations': [], 'errors': errors}
+        
+        updated = self._get_many([row['id'] for row in rows])
+        annotations = [updated[row['id']] for row in rows]
+        for document, group in self._by_document(annotations).items():
+            text_indexes.update_many(document, group)
+            self.stats.record_batch(
+                document,
+                updated=[(before[annotation.id], annotation) for annotation in group]
+            )
+        return {'annotations': annotations, 'errors': errors}
+    
+    def bulk_delete_annotations(
+        self,
+        annotation_ids: List[UUID],
+        document_id: Optional[UUID] = None,
+        user_id: Optional[UUID] = None
+    ) -> Dict[str, Any]:
+        """Delete many annotations with one DELETE and one commit.
+        
+        Args:
+            annotation_ids: Annotations to delete
+            document_id: Only delete annotations of this document
+            user_id: Only delete annotations owned by this user
+            
+        Returns:
+            Dict with the deleted IDs and the errors
+        """
+        owners = {
+            row.id: row
+            for row in self.db.execute(
+                select(
+                    Annotation.id, Annotation.document_id, Annotation.user_id,
+                    Annotation.type, Annotation.position, Annotation.tags
+                )
+                .where(Annotation.id.in_(set(annotation_ids)))
+            )
+        }
+        errors, deleted, seen = [], [], set()
+        for index, annotation_id in enumerate(annotation_ids):
+            owner = owners.get(annotation_id)
+            if owner is None or (document_id and owner.document_id != document_id):
+                errors.append(self._bulk_error(index, annotation_id, "Annotation not found"))
+            elif user_id and owner.user_id != user_id:
+                errors.append(self._bulk_error(index, annotation_id, "Not authorized to delete this annotation"))
+            elif annotation_id not in seen:
+                seen.add(annotation_id)
+                deleted.append(annotation_id)
+        
+        if not deleted:
+            return {'deleted': [], 'errors': errors}
+        try:
+            self.db.execute(
+                delete(Annotation).where(Annotation.id.in_(deleted)),
+                execution_options={'synchronize_session': False}
+            )
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            logger.error(f"Error deleting {len(deleted)} annotations: {str(e)}")
+            errors.extend(self._bulk_error(index, annotation_id, "Batch rejected by the database")
+                          for index, annotation_id in enumerate(annotation_ids) if annotation_id in seen)
+            errors.sort(key=lambda error: error['index'])
+            return {'deleted': [], 'errors': errors}
+        
+        by_document = defaultdict(list)
+        for annotation_id in deleted:
+            by_document[str(owners[annotation_id].document_id)].append(owners[annotation_id])
+        for document, rows in by_document.items():
+            text_indexes.remove_many(document, [row.id for row in rows])
+            self.stats.record_batch(document, deleted=rows)
+        return {'deleted': deleted, 'errors': errors}
+    
+    def _get_many(self, annotation_ids: Iterable[UUID]) -> Dict[UUID, Annotation]:
+        """Load annotations by ID with one query."""
+        annotation_ids = set(annotation_ids)
+        if not annotation_ids:
+            return {}
+        return {
+            annotation.id: annotation
+            for annotation in self.db.scalars(select(Annotation).where(Annotation.id.in_(annotation_ids)))
+        }
+    
+    def _by_document(self, annotations: Iterable[Annotation]) -> Dict[str, List[Annotation]]:
+        """Group annotations by document, for the per-document indexes."""
+        groups = defaultdict(list)
+        for annotation in annotations:
+            groups[str(annotation.document_id)].append(annotation)
+        return groups
+    
+    def _validate_position(self, position: Dict[str, Any]):
+        """Check the position keys the expression indexes cast.
+        
+        Raises:
+            ValueError: If page is not an integer or x and y are not numbers
+        """
+        if not isinstance(position, dict):
+            raise ValueError("position must be an object")
+        page, x, y = (position.get(key) for key in ('page', 'x', 'y'))
+        if isinstance(page, bool) or not isinstance(page, int):
+            raise ValueError("position page must be an integer")
+        if any(isinstance(value, bool) or not isinstance(value, (int, float)) for value in (x, y)):
+            raise ValueError("position x and y must be numbers")
+    
+    def _bulk_error(self, index: int, annotation_id: Any, error: str) -> Dict[str, Any]:
+        return {'index': index, 'id': annotation_id, 'error': error}
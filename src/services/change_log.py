@@ -0,0 +1,197 @@
+"""
+Registro de cambios del servidor para sincronización incremental.
+Cada cambio aplicado se agrega a un Redis Stream por usuario y por documento;
+los clientes piden solo lo ocurrido desde su último cursor (ID del stream).
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import time
+import redis
+from src.config import settings
+from src.monitoring.logger import Logger
+
+logger = Logger(__name__)
+
+START_CURSOR = "0-0"
+
+class ChangeLog:
+    """Log append-only de cambios, con retención y compactación configurables."""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        """Inicializar log de cambios.
+
+        Args:
+            redis_client: Cliente Redis; por defecto se conecta a REDIS_URL
+        """
+        self.redis = redis_client or redis.Redis.from_url(settings.REDIS_URL)
+        self.config = {
+            'max_entries': settings.SYNC_CHANGELOG_MAX_ENTRIES,
+            'retention': settings.SYNC_CHANGELOG_RETENTION,  # segundos
+            'compact': settings.SYNC_CHANGELOG_COMPACT,
+            'page_size': 500
+        }
+
+    def append(
+        self,
+        change: Dict[str, Any],
+        user_id: Optional[str] = None,
+        document_id: Optional[str] = None
+    ) -> Dict[str, str]:
+        """Agregar un cambio a los streams del usuario y del documento.
+
+        Args:
+            change: Cambio aplicado (type, action, id, data, timestamp, deviceId)
+            user_id: Usuario dueño del cambio
+            document_id: Documento afectado
+
+        Returns:
+            ID asignado en cada stream
+        """
+        keys = []
+        if user_id:
+            keys.append(self._stream_key('user', user_id))
+        if document_id:
+            keys.append(self._stream_key('document', document_id))
+        if not keys:
+            return {}
+
+        payload = {'change': json.dumps(change, default=str)}
+        min_id = f"{int((time.time() - self.config['retention']) * 1000)}-0"
+
+        pipeline = self.redis.pipeline()
+        for key in keys:
+            pipeline.xadd(
+                key,
+                payload,
+                maxlen=self.config['max_entries'],
+                approximate=True
+            )
+            pipeline.xtrim(key, minid=min_id, approximate=True)
+            pipeline.expire(key, self.config['retention'])
+        results = pipeline.execute()
+
+        # Cada stream ejecuta tres comandos; el primero devuelve el ID
+        return {
+            key: self._decode(results[i * 3])
+            for i, key in enumerate(keys)
+        }
+
+    def get_changes(
+        self,
+        cursor: Optional[str] = None,
+        user_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Obtener los cambios posteriores a un cursor.
+
+        Args:
+            cursor: Último cursor recibido por el cliente (None = desde el inicio)
+            user_id: Leer el stream del usuario
+            document_id: Leer el stream del documento (tiene prioridad)
+            limit: Máximo de entradas a leer
+
+        Returns:
+            Cambios, nuevo cursor, si quedan más y si el cliente debe
+            descargar el estado completo porque su cursor ya fue purgado
+        """
+        if document_id:
+            key = self._stream_key('document', document_id)
+        elif user_id:
+            key = self._stream_key('user', user_id)
+        else:
+            raise ValueError("Se requiere user_id o document_id")
+
+        cursor = cursor or START_CURSOR
+        limit = limit or self.config['page_size']
+
+        if self._cursor_expired(key, cursor):
+            return {
+                'changes': [],
+                'cursor': cursor,
+                'has_more': False,
+                'reset': True
+            }
+
+        entries = self.redis.xrange(key, min=f"({cursor}", max='+', count=limit)
+        changes: List[Tuple[str, Dict[str, Any]]] = [
+            (self._decode(entry_id), json.loads(self._decode(fields[b'change'])))
+            for entry_id, fields in entries
+        ]
+
+        next_cursor = changes[-1][0] if changes else cursor
+        if self.config['compact']:
+            changes = self._compact(changes)
+
+        return {
+            'changes': [{'cursor': entry_id, **change} for entry_id, change in changes],
+            'cursor': next_cursor,
+            'has_more': len(entries) >= limit,
+            'reset': False
+        }
+
+    def _cursor_expired(self, key: str, cursor: str) -> bool:
+        """Verificar si el cursor es anterior a la entrada más antigua retenida."""
+        if cursor == START_CURSOR:
+            return False
+        oldest = self.redis.xrange(key, min='-', max='+', count=1)
+        if not oldest:
+            # Stream vacío o expirado: si el cliente tenía cursor, perdió cambios
+            return self._parse_id(cursor)[0] < (time.time() - self.config['retention']) * 1000
+        return self._parse_id(cursor) < self._parse_id(self._decode(oldest[0][0]))
+
+    def _compact(
+        self,
+        changes: List[Tuple[str, Dict[str, Any]]]
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Reducir los cambios de cada entidad a su efecto neto.
+
+        - create + update* -> create con los datos combinados
+        - update + update* -> un update con los datos combinados
+        - cualquier cadena + delete -> delete
+        - delete + create -> la cadena vuelve a empezar con el create
+
+        La entrada resultante ocupa la posición (y el cursor) del último
+        cambio de la entidad.
+        """
+        merged: Dict[Any, Tuple[int, str, Dict[str, Any]]] = {}
+        for index, (entry_id, change) in enumerate(changes):
+            entity = (change.get('type'), change.get('id'))
+            if entity[1] is None:
+                entity = ('__unkeyed__', index)
+            previous = merged.get(entity)
+            if (
+                previous is not None
+                and change.get('action') != 'delete'
+                and previous[2].get('action') != 'delete'
+            ):
+                earlier = previous[2]
+                change = {
+                    **change,
+                    'action': 'create' if earlier.get('action') == 'create' else change.get('action'),
+                    'data': self._combine_data(earlier.get('data'), change.get('data'))
+                }
+            merged[entity] = (index, entry_id, change)
+        return [(entry_id, change) for _, entry_id, change in sorted(merged.values(), key=lambda m: m[0])]
+
+    @staticmethod
+    def _combine_data(previous: Any, current: Any) -> Any:
+        """Combinar los datos de dos cambios sucesivos (gana el último)."""
+        if isinstance(previous, dict) and isinstance(current, dict):
+            return {**previous, **current}
+        return current
+
+    @staticmethod
+    def _stream_key(scope: str, identifier: str) -> str:
+        """Key del stream de cambios."""
+        return f"sync:changes:{scope}:{identifier}"
+
+    @staticmethod
+    def _parse_id(entry_id: str) -> Tuple[int, int]:
+        """Convertir un ID de stream en tupla comparable."""
+        ms, _, seq = entry_id.partition('-')
+        return int(ms), int(seq or 0)
+
+    @staticmethod
+    def _decode(value: Any) -> str:
+        return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,249 @@
+"""
+Historial del chat de documentos en dos niveles.
+Los mensajes recientes de cada documento viven en un sorted set de Redis
+(ventana caliente, puntuado por número de secuencia); cuando la ventana se
+excede en un lote, los más antiguos se archivan en Postgres y se recortan.
+La lectura pagina por cursor (`before` = secuencia) y lee de Redis lo que
+esté en la ventana y de Postgres el resto.
+
+Los documentos con chat anterior a la ventana (una lista sin secuencias en
+`document:{id}:chat`) se copian a la ventana la primera vez que se usan,
+numerando sus mensajes antes de cualquier mensaje nuevo. La tabla del
+archivo se crea con migrations/20261019_create_document_chat_messages.sql.
+"""
+from typing import Any, Callable, Dict, List, Optional, Set
+from datetime import datetime
+from uuid import UUID
+import asyncio
+import json
+import redis
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from src.config import settings
+from src.database.redis import RedisKeys
+from src.monitoring.logger import Logger
+
+logger = Logger(__name__)
+
+class ChatHistoryService:
+    """Ventana caliente en Redis y archivo en Postgres del chat."""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        session_factory: Optional[Callable[[], Session]] = None
+    ):
+        """Inicializar servicio.
+
+        Args:
+            redis_client: Cliente Redis
+            session_factory: Crea sesiones de base de datos para el archivo;
+                            sin ella los mensajes fuera de la ventana se descartan
+        """
+        self.redis = redis_client
+        self.session_factory = session_factory
+        # Documentos cuyo chat anterior ya se verificó o copió
+        self._migrated: Set[str] = set()
+        self.config = {
+            'hot_window': settings.CHAT_HOT_WINDOW,
+            'archive_batch': settings.CHAT_ARCHIVE_BATCH,
+            'page_size': settings.CHAT_PAGE_SIZE,
+            'max_page_size': settings.CHAT_MAX_PAGE_SIZE
+        }
+
+    def append(self, document_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Guardar un mensaje en la ventana caliente.
+
+        Args:
+            document_id: ID del documento
+            message: Mensaje de chat (sin secuencia)
+
+        Returns:
+            Mensaje con su número de secuencia (`seq`)
+        """
+        self._migrate_legacy(document_id)
+        seq = self.redis.incr(self._seq_key(document_id))
+        message = {**message, 'seq': seq}
+        self.redis.zadd(RedisKeys.document_chat(document_id), {json.dumps(message): seq})
+        return message
+
+    def needs_archive(self, document_id: str) -> bool:
+        """Verificar si la ventana excede su tamaño en al menos un lote."""
+        size = self.redis.zcard(RedisKeys.document_chat(document_id))
+        return size >= self.config['hot_window'] + self.config['archive_batch']
+
+    async def archive(self, document_id: str) -> int:
+        """Mover a Postgres los mensajes que exceden la ventana caliente.
+
+        Un solo worker archiva cada documento a la vez; la inserción ignora
+        secuencias ya archivadas, por lo que reintentar es seguro.
+
+        Returns:
+            Número de mensajes que salieron de Redis
+        """
+        lock_key = f"document:{document_id}:chat:archiving"
+        if not self.redis.set(lock_key, 1, nx=True, ex=60):
+            return 0
+
+        try:
+            key = RedisKeys.document_chat(document_id)
+            excess = self.redis.zcard(key) - self.config['hot_window']
+            if excess <= 0:
+                return 0
+
+            messages = [json.loads(raw) for raw in self.redis.zrange(key, 0, excess - 1)]
+            if self.session_factory:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self._store_archived, document_id, messages)
+            else:
+                logger.warning(
+                    f"No chat archive configured; dropping {len(messages)} messages of {document_id}"
+                )
+
+            # Recortar por secuencia: mensajes nuevos no se ven afectados
+            self.redis.zremrangebyscore(key, '-inf', messages[-1]['seq'])
+            return len(messages)
+        except Exception as e:
+            logger.error(f"Error archiving chat of document {document_id}: {str(e)}")
+            return 0
+        finally:
+            self.redis.delete(lock_key)
+
+    async def history(
+        self,
+        document_id: str,
+        before: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Obtener una página del historial, del más antiguo al más nuevo.
+
+        Args:
+            document_id: ID del documento
+            before: Devolver mensajes con secuencia menor (cursor); None para
+                   los más recientes
+            limit: Tamaño de página
+
+        Returns:
+            {'messages': [...], 'next_cursor': secuencia para la página
+            anterior o None si no hay más}
+        """
+        limit = max(1, min(limit or self.config['page_size'], self.config['max_page_size']))
+        self._migrate_legacy(document_id)
+        upper = f"({before}" if before is not None else '+inf'
+
+        # Nivel caliente: O(log n + limit)
+        raw = self.redis.zrevrangebyscore(RedisKeys.document_chat(document_id), upper, '-inf', start=0, num=limit)
+        messages = [json.loads(item) for item in raw]
+
+        # Lo que falte está archivado y es anterior a todo lo leído de Redis
+        if len(messages) < limit and self.session_factory:
+            oldest = messages[-1]['seq'] if messages else before
+            loop = asyncio.get_running_loop()
+            messages.extend(await loop.run_in_executor(
+                None, self._load_archived, document_id, oldest, limit - len(messages)
+            ))
+
+        messages.reverse()
+        has_more = len(messages) == limit and messages[0]['seq'] > 1
+        return {
+            'messages': messages,
+            'next_cursor': messages[0]['seq'] if has_more else None
+        }
+
+    def _migrate_legacy(self, document_id: str) -> int:
+        """Copiar a la ventana caliente el chat guardado en la lista anterior.
+
+        Se hace en una transacción sobre la lista y el contador de
+        secuencias, de modo que otro worker que escriba o migre a la vez
+        repite la lectura en vez de duplicar mensajes o secuencias. Si la
+        lista es más grande que la ventana, el siguiente mensaje dispara el
+        archivo habitual.
+
+        Returns:
+            Número de mensajes copiados
+        """
+        if document_id in self._migrated:
+            return 0
+        legacy_key = RedisKeys.document_chat_legacy(document_id)
+        seq_key = self._seq_key(document_id)
+        if not self.redis.exists(legacy_key):
+            self._migrated.add(document_id)
+            return 0
+
+        def migrate(pipeline) -> int:
+            if pipeline.type(legacy_key) not in (b'list', 'list'):
+                return 0
+            items = pipeline.lrange(legacy_key, 0, -1)
+            # Normalmente 0: todo escritor migra antes de numerar
+            seq = int(pipeline.get(seq_key) or 0)
+            messages = {}
+            for offset, raw in enumerate(items, start=1):
+                messages[json.dumps({**json.loads(raw), 'seq': seq + offset})] = seq + offset
+            pipeline.multi()
+            if messages:
+                pipeline.zadd(RedisKeys.document_chat(document_id), messages)
+                pipeline.set(seq_key, seq + len(messages))
+            pipeline.delete(legacy_key)
+            return len(messages)
+
+        copied = self.redis.transaction(migrate, legacy_key, seq_key, value_from_callable=True)
+        if copied:
+            logger.info(f"Copied {copied} legacy chat messages of {document_id} to the hot window")
+        self._migrated.add(document_id)
+        return copied
+
+    @staticmethod
+    def _seq_key(document_id: str) -> str:
+        """Key del contador de secuencias del chat."""
+        return f"document:{document_id}:chat:seq"
+
+    def _store_archived(self, document_id: str, messages: List[Dict[str, Any]]):
+        """Insertar un lote en Postgres en una transacción."""
+        # El modelo solo se necesita si hay archivo configurado
+        from src.models.chat import ChatMessage
+
+        session = self.session_factory()
+        try:
+            statement = insert(ChatMessage).values([
+                {
+                    'document_id': UUID(document_id),
+                    'seq': message['seq'],
+                    'user_id': message['user_id'],
+                    'content': message['content'],
+                    'message_type': message.get('message_type', 'text'),
+                    'created_at': _parse_timestamp(message.get('timestamp'))
+                }
+                for message in messages
+            ]).on_conflict_do_nothing(index_elements=['document_id', 'seq'])
+            session.execute(statement)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def _load_archived(
+        self,
+        document_id: str,
+        before: Optional[int],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Mensajes archivados anteriores a `before`, del más nuevo al más antiguo."""
+        from src.models.chat import ChatMessage
+
+        session = self.session_factory()
+        try:
+            query = session.query(ChatMessage).filter(ChatMessage.document_id == UUID(document_id))
+            if before is not None:
+                query = query.filter(ChatMessage.seq < before)
+            rows = query.order_by(ChatMessage.seq.desc()).limit(limit).all()
+            return [row.to_dict() for row in rows]
+        finally:
+            session.close()
+
+def _parse_timestamp(value: Optional[str]) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return datetime.utcnow()
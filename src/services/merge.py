@@ -0,0 +1,236 @@
+"""
+Merge de tres vías para la sincronización offline.
+Compara el estado del cliente y el del servidor contra la versión que el
+cliente sincronizó por última vez (base), de modo que se distingue un
+elemento eliminado de uno que simplemente no existía.
+"""
+from typing import Any, Dict, Hashable, List, Tuple
+import json
+
+# Marca de valor ausente (distinta de None, que es un valor válido)
+MISSING = object()
+
+DEFAULT_LIST_KEY = 'id'
+
+def three_way_merge(
+    base: Any,
+    local: Any,
+    remote: Any,
+    list_key: str = DEFAULT_LIST_KEY
+) -> Tuple[Any, List[Dict[str, Any]]]:
+    """Combinar cambios del cliente (local) y del servidor (remote).
+
+    - Diccionarios: se combinan clave por clave.
+    - Listas de diccionarios con `list_key` (p. ej. anotaciones): se combinan
+      elemento por elemento según su ID, conservando el orden.
+    - Otras listas: se aplican las altas y bajas de cada lado.
+    - Escalares: gana el lado que cambió; si cambiaron ambos, el cliente.
+
+    Args:
+        base: Estado sincronizado por última vez (None si no se conoce)
+        local: Estado del cliente
+        remote: Estado del servidor
+        list_key: Campo que identifica elementos de listas
+
+    Returns:
+        Estado combinado y lista de conflictos resueltos ({path, base,
+        local, remote, resolution})
+    """
+    conflicts: List[Dict[str, Any]] = []
+    merged = _merge(MISSING if base is None else base, local, remote, list_key, '', conflicts)
+    return merged, conflicts
+
+def _merge(base: Any, local: Any, remote: Any, list_key: str, path: str, conflicts: List[Dict]) -> Any:
+    if local == remote:
+        return local
+    if base is not MISSING:
+        if local == base:
+            return remote
+        if remote == base:
+            return local
+
+    if isinstance(local, dict) and isinstance(remote, dict):
+        return _merge_dicts(
+            base if isinstance(base, dict) else {},
+            local, remote, list_key, path, conflicts
+        )
+
+    if isinstance(local, list) and isinstance(remote, list):
+        base_list = base if isinstance(base, list) else []
+        if _is_keyed(local, list_key) and _is_keyed(remote, list_key) and _is_keyed(base_list, list_key):
+            return _merge_keyed_lists(base_list, local, remote, list_key, path, conflicts)
+        return _merge_lists(base_list, local, remote)
+
+    # Ambos cambiaron el mismo valor: se conserva el del cliente
+    conflicts.append({
+        'path': path,
+        'base': None if base is MISSING else base,
+        'local': local,
+        'remote': remote,
+        'resolution': 'local'
+    })
+    return local
+
+def _merge_dicts(
+    base: Dict,
+    local: Dict,
+    remote: Dict,
+    list_key: str,
+    path: str,
+    conflicts: List[Dict]
+) -> Dict:
+    merged = {}
+    for key in list(remote) + [k for k in local if k not in remote]:
+        value = _merge_entry(
+            base.get(key, MISSING),
+            local.get(key, MISSING),
+            remote.get(key, MISSING),
+            list_key,
+            f"{path}.{key}" if path else str(key),
+            conflicts
+        )
+        if value is not MISSING:
+            merged[key] = value
+    return merged
+
+def _merge_entry(base: Any, local: Any, remote: Any, list_key: str, path: str, conflicts: List[Dict]) -> Any:
+    """Combinar una entrada que puede faltar en alguno de los lados."""
+    if local is MISSING and remote is MISSING:
+        return MISSING
+    if local is MISSING or remote is MISSING:
+        present = remote if local is MISSING else local
+        if base is MISSING:
+            # Agregado en un solo lado
+            return present
+        if present == base:
+            # Eliminado en el otro lado sin cambios en este
+            return MISSING
+        # Modificado en un lado y eliminado en el otro: se conserva
+        conflicts.append({
+            'path': path,
+            'base': base,
+            'local': None if local is MISSING else local,
+            'remote': None if remote is MISSING else remote,
+            'resolution': 'keep'
+        })
+        return present
+    return _merge(base, local, remote, list_key, path, conflicts)
+
+def _merge_keyed_lists(
+    base: List[Dict],
+    local: List[Dict],
+    remote: List[Dict],
+    list_key: str,
+    path: str,
+    conflicts: List[Dict]
+) -> List[Dict]:
+    """Combinar listas de elementos con ID en O(n)."""
+    base_by_id = {item[list_key]: item for item in base}
+    local_by_id = {item[list_key]: item for item in local}
+    remote_by_id = {item[list_key]: item for item in remote}
+
+    merged: Dict[Hashable, Any] = {}
+    for item_id in _merged_order(
+        [item[list_key] for item in local],
+        [item[list_key] for item in remote]
+    ):
+        value = _merge_entry(
+            base_by_id.get(item_id, MISSING),
+            local_by_id.get(item_id, MISSING),
+            remote_by_id.get(item_id, MISSING),
+            list_key,
+            f"{path}[{item_id}]",
+            conflicts
+        )
+        if value is not MISSING:
+            merged[item_id] = value
+    return list(merged.values())
+
+def _merge_lists(base: List, local: List, remote: List) -> List:
+    """Combinar listas sin ID aplicando altas y bajas de cada lado.
+
+    Los elementos se comparan por valor (también diccionarios), contando
+    repeticiones.
+    """
+    base_counts = _counts(base)
+    local_counts = _counts(local)
+    remote_counts = _counts(remote)
+
+    result = []
+    taken: Dict[str, int] = {}
+    for item in _merged_order_values(local, remote):
+        key = _value_key(item)
+        in_base = base_counts.get(key, 0)
+        in_local = local_counts.get(key, 0)
+        in_remote = remote_counts.get(key, 0)
+        # Copias de la base que sobreviven a ambos lados, más las agregadas
+        keep = (
+            in_base
+            - max(in_base - in_local, in_base - in_remote, 0)
+            + max(in_local - in_base, 0)
+            + max(in_remote - in_base, 0)
+        ) if in_base else max(in_local, in_remote)
+        taken[key] = taken.get(key, 0) + 1
+        if taken[key] <= keep:
+            result.append(item)
+    return result
+
+def _merged_order(local: List[Hashable], remote: List[Hashable]) -> List[Hashable]:
+    """Orden combinado: el del servidor, con los elementos nuevos del
+    cliente insertados tras su vecino anterior en el cliente."""
+    remote_set = set(remote)
+    after: Dict[Any, List[Hashable]] = {}
+    anchor: Any = MISSING
+    for item_id in local:
+        if item_id in remote_set:
+            anchor = item_id
+        else:
+            after.setdefault(anchor, []).append(item_id)
+
+    order = list(after.get(MISSING, []))
+    for item_id in remote:
+        order.append(item_id)
+        order.extend(after.get(item_id, []))
+    return order
+
+def _merged_order_values(local: List, remote: List) -> List:
+    """`_merged_order` para valores arbitrarios (con repeticiones)."""
+    local_keys = _occurrence_keys(local)
+    remote_keys = _occurrence_keys(remote)
+    values = dict(zip(local_keys, local))
+    values.update(zip(remote_keys, remote))
+    return [values[key] for key in _merged_order(local_keys, remote_keys)]
+
+def _occurrence_keys(values: List) -> List[Tuple[str, int]]:
+    """Clave hashable por valor y número de aparición."""
+    seen: Dict[str, int] = {}
+    keys = []
+    for value in values:
+        key = _value_key(value)
+        seen[key] = seen.get(key, 0) + 1
+        keys.append((key, seen[key]))
+    return keys
+
+def _counts(values: List) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for value in values:
+        key = _value_key(value)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+def _value_key(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+def _is_keyed(items: List, list_key: str) -> bool:
+    """Verificar si todos los elementos son diccionarios con ID único."""
+    ids = set()
+    for item in items:
+        if not isinstance(item, dict) or item.get(list_key) is None:
+            return False
+        try:
+            if item[list_key] in ids:
+                return False
+            ids.add(item[list_key])
+        except TypeError:
+            return False
+    return True
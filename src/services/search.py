@@ -7,6 +7,7 @@ from src.config import settings
 from src.monitoring.logger import Logger
 from src.monitoring.metrics import search_metrics
 from src.services.search_cache import SearchCache
+from src.services.search_batcher import SearchBatcher
 
 logger = Logger(__name__)
 
@@ -15,6 +16,7 @@ class SearchService:
         """Inicializar servicio de búsqueda."""
         self.es = AsyncElasticsearch([settings.ES_URL])
         self.cache = SearchCache()
+        self.batcher = SearchBatcher(self.es)
         
     async def search_document(
         self,
@@ -47,13 +49,13 @@ class SearchService:
                     logger.info(f"Cache hit for query: {query}")
                     return cached
                 
-                # 2. Realizar búsqueda en Elasticsearch
+                # 2. Realizar búsqueda en Elasticsearch (agrupada vía _msearch)
                 search_body = self._build_search_query(query, options)
+                search_body["_source"] = ["text", "pageNumber", "position"]
                 
-                results = await self.es.search(
+                results = await self.batcher.search(
                     index=f"documents_{document_id}",
-                    body=search_body,
-                    _source=["text", "pageNumber", "position"]
+                    body=search_body
                 )
                 
                 # 3. Formatear resultados
@@ -87,7 +89,9 @@ class SearchService:
     async def get_search_stats(self) -> Dict:
         """Obtener estadísticas de búsqueda."""
         try:
-            return await self.cache.get_stats()
+            stats = await self.cache.get_stats()
+            stats["batching"] = self.batcher.get_stats()
+            return stats
         except Exception as e:
             logger.error(f"Error getting search stats: {str(e)}")
             return {}
@@ -0,0 +1,144 @@
+"""
+Micro-batching de búsquedas sobre Elasticsearch.
+Agrupa las queries que llegan dentro de una ventana corta en un único `_msearch`
+y reparte las respuestas entre los solicitantes.
+"""
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio
+from src.config import settings
+from src.monitoring.logger import Logger
+from src.monitoring.metrics import metrics
+
+logger = Logger(__name__)
+
+class SearchBatcher:
+    """Agrupa búsquedas concurrentes en requests `_msearch`."""
+
+    def __init__(
+        self,
+        es,
+        window_ms: Optional[float] = None,
+        max_batch_size: Optional[int] = None
+    ):
+        """Inicializar batcher.
+
+        Args:
+            es: Cliente AsyncElasticsearch
+            window_ms: Tiempo máximo de espera para completar un lote
+            max_batch_size: Número máximo de queries por `_msearch`
+        """
+        self.es = es
+        self.config = {
+            'window_ms': window_ms if window_ms is not None else settings.SEARCH_BATCH_WINDOW_MS,
+            'max_batch_size': max_batch_size or settings.SEARCH_BATCH_MAX_SIZE
+        }
+        self._pending: List[Tuple[Dict, Dict, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._inflight: Set[asyncio.Task] = set()  # flushes de lotes llenos
+        self.stats = {
+            'batches': 0,
+            'queries': 0,
+            'full_batches': 0,
+            'errors': 0
+        }
+
+    async def search(self, index: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Encolar una búsqueda y esperar su respuesta.
+
+        Args:
+            index: Índice sobre el que buscar
+            body: Cuerpo de la búsqueda
+
+        Returns:
+            Respuesta de Elasticsearch para esta búsqueda
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(({'index': index}, body, future))
+
+        if len(self._pending) >= self.config['max_batch_size']:
+            # Lote lleno: enviar sin esperar a la ventana. El flush corre en su
+            # propia tarea para que cancelar a este solicitante no deje sin
+            # respuesta al resto del lote.
+            self._cancel_timer()
+            batch, self._pending = self._pending, []
+            task = asyncio.create_task(self._flush(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after_window())
+
+        return await future
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Obtener estadísticas de llenado de lotes."""
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'avg_batch_size': self.stats['queries'] / batches if batches else 0.0,
+            'avg_batch_fill': (
+                self.stats['queries'] / (batches * self.config['max_batch_size'])
+                if batches else 0.0
+            )
+        }
+
+    def _cancel_timer(self):
+        """Cancelar el flush programado, si existe."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+    async def _flush_after_window(self):
+        """Esperar la ventana de batching y enviar lo acumulado."""
+        try:
+            await asyncio.sleep(self.config['window_ms'] / 1000)
+        except asyncio.CancelledError:
+            return
+        self._flush_task = None
+        await self._flush()
+
+    async def _flush(self, batch: Optional[List[Tuple[Dict, Dict, asyncio.Future]]] = None):
+        """Enviar un lote (por defecto, las búsquedas pendientes) como un único `_msearch`."""
+        if batch is None:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        self._record_batch(len(batch))
+
+        body: List[Dict[str, Any]] = []
+        for header, search_body, _ in batch:
+            body.append(header)
+            body.append(search_body)
+
+        try:
+            response = await self.es.msearch(body=body)
+        except asyncio.CancelledError:
+            for _, _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Error in msearch batch: {str(e)}")
+            self.stats['errors'] += 1
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        responses = response.get('responses', [])
+        for i, (_, _, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i >= len(responses):
+                future.set_exception(RuntimeError("msearch response missing item"))
+            elif 'error' in responses[i]:
+                future.set_exception(RuntimeError(str(responses[i]['error'])))
+            else:
+                future.set_result(responses[i])
+
+    def _record_batch(self, size: int):
+        """Registrar métricas de llenado de un lote."""
+        self.stats['batches'] += 1
+        self.stats['queries'] += size
+        if size >= self.config['max_batch_size']:
+            self.stats['full_batches'] += 1
+        metrics.track_search_batch(size, self.config['max_batch_size'])
@@ -46,12 +46,13 @@ class SearchCache:
                 
                 # Obtener datos de caché
                 cached = self.redis.get(cache_key)
-                if not cached:
-                    return None
                 
-                # Actualizar estadísticas
-                self._update_stats(cache_key, hit=True)
+                # Actualizar estadísticas; los fallos también cuentan para la
+                # frecuencia que decide si la query se cachea
+                self._update_stats(cache_key, hit=bool(cached))
                 
+                if not cached:
+                    return None
                 return json.loads(cached)
                 
         except Exception as e:
@@ -91,9 +92,6 @@ class SearchCache:
                     json.dumps(results)
                 )
                 
-                # Actualizar estadísticas
-                self._update_stats(cache_key, hit=False)
-                
                 return True
                 
         except Exception as e:
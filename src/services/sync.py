@@ -1,20 +1,43 @@
 """
 Servicio de sincronización offline.
 """
-from typing import Dict, List, Optional
-from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
+import asyncio
 import json
 from src.config import settings
 from src.monitoring.logger import Logger
 from src.monitoring.metrics import sync_metrics
+from src.services.change_log import ChangeLog
+from src.services.merge import three_way_merge
+from src.services.sync_idempotency import IdempotencyStore, group_sequences
+from src.services.sync_state import SyncStateStore
 
 logger = Logger(__name__)
 
 class SyncService:
     """Servicio para gestionar sincronización offline."""
     
-    def __init__(self):
-        """Inicializar servicio de sincronización."""
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        change_log: Optional[ChangeLog] = None,
+        idempotency: Optional[IdempotencyStore] = None,
+        state_store: Optional[SyncStateStore] = None
+    ):
+        """Inicializar servicio de sincronización.
+        
+        Args:
+            max_concurrency: Máximo de entidades procesadas en paralelo
+            change_log: Log de cambios para sincronización incremental
+            idempotency: Registro de operaciones ya aplicadas
+            state_store: Último estado sincronizado de cada entidad
+        """
+        self.max_concurrency = max_concurrency or settings.SYNC_MAX_CONCURRENCY
+        self.change_log = change_log or ChangeLog()
+        self.idempotency = idempotency or IdempotencyStore()
+        self.state_store = state_store or SyncStateStore()
+        
         self.priorities = {
             'CRITICAL': {
                 'types': ['document', 'annotations'],
@@ -46,14 +69,20 @@ class SyncService:
         self,
         operations: List[Dict],
         last_sync: str,
-        device_id: str
+        device_id: str,
+        user_id: Optional[str] = None
     ) -> Dict:
         """Sincronizar operaciones pendientes.
         
         Args:
-            operations: Lista de operaciones pendientes
-            last_sync: Timestamp de última sincronización
+            operations: Lista de operaciones pendientes; pueden incluir
+                'base', el estado de la entidad en la última sincronización,
+                que se usa como ancestro común al combinar
+            last_sync: Timestamp de última sincronización (`syncTimestamp`
+                de la respuesta anterior); solo los cambios de otros
+                dispositivos posteriores a él son conflicto
             device_id: ID del dispositivo
+            user_id: Usuario que sincroniza
             
         Returns:
             Resultado de sincronización
@@ -64,38 +93,40 @@ class SyncService:
                 validated_ops = self._validate_operations(operations)
                 sorted_ops = self._sort_by_priority(validated_ops)
                 
-                # 2. Procesar operaciones
-                results = []
-                conflicts = []
+                # 2. Omitir operaciones ya aplicadas en un intento anterior
+                pending_ops, duplicates = await asyncio.to_thread(self._skip_applied, sorted_ops)
                 
-                for op in sorted_ops:
-                    try:
-                        # Verificar si la operación está dentro del tiempo máximo
-                        if not self._is_operation_valid(op):
-                            conflicts.append(self._create_conflict(
-                                op,
-                                None,
-                                'EXPIRED',
-                                None
-                            ))
-                            continue
-                        
-                        # Procesar operación
-                        result = await self._process_operation(op)
-                        
-                        if result.get('conflict'):
-                            conflicts.append(result['conflict'])
-                        else:
-                            results.append(result)
-                            
-                    except Exception as e:
-                        logger.error(f"Error processing operation: {str(e)}")
-                        conflicts.append(self._create_conflict(
-                            op,
-                            None,
-                            'ERROR',
-                            str(e)
-                        ))
+                # 3. Agrupar por entidad, compactar cada cadena de operaciones
+                #    y obtener estado del servidor en bloque
+                groups = self._group_by_entity(pending_ops)
+                compacted_away = []
+                for key, ops in groups.items():
+                    groups[key], dropped = self._compact_operations(ops)
+                    compacted_away.extend(dropped)
+                await asyncio.to_thread(self._mark_applied, compacted_away)
+                
+                server_states = await self._prefetch_server_states(
+                    [op for ops in groups.values() for op in ops]
+                )
+                
+                # 4. Procesar entidades en paralelo, en orden dentro de cada una
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                outcomes = await asyncio.gather(*[
+                    self._process_entity(ops, server_states, semaphore, user_id, last_sync)
+                    for ops in groups.values()
+                ])
+                
+                results = [
+                    {'operation': op, 'status': 'duplicate', 'result': None}
+                    for op in duplicates
+                ] + [
+                    {'operation': op, 'status': 'compacted', 'result': None}
+                    for op in compacted_away
+                ]
+                conflicts = []
+                for entity_results, entity_conflicts in outcomes:
+                    results.extend(entity_results)
+                    conflicts.extend(entity_conflicts)
                 
                 return {
                     'success': len(conflicts) == 0,
@@ -108,17 +139,81 @@ class SyncService:
             logger.error(f"Error in sync: {str(e)}")
             raise
 
-    async def _process_operation(self, operation: Dict) -> Dict:
-        """Procesar una operación individual."""
+    async def _process_entity(
+        self,
+        operations: List[Dict],
+        server_states: Dict[Tuple[str, str], Optional[Dict]],
+        semaphore: asyncio.Semaphore,
+        user_id: Optional[str] = None,
+        last_sync: Optional[str] = None
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """Procesar en orden las operaciones de una misma entidad.
+        
+        Las escrituras en Redis (estado, log de cambios, secuencias
+        aplicadas) se hacen en un hilo para no bloquear el loop mientras se
+        procesan las demás entidades.
+        """
+        results = []
+        conflicts = []
+        
+        async with semaphore:
+            for op in operations:
+                try:
+                    # Verificar si la operación está dentro del tiempo máximo
+                    if not self._is_operation_valid(op):
+                        conflicts.append(self._create_conflict(
+                            op,
+                            None,
+                            'EXPIRED',
+                            None
+                        ))
+                        continue
+                    
+                    key = self._entity_key(op)
+                    result = await self._process_operation(
+                        op,
+                        server_states.get(key),
+                        last_sync
+                    )
+                    
+                    if result.get('conflict'):
+                        conflicts.append(result['conflict'])
+                    else:
+                        results.append(result)
+                        # Las siguientes operaciones de la entidad ven este estado
+                        if key is not None:
+                            server_states[key] = self._state_after(op)
+                            await asyncio.to_thread(self._save_state, key, server_states[key])
+                        await asyncio.to_thread(self._record_change, op, user_id)
+                        
+                except Exception as e:
+                    logger.error(f"Error processing operation: {str(e)}")
+                    conflicts.append(self._create_conflict(
+                        op,
+                        None,
+                        'ERROR',
+                        str(e)
+                    ))
+        
+        await asyncio.to_thread(self._mark_applied, [r['operation'] for r in results])
+        return results, conflicts
+
+    async def _process_operation(
+        self,
+        operation: Dict,
+        server_state: Optional[Dict] = None,
+        last_sync: Optional[str] = None
+    ) -> Dict:
+        """Procesar una operación individual.
+        
+        Args:
+            operation: Operación a procesar
+            server_state: Estado actual de la entidad en el servidor
+            last_sync: Timestamp de la última sincronización del cliente
+        """
         try:
-            # Obtener estado actual del servidor
-            server_state = await self._get_server_state(
-                operation['type'],
-                operation.get('id')
-            )
-            
             # Verificar conflictos
-            if self._has_conflict(operation, server_state):
+            if self._has_conflict(operation, server_state, last_sync):
                 # Resolver según estrategia
                 resolution = self._resolve_conflict(
                     operation,
@@ -137,6 +232,8 @@ class SyncService:
                 
                 # Usar estado resuelto
                 operation['data'] = resolution['data']
+                if resolution.get('conflicts'):
+                    operation['mergeConflicts'] = resolution['conflicts']
             
             # Ejecutar operación
             result = await self._execute_operation(operation)
@@ -207,6 +304,173 @@ class SyncService:
             )
         )
 
+    def _entity_key(self, operation: Dict) -> Optional[Tuple[str, str]]:
+        """Obtener la entidad afectada por una operación."""
+        entity_id = operation.get('id')
+        if entity_id is None and isinstance(operation.get('data'), dict):
+            entity_id = operation['data'].get('id')
+        if entity_id is None:
+            return None
+        return (operation['type'], str(entity_id))
+
+    def _group_by_entity(self, operations: List[Dict]) -> Dict[Any, List[Dict]]:
+        """Agrupar operaciones por entidad conservando su orden.
+        
+        Las operaciones sin ID de entidad forman cada una su propio grupo.
+        """
+        groups: Dict[Any, List[Dict]] = {}
+        for index, op in enumerate(operations):
+            key = self._entity_key(op) or ('__unkeyed__', index)
+            groups.setdefault(key, []).append(op)
+        return groups
+
+    def _compact_operations(self, operations: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Reducir la cadena de operaciones de una entidad a su efecto neto.
+        
+        - create + update* -> create con los datos combinados
+        - update + update* -> un update con los datos combinados
+        - (create | update)* + delete -> delete, o nada si la cadena empezó
+          con un create de este mismo lote
+        
+        Un delete cierra la cadena; lo que viene después empieza una nueva.
+        
+        Returns:
+            Operaciones compactadas y operaciones que se anularon entre sí
+        """
+        if len(operations) < 2 or self._entity_key(operations[0]) is None:
+            return operations, []
+        
+        compacted: List[Dict] = []
+        chains: List[List[Dict]] = []
+        dropped: List[Dict] = []
+        
+        for op in operations:
+            previous = compacted[-1] if compacted else None
+            
+            if previous is None or previous['action'] == 'delete':
+                compacted.append(dict(op))
+                chains.append([op])
+                continue
+            
+            chains[-1].append(op)
+            
+            if op['action'] == 'delete':
+                if previous['action'] == 'create':
+                    # Creada y eliminada sin llegar al servidor
+                    compacted.pop()
+                    dropped.extend(chains.pop())
+                else:
+                    compacted[-1] = dict(op)
+            else:
+                previous['data'] = self._combine_data(previous['data'], op['data'])
+                previous['timestamp'] = op['timestamp']
+        
+        for op, chain in zip(compacted, chains):
+            if len(chain) > 1:
+                op['compactedSequences'] = [
+                    o['sequence'] for o in chain if o.get('sequence') is not None
+                ]
+        
+        return compacted, dropped
+
+    def _combine_data(self, previous: Any, current: Any) -> Any:
+        """Combinar datos de dos actualizaciones sucesivas (gana la última)."""
+        if isinstance(previous, dict) and isinstance(current, dict):
+            return {**previous, **current}
+        return current
+
+    def _skip_applied(self, operations: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """Separar las operaciones que el servidor ya aplicó."""
+        applied = {}
+        try:
+            for device, sequences in group_sequences(operations).items():
+                applied[device] = self.idempotency.filter_applied(device, sequences)
+        except Exception as e:
+            logger.error(f"Error checking applied operations: {str(e)}")
+            return operations, []
+        
+        pending = []
+        duplicates = []
+        for op in operations:
+            if op.get('sequence') in applied.get(op['deviceId'], ()):
+                duplicates.append(op)
+            else:
+                pending.append(op)
+        return pending, duplicates
+
+    def _mark_applied(self, operations: List[Dict]):
+        """Registrar las secuencias de operaciones aplicadas."""
+        try:
+            for device, sequences in group_sequences(operations).items():
+                self.idempotency.mark_applied(device, sequences)
+        except Exception as e:
+            logger.error(f"Error marking applied operations: {str(e)}")
+
+    async def _prefetch_server_states(
+        self,
+        operations: List[Dict]
+    ) -> Dict[Tuple[str, str], Optional[Dict]]:
+        """Obtener el estado del servidor con una consulta por tipo de entidad."""
+        ids_by_type: Dict[str, List[str]] = {}
+        for op in operations:
+            key = self._entity_key(op)
+            if key is not None and key[1] not in ids_by_type.setdefault(key[0], []):
+                ids_by_type[key[0]].append(key[1])
+        
+        types = list(ids_by_type)
+        fetched = await asyncio.gather(*[
+            self._get_server_states(type, ids_by_type[type])
+            for type in types
+        ])
+        
+        states: Dict[Tuple[str, str], Optional[Dict]] = {}
+        for type, type_states in zip(types, fetched):
+            for entity_id in ids_by_type[type]:
+                states[(type, entity_id)] = type_states.get(entity_id)
+        return states
+
+    def _state_after(self, operation: Dict) -> Optional[Dict]:
+        """Estado de la entidad tras aplicar una operación."""
+        if operation['action'] == 'delete':
+            return None
+        return {
+            'data': operation['data'],
+            'timestamp': operation['timestamp'],
+            'deviceId': operation['deviceId'],
+            'syncedAt': datetime.utcnow().isoformat()
+        }
+
+    def _save_state(self, key: Tuple[str, str], state: Optional[Dict]):
+        """Guardar el estado de una entidad para las próximas sincronizaciones."""
+        try:
+            self.state_store.set(key[0], key[1], state)
+        except Exception as e:
+            logger.error(f"Error saving sync state: {str(e)}")
+
+    def _record_change(self, operation: Dict, user_id: Optional[str]):
+        """Registrar una operación aplicada en el log de cambios."""
+        data = operation['data'] if isinstance(operation['data'], dict) else {}
+        if operation['type'] == 'document':
+            document_id = operation.get('id')
+        else:
+            document_id = operation.get('documentId') or data.get('document_id')
+        
+        try:
+            self.change_log.append(
+                {
+                    'type': operation['type'],
+                    'action': operation['action'],
+                    'id': operation.get('id') or data.get('id'),
+                    'data': operation['data'],
+                    'timestamp': operation['timestamp'],
+                    'deviceId': operation['deviceId']
+                },
+                user_id=user_id,
+                document_id=document_id
+            )
+        except Exception as e:
+            logger.error(f"Error recording change: {str(e)}")
+
     def _is_operation_valid(self, operation: Dict) -> bool:
         """Verificar si una operación está dentro del tiempo máximo."""
         priority = self.priorities[operation['priority']]
@@ -225,34 +489,92 @@ class SyncService:
         id: Optional[str]
     ) -> Optional[Dict]:
         """Obtener estado actual del servidor."""
-        if type == 'document':
-            # TODO: Obtener estado del documento
-            pass
-        elif type == 'annotations':
-            # TODO: Obtener estado de anotaciones
-            pass
-        elif type == 'preferences':
-            # TODO: Obtener preferencias
-            pass
+        if id is None:
+            return None
+        states = await self._get_server_states(type, [str(id)])
+        return states.get(str(id))
+
+    async def _get_server_states(
+        self,
+        type: str,
+        ids: List[str]
+    ) -> Dict[str, Optional[Dict]]:
+        """Obtener en bloque el estado de varias entidades del mismo tipo.
         
-        return None
+        El estado es el que dejó la última operación sincronizada de cada
+        entidad (datos, timestamp y dispositivo).
+        """
+        try:
+            return await asyncio.to_thread(self.state_store.get_many, type, ids)
+        except Exception as e:
+            logger.error(f"Error fetching sync state for {type}: {str(e)}")
+            return {}
 
     def _has_conflict(
         self,
         operation: Dict,
-        server_state: Optional[Dict]
+        server_state: Optional[Dict],
+        last_sync: Optional[str] = None
     ) -> bool:
         """Verificar si hay conflicto con el estado del servidor."""
         if not server_state:
             return False
             
         if operation['type'] == 'document':
-            return self._check_document_conflict(operation, server_state)
+            return self._check_document_conflict(operation, server_state, last_sync)
         elif operation['type'] == 'annotations':
-            return self._check_annotation_conflict(operation, server_state)
+            return self._check_annotation_conflict(operation, server_state, last_sync)
             
         return False
 
+    def _check_document_conflict(
+        self,
+        operation: Dict,
+        server_state: Dict,
+        last_sync: Optional[str] = None
+    ) -> bool:
+        """Verificar si otro dispositivo modificó el documento tras la última sincronización."""
+        return self._changed_since(operation, server_state, last_sync)
+
+    def _check_annotation_conflict(
+        self,
+        operation: Dict,
+        server_state: Dict,
+        last_sync: Optional[str] = None
+    ) -> bool:
+        """Verificar si otro dispositivo modificó las anotaciones tras la última sincronización."""
+        return self._changed_since(operation, server_state, last_sync)
+
+    def _changed_since(
+        self,
+        operation: Dict,
+        server_state: Dict,
+        last_sync: Optional[str]
+    ) -> bool:
+        """Verificar si el estado del servidor es posterior a lo que vio el cliente.
+        
+        Un estado escrito por otro dispositivo solo es conflicto si se
+        sincronizó después de `last_sync`; si el cliente ya lo recibió, su
+        operación se hizo sobre él. Los estados sin `syncedAt` se comparan
+        por el timestamp de su operación.
+        """
+        if server_state.get('deviceId') == operation['deviceId']:
+            return False
+        if not last_sync:
+            return True
+        written = server_state.get('syncedAt') or server_state.get('timestamp')
+        if not written:
+            return True
+        return self._parse_time(written) > self._parse_time(last_sync)
+
+    @staticmethod
+    def _parse_time(value: str) -> datetime:
+        """Leer un timestamp ISO como UTC sin zona horaria."""
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+
     def _resolve_conflict(
         self,
         operation: Dict,
@@ -278,15 +600,17 @@ class SyncService:
                 }
                 
         elif strategy == 'MERGE':
-            # Intentar combinar cambios
-            merged = self._merge_states(
+            # Combinar contra la versión que el cliente sincronizó por última vez
+            merged, conflicts = three_way_merge(
+                operation.get('base'),
                 operation['data'],
                 server_state['data']
             )
             
             return {
                 'action': 'continue',
-                'data': merged
+                'data': merged,
+                'conflicts': conflicts
             }
             
         else:  # SERVER_WINS
@@ -325,22 +649,12 @@ class SyncService:
             'timestamp': datetime.utcnow().isoformat()
         }
 
-    def _merge_states(self, client_state: Dict, server_state: Dict) -> Dict:
-        """Combinar estados en conflicto."""
-        if isinstance(client_state, dict) and isinstance(server_state, dict):
-            merged = server_state.copy()
-            
-            for key, value in client_state.items():
-                if key in merged:
-                    merged[key] = self._merge_states(value, merged[key])
-                else:
-                    merged[key] = value
-                    
-            return merged
-            
-        elif isinstance(client_state, list) and isinstance(server_state, list):
-            # Para listas, usar conjunto para eliminar duplicados
-            return list(set(client_state + server_state))
-            
-        # Para valores simples, mantener el más reciente (cliente)
-        return client_state
+    def _merge_states(
+        self,
+        client_state: Any,
+        server_state: Any,
+        base_state: Any = None
+    ) -> Any:
+        """Combinar estados en conflicto (merge de tres vías)."""
+        merged, _ = three_way_merge(base_state, client_state, server_state)
+        return merged
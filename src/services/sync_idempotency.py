@@ -0,0 +1,74 @@
+"""
+Registro de operaciones ya aplicadas para reintentos idempotentes.
+Cada operación offline se identifica por dispositivo + número de secuencia;
+un lote reenviado omite las que el servidor ya ejecutó.
+"""
+from typing import Dict, Iterable, List, Optional, Set
+import redis
+from src.config import settings
+
+class IdempotencyStore:
+    """Secuencias aplicadas por dispositivo en un sorted set de Redis."""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        """Inicializar registro.
+
+        Args:
+            redis_client: Cliente Redis; por defecto se conecta a REDIS_URL
+        """
+        self.redis = redis_client or redis.Redis.from_url(settings.REDIS_URL)
+        self.config = {
+            'ttl': settings.SYNC_IDEMPOTENCY_TTL,  # segundos
+            'window': settings.SYNC_IDEMPOTENCY_WINDOW  # secuencias retenidas
+        }
+
+    def filter_applied(self, device_id: str, sequences: Iterable[int]) -> Set[int]:
+        """Obtener cuáles de las secuencias ya fueron aplicadas.
+
+        Args:
+            device_id: ID del dispositivo
+            sequences: Números de secuencia a verificar
+
+        Returns:
+            Secuencias ya aplicadas
+        """
+        sequences = list(sequences)
+        if not sequences:
+            return set()
+
+        pipeline = self.redis.pipeline()
+        for seq in sequences:
+            pipeline.zscore(self._key(device_id), str(seq))
+        scores = pipeline.execute()
+
+        return {seq for seq, score in zip(sequences, scores) if score is not None}
+
+    def mark_applied(self, device_id: str, sequences: Iterable[int]):
+        """Registrar secuencias como aplicadas.
+
+        Se conservan solo las últimas `window` secuencias del dispositivo.
+        """
+        sequences = list(sequences)
+        if not sequences:
+            return
+
+        key = self._key(device_id)
+        pipeline = self.redis.pipeline()
+        pipeline.zadd(key, {str(seq): seq for seq in sequences})
+        pipeline.zremrangebyscore(key, '-inf', max(sequences) - self.config['window'])
+        pipeline.expire(key, self.config['ttl'])
+        pipeline.execute()
+
+    @staticmethod
+    def _key(device_id: str) -> str:
+        """Key del registro de un dispositivo."""
+        return f"sync:applied:{device_id}"
+
+def group_sequences(operations: Iterable[Dict]) -> Dict[str, List[int]]:
+    """Agrupar números de secuencia por dispositivo."""
+    by_device: Dict[str, List[int]] = {}
+    for op in operations:
+        for seq in op.get('compactedSequences', [op.get('sequence')]):
+            if seq is not None:
+                by_device.setdefault(op['deviceId'], []).append(seq)
+    return by_device
@@ -0,0 +1,52 @@
+"""
+Último estado sincronizado de cada entidad.
+Al aplicar una operación se guarda el estado resultante (datos, timestamp y
+dispositivo); la siguiente sincronización lo compara con sus operaciones
+para detectar conflictos con lo que escribió otro dispositivo.
+"""
+from typing import Any, Dict, Iterable, Optional
+import json
+import redis
+from src.config import settings
+
+class SyncStateStore:
+    """Estado por entidad en una key de Redis con expiración."""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        """Inicializar registro.
+
+        Args:
+            redis_client: Cliente Redis; por defecto se conecta a REDIS_URL
+        """
+        self.redis = redis_client or redis.Redis.from_url(settings.REDIS_URL)
+        self.config = {
+            'ttl': settings.SYNC_STATE_TTL  # segundos
+        }
+
+    def get_many(self, type: str, ids: Iterable[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Obtener con un MGET el estado de varias entidades del mismo tipo.
+
+        Returns:
+            Estado por ID; None si la entidad no tiene estado guardado
+        """
+        ids = list(ids)
+        if not ids:
+            return {}
+        values = self.redis.mget([self._key(type, entity_id) for entity_id in ids])
+        return {
+            entity_id: json.loads(value) if value is not None else None
+            for entity_id, value in zip(ids, values)
+        }
+
+    def set(self, type: str, entity_id: str, state: Optional[Dict[str, Any]]):
+        """Guardar el estado de una entidad; None la elimina."""
+        key = self._key(type, entity_id)
+        if state is None:
+            self.redis.delete(key)
+        else:
+            self.redis.set(key, json.dumps(state, default=str), ex=self.config['ttl'])
+
+    @staticmethod
+    def _key(type: str, entity_id: str) -> str:
+        """Key del estado de una entidad."""
+        return f"sync:state:{type}:{entity_id}"
@@ -0,0 +1,212 @@
+"""
+Almacén local de versiones de documentos como cadena de deltas.
+Cada N revisiones se guarda un snapshot completo; entre snapshots solo se
+guarda el delta producido por `src.utils.diff`, comprimido. Una revisión se
+reconstruye desde el snapshot más cercano aplicando a lo sumo N-1 deltas.
+Cada entrada guarda el seq del snapshot donde empieza su cadena, así que
+cambiar N no invalida las cadenas ya escritas.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import zlib
+import redis
+from src.config import settings
+from src.monitoring.logger import Logger
+from src.utils.diff import calculate_diff, apply_patch, strip_indices
+
+logger = Logger(__name__)
+
+SNAPSHOT = 'snapshot'
+DELTA = 'delta'
+
+# Campos de los cambios que solo sirven para mostrarlos; no se guardan
+_DISPLAY_FIELDS = ('content', 'old_content', 'new_content')
+
+class VersionStore:
+    """Historial de revisiones por documento en Redis."""
+
+    def __init__(self, redis_client: Optional[redis.Redis] = None):
+        """Inicializar almacén.
+
+        Args:
+            redis_client: Cliente Redis; por defecto se conecta a REDIS_URL
+        """
+        self.redis = redis_client or redis.Redis.from_url(settings.REDIS_URL)
+        self.config = {
+            'snapshot_interval': settings.VERSION_SNAPSHOT_INTERVAL,
+            'compression_level': settings.VERSION_COMPRESSION_LEVEL
+        }
+
+    def add_version(
+        self,
+        document_id: str,
+        revision_id: str,
+        content: Dict[str, Any],
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Registrar una nueva revisión al final del historial.
+
+        Args:
+            document_id: ID del documento
+            revision_id: ID de la revisión (Google Docs revisionId)
+            content: Contenido completo del documento en esa revisión
+            metadata: Datos adicionales (modifiedTime, lastModifyingUser)
+
+        Returns:
+            Entrada del historial; si la revisión ya existía, la existente
+        """
+        content = strip_indices(content)
+        snapshot = self._encode(content)
+        log_key = self._key(document_id, 'log')
+        ids_key = self._key(document_id, 'ids')
+        head_key = self._key(document_id, 'head')
+
+        def append(pipeline) -> Dict[str, Any]:
+            # Con WATCH sobre log, ids y head, dos escritores concurrentes no
+            # pueden tomar el mismo seq ni calcular el delta contra la misma
+            # cabeza: el que pierde repite la lectura
+            existing = self.get_entry(document_id, revision_id, pipeline)
+            if existing:
+                return existing
+
+            seq = pipeline.llen(log_key)
+            kind, blob = SNAPSHOT, snapshot
+            head = pipeline.get(head_key)
+            previous = pipeline.lindex(log_key, seq - 1) if seq else None
+            # Entradas anteriores sin snapshot_seq: se abre una cadena nueva
+            chain_start = json.loads(previous).get('snapshot_seq') if previous else None
+            if (
+                head is not None and chain_start is not None
+                and seq - chain_start < self.config['snapshot_interval']
+            ):
+                delta = self._encode(self._compact_changes(
+                    calculate_diff(self._decode(head), content)
+                ))
+                # Un delta más grande que el snapshot no aporta nada
+                if len(delta) < len(snapshot):
+                    kind, blob = DELTA, delta
+
+            entry = {
+                **(metadata or {}),
+                'revision_id': revision_id,
+                'seq': seq,
+                'kind': kind,
+                'snapshot_seq': seq if kind == SNAPSHOT else chain_start,
+                'size': len(blob),
+                'snapshot_size': len(snapshot)
+            }
+
+            pipeline.multi()
+            pipeline.hset(self._key(document_id, 'data'), str(seq), blob)
+            pipeline.hset(ids_key, revision_id, seq)
+            pipeline.rpush(log_key, json.dumps(entry, default=str))
+            pipeline.set(head_key, snapshot)
+            return entry
+
+        return self.redis.transaction(append, log_key, ids_key, head_key, value_from_callable=True)
+
+    def get_version(self, document_id: str, revision_id: str) -> Optional[Dict[str, Any]]:
+        """Reconstruir el contenido de una revisión.
+
+        Args:
+            document_id: ID del documento
+            revision_id: ID de la revisión
+
+        Returns:
+            Contenido del documento (sin startIndex/endIndex) o None si la
+            revisión no está almacenada
+        """
+        entry = self.get_entry(document_id, revision_id)
+        if entry is None:
+            return None
+        seq = entry['seq']
+
+        # Entradas escritas antes de guardar snapshot_seq: se busca el
+        # snapshot en todo el historial anterior
+        start = entry.get('snapshot_seq', 0)
+        chain = [
+            json.loads(raw)
+            for raw in self.redis.lrange(self._key(document_id, 'log'), start, seq)
+        ]
+        snapshots = [i for i, entry in enumerate(chain) if entry['kind'] == SNAPSHOT]
+        if not snapshots:
+            logger.error(f"No snapshot found for {document_id} revision {revision_id}")
+            return None
+        chain = chain[snapshots[-1]:]
+
+        blobs = self.redis.hmget(
+            self._key(document_id, 'data'),
+            [str(entry['seq']) for entry in chain]
+        )
+        content = self._decode(blobs[0])
+        for blob in blobs[1:]:
+            content = apply_patch(content, self._decode(blob))
+        return content
+
+    def has_version(self, document_id: str, revision_id: str) -> bool:
+        """Verificar si una revisión está almacenada."""
+        return bool(self.redis.hexists(self._key(document_id, 'ids'), revision_id))
+
+    def list_versions(self, document_id: str) -> List[Dict[str, Any]]:
+        """Obtener las entradas del historial, de la más antigua a la más reciente."""
+        return [
+            json.loads(raw)
+            for raw in self.redis.lrange(self._key(document_id, 'log'), 0, -1)
+        ]
+
+    def get_stats(self, document_id: str) -> Dict[str, Any]:
+        """Obtener estadísticas de almacenamiento del historial."""
+        versions = self.list_versions(document_id)
+        stored = sum(v['size'] for v in versions)
+        full = sum(v['snapshot_size'] for v in versions)
+        return {
+            'versions': len(versions),
+            'snapshots': sum(1 for v in versions if v['kind'] == SNAPSHOT),
+            'stored_bytes': stored,
+            'full_copies_bytes': full,
+            'ratio': stored / full if full else 0.0
+        }
+
+    def delete_document(self, document_id: str):
+        """Eliminar el historial completo de un documento."""
+        self.redis.delete(*[
+            self._key(document_id, name)
+            for name in ('log', 'ids', 'data', 'head')
+        ])
+
+    def get_entry(
+        self,
+        document_id: str,
+        revision_id: str,
+        client: Optional[redis.Redis] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Obtener la entrada del historial de una revisión; None si no está."""
+        client = client or self.redis
+        seq = client.hget(self._key(document_id, 'ids'), revision_id)
+        if seq is None:
+            return None
+        raw = client.lindex(self._key(document_id, 'log'), int(seq))
+        return json.loads(raw) if raw else None
+
+    def _encode(self, value: Any) -> bytes:
+        """Serializar y comprimir."""
+        data = json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+        return zlib.compress(data, self.config['compression_level'])
+
+    @staticmethod
+    def _decode(blob: bytes) -> Any:
+        """Descomprimir y deserializar."""
+        return json.loads(zlib.decompress(blob))
+
+    @staticmethod
+    def _compact_changes(changes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Quitar de los cambios los campos que no necesita `apply_patch`."""
+        return [
+            {k: v for k, v in change.items() if k not in _DISPLAY_FIELDS}
+            for change in changes
+        ]
+
+    @staticmethod
+    def _key(document_id: str, name: str) -> str:
+        """Key de una estructura del historial."""
+        return f"versions:{document_id}:{name}"
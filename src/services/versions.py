@@ -0,0 +1,77 @@
+"""
+Servicio de historial de versiones de documentos.
+Cada revisión nueva se descarga una sola vez y se guarda en el almacén
+local de deltas; las consultas posteriores se resuelven sin volver a
+pedirla a Google.
+"""
+from typing import Any, Dict, List, Optional
+from src.monitoring.logger import Logger
+from src.monitoring.metrics import document_metrics
+from src.services.version_store import VersionStore
+
+logger = Logger(__name__)
+
+class VersionService:
+    """Servicio para consultar y registrar versiones de documentos."""
+
+    def __init__(self, docs_client=None, store: Optional[VersionStore] = None):
+        """Inicializar servicio.
+
+        Args:
+            docs_client: Cliente de Google Docs; se crea al primer uso
+            store: Almacén de versiones; por defecto uno sobre REDIS_URL
+        """
+        self.store = store or VersionStore()
+        self._docs_client = docs_client
+
+    @property
+    def docs_client(self):
+        """Cliente de Google Docs (requiere credenciales, por eso es perezoso)."""
+        if self._docs_client is None:
+            from src.integrations.google_docs import GoogleDocsClient
+            self._docs_client = GoogleDocsClient(version_store=self.store)
+        return self._docs_client
+
+    async def get_versions(self, document_id: str, user: Any = None) -> List[Dict[str, Any]]:
+        """Obtener historial de versiones de un documento.
+
+        Registra la revisión actual si aún no está en el almacén.
+
+        Args:
+            document_id: ID del documento
+            user: Usuario que consulta
+
+        Returns:
+            Revisiones almacenadas, de la más reciente a la más antigua
+        """
+        with document_metrics.measure_latency("list_versions"):
+            try:
+                self.docs_client.capture_version(document_id)
+            except Exception as e:
+                logger.error(f"Error capturing current version of {document_id}: {str(e)}")
+
+            return list(reversed(self.store.list_versions(document_id)))
+
+    async def get_version(
+        self,
+        document_id: str,
+        revision_id: str,
+        user: Any = None
+    ) -> Dict[str, Any]:
+        """Obtener una revisión con su contenido.
+
+        Args:
+            document_id: ID del documento
+            revision_id: ID de la revisión
+            user: Usuario que consulta
+
+        Returns:
+            Revisión con 'id', 'modifiedTime', 'lastModifyingUser' y
+            'content' (None si la revisión no está en el almacén local)
+        """
+        with document_metrics.measure_latency("get_version"):
+            return self.docs_client.get_document_version(document_id, revision_id)
+
+    def get_storage_stats(self, document_id: str) -> Dict[str, Any]:
+        """Obtener estadísticas de almacenamiento del historial."""
+        return self.store.get_stats(document_id)
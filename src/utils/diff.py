@@ -1,113 +1,447 @@
-"""Utilities for calculating and applying document differences."""
-from typing import Dict, Any, List, Union
-import difflib
+"""Utilities for calculating and applying document differences.
+
+Differences are computed on the Google Docs `body.content` structure in two
+levels: first between structural elements (paragraphs, tables, section
+breaks) and then, for paragraphs that changed but kept their structure,
+between the words of each text run. Both levels use Myers' algorithm in its
+linear-space variant (middle snake bisection), after trimming the common
+prefix and suffix.
+
+Change format (in document order):
+    {'type': 'equal', 'position': {'start', 'end'}}
+    {'type': 'delete', 'position': {...}, 'content': <removed text>}
+    {'type': 'insert', 'position': {...}, 'elements': [...], 'content': <text>}
+    {'type': 'replace', 'position': {...}, 'elements': [...],
+     'old_content': <text>, 'new_content': <text>}
+    {'type': 'modify', 'position': {...}, 'runs': [[run_index, word_ops], ...]}
+
+Positions are indexes into the original `body.content`. Word operations are
+`['=', n]` (keep n tokens), `['-', n, text]` (drop n tokens) and
+`['+', text]` (insert text). `startIndex`/`endIndex` are derived by Google
+Docs and are ignored when comparing and omitted from rebuilt content.
+"""
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+import copy
 import json
+import re
+
+_INDEX_FIELDS = ('startIndex', 'endIndex')
+_WORD_TOKENS = re.compile(r"\s+|\w+|[^\w\s]", re.UNICODE)
+
+Opcode = Tuple[str, int, int, int, int]
 
 def calculate_diff(content1: Dict[str, Any], content2: Dict[str, Any]) -> List[Dict[str, Any]]:
     """Calculate differences between two document contents.
-    
+
     Args:
         content1: First document content
         content2: Second document content
-        
+
     Returns:
         List of changes with type and content
     """
-    # Convertir contenido a formato comparable
-    text1 = _extract_text(content1)
-    text2 = _extract_text(content2)
-    
-    # Calcular diferencias a nivel de línea
-    differ = difflib.SequenceMatcher(None, text1, text2)
+    old_elements = _body_elements(content1)
+    new_elements = _body_elements(content2)
+
+    # Comparar elementos por su representación canónica
+    old_keys, new_keys = _intern(
+        [_element_key(e) for e in old_elements],
+        [_element_key(e) for e in new_elements]
+    )
+
     changes = []
-    
-    for tag, i1, i2, j1, j2 in differ.get_opcodes():
-        change = {
-            'type': tag,
-            'content': None,
-            'position': {
-                'start': i1,
-                'end': i2
-            }
-        }
-        
-        if tag == 'replace':
-            change['old_content'] = text1[i1:i2]
-            change['new_content'] = text2[j1:j2]
+    for tag, i1, i2, j1, j2 in diff_opcodes(old_keys, new_keys):
+        position = {'start': i1, 'end': i2}
+
+        if tag == 'equal':
+            changes.append({'type': 'equal', 'position': position})
         elif tag == 'delete':
-            change['content'] = text1[i1:i2]
+            changes.append({
+                'type': 'delete',
+                'position': position,
+                'content': _elements_text(old_elements[i1:i2])
+            })
         elif tag == 'insert':
-            change['content'] = text2[j1:j2]
-            
-        changes.append(change)
-    
+            changes.append({
+                'type': 'insert',
+                'position': position,
+                'elements': new_elements[j1:j2],
+                'content': _elements_text(new_elements[j1:j2])
+            })
+        else:
+            changes.extend(_diff_replaced_block(
+                old_elements, new_elements, i1, i2, j1, j2
+            ))
+
     return changes
 
 def apply_patch(content: Dict[str, Any], changes: List[Dict[str, Any]]) -> Dict[str, Any]:
     """Apply changes to document content.
-    
+
     Args:
         content: Original document content
         changes: List of changes to apply
-        
+
     Returns:
         Updated document content
     """
-    text = _extract_text(content)
+    old_elements = _body_elements(content)
     result = []
-    last_pos = 0
-    
-    for change in sorted(changes, key=lambda x: x['position']['start']):
+
+    for change in changes:
         start = change['position']['start']
         end = change['position']['end']
-        
-        # Mantener texto sin cambios hasta la posición actual
-        result.append(text[last_pos:start])
-        
-        # Aplicar el cambio
-        if change['type'] == 'replace':
-            result.append(change['new_content'])
-        elif change['type'] == 'insert':
-            result.append(change['content'])
-        
-        last_pos = end
-    
-    # Agregar el resto del texto
-    result.append(text[last_pos:])
-    
-    # Reconstruir el contenido del documento
-    return _rebuild_content(''.join(result), content)
 
-def _extract_text(content: Dict[str, Any]) -> str:
-    """Extract plain text from document content."""
+        if change['type'] == 'equal':
+            result.extend(copy.deepcopy(old_elements[start:end]))
+        elif change['type'] in ('insert', 'replace'):
+            result.extend(copy.deepcopy(change['elements']))
+        elif change['type'] == 'modify':
+            element = copy.deepcopy(old_elements[start])
+            runs = element['paragraph']['elements']
+            for run_index, word_ops in change['runs']:
+                text_run = runs[run_index]['textRun']
+                text_run['content'] = _apply_word_ops(text_run.get('content', ''), word_ops)
+            result.append(element)
+        # 'delete': el elemento simplemente no se copia
+
+    return _rebuild_content(result, content)
+
+def diff_opcodes(a: Sequence[Any], b: Sequence[Any]) -> List[Opcode]:
+    """Compute difflib-style opcodes between two sequences using Myers' diff.
+
+    Runs in O((N + M) * D) time and O(N + M) space, where D is the size
+    of the edit script.
+
+    Args:
+        a: Original sequence of hashable items
+        b: New sequence of hashable items
+
+    Returns:
+        List of (tag, i1, i2, j1, j2) tuples
+    """
+    blocks: List[Tuple[int, int, int]] = []
+    _matching_blocks(a, b, 0, len(a), 0, len(b), blocks)
+    blocks.append((len(a), len(b), 0))
+
+    opcodes: List[Opcode] = []
+    i = j = 0
+    for ai, bj, size in blocks:
+        if i < ai and j < bj:
+            opcodes.append(('replace', i, ai, j, bj))
+        elif i < ai:
+            opcodes.append(('delete', i, ai, j, j))
+        elif j < bj:
+            opcodes.append(('insert', i, i, j, bj))
+        if size:
+            if opcodes and opcodes[-1][0] == 'equal':
+                _, ei1, _, ej1, _ = opcodes.pop()
+                opcodes.append(('equal', ei1, ai + size, ej1, bj + size))
+            else:
+                opcodes.append(('equal', ai, ai + size, bj, bj + size))
+        i, j = ai + size, bj + size
+
+    return opcodes
+
+def _matching_blocks(
+    a: Sequence[Any],
+    b: Sequence[Any],
+    a_lo: int,
+    a_hi: int,
+    b_lo: int,
+    b_hi: int,
+    blocks: List[Tuple[int, int, int]]
+):
+    """Append the matching blocks of a[a_lo:a_hi] and b[b_lo:b_hi] in order."""
+    # Prefijo común
+    prefix = 0
+    while a_lo + prefix < a_hi and b_lo + prefix < b_hi and a[a_lo + prefix] == b[b_lo + prefix]:
+        prefix += 1
+    if prefix:
+        blocks.append((a_lo, b_lo, prefix))
+        a_lo += prefix
+        b_lo += prefix
+
+    # Sufijo común
+    suffix = 0
+    while a_lo < a_hi - suffix and b_lo < b_hi - suffix and a[a_hi - suffix - 1] == b[b_hi - suffix - 1]:
+        suffix += 1
+    a_hi -= suffix
+    b_hi -= suffix
+
+    if a_lo < a_hi and b_lo < b_hi:
+        split = _bisect(a, b, a_lo, a_hi, b_lo, b_hi)
+        if split is not None:
+            x, y = split
+            _matching_blocks(a, b, a_lo, x, b_lo, y, blocks)
+            _matching_blocks(a, b, x, a_hi, y, b_hi, blocks)
+
+    if suffix:
+        blocks.append((a_hi, b_hi, suffix))
+
+def _bisect(
+    a: Sequence[Any],
+    b: Sequence[Any],
+    a_lo: int,
+    a_hi: int,
+    b_lo: int,
+    b_hi: int
+) -> Optional[Tuple[int, int]]:
+    """Find the middle snake of the shortest edit script (Myers 1986, 4b).
+
+    Returns:
+        Absolute (x, y) split point, or None if the ranges share nothing
+    """
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+    max_d = (n + m + 1) // 2
+    offset = max_d
+    size = 2 * max_d + 2
+    forward = [-1] * size
+    backward = [-1] * size
+    forward[offset + 1] = 0
+    backward[offset + 1] = 0
+    delta = n - m
+    front = delta % 2 != 0
+    k1_start = k1_end = k2_start = k2_end = 0
+
+    for d in range(max_d):
+        # Camino hacia adelante
+        for k1 in range(-d + k1_start, d + 1 - k1_end, 2):
+            k1_offset = offset + k1
+            if k1 == -d or (k1 != d and forward[k1_offset - 1] < forward[k1_offset + 1]):
+                x1 = forward[k1_offset + 1]
+            else:
+                x1 = forward[k1_offset - 1] + 1
+            y1 = x1 - k1
+            while x1 < n and y1 < m and a[a_lo + x1] == b[b_lo + y1]:
+                x1 += 1
+                y1 += 1
+            forward[k1_offset] = x1
+            if x1 > n:
+                k1_end += 2
+            elif y1 > m:
+                k1_start += 2
+            elif front:
+                k2_offset = offset + delta - k1
+                if 0 <= k2_offset < size and backward[k2_offset] != -1:
+                    if x1 >= n - backward[k2_offset]:
+                        return a_lo + x1, b_lo + y1
+
+        # Camino hacia atrás
+        for k2 in range(-d + k2_start, d + 1 - k2_end, 2):
+            k2_offset = offset + k2
+            if k2 == -d or (k2 != d and backward[k2_offset - 1] < backward[k2_offset + 1]):
+                x2 = backward[k2_offset + 1]
+            else:
+                x2 = backward[k2_offset - 1] + 1
+            y2 = x2 - k2
+            while x2 < n and y2 < m and a[a_hi - x2 - 1] == b[b_hi - y2 - 1]:
+                x2 += 1
+                y2 += 1
+            backward[k2_offset] = x2
+            if x2 > n:
+                k2_end += 2
+            elif y2 > m:
+                k2_start += 2
+            elif not front:
+                k1_offset = offset + delta - k2
+                if 0 <= k1_offset < size and forward[k1_offset] != -1:
+                    x1 = forward[k1_offset]
+                    y1 = offset + x1 - k1_offset
+                    if x1 >= n - x2:
+                        return a_lo + x1, b_lo + y1
+
+    return None
+
+def _diff_replaced_block(
+    old_elements: List[Dict[str, Any]],
+    new_elements: List[Dict[str, Any]],
+    i1: int,
+    i2: int,
+    j1: int,
+    j2: int
+) -> List[Dict[str, Any]]:
+    """Diff a replaced block, going down to word level where possible.
+
+    Elements are paired in order; a pair of paragraphs with the same
+    structure (styles and run boundaries) becomes a word-level 'modify'.
+    Everything else is emitted as element-level replace/insert/delete.
+    """
+    changes = []
+    pending_old = []
+    pending_new = []
+
+    def flush(position_end: int):
+        if pending_old and pending_new:
+            changes.append({
+                'type': 'replace',
+                'position': {'start': pending_old[0], 'end': position_end},
+                'elements': [new_elements[j] for j in pending_new],
+                'old_content': _elements_text([old_elements[i] for i in pending_old]),
+                'new_content': _elements_text([new_elements[j] for j in pending_new])
+            })
+        elif pending_old:
+            changes.append({
+                'type': 'delete',
+                'position': {'start': pending_old[0], 'end': position_end},
+                'content': _elements_text([old_elements[i] for i in pending_old])
+            })
+        elif pending_new:
+            changes.append({
+                'type': 'insert',
+                'position': {'start': position_end, 'end': position_end},
+                'elements': [new_elements[j] for j in pending_new],
+                'content': _elements_text([new_elements[j] for j in pending_new])
+            })
+        pending_old.clear()
+        pending_new.clear()
+
+    pairs = min(i2 - i1, j2 - j1)
+    for offset in range(pairs):
+        i, j = i1 + offset, j1 + offset
+        runs = _diff_paragraph_runs(old_elements[i], new_elements[j])
+        if runs is None:
+            pending_old.append(i)
+            pending_new.append(j)
+            continue
+        flush(i)
+        changes.append({
+            'type': 'modify',
+            'position': {'start': i, 'end': i + 1},
+            'runs': runs
+        })
+
+    pending_old.extend(range(i1 + pairs, i2))
+    pending_new.extend(range(j1 + pairs, j2))
+    flush(i2)
+
+    return changes
+
+def _diff_paragraph_runs(
+    old_element: Dict[str, Any],
+    new_element: Dict[str, Any]
+) -> Optional[List[List[Any]]]:
+    """Word-level diff of two paragraphs that share their structure.
+
+    Returns:
+        List of [run_index, word_ops] for the runs that changed, or None if
+        the paragraphs differ in anything other than run text
+    """
+    if 'paragraph' not in old_element or 'paragraph' not in new_element:
+        return None
+    if _paragraph_skeleton(old_element) != _paragraph_skeleton(new_element):
+        return None
+
+    runs = []
+    old_runs = old_element['paragraph'].get('elements', [])
+    new_runs = new_element['paragraph'].get('elements', [])
+    for index, (old_run, new_run) in enumerate(zip(old_runs, new_runs)):
+        if 'textRun' not in old_run:
+            continue
+        old_text = old_run['textRun'].get('content', '')
+        new_text = new_run['textRun'].get('content', '')
+        if old_text != new_text:
+            runs.append([index, _word_ops(old_text, new_text)])
+
+    return runs
+
+def _word_ops(old_text: str, new_text: str) -> List[List[Any]]:
+    """Compact word-level edit script between two strings."""
+    old_tokens = _WORD_TOKENS.findall(old_text)
+    new_tokens = _WORD_TOKENS.findall(new_text)
+
+    ops: List[List[Any]] = []
+    for tag, i1, i2, j1, j2 in diff_opcodes(old_tokens, new_tokens):
+        if tag == 'equal':
+            ops.append(['=', i2 - i1])
+            continue
+        if i2 > i1:
+            ops.append(['-', i2 - i1, ''.join(old_tokens[i1:i2])])
+        if j2 > j1:
+            ops.append(['+', ''.join(new_tokens[j1:j2])])
+
+    return ops
+
+def _apply_word_ops(text: str, ops: List[List[Any]]) -> str:
+    """Apply a word-level edit script to a string."""
+    tokens = _WORD_TOKENS.findall(text)
+    result = []
+    position = 0
+
+    for op in ops:
+        if op[0] == '=':
+            result.extend(tokens[position:position + op[1]])
+            position += op[1]
+        elif op[0] == '-':
+            position += op[1]
+        elif op[0] == '+':
+            result.append(op[1])
+
+    result.extend(tokens[position:])
+    return ''.join(result)
+
+def _body_elements(content: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Structural elements of the document body without derived indexes."""
     if not content.get('body'):
-        return ''
-        
+        return []
+    return [strip_indices(e) for e in content['body'].get('content', [])]
+
+def strip_indices(value: Any) -> Any:
+    """Remove startIndex/endIndex recursively."""
+    if isinstance(value, dict):
+        return {
+            k: strip_indices(v)
+            for k, v in value.items()
+            if k not in _INDEX_FIELDS
+        }
+    if isinstance(value, list):
+        return [strip_indices(v) for v in value]
+    return value
+
+def _element_key(element: Dict[str, Any]) -> str:
+    """Canonical representation used to compare elements."""
+    return json.dumps(element, sort_keys=True, ensure_ascii=False)
+
+def _paragraph_skeleton(element: Dict[str, Any]) -> str:
+    """Paragraph representation without run text."""
+    skeleton = copy.deepcopy(element)
+    for run in skeleton['paragraph'].get('elements', []):
+        if 'textRun' in run:
+            run['textRun'].pop('content', None)
+    return _element_key(skeleton)
+
+def _intern(a: List[str], b: List[str]) -> Tuple[List[int], List[int]]:
+    """Map keys to small integers for fast comparisons."""
+    ids: Dict[str, int] = {}
+    return (
+        [ids.setdefault(k, len(ids)) for k in a],
+        [ids.setdefault(k, len(ids)) for k in b]
+    )
+
+def _elements_text(elements: List[Dict[str, Any]]) -> str:
+    """Extract plain text from a list of structural elements."""
     text = []
-    for element in content['body'].get('content', []):
+    for element in elements:
         if 'paragraph' in element:
             for part in element['paragraph'].get('elements', []):
                 if 'textRun' in part:
                     text.append(part['textRun'].get('content', ''))
-    
     return ''.join(text)
 
-def _rebuild_content(text: str, template: Dict[str, Any]) -> Dict[str, Any]:
-    """Rebuild document content from text using template structure."""
-    result = json.loads(json.dumps(template))  # Deep copy
-    
+def _extract_text(content: Dict[str, Any]) -> str:
+    """Extract plain text from document content."""
+    if not content.get('body'):
+        return ''
+    return _elements_text(content['body'].get('content', []))
+
+def _rebuild_content(elements: List[Dict[str, Any]], template: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild document content from structural elements using template structure."""
+    result = copy.deepcopy(template)
+
     if not result.get('body'):
-        result['body'] = {'content': []}
-    
-    # Crear un nuevo párrafo con el texto
-    result['body']['content'] = [{
-        'paragraph': {
-            'elements': [{
-                'textRun': {
-                    'content': text
-                }
-            }]
-        }
-    }]
-    
+        result['body'] = {}
+
+    result['body']['content'] = elements
+
     return result
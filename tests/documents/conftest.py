@@ -0,0 +1,45 @@
+"""Fixtures compartidos por los tests de índices de anotaciones."""
+from datetime import datetime, timedelta
+import pytest
+
+PHRASES = [
+    "Se decreta prisión preventiva",
+    "Prision preventiba del imputado",
+    "Se rechaza la reposición",
+    "Plazo de investigación",
+    "Téngase presente",
+    ""
+]
+
+def _make_annotation(i, rng, pages=20):
+    text = rng.choice(PHRASES)
+    if text and rng.random() < 0.5:
+        # Variaciones: borrar, cambiar o duplicar algunos caracteres
+        chars = list(text)
+        for _ in range(rng.randint(1, 4)):
+            position = rng.randrange(len(chars))
+            chars[position] = rng.choice([chars[position] * 2, "", rng.choice("aeiosn ")])
+        text = "".join(chars)
+    created = datetime(2024, 1, 1) + timedelta(hours=rng.randint(0, 24 * 30))
+    return {
+        'id': f"ann-{i}",
+        'content': text,
+        'tags': rng.sample(["urgente", "prueba", "plazo"], rng.randint(0, 2)),
+        'type': rng.choice(["note", "highlight", "comment"]),
+        'user_id': f"user-{rng.randint(1, 5)}",
+        'created_at': created,
+        'updated_at': created + timedelta(days=rng.randint(0, 5)),
+        'position': {'page': rng.randint(1, pages), 'x': rng.random(), 'y': rng.random()}
+    }
+
+@pytest.fixture
+def make_annotation():
+    """Fábrica de anotaciones aleatorias: `make_annotation(i, rng, pages=20)`."""
+    return _make_annotation
+
+@pytest.fixture
+def brute_force():
+    """Referencia lineal: IDs de las anotaciones que cumplen `keep`, en orden."""
+    def select(annotations, keep):
+        return [a['id'] for a in annotations if keep(a)]
+    return select
@@ -0,0 +1,87 @@
+"""Tests para el almacén columnar de anotaciones."""
+import random
+from datetime import datetime
+
+from src.documents.annotation_columns import AnnotationColumns
+from src.documents.annotation_filters import (
+    AnnotationFilter,
+    AnnotationFilterEngine,
+    SortField,
+    SortOrder
+)
+from src.services.annotation_stats import count_annotations
+
+def random_filter(rng):
+    return AnnotationFilter(
+        content_query=rng.choice([None, "PRISIÓN", "reposición"]),
+        tags=rng.choice([None, ["urgente"], ["prueba", "plazo"], ["inexistente"]]),
+        types=rng.choice([None, ["note"], ["note", "comment"]]),
+        users=rng.choice([None, ["user-1", "user-2"]]),
+        created_after=rng.choice([None, datetime(2024, 1, 10)]),
+        created_before=rng.choice([None, datetime(2024, 1, 25)]),
+        updated_after=rng.choice([None, datetime(2024, 1, 15)]),
+        page_range=rng.choice([None, (3, 12)]),
+        position_box=rng.choice([None, {'x1': 0.2, 'y1': 0.1, 'x2': 0.8, 'y2': 0.7}]),
+        sort_by=rng.choice(list(SortField)),
+        sort_order=rng.choice(list(SortOrder)),
+        limit=rng.choice([5, 50, 1000]),
+        offset=rng.choice([0, 10, 500])
+    )
+
+def test_columns_match_linear_filter(make_annotation):
+    """Test que el filtro columnar devuelve lo mismo que la pasada lineal"""
+    rng = random.Random(11)
+    engine = AnnotationFilterEngine()
+    annotations = {f"ann-{i}": make_annotation(i, rng) for i in range(2000)}
+    store = AnnotationColumns.build(annotations.values())
+
+    for step in range(150):
+        if step % 3 == 0:
+            annotation = make_annotation(2000 + step, rng)
+            annotations[annotation['id']] = annotation
+            store.add(annotation)
+        elif step % 3 == 1:
+            annotation_id = rng.choice(list(annotations))
+            del annotations[annotation_id]
+            assert store.remove(annotation_id)
+
+        params = random_filter(rng)
+        expected = [a['id'] for a in engine.apply_filter(list(annotations.values()), params)]
+        assert [a['id'] for a in engine.apply_filter([], params, columns=store)] == expected
+
+def test_summary_counts(make_annotation):
+    """Test resumen por tipo y página con bincount"""
+    rng = random.Random(2)
+    annotations = [make_annotation(i, rng) for i in range(500)]
+    annotations = [a for a in annotations if a['type'] != "comment"]
+    summary = AnnotationColumns.build(annotations).summary()
+
+    assert summary["total"] == len(annotations)
+    assert summary["by_type"] == {
+        "note": sum(a['type'] == "note" for a in annotations),
+        "highlight": sum(a['type'] == "highlight" for a in annotations),
+        "comment": 0
+    }
+    pages = {a['position']['page'] for a in annotations}
+    assert summary["by_page"] == {
+        page: sum(a['position']['page'] == page for a in annotations) for page in pages
+    }
+    assert AnnotationColumns.build([]).summary() == {
+        "total": 0,
+        "by_type": {"note": 0, "highlight": 0, "comment": 0},
+        "by_page": {}
+    }
+
+def test_counts_match_stats_counters(make_annotation):
+    """Test que los conteos con bincount coinciden con los del hash de contadores"""
+    rng = random.Random(3)
+    annotations = [make_annotation(i, rng) for i in range(500)]
+    for annotation in annotations[:50]:
+        # Etiquetas en metadatos y repetidas, como en el modelo de Drive
+        annotation['metadata'] = {'tags': annotation.pop('tags') * 2}
+    store = AnnotationColumns.build(annotations)
+
+    assert store.counts() == count_annotations("doc-1", annotations)
+    store.remove("ann-0")
+    assert store.counts() == count_annotations("doc-1", annotations[1:])
+    assert AnnotationColumns.build([]).counts() == {'total': 0}
@@ -0,0 +1,102 @@
+"""Tests para el motor de filtros de anotaciones."""
+import random
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+import pytest
+
+from src.documents.annotation_filters import (
+    AnnotationFilter,
+    AnnotationFilterEngine,
+    SortField,
+    SortOrder
+)
+
+@pytest.fixture
+def annotations():
+    """Anotaciones aleatorias con muchos empates de página y fecha."""
+    rng = random.Random(7)
+    start = datetime(2024, 1, 1)
+    result = []
+    for i in range(2000):
+        created = start + timedelta(days=rng.randint(0, 30))
+        result.append({
+            'id': i,
+            'content': rng.choice(["Prisión preventiva", "Se rechaza la reposición", "Plazo de investigación"]),
+            'tags': rng.sample(["urgente", "prueba", "plazo"], rng.randint(0, 2)),
+            'type': rng.choice(["note", "highlight", "comment"]),
+            'user_id': f"user-{rng.randint(1, 5)}",
+            'created_at': created,
+            'updated_at': created + timedelta(days=rng.randint(0, 5)),
+            'position': {'page': rng.randint(1, 20), 'x': rng.random(), 'y': rng.random()}
+        })
+    return result
+
+def reference(annotations, params):
+    """Implementación directa de la semántica del filtro."""
+    def keep(ann):
+        if params.content_query and params.content_query.lower() not in ann['content'].lower():
+            return False
+        if params.tags and not any(tag in ann['tags'] for tag in params.tags):
+            return False
+        if params.types and ann['type'] not in params.types:
+            return False
+        if params.users and ann['user_id'] not in params.users:
+            return False
+        if params.created_after and ann['created_at'] < params.created_after:
+            return False
+        if params.created_before and ann['created_at'] > params.created_before:
+            return False
+        if params.page_range and not params.page_range[0] <= ann['position']['page'] <= params.page_range[1]:
+            return False
+        box = params.position_box
+        if box and not (box['x1'] <= ann['position']['x'] <= box['x2'] and box['y1'] <= ann['position']['y'] <= box['y2']):
+            return False
+        return True
+
+    if params.sort_by == SortField.PAGE:
+        key = lambda x: x['position']['page']
+    elif params.sort_by == SortField.POSITION:
+        key = lambda x: (x['position']['page'], x['position']['y'], x['position']['x'])
+    else:
+        key = lambda x: x[params.sort_by]
+    ordered = sorted(filter(keep, annotations), key=key, reverse=params.sort_order == SortOrder.DESC)
+    return ordered[params.offset:params.offset + params.limit]
+
+def test_matches_reference(annotations):
+    """Test que el predicado compilado y el top-k equivalen a filtrar y ordenar todo"""
+    engine = AnnotationFilterEngine()
+    rng = random.Random(3)
+    for _ in range(200):
+        params = AnnotationFilter(
+            content_query=rng.choice([None, "PRISIÓN", "reposición"]),
+            tags=rng.choice([None, ["urgente"], ["prueba", "plazo"]]),
+            types=rng.choice([None, ["note"], ["note", "comment"]]),
+            users=rng.choice([None, ["user-1", "user-2"]]),
+            created_after=rng.choice([None, datetime(2024, 1, 10)]),
+            created_before=rng.choice([None, datetime(2024, 1, 25)]),
+            page_range=rng.choice([None, (3, 12)]),
+            position_box=rng.choice([None, {'x1': 0.2, 'y1': 0.1, 'x2': 0.8, 'y2': 0.7}]),
+            sort_by=rng.choice(list(SortField)),
+            sort_order=rng.choice(list(SortOrder)),
+            limit=rng.choice([5, 50, 1000]),
+            offset=rng.choice([0, 10, 500])
+        )
+        expected = [a['id'] for a in reference(annotations, params)]
+        assert [a['id'] for a in engine.apply_filter(annotations, params)] == expected
+
+def test_fuzzy_predicate():
+    """Test coincidencia aproximada con la consulta preprocesada"""
+    engine = AnnotationFilterEngine()
+    texts = ["Prisión preventiva", "Prision preventiba", "Arresto domiciliario"]
+    check = engine.compile_predicate(AnnotationFilter(content_query="PRISIÓN PREVENTIVA"), match_type='fuzzy')
+
+    for text in texts:
+        expected = SequenceMatcher(None, text.lower(), "prisión preventiva").ratio() >= 0.8
+        assert check({'content': text}) == expected
+    assert check({'content': texts[1]})
+    assert not check({'content': texts[2]})
+
+def test_empty_filter_accepts_everything():
+    """Test filtro vacío"""
+    predicate = AnnotationFilterEngine().compile_predicate(AnnotationFilter())
+    assert predicate({})
@@ -0,0 +1,58 @@
+"""Tests para la exportación de anotaciones a PDF."""
+import asyncio
+from datetime import datetime
+import pytest
+
+pytest.importorskip("reportlab")
+
+from src.documents import pdf_exporter
+from src.documents.pdf_exporter import AnnotationPDFExporter
+
+def make_annotations(count):
+    colors = ["#1f77b4", "#d62728", "#2ca02c"]
+    return [
+        {
+            'content': f"Considerando {i}: se tiene presente lo expuesto por la defensa.",
+            'position': {'page': i % 7 + 1, 'x': 0.1, 'y': (i % 10) / 10},
+            'created_at': datetime(2024, 5, 1, 10, i % 60),
+            'tags': [{'name': f"etiqueta {j}", 'color': colors[(i + j) % 3]} for j in range(2)]
+        }
+        for i in range(120)
+    ]
+
+DOC_INFO = {'title': 'Causa RIT 123-2024', 'total_annotations': 120, 'author': 'Tribunal'}
+
+def test_render_reuses_tag_styles_and_reports_progress(tmp_path):
+    """Test que los estilos de etiqueta se crean una vez por color y el avance llega a 1.0"""
+    exporter = AnnotationPDFExporter()
+    progress = []
+    pages = exporter.render(make_annotations(120), DOC_INFO, str(tmp_path / "out.pdf"), progress.append)
+
+    assert pages > 1
+    assert (tmp_path / "out.pdf").read_bytes().startswith(b"%PDF")
+    assert len(exporter._tag_styles) == 3
+    assert progress == sorted(progress) and progress[-1] == 1.0
+
+def test_export_runs_in_process_pool(tmp_path):
+    """Test exportación en el pool con avance entregado en el event loop"""
+    progress = []
+
+    async def on_progress(value):
+        progress.append(value)
+
+    async def export():
+        exporter = AnnotationPDFExporter()
+        path = str(tmp_path / "pool.pdf")
+        pages = await exporter.export_to_file(make_annotations(120), DOC_INFO, path, on_progress)
+        buffer = await exporter.export_annotations(make_annotations(10), DOC_INFO)
+        return pages, buffer
+
+    try:
+        pages, buffer = asyncio.run(export())
+    finally:
+        pdf_exporter.shutdown_export_pool()
+
+    assert pages > 1
+    assert (tmp_path / "pool.pdf").read_bytes().startswith(b"%PDF")
+    assert buffer.getvalue().startswith(b"%PDF")
+    assert progress[-1] == 1.0
@@ -0,0 +1,104 @@
+"""Tests para el índice espacial de anotaciones."""
+import random
+
+from src.documents.annotation_columns import AnnotationColumns
+from src.documents.annotation_filters import AnnotationFilter, AnnotationFilterEngine, SortField, SortOrder
+from src.documents.spatial_index import SpatialIndex, SpatialIndexRegistry
+
+def in_area(page_range, box):
+    """Condición de páginas y recuadro evaluada anotación por anotación."""
+    return lambda a: (
+        (not page_range or page_range[0] <= a['position']['page'] <= page_range[1])
+        and (not box or (box['x1'] <= a['position']['x'] <= box['x2']
+                         and box['y1'] <= a['position']['y'] <= box['y2']))
+    )
+
+def test_queries_match_brute_force_under_changes(make_annotation, brute_force):
+    """Test que el índice responde igual que un recorrido lineal tras altas, cambios y bajas"""
+    rng = random.Random(5)
+    annotations = {f"ann-{i}": make_annotation(i, rng, pages=10) for i in range(3000)}
+    index = SpatialIndex.build(annotations.values())
+
+    for step in range(300):
+        action = rng.random()
+        if action < 0.3:
+            annotation = make_annotation(3000 + step, rng, pages=10)
+            annotations[annotation['id']] = annotation
+            index.add(annotation)
+        elif action < 0.6:
+            annotation = annotations[rng.choice(list(annotations))]
+            annotation['position'] = {'page': rng.randint(1, 10), 'x': rng.random(), 'y': rng.random()}
+            index.update(annotation)
+        else:
+            annotation_id = rng.choice(list(annotations))
+            del annotations[annotation_id]
+            assert index.remove(annotation_id)
+
+        x1, x2 = sorted([rng.random(), rng.random()])
+        y1, y2 = sorted([rng.random(), rng.random()])
+        box = rng.choice([None, {'x1': x1, 'y1': y1, 'x2': x2, 'y2': y2}])
+        first = rng.randint(1, 10)
+        page_range = rng.choice([None, (first, min(10, first + rng.randint(0, 3)))])
+
+        expected = set(brute_force(annotations.values(), in_area(page_range, box)))
+        assert {a['id'] for a in index.query(page_range, box)} == expected
+
+    assert len(index) == len(annotations)
+    assert not index.remove("no-existe")
+
+def test_filter_engine_uses_index(make_annotation):
+    """Test que el filtro con índice devuelve lo mismo que sin él"""
+    rng = random.Random(9)
+    annotations = [make_annotation(i, rng, pages=10) for i in range(2000)]
+    index = SpatialIndex.build(annotations)
+    engine = AnnotationFilterEngine()
+
+    for sort_by in (SortField.CREATED_AT, SortField.POSITION):
+        params = AnnotationFilter(
+            types=["note"],
+            page_range=(2, 4),
+            position_box={'x1': 0.1, 'y1': 0.2, 'x2': 0.6, 'y2': 0.9},
+            sort_by=sort_by,
+            sort_order=SortOrder.ASC,
+            limit=20,
+            offset=5
+        )
+        assert engine._use_index(index, params, len(annotations))
+        expected = engine.apply_filter(annotations, params)
+        assert engine.apply_filter(annotations, params, index) == expected
+
+def test_filter_engine_prefers_index_over_columns(make_annotation):
+    """Test que con índice y almacén columnar el resultado no depende del camino"""
+    rng = random.Random(10)
+    annotations = [make_annotation(i, rng, pages=10) for i in range(2000)]
+    index = SpatialIndex.build(annotations)
+    columns = AnnotationColumns.build(annotations)
+    engine = AnnotationFilterEngine()
+
+    # Una página sola usa el índice; todo el documento, las columnas
+    for page_range in ((3, 3), (1, 10)):
+        params = AnnotationFilter(page_range=page_range, tags=["urgente"], limit=30)
+        expected = [a['id'] for a in engine.apply_filter(annotations, params)]
+        result = engine.apply_filter(annotations, params, index, columns=columns)
+        assert [a['id'] for a in result] == expected
+
+def test_registry_applies_changes_only_to_loaded_documents(make_annotation):
+    """Test registro de índices con límite de documentos"""
+    rng = random.Random(1)
+    registry = SpatialIndexRegistry(max_documents=2)
+    registry.add("doc-0", make_annotation(0, rng))
+    assert registry.get("doc-0") is None
+
+    index = registry.load("doc-1", [make_annotation(1, rng)])
+    registry.add("doc-1", make_annotation(2, rng))
+    assert len(index) == 2
+
+    registry.add_many("doc-1", [make_annotation(i, rng) for i in range(3, 6)])
+    registry.remove_many("doc-1", ["ann-1", "ann-3"])
+    registry.add_many("doc-0", [make_annotation(6, rng)])
+    assert len(index) == 3
+    assert registry.get("doc-0") is None
+
+    registry.load("doc-2", [])
+    registry.load("doc-3", [])
+    assert registry.get("doc-1") is None
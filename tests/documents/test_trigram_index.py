@@ -0,0 +1,86 @@
+"""Tests para el índice de n-gramas de la búsqueda fuzzy."""
+import random
+from difflib import SequenceMatcher
+
+from src.documents import trigram_index
+from src.documents.annotation_filters import AnnotationFilter, AnnotationFilterEngine
+from src.documents.trigram_index import TrigramIndex, TrigramIndexRegistry, lcs_length
+
+def similar(query, threshold):
+    """Coincidencia fuzzy calculada con SequenceMatcher sobre cada texto."""
+    return lambda a: SequenceMatcher(None, a['content'].lower(), query.lower()).ratio() >= threshold
+
+def test_lcs_length():
+    """Test subsecuencia común más larga bit-paralela"""
+    query = "prisión"
+    masks = {}
+    for position, char in enumerate(query):
+        masks[char] = masks.get(char, 0) | (1 << position)
+    assert lcs_length("prision", masks, len(query)) == 6
+    assert lcs_length("", masks, len(query)) == 0
+    assert lcs_length("xyz", masks, len(query)) == 0
+
+def test_search_matches_sequence_matcher_under_changes(monkeypatch, make_annotation, brute_force):
+    """Test que el índice devuelve lo mismo que ratio() sobre todo tras altas, cambios y bajas"""
+    monkeypatch.setattr(trigram_index, 'COMPACT_MIN_DEAD', 50)
+    rng = random.Random(4)
+    annotations = {f"ann-{i}": make_annotation(i, rng) for i in range(600)}
+    index = TrigramIndex.build(annotations.values())
+
+    for step in range(200):
+        action = rng.random()
+        if action < 0.3:
+            annotation = make_annotation(600 + step, rng)
+            annotations[annotation['id']] = annotation
+            index.add(annotation)
+        elif action < 0.6:
+            annotation_id = rng.choice(list(annotations))
+            annotations[annotation_id] = dict(make_annotation(0, rng), id=annotation_id)
+            index.update(annotations[annotation_id])
+        else:
+            annotation_id = rng.choice(list(annotations))
+            del annotations[annotation_id]
+            assert index.remove(annotation_id)
+
+        if step % 20 == 0:
+            for query in ("PRISIÓN PREVENTIVA", "se rechaza la reposicion", "plazo", ""):
+                for threshold in (0.5, 0.8, 0.95):
+                    expected = brute_force(annotations.values(), similar(query, threshold))
+                    assert sorted(index.search(query, threshold)) == sorted(expected)
+
+    assert len(index) == len(annotations)
+
+def test_filter_engine_uses_text_index(make_annotation, brute_force):
+    """Test que el filtro fuzzy con índice devuelve lo mismo que sin él"""
+    rng = random.Random(8)
+    annotations = [make_annotation(i, rng) for i in range(500)]
+    for i, annotation in enumerate(annotations):
+        annotation['created_at'] = i
+    index = TrigramIndex.build(annotations)
+    engine = AnnotationFilterEngine()
+    params = AnnotationFilter(content_query="se decreta prisión preventiva", limit=1000)
+
+    expected = engine.apply_filter(annotations, params, match_type='fuzzy')
+    assert expected
+    assert engine.apply_filter(annotations, params, match_type='fuzzy', text_index=index) == expected
+    assert [a['id'] for a in expected] == sorted(
+        brute_force(annotations, similar("se decreta prisión preventiva", 0.8)), key=lambda i: -int(i.split('-')[1])
+    )
+
+def test_registry_drops_index_written_elsewhere(make_annotation):
+    """Test que el registro descarta índices de otra versión y sigue las escrituras propias"""
+    rng = random.Random(4)
+    registry = TrigramIndexRegistry(max_documents=2)
+    annotations = [dict(make_annotation(i, rng), updated_at=i) for i in range(3)]
+    index = registry.load("doc-1", annotations, version=(3, 2))
+    assert registry.get("doc-1", (3, 2)) is index
+
+    # Escrituras de este proceso: la versión avanza y el índice se mantiene
+    registry.add("doc-1", dict(make_annotation(3, rng), updated_at=5))
+    registry.remove("doc-1", "ann-0")
+    assert registry.get("doc-1", (3, 5)) is index
+
+    # Otro proceso escribió: la versión de la base ya no coincide
+    assert registry.get("doc-1", (4, 7)) is None
+    assert registry.get("doc-1") is None
+    assert registry.load("doc-1", annotations, version=(4, 7)) is not index
@@ -0,0 +1,123 @@
+"""Tests para el CRDT de documentos colaborativos."""
+import base64
+import random
+import pytest
+from unittest.mock import AsyncMock, Mock
+from src.realtime.crdt import DocumentCRDT
+from src.realtime.websocket_manager import ConnectionManager
+
+def test_concurrent_inserts_converge():
+    """Test que ediciones concurrentes convergen en cualquier orden de entrega"""
+    rng = random.Random(11)
+    for _ in range(50):
+        replicas = [DocumentCRDT(f"client-{i}") for i in range(3)]
+        server = DocumentCRDT()
+        updates = []
+        for _ in range(30):
+            origin = rng.randrange(3)
+            replica = replicas[origin]
+            if replica.text and rng.random() < 0.3:
+                update = replica.delete(rng.randrange(len(replica.text)), rng.randint(1, 3))
+            else:
+                update = replica.insert(rng.randint(0, len(replica.text)), rng.choice(["a", "se", "tiene"]))
+            updates.append((origin, update))
+
+        rng.shuffle(updates)
+        for origin, update in updates:
+            for index, replica in enumerate(replicas):
+                if index != origin:
+                    replica.apply_update(update)
+            server.apply_update(update)
+
+        assert len({replica.text for replica in replicas} | {server.text}) == 1
+        assert server.pending == 0
+
+def test_apply_update_is_idempotent():
+    """Test que un update repetido no produce cambios efectivos"""
+    client = DocumentCRDT("juez")
+    server = DocumentCRDT()
+    update = client.insert(0, "Vistos:")
+
+    assert server.apply_update(update) is not None
+    assert server.apply_update(update) is None
+    assert server.text == "Vistos:"
+
+def test_snapshot_compacts_deleted_content():
+    """Test que el snapshot descarta el contenido borrado y sirve a nuevos clientes"""
+    client = DocumentCRDT("secretario")
+    server = DocumentCRDT()
+    server.apply_update(client.insert(0, "Se rechaza el recurso de reposición. " * 20))
+    server.apply_update(client.delete(0, 500))
+
+    snapshot = server.snapshot()
+    late = DocumentCRDT.from_update(snapshot, "abogado")
+
+    assert late.text == server.text
+    assert len(snapshot) < len(server.text.encode()) + 50
+
+    # El nuevo cliente puede editar sobre el snapshot
+    server.apply_update(late.insert(0, "X"))
+    assert server.text == late.text
+    assert server.text.startswith("X")
+
+def test_state_vector_delta():
+    """Test que un cliente recibe solo lo que le falta"""
+    client = DocumentCRDT("juez")
+    server = DocumentCRDT()
+    server.apply_update(client.insert(0, "Considerando."))
+    known = dict(client.state_vector)
+    other = DocumentCRDT("fiscal")
+    server.apply_update(other.insert(0, "Primero: "))
+
+    delta = server.encode_state_as_update(known)
+    assert len(delta) < len(server.snapshot())
+    client.apply_update(delta)
+    assert client.text == server.text
+
+def test_malformed_update():
+    """Test update malformado"""
+    with pytest.raises(ValueError):
+        DocumentCRDT().apply_update(b"\x01\x05")
+
+def varints(*values):
+    out = bytearray()
+    for value in values:
+        while value > 0x7F:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    return bytes(out)
+
+def test_oversized_lengths_rejected():
+    """Test que largos enormes se rechazan antes de reservar memoria"""
+    header = varints(1, 1, 1) + b"a"
+    tombstones = header + varints(1, 0, 1, 0, 2 ** 40, 1, 0)
+    content = header + varints(1, 0, 1, 0, 2 ** 40, 0, 2 ** 40) + b"x"
+    deletes = header + varints(0, 1, 0, 1, 2 ** 40)
+    for update in (tombstones, content, deletes):
+        with pytest.raises(ValueError):
+            DocumentCRDT().apply_update(update)
+
+@pytest.mark.asyncio
+async def test_send_document_update_merges_and_broadcasts():
+    """Test que el manager integra el update y lo reenvía a los demás"""
+    redis = Mock()
+    redis.get.return_value = None
+    redis.lrange.return_value = []
+    redis.rpush.return_value = 1
+    manager = ConnectionManager(redis)
+    author, reader = AsyncMock(), AsyncMock()
+    manager.active_connections["doc1"] = {"u1": author, "u2": reader}
+    manager.document_participants["doc1"] = {"u1", "u2"}
+
+    update = DocumentCRDT("u1").insert(0, "Vistos")
+    encoded = base64.b64encode(update).decode()
+    await manager.send_document_update("doc1", "u1", encoded)
+    await manager.send_document_update("doc1", "u1", encoded)
+    await manager.senders["doc1"]["u2"].drain()
+
+    assert manager.documents["doc1"].text == "Vistos"
+    redis.rpush.assert_called_once()
+    reader.send_json.assert_called_once()
+    author.send_json.assert_not_called()
+    assert reader.send_json.call_args[0][0]["type"] == "document_update"
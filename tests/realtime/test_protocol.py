@@ -0,0 +1,70 @@
+"""Tests para los codecs del protocolo WebSocket."""
+import base64
+import json
+import pytest
+from unittest.mock import AsyncMock
+from src.realtime.crdt import DocumentCRDT
+from src.realtime.protocol import JSON, MSGPACK, SUBPROTOCOL_MSGPACK, negotiate_codec
+from src.realtime.websocket_manager import ConnectionManager
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def test_msgpack_roundtrip_is_smaller():
+    """Test que msgpack conserva el mensaje y ocupa menos que JSON"""
+    update = DocumentCRDT("juez").insert(0, "Se acoge el recurso de protección. " * 10)
+    message = {
+        "type": "document_update",
+        "user_id": "juez",
+        "update": base64.b64encode(update).decode()
+    }
+
+    frame = MSGPACK.encode(message)
+
+    assert MSGPACK.decode(frame) == message
+    assert len(frame) < len(json.dumps(message).encode()) * 0.8
+
+def test_msgpack_nested_presence_batch():
+    """Test que se traducen las claves de los updates de presencia"""
+    message = {
+        "type": "presence_batch",
+        "updates": [{"user_id": "u1", "position": {"x": 1, "y": 2}}]
+    }
+    assert MSGPACK.decode(MSGPACK.encode(message)) == message
+
+def test_msgpack_invalid_frame():
+    """Test frame malformado"""
+    with pytest.raises(ValueError):
+        MSGPACK.decode(b"\xc1")
+    with pytest.raises(ValueError):
+        MSGPACK.decode(MSGPACK.encode({"type": "chat_message"})[1:])
+
+def test_negotiate_codec():
+    """Test negociación por subprotocolo con fallback a JSON"""
+    binary, legacy = AsyncMock(), AsyncMock()
+    binary.scope = {"subprotocols": ["otro", SUBPROTOCOL_MSGPACK]}
+    legacy.scope = {"subprotocols": []}
+
+    assert negotiate_codec(binary) is MSGPACK
+    assert negotiate_codec(legacy) is JSON
+
+@pytest.mark.asyncio
+async def test_mixed_clients_in_same_room():
+    """Test que clientes binarios y JSON reciben el mismo mensaje"""
+    manager = ConnectionManager(fakeredis.FakeRedis(), fakeredis.aioredis.FakeRedis())
+    binary, legacy = AsyncMock(), AsyncMock()
+    binary.scope = {"subprotocols": [SUBPROTOCOL_MSGPACK]}
+    legacy.scope = {"subprotocols": []}
+
+    assert await manager.connect(binary, "doc1", "u1") is MSGPACK
+    assert await manager.connect(legacy, "doc1", "u2") is JSON
+    binary.accept.assert_called_once_with(subprotocol=SUBPROTOCOL_MSGPACK)
+
+    await manager.send_chat_message("doc1", "u2", "Se cita a audiencia")
+    for sender in manager.senders["doc1"].values():
+        await sender.drain()
+
+    received = MSGPACK.decode(binary.send_bytes.call_args[0][0])
+    assert received == legacy.send_json.call_args[0][0]
+    assert received["content"] == "Se cita a audiencia"
+    binary.send_json.assert_not_called()
+    await manager.stop()
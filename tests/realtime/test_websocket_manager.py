@@ -0,0 +1,237 @@
+"""Tests para el ConnectionManager de colaboración en tiempo real."""
+import asyncio
+import time
+import pytest
+from unittest.mock import AsyncMock
+from src.realtime.websocket_manager import ConnectionManager
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def workers():
+    """Dos managers (workers) sobre el mismo Redis en memoria"""
+    server = fakeredis.FakeServer()
+    return [
+        ConnectionManager(
+            fakeredis.FakeRedis(server=server),
+            fakeredis.aioredis.FakeRedis(server=server)
+        )
+        for _ in range(2)
+    ]
+
+async def wait_for(condition, timeout=2.0):
+    """Esperar a que se cumpla una condición."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.01)
+    return True
+
+@pytest.mark.asyncio
+async def test_broadcast_reaches_other_workers(workers):
+    """Test que un mensaje llega a los sockets de otro worker una sola vez"""
+    first, second = workers
+    author, local_peer, remote_peer = AsyncMock(), AsyncMock(), AsyncMock()
+    await first.connect(author, "doc1", "u1")
+    await first.connect(local_peer, "doc1", "u2")
+    await second.connect(remote_peer, "doc1", "u3")
+    await asyncio.sleep(0.1)
+    for socket in (author, local_peer, remote_peer):
+        socket.send_json.reset_mock()
+
+    await first.send_cursor_position("doc1", "u1", {"x": 10, "y": 20})
+
+    assert await wait_for(lambda: remote_peer.send_json.called)
+    await asyncio.sleep(0.1)
+    local_peer.send_json.assert_called_once()
+    remote_peer.send_json.assert_called_once()
+    author.send_json.assert_not_called()
+    frame = remote_peer.send_json.call_args[0][0]
+    assert frame["type"] == "presence_batch"
+    assert frame["updates"] == [{"user_id": "u1", "position": {"x": 10, "y": 20}}]
+
+    for worker in workers:
+        await worker.stop()
+
+@pytest.mark.asyncio
+async def test_empty_room_unsubscribes(workers):
+    """Test que una sala sin miembros locales deja de escuchar su canal"""
+    first, _ = workers
+    await first.connect(AsyncMock(), "doc1", "u1")
+    assert first._pubsub.channels
+
+    await first.disconnect("doc1", "u1")
+
+    assert await wait_for(lambda: not first._pubsub.subscribed)
+    assert await wait_for(lambda: first._listener.done())
+    await first.stop()
+
+@pytest.mark.asyncio
+async def test_reconnect_replaces_socket(workers):
+    """Test que al reconectarse el socket nuevo recibe todo y el viejo no lo expulsa"""
+    manager, _ = workers
+    old, new, peer = AsyncMock(), AsyncMock(), AsyncMock()
+    await manager.connect(old, "doc1", "u1")
+    await manager.connect(peer, "doc1", "u2")
+    await manager.connect(new, "doc1", "u1")
+
+    sent = lambda socket: [call[0][0]["type"] for call in socket.send_json.call_args_list]
+    assert await wait_for(lambda: "document_state" in sent(new))
+    assert manager.senders["doc1"]["u1"].websocket is new
+
+    # El socket viejo termina (su handler llama a disconnect) después de la reconexión
+    old.send_json.side_effect = RuntimeError("closed")
+    await manager.disconnect("doc1", "u1", old)
+    assert manager.active_connections["doc1"]["u1"] is new
+
+    old.send_json.reset_mock()
+    new.send_json.reset_mock()
+    await manager.broadcast_to_document("doc1", {"type": "ping"})
+    assert await wait_for(lambda: sent(new) == ["ping"])
+    old.send_json.assert_not_called()
+    assert "u1" in manager.get_document_participants("doc1")
+    for worker in workers:
+        await worker.stop()
+
+@pytest.mark.asyncio
+async def test_slow_consumer_does_not_block_others(workers, monkeypatch):
+    """Test que un socket lento no frena al resto y se degrada a snapshot"""
+    from src.config import settings
+    monkeypatch.setattr(settings, "WS_MESSAGE_QUEUE_SIZE", 5)
+    monkeypatch.setattr(settings, "WS_SLOW_CONSUMER_POLICY", "snapshot")
+    manager, _ = workers
+    blocked = asyncio.Event()
+
+    async def slow_send(message):
+        await blocked.wait()
+
+    slow, fast = AsyncMock(), AsyncMock()
+    slow.send_json.side_effect = slow_send
+    await manager.connect(slow, "doc1", "slow")
+    await manager.connect(fast, "doc1", "fast")
+
+    for i in range(20):
+        await manager.broadcast_to_document("doc1", {"type": "annotation", "index": i})
+    await manager.senders["doc1"]["fast"].drain()
+
+    # El socket rápido recibió todo
+    assert fast.send_json.call_args[0][0]["index"] == 19
+    # El lento quedó con un snapshot en vez del backlog
+    sender = manager.senders["doc1"]["slow"]
+    assert sender.queue.qsize() <= 5
+    assert sender.dropped >= 15
+    assert slow.send_json.call_args[0][0]["type"] == "document_state"
+
+    blocked.set()
+    for worker in workers:
+        await worker.stop()
+
+@pytest.mark.asyncio
+async def test_slow_consumer_evicted(workers, monkeypatch):
+    """Test política de desconexión de consumidores lentos"""
+    from src.config import settings
+    monkeypatch.setattr(settings, "WS_MESSAGE_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "WS_SLOW_CONSUMER_POLICY", "disconnect")
+    manager, _ = workers
+
+    async def never(message):
+        await asyncio.Event().wait()
+
+    slow = AsyncMock()
+    slow.send_json.side_effect = never
+    await manager.connect(slow, "doc1", "slow")
+    for i in range(10):
+        await manager.broadcast_to_document("doc1", {"type": "annotation", "index": i})
+
+    assert await wait_for(lambda: "slow" not in manager.get_document_participants("doc1"))
+    slow.close.assert_called_once_with(code=1013)
+    for worker in workers:
+        await worker.stop()
+
+@pytest.mark.asyncio
+async def test_cursor_updates_coalesced_per_tick(workers):
+    """Test que los cursores se agrupan en un frame por tick y gana el último"""
+    manager, _ = workers
+    peer = AsyncMock()
+    await manager.connect(AsyncMock(), "doc1", "u1")
+    await manager.connect(AsyncMock(), "doc1", "u2")
+    await manager.connect(peer, "doc1", "u3")
+    await manager.senders["doc1"]["u3"].drain()
+    peer.send_json.reset_mock()
+
+    for i in range(10):
+        await manager.send_cursor_position("doc1", "u1", {"x": i})
+        await manager.send_selection("doc1", "u2", {"start": 0, "end": i})
+
+    assert await wait_for(lambda: peer.send_json.called)
+    await asyncio.sleep(0.1)
+    peer.send_json.assert_called_once()
+    frame = peer.send_json.call_args[0][0]
+    assert frame["type"] == "presence_batch"
+    assert frame["updates"] == [
+        {"user_id": "u1", "position": {"x": 9}},
+        {"user_id": "u2", "selection": {"start": 0, "end": 9}}
+    ]
+    for worker in workers:
+        await worker.stop()
+
+@pytest.mark.asyncio
+async def test_cursor_rate_limit(workers, monkeypatch):
+    """Test que el límite por conexión retrasa el envío sin perder el último valor"""
+    manager, _ = workers
+    monkeypatch.setattr(manager.presence, "rate_limit", 1)
+    frames = []
+
+    async def flush(document_id, updates):
+        frames.append(updates)
+
+    monkeypatch.setattr(manager.presence, "flush", flush)
+    await manager.connect(AsyncMock(), "doc1", "u1")
+
+    manager.presence.push("doc1", "u1", "position", {"x": 0})
+    assert await wait_for(lambda: len(frames) == 1)
+    for i in range(1, 10):
+        manager.presence.push("doc1", "u1", "position", {"x": i})
+    assert manager.presence.pending["doc1"]["u1"]["position"] == {"x": 9}
+
+    await asyncio.sleep(0.1)
+    # Sin token disponible el valor sigue pendiente, no se descarta
+    assert len(frames) == 1
+    assert manager.presence.pending["doc1"]["u1"]["position"] == {"x": 9}
+    for worker in workers:
+        await worker.stop()
+
+@pytest.mark.asyncio
+async def test_presence_expires_without_heartbeat(workers):
+    """Test que usuarios de un worker caído expiran de la presencia"""
+    first, second = workers
+    await first.connect(AsyncMock(), "doc1", "u1")
+    # Usuario fantasma de un worker que dejó de enviar heartbeats
+    first.redis.zadd("document:doc1:online", {"ghost": time.time() - 3600})
+
+    presence = second.get_user_presence("doc1")
+
+    assert set(presence) == {"u1"}
+    assert presence["u1"]["status"] == "active"
+    assert first.redis.zscore("document:doc1:online", "ghost") is None
+    for worker in workers:
+        await worker.stop()
+
+@pytest.mark.asyncio
+async def test_heartbeat_refreshes_and_disconnect_removes(workers, monkeypatch):
+    """Test heartbeat periódico del worker y limpieza al desconectar"""
+    from src.config import settings
+    monkeypatch.setattr(settings, "WS_HEARTBEAT_INTERVAL", 0.05)
+    manager, _ = workers
+    await manager.connect(AsyncMock(), "doc1", "u1")
+    first_seen = manager.redis.zscore("document:doc1:online", "u1")
+
+    assert await wait_for(lambda: manager.redis.zscore("document:doc1:online", "u1") > first_seen)
+    assert manager.redis.ttl("document:doc1:online") > 0
+
+    await manager.disconnect("doc1", "u1")
+    assert manager.get_user_presence("doc1") == {}
+    assert await wait_for(lambda: manager._heartbeat.done())
+    for worker in workers:
+        await worker.stop()
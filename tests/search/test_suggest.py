@@ -0,0 +1,100 @@
+"""Tests para el índice de sugerencias de causas y partes."""
+import pytest
+from datetime import datetime
+from types import SimpleNamespace
+
+from src.search.suggest import SuggestIndex, normalize
+
+def make_case(case_id, case_number, parties=(), updated_at=None):
+    """Crear una causa con intervinientes al estilo de los modelos."""
+    return SimpleNamespace(
+        id=case_id,
+        case_number=case_number,
+        title=f"Causa {case_number}",
+        updated_at=updated_at,
+        participants=[
+            SimpleNamespace(
+                role=role,
+                participant=SimpleNamespace(id=pid, name=name, role=role)
+            )
+            for pid, name, role in parties
+        ]
+    )
+
+@pytest.fixture
+def index():
+    """Índice con algunas causas cargadas."""
+    idx = SuggestIndex(max_suggestions=3)
+    idx.load_cases([
+        make_case(1, "789-2023", [(10, "Juan Pérez Soto", "imputado")],
+                  updated_at=datetime(2024, 1, 1)),
+        make_case(2, "790-2023", [(11, "María González", "víctima")],
+                  updated_at=datetime(2024, 2, 1)),
+        make_case(3, "1234-2024", [(12, "Pedro Pérez", "testigo")],
+                  updated_at=datetime(2024, 3, 1)),
+    ])
+    return idx
+
+def test_normalize_strips_accents_and_case():
+    """Test normalización sin tildes ni mayúsculas."""
+    assert normalize("  María  PÉREZ ") == "maria perez"
+
+def test_suggest_case_number_prefix(index):
+    """Test sugerencias por prefijo de RIT."""
+    labels = [s["label"] for s in index.suggest("78")]
+    assert labels == ["789-2023"]
+
+def test_suggest_case_number_digits_only(index):
+    """Test RIT encontrado sin guion."""
+    assert index.suggest("7892")[0]["case_number"] == "789-2023"
+
+def test_suggest_party_by_surname(index):
+    """Test parte encontrada por apellido y ordenada por recencia."""
+    labels = [s["label"] for s in index.suggest("perez", kind="party")]
+    assert labels == ["Pedro Pérez", "Juan Pérez Soto"]
+
+def test_upsert_and_remove_case(index):
+    """Test actualización incremental del índice."""
+    index.upsert_case(make_case(4, "791-2023", updated_at=datetime(2025, 1, 1)))
+    assert index.suggest("79")[0]["label"] == "791-2023"
+
+    index.remove_case(4)
+    index.remove_case(1)
+    assert [s["label"] for s in index.suggest("7")] == ["790-2023"]
+    assert index.suggest("juan") == []
+
+def test_upsert_drops_removed_parties(index):
+    """Test que una parte quitada de la causa deja de sugerirse."""
+    index.upsert_case(make_case(1, "789-2023", [(13, "Ana Rojas", "querellante")],
+                                updated_at=datetime(2024, 1, 1)))
+
+    assert index.suggest("juan") == []
+    assert index.suggest("rojas")[0]["label"] == "Ana Rojas"
+
+def test_limit_beyond_cached_top(index):
+    """Test límite mayor que la caché de cada nodo."""
+    for i in range(5):
+        index.upsert_case(make_case(100 + i, f"1{i}-2025", updated_at=datetime(2025, 1, 1)))
+
+    results = index.suggest("1", kind="case", limit=10)
+    assert len(results) == 6
+
+def test_removals_keep_prefix_caches_exact():
+    """Test que tras varias bajas cada prefijo sigue devolviendo las mejores entradas."""
+    idx = SuggestIndex(max_suggestions=2)
+    cases = [
+        make_case(i, f"7{i:02d}-2023", [(100 + i, f"Pérez {i}", "testigo")],
+                  updated_at=datetime(2024, 1, 1 + i))
+        for i in range(10)
+    ]
+    idx.load_cases(cases)
+    for case_id in (9, 8, 4):
+        idx.remove_case(case_id)
+
+    remaining = [c for c in cases if c.id not in (9, 8, 4)]
+    expected = [c.case_number for c in sorted(remaining, key=lambda c: c.updated_at, reverse=True)]
+    assert [s["label"] for s in idx.suggest("7", limit=2, kind="case")] == expected[:2]
+    assert [s["label"] for s in idx.suggest("perez", limit=2, kind="party")] == [
+        f"Pérez {c.id}" for c in sorted(remaining, key=lambda c: c.updated_at, reverse=True)[:2]
+    ]
+    assert idx.suggest("708", kind="case") == []
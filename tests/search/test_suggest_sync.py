@@ -0,0 +1,70 @@
+"""Tests para la sincronización del índice de sugerencias con las causas."""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.search.suggest import SuggestIndex
+from src.search.suggest_sync import load_cases_from_db, track_case_writes
+
+models = pytest.importorskip("src.integrations.database.models")
+
+@pytest.fixture
+def db():
+    """Fábrica de sesiones sobre SQLite en memoria, con el índice escuchando."""
+    engine = create_engine("sqlite:///:memory:")
+    models.Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    index = SuggestIndex()
+    track_case_writes(index, Session)
+    yield Session, index
+    models.Base.metadata.drop_all(engine)
+
+def add_case(session, number, parties=()):
+    """Crear una causa con sus intervinientes."""
+    case = models.Case(case_number=number, title=f"Causa {number}")
+    for name, role in parties:
+        participant = models.Participant(name=name, email=f"{name}@test.cl", role=role)
+        case.participants.append(models.CaseParticipant(participant=participant, role=role))
+    session.add(case)
+    return case
+
+def test_load_cases_from_db_includes_parties(db):
+    """Test carga inicial con las partes de cada causa."""
+    Session, _ = db
+    session = Session()
+    add_case(session, "789-2023", [("Juan Pérez", "imputado")])
+    session.commit()
+
+    index = SuggestIndex()
+    assert load_cases_from_db(session, index) == 1
+    assert index.suggest("perez", kind="party")[0]["case_number"] == "789-2023"
+
+def test_commit_updates_index(db):
+    """Test altas, cambios de partes y bajas aplicadas al confirmar."""
+    Session, index = db
+    session = Session()
+    case = add_case(session, "789-2023", [("Juan Pérez", "imputado")])
+    session.commit()
+    assert index.suggest("juan")[0]["label"] == "Juan Pérez"
+
+    session.delete(case.participants[0])
+    participant = models.Participant(name="Ana Rojas", email="ana@test.cl", role="querellante")
+    session.add(models.CaseParticipant(case=case, participant=participant, role="querellante"))
+    session.commit()
+    assert index.suggest("juan") == []
+    assert index.suggest("rojas")[0]["role"] == "querellante"
+
+    session.delete(case)
+    session.commit()
+    assert index.suggest("789") == []
+    assert index.suggest("rojas") == []
+
+def test_rollback_discards_changes(db):
+    """Test que una transacción revertida no toca el índice."""
+    Session, index = db
+    session = Session()
+    add_case(session, "790-2023")
+    session.flush()
+    session.rollback()
+
+    assert index.suggest("790") == []
@@ -0,0 +1,136 @@
+"""Tests para los contadores incrementales de anotaciones."""
+import asyncio
+import pytest
+from src.database.redis import RedisKeys
+from src.services.annotation_stats import AnnotationStatsService, annotation_counts, count_annotations
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def annotation(annotation_id, type='note', page=1, user_id='user-1', tags=()):
+    return {
+        'id': annotation_id,
+        'type': type,
+        'position': {'x': 0.1, 'y': 0.2, 'page': page},
+        'user_id': user_id,
+        'tags': list(tags)
+    }
+
+def reconcile(stats, document_id, annotations):
+    async def load():
+        return list(annotations)
+    return asyncio.run(stats.reconcile(document_id, load))
+
+@pytest.fixture
+def stats():
+    """Fixture de contadores sobre Redis en memoria"""
+    return AnnotationStatsService(redis_client=fakeredis.FakeRedis())
+
+def test_counters_follow_writes(stats):
+    """Test que altas, cambios y bajas mantienen el resumen exacto"""
+    first = annotation('a1', 'note', 1, 'user-1', ['urgente'])
+    second = annotation('a2', 'comment', 2, 'user-2', ['urgente', 'plazo'])
+    reconcile(stats, 'doc-1', [first])
+
+    assert stats.record_created('doc-1', second)
+    moved = annotation('a1', 'highlight', 3, 'user-1', [])
+    assert stats.record_updated('doc-1', annotation_counts(first), moved)
+
+    assert stats.get_summary('doc-1') == {
+        'total': 2,
+        'by_type': {'note': 0, 'highlight': 1, 'comment': 1},
+        'by_page': {2: 1, 3: 1},
+        'by_user': {'user-1': 1, 'user-2': 1},
+        'by_tag': {'urgente': 1, 'plazo': 1}
+    }
+
+    assert stats.record_deleted('doc-1', second)
+    summary = stats.get_summary('doc-1')
+    assert summary['total'] == 1
+    assert summary['by_tag'] == {}
+
+def test_writes_skip_documents_without_counters(stats):
+    """Test que sin conteo inicial no se crean contadores parciales"""
+    assert not stats.record_created('doc-2', annotation('a1'))
+    assert stats.get_summary('doc-2') is None
+
+def test_reconcile_repairs_drift(stats):
+    """Test que la reconciliación corrige contadores desviados"""
+    annotations = [annotation(f"a{i}", 'comment', i % 3, tags=['plazo']) for i in range(6)]
+    assert reconcile(stats, 'doc-3', annotations) == {}
+
+    key = RedisKeys.document_annotation_stats('doc-3')
+    stats.redis.hincrby(key, 'total', 5)
+    stats.redis.hincrby(key, 'type:note', 1)
+
+    drift = reconcile(stats, 'doc-3', annotations)
+    assert drift == {'total': (11, 6), 'type:note': (1, 0)}
+    assert stats.get_summary('doc-3')['total'] == 6
+
+    async def load(document_id):
+        return annotations
+    assert asyncio.run(stats.reconcile_all(load)) == {}
+
+def test_reconcile_stores_counts_under_constant_writes(stats):
+    """Test que con escrituras en cada intento igual se guardan los contadores"""
+    annotations = [annotation('a1'), annotation('a2', 'comment')]
+    reconcile(stats, 'doc-4', [])
+
+    async def load():
+        # Otro proceso ajusta los contadores mientras se cuenta
+        stats.redis.hincrby(RedisKeys.document_annotation_stats('doc-4'), '_seq', 1)
+        return annotations
+    asyncio.run(stats.reconcile('doc-4', load))
+
+    summary = stats.get_summary('doc-4')
+    assert summary['total'] == 2
+    assert summary['by_type'] == {'note': 1, 'highlight': 0, 'comment': 1}
+
+def test_reconcile_uses_given_count(stats):
+    """Test que la reconciliación guarda los conteos de la función entregada"""
+    annotations = [annotation('a1', tags=['plazo']), annotation('a2', 'comment', 2)]
+    seen = []
+
+    def count(document_id, loaded):
+        seen.append(document_id)
+        return count_annotations(document_id, loaded)
+
+    async def load():
+        return annotations
+    asyncio.run(stats.reconcile('doc-5', load, count))
+
+    assert seen == ['doc-5']
+    assert stats.get_summary('doc-5')['by_tag'] == {'plazo': 1}
+
+def test_record_batch_applies_all_changes(stats):
+    """Test que una operación masiva ajusta los contadores en una sola transacción"""
+    first, second = annotation('a1', tags=['plazo']), annotation('a2', 'comment', 2)
+    reconcile(stats, 'doc-6', [first, second])
+    seq = stats._read('doc-6')['_seq']
+
+    moved = annotation('a2', 'highlight', 3)
+    assert stats.record_batch(
+        'doc-6',
+        created=[annotation('a3', page=2), annotation('a4', tags=['plazo'])],
+        updated=[(annotation_counts(second), moved)],
+        deleted=[first]
+    )
+
+    assert stats._read('doc-6')['_seq'] == seq + 1
+    assert stats.get_summary('doc-6') == {
+        'total': 3,
+        'by_type': {'note': 2, 'highlight': 1, 'comment': 0},
+        'by_page': {1: 1, 2: 1, 3: 1},
+        'by_user': {'user-1': 3},
+        'by_tag': {'plazo': 1}
+    }
+
+def test_scopes_keep_separate_counters(stats):
+    """Test que cada almacén tiene sus propios contadores y documentos"""
+    other = AnnotationStatsService(redis_client=stats.redis, scope='db')
+    reconcile(stats, 'doc-7', [annotation('a1')])
+    reconcile(other, 'doc-8', [annotation('a2'), annotation('a3')])
+
+    assert other.get_summary('doc-7') is None
+    assert stats.get_summary('doc-8') is None
+    assert other.get_summary('doc-8')['total'] == 2
+    assert stats.redis.smembers(RedisKeys.annotation_stats_documents('db')) == {b'doc-8'}
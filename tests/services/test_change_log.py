@@ -0,0 +1,35 @@
+"""Tests para el log de cambios de sincronización."""
+import time
+import pytest
+from src.services.change_log import ChangeLog
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def change(entity_id, action, data):
+    return {
+        'type': 'annotations',
+        'action': action,
+        'id': entity_id,
+        'data': data,
+        'timestamp': time.time(),
+        'deviceId': 'device-1'
+    }
+
+def test_compaction_keeps_folded_data():
+    """Test que la compactación combina los datos y conserva el create"""
+    log = ChangeLog(redis_client=fakeredis.FakeRedis())
+    log.append(change('a', 'create', {'a': 1, 'b': 1}), document_id='doc-1')
+    log.append(change('x', 'update', {'v': 1}), document_id='doc-1')
+    log.append(change('a', 'update', {'b': 2}), document_id='doc-1')
+    log.append(change('x', 'delete', {}), document_id='doc-1')
+    log.append(change('x', 'create', {'v': 2}), document_id='doc-1')
+
+    result = log.get_changes(document_id='doc-1')
+    changes = {c['id']: c for c in result['changes']}
+
+    assert [c['id'] for c in result['changes']] == ['a', 'x']
+    assert changes['a']['action'] == 'create'
+    assert changes['a']['data'] == {'a': 1, 'b': 2}
+    assert changes['x']['action'] == 'create'
+    assert changes['x']['data'] == {'v': 2}
+    assert result['cursor'] == result['changes'][-1]['cursor']
@@ -0,0 +1,97 @@
+"""Tests para el historial de chat en dos niveles."""
+import json
+import pytest
+from unittest.mock import Mock
+from src.services.chat_history import ChatHistoryService
+
+fakeredis = pytest.importorskip("fakeredis")
+
+DOCUMENT_ID = "5f0c8a52-3a58-4a8e-9b0e-1d2c3b4a5f60"
+
+@pytest.fixture
+def service(monkeypatch):
+    """Fixture con Redis en memoria y un archivo Postgres simulado en una lista"""
+    service = ChatHistoryService(fakeredis.FakeRedis(), session_factory=Mock())
+    service.config.update({'hot_window': 10, 'archive_batch': 5, 'page_size': 4})
+    archived = {}
+
+    def store(document_id, messages):
+        for message in messages:
+            archived.setdefault(message['seq'], message)
+
+    def load(document_id, before, limit):
+        seqs = sorted((s for s in archived if before is None or s < before), reverse=True)
+        return [archived[s] for s in seqs[:limit]]
+
+    monkeypatch.setattr(service, '_store_archived', store)
+    monkeypatch.setattr(service, '_load_archived', load)
+    service.archived = archived
+    return service
+
+def message(i):
+    return {'type': 'chat_message', 'user_id': 'juez', 'content': f"Mensaje {i}",
+            'message_type': 'text', 'timestamp': '2024-05-01T10:00:00'}
+
+@pytest.mark.asyncio
+async def test_hot_window_is_capped(service):
+    """Test que al exceder la ventana se archiva un lote y se recorta Redis"""
+    for i in range(1, 15):
+        service.append(DOCUMENT_ID, message(i))
+    assert not service.needs_archive(DOCUMENT_ID)
+    service.append(DOCUMENT_ID, message(15))
+    assert service.needs_archive(DOCUMENT_ID)
+
+    moved = await service.archive(DOCUMENT_ID)
+
+    assert moved == 5
+    assert sorted(service.archived) == [1, 2, 3, 4, 5]
+    assert service.redis.zcard("document:%s:chat:recent" % DOCUMENT_ID) == 10
+
+@pytest.mark.asyncio
+async def test_cursor_pagination_across_tiers(service):
+    """Test que la paginación recorre Redis y Postgres sin huecos ni duplicados"""
+    for i in range(1, 16):
+        service.append(DOCUMENT_ID, message(i))
+    await service.archive(DOCUMENT_ID)
+
+    seen = []
+    cursor = None
+    while True:
+        page = await service.history(DOCUMENT_ID, before=cursor)
+        seqs = [m['seq'] for m in page['messages']]
+        assert seqs == sorted(seqs)
+        seen = seqs + seen
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == list(range(1, 16))
+
+@pytest.mark.asyncio
+async def test_archive_failure_keeps_messages(service, monkeypatch):
+    """Test que si falla el archivo no se recorta la ventana"""
+    for i in range(1, 16):
+        service.append(DOCUMENT_ID, message(i))
+    monkeypatch.setattr(service, '_store_archived', Mock(side_effect=Exception("db down")))
+
+    assert await service.archive(DOCUMENT_ID) == 0
+    assert service.redis.zcard("document:%s:chat:recent" % DOCUMENT_ID) == 15
+    # El lock se libera para reintentar
+    assert service.redis.get("document:%s:chat:archiving" % DOCUMENT_ID) is None
+
+@pytest.mark.asyncio
+async def test_legacy_chat_list_is_copied_once(service):
+    """Test que el chat guardado en la lista anterior se conserva y numera primero"""
+    legacy_key = "document:%s:chat" % DOCUMENT_ID
+    for i in range(1, 4):
+        service.redis.rpush(legacy_key, json.dumps(message(i)))
+
+    page = await service.history(DOCUMENT_ID)
+    assert [m['content'] for m in page['messages']] == ["Mensaje 1", "Mensaje 2", "Mensaje 3"]
+    assert [m['seq'] for m in page['messages']] == [1, 2, 3]
+    assert not service.redis.exists(legacy_key)
+
+    # Otro worker (sin memoria de la migración) no duplica nada
+    other = ChatHistoryService(service.redis)
+    assert other.append(DOCUMENT_ID, message(4))['seq'] == 4
+    assert service.redis.zcard("document:%s:chat:recent" % DOCUMENT_ID) == 4
@@ -0,0 +1,53 @@
+"""Tests para el merge de tres vías."""
+from src.services.merge import three_way_merge
+
+def test_changes_on_both_sides_are_combined():
+    """Test que cambios en claves distintas se combinan"""
+    base = {'title': 'Acta', 'status': 'draft', 'pages': 3}
+    local = {'title': 'Acta de audiencia', 'status': 'draft', 'pages': 3}
+    remote = {'title': 'Acta', 'status': 'final', 'pages': 3}
+
+    merged, conflicts = three_way_merge(base, local, remote)
+
+    assert merged == {'title': 'Acta de audiencia', 'status': 'final', 'pages': 3}
+    assert conflicts == []
+
+def test_deletion_is_not_undone():
+    """Test que una clave eliminada no reaparece"""
+    base = {'a': 1, 'b': 2}
+    merged, _ = three_way_merge(base, {'a': 1}, {'a': 1, 'b': 2, 'c': 3})
+    assert merged == {'a': 1, 'c': 3}
+
+def test_keyed_list_merge():
+    """Test merge de anotaciones por ID conservando el orden"""
+    base = [{'id': 1, 'text': 'a'}, {'id': 2, 'text': 'b'}, {'id': 3, 'text': 'c'}]
+    local = [{'id': 1, 'text': 'a'}, {'id': 4, 'text': 'nueva'}, {'id': 3, 'text': 'c'}]
+    remote = [{'id': 1, 'text': 'a editada'}, {'id': 2, 'text': 'b'}, {'id': 3, 'text': 'c'}, {'id': 5, 'text': 'otra'}]
+
+    merged, conflicts = three_way_merge(base, local, remote)
+
+    assert [item['id'] for item in merged] == [1, 4, 3, 5]
+    assert merged[0]['text'] == 'a editada'
+    assert conflicts == []
+
+def test_unkeyed_list_with_dicts():
+    """Test listas de diccionarios sin ID (antes fallaba con set())"""
+    base = [{'x': 1}, 'tag']
+    merged, _ = three_way_merge(base, [{'x': 1}, 'tag', 'nuevo'], ['tag', {'y': 2}])
+    assert merged == ['tag', 'nuevo', {'y': 2}]
+
+def test_conflicting_values_prefer_client():
+    """Test conflicto en el mismo valor: gana el cliente y se informa"""
+    merged, conflicts = three_way_merge({'text': 'a'}, {'text': 'b'}, {'text': 'c'})
+
+    assert merged == {'text': 'b'}
+    assert conflicts[0]['path'] == 'text'
+    assert conflicts[0]['resolution'] == 'local'
+
+def test_modified_and_deleted_is_kept():
+    """Test elemento modificado en un lado y eliminado en el otro"""
+    base = [{'id': 1, 'text': 'a'}]
+    merged, conflicts = three_way_merge(base, [], [{'id': 1, 'text': 'editado'}])
+
+    assert merged == [{'id': 1, 'text': 'editado'}]
+    assert conflicts[0]['resolution'] == 'keep'
@@ -0,0 +1,111 @@
+"""Tests para el batching de búsquedas vía _msearch."""
+import pytest
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+from src.services.search_batcher import SearchBatcher
+
+@pytest.fixture
+def es_mock():
+    """Mock de cliente AsyncElasticsearch."""
+    es = AsyncMock()
+
+    async def msearch(body):
+        # Una respuesta por par header/body, identificada por el índice
+        return {
+            "responses": [
+                {"index": header["index"], "hits": {"hits": [], "total": {"value": 0}}}
+                for header in body[::2]
+            ]
+        }
+
+    es.msearch.side_effect = msearch
+    return es
+
+@pytest.fixture
+def batcher(es_mock):
+    """Fixture para SearchBatcher."""
+    with patch('src.services.search_batcher.metrics'):
+        yield SearchBatcher(es_mock, window_ms=5, max_batch_size=4)
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_share_one_msearch(batcher, es_mock):
+    """Test búsquedas concurrentes agrupadas en un solo _msearch."""
+    results = await asyncio.gather(*[
+        batcher.search(f"documents_{i}", {"query": {"match_all": {}}})
+        for i in range(3)
+    ])
+
+    assert es_mock.msearch.await_count == 1
+    assert [r["index"] for r in results] == ["documents_0", "documents_1", "documents_2"]
+    assert batcher.get_stats()["batches"] == 1
+    assert batcher.get_stats()["queries"] == 3
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting(batcher, es_mock):
+    """Test lote lleno se envía inmediatamente y el resto en otro lote."""
+    results = await asyncio.gather(*[
+        batcher.search(f"documents_{i}", {})
+        for i in range(6)
+    ])
+
+    assert len(results) == 6
+    assert es_mock.msearch.await_count == 2
+    stats = batcher.get_stats()
+    assert stats["full_batches"] == 1
+    assert stats["avg_batch_size"] == 3
+
+@pytest.mark.asyncio
+async def test_item_error_only_fails_its_caller(batcher, es_mock):
+    """Test error de un ítem no afecta al resto del lote."""
+    async def msearch(body):
+        return {
+            "responses": [
+                {"error": {"type": "index_not_found_exception"}},
+                {"hits": {"hits": [], "total": {"value": 0}}}
+            ]
+        }
+    es_mock.msearch.side_effect = msearch
+
+    results = await asyncio.gather(
+        batcher.search("missing", {}),
+        batcher.search("documents_1", {}),
+        return_exceptions=True
+    )
+
+    assert isinstance(results[0], RuntimeError)
+    assert results[1]["hits"]["total"]["value"] == 0
+
+@pytest.mark.asyncio
+async def test_transport_error_propagates_to_all(batcher, es_mock):
+    """Test error de transporte se propaga a todas las búsquedas del lote."""
+    es_mock.msearch.side_effect = ConnectionError("es down")
+
+    results = await asyncio.gather(
+        batcher.search("documents_0", {}),
+        batcher.search("documents_1", {}),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(r, ConnectionError) for r in results)
+    assert batcher.get_stats()["errors"] == 1
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_strand_batch(batcher, es_mock):
+    """Test cancelar a quien llenó el lote no deja sin respuesta a los demás."""
+    respond = es_mock.msearch.side_effect
+
+    async def slow_msearch(body):
+        await asyncio.sleep(0.01)
+        return await respond(body)
+
+    es_mock.msearch.side_effect = slow_msearch
+    others = [asyncio.create_task(batcher.search(f"documents_{i}", {})) for i in range(3)]
+    await asyncio.sleep(0)
+    last = asyncio.create_task(batcher.search("documents_3", {}))
+    await asyncio.sleep(0)
+    last.cancel()
+
+    results = await asyncio.wait_for(asyncio.gather(*others), timeout=1)
+    assert [r["index"] for r in results] == ["documents_0", "documents_1", "documents_2"]
+    assert es_mock.msearch.await_count == 1
@@ -0,0 +1,27 @@
+"""Tests para el caché de búsquedas frecuentes."""
+import pytest
+
+from src.services.search_cache import SearchCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+@pytest.fixture
+def cache():
+    """SearchCache sobre Redis en memoria."""
+    svc = SearchCache()
+    svc.redis = fakeredis.FakeRedis()
+    return svc
+
+@pytest.mark.asyncio
+async def test_repeated_misses_make_query_cacheable(cache):
+    """Test una query que falla `min_frequency` veces pasa a cachearse y acierta."""
+    results = {"results": [{"page": 1}]}
+    for _ in range(cache.config['min_frequency']):
+        assert await cache.get_cached_results("prisión preventiva", "doc-1") is None
+        await cache.cache_results("prisión preventiva", results, "doc-1")
+
+    assert await cache.get_cached_results("prisión preventiva", "doc-1") == results
+    stats = await cache.get_stats()
+    assert stats["cache_hits"] == 1
+    assert stats["cache_misses"] == cache.config['min_frequency']
+    assert stats["total_queries"] == cache.config['min_frequency'] + 1
@@ -0,0 +1,246 @@
+"""Tests para el servicio de sincronización offline."""
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, Mock
+
+from src.services.sync import SyncService
+
+def make_op(entity_id, action='update', type='annotations', seconds=0, data=None, sequence=None):
+    """Crear una operación pendiente."""
+    return {
+        'id': entity_id,
+        'sequence': sequence,
+        'type': type,
+        'action': action,
+        'data': data if data is not None else {'id': entity_id, 'seq': seconds},
+        'timestamp': (datetime(2024, 1, 1) + timedelta(seconds=seconds)).isoformat(),
+        'deviceId': 'device-1',
+        'priority': 'CRITICAL'
+    }
+
+@pytest.fixture
+def service():
+    """Fixture para SyncService con backend simulado."""
+    svc = SyncService(
+        max_concurrency=2,
+        change_log=Mock(),
+        idempotency=Mock(filter_applied=Mock(return_value=set())),
+        state_store=Mock()
+    )
+    svc._get_server_states = AsyncMock(return_value={})
+    return svc
+
+@pytest.mark.asyncio
+async def test_operations_ordered_within_entity(service):
+    """Test las operaciones de una entidad se aplican en orden."""
+    applied = []
+
+    async def execute(op):
+        # Ceder el loop para intercalar entidades
+        await asyncio.sleep(0)
+        applied.append((op['id'], op['action']))
+        return {}
+
+    service._execute_operation = execute
+    actions = ['update', 'delete', 'create', 'update']
+    ops = [
+        make_op(entity, action=action, seconds=i)
+        for entity in ('a', 'b')
+        for i, action in enumerate(actions)
+    ]
+
+    result = await service.sync(ops, last_sync='', device_id='device-1')
+
+    assert result['success']
+    assert len(result['results']) == 4
+    assert [action for entity, action in applied if entity == 'a'] == ['delete', 'create']
+    assert [action for entity, action in applied if entity == 'b'] == ['delete', 'create']
+
+@pytest.mark.asyncio
+async def test_server_state_fetched_once_per_type(service):
+    """Test estado del servidor obtenido en bloque por tipo de entidad."""
+    service._execute_operation = AsyncMock(return_value={})
+    ops = [make_op(str(i)) for i in range(20)] + [make_op('doc-1', type='document')]
+
+    await service.sync(ops, last_sync='', device_id='device-1')
+
+    assert service._get_server_states.await_count == 2
+    calls = {c.args[0]: c.args[1] for c in service._get_server_states.await_args_list}
+    assert sorted(calls['annotations']) == sorted(str(i) for i in range(20))
+    assert calls['document'] == ['doc-1']
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded(service):
+    """Test no se procesan más entidades en paralelo que el límite."""
+    running = 0
+    peak = 0
+
+    async def execute(op):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {}
+
+    service._execute_operation = execute
+    ops = [make_op(str(i)) for i in range(8)]
+
+    await service.sync(ops, last_sync='', device_id='device-1')
+
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_later_ops_see_state_of_earlier_ops(service):
+    """Test las operaciones posteriores ven el estado dejado por las anteriores."""
+    service._get_server_states = AsyncMock(return_value={
+        'a': {'data': {'id': 'a', 'tags': ['x']}, 'timestamp': '2024-01-01T00:00:00'}
+    })
+    seen_states = []
+    process = service._process_operation
+
+    async def spy(op, server_state=None, last_sync=None):
+        seen_states.append(server_state)
+        return await process(op, server_state, last_sync)
+
+    service._process_operation = spy
+    service._execute_operation = AsyncMock(return_value={})
+
+    await service.sync(
+        [make_op('a', seconds=1), make_op('a', action='delete', seconds=2), make_op('a', action='create', seconds=3)],
+        last_sync='',
+        device_id='device-1'
+    )
+
+    # update + delete se compactan en un delete; luego se recrea
+    assert len(seen_states) == 2
+    assert seen_states[0]['data']['tags'] == ['x']
+    assert seen_states[1] is None
+
+@pytest.mark.asyncio
+async def test_applied_operations_recorded_in_change_log(service):
+    """Test las operaciones aplicadas se registran en el log de cambios."""
+    service._execute_operation = AsyncMock(return_value={})
+    op = make_op('a', data={'id': 'a', 'document_id': 'doc-1'})
+
+    await service.sync([op], last_sync='', device_id='device-1', user_id='user-1')
+
+    service.change_log.append.assert_called_once()
+    kwargs = service.change_log.append.call_args.kwargs
+    assert kwargs == {'user_id': 'user-1', 'document_id': 'doc-1'}
+
+def test_compaction_coalesces_updates(service):
+    """Test cadena create + updates compactada en un solo create."""
+    ops = [
+        make_op('a', action='create', seconds=0, data={'text': 'h'}, sequence=1),
+        make_op('a', seconds=1, data={'text': 'ho'}, sequence=2),
+        make_op('a', seconds=2, data={'text': 'hola', 'color': 'red'}, sequence=3),
+    ]
+
+    compacted, dropped = service._compact_operations(ops)
+
+    assert dropped == []
+    assert len(compacted) == 1
+    assert compacted[0]['action'] == 'create'
+    assert compacted[0]['data'] == {'text': 'hola', 'color': 'red'}
+    assert compacted[0]['timestamp'] == ops[-1]['timestamp']
+    assert compacted[0]['compactedSequences'] == [1, 2, 3]
+    # Las operaciones originales no se modifican
+    assert ops[0]['data'] == {'text': 'h'}
+
+def test_compaction_drops_create_then_delete(service):
+    """Test create seguido de delete no llega al servidor."""
+    ops = [
+        make_op('a', action='create', sequence=1),
+        make_op('a', seconds=1, sequence=2),
+        make_op('a', action='delete', seconds=2, sequence=3),
+    ]
+
+    compacted, dropped = service._compact_operations(ops)
+
+    assert compacted == []
+    assert [op['sequence'] for op in dropped] == [1, 2, 3]
+
+@pytest.mark.asyncio
+async def test_already_applied_operations_are_skipped(service):
+    """Test lote reintentado omite operaciones ya aplicadas."""
+    service.idempotency.filter_applied.return_value = {1}
+    service._execute_operation = AsyncMock(return_value={})
+
+    result = await service.sync(
+        [make_op('a', sequence=1), make_op('b', sequence=2)],
+        last_sync='',
+        device_id='device-1'
+    )
+
+    statuses = {r['operation']['id']: r['status'] for r in result['results']}
+    assert statuses == {'a': 'duplicate', 'b': 'success'}
+    assert service._execute_operation.await_count == 1
+    service.idempotency.mark_applied.assert_called_with('device-1', [2])
+
+@pytest.mark.asyncio
+async def test_merge_uses_client_base(service):
+    """Test que el merge de anotaciones usa la base del cliente."""
+    base = {'id': 'a', 'items': [{'id': 1, 'text': 'uno'}, {'id': 2, 'text': 'dos'}]}
+    server = {'id': 'a', 'items': [{'id': 1, 'text': 'uno editado'}, {'id': 2, 'text': 'dos'}]}
+    service._get_server_states = AsyncMock(return_value={
+        'a': {'data': server, 'timestamp': datetime(2024, 1, 1).isoformat(), 'deviceId': 'device-2'}
+    })
+    service._execute_operation = AsyncMock(return_value={})
+    op = make_op('a', data={'id': 'a', 'items': [{'id': 1, 'text': 'uno'}]})
+    op['base'] = base
+
+    result = await service.sync([op], last_sync='', device_id='device-1')
+
+    # El cliente eliminó el 2 y el servidor editó el 1
+    assert result['results'][0]['operation']['data']['items'] == [{'id': 1, 'text': 'uno editado'}]
+
+@pytest.mark.asyncio
+async def test_server_state_persists_between_syncs():
+    """Test el estado que deja una sincronización detecta conflictos en la siguiente."""
+    fakeredis = pytest.importorskip("fakeredis")
+    from src.services.sync_state import SyncStateStore
+
+    svc = SyncService(
+        change_log=Mock(),
+        idempotency=Mock(filter_applied=Mock(return_value=set())),
+        state_store=SyncStateStore(redis_client=fakeredis.FakeRedis())
+    )
+    svc._execute_operation = AsyncMock(return_value={})
+
+    first = await svc.sync([make_op('doc-1', type='document', seconds=10)], last_sync='', device_id='device-1')
+    assert first['success']
+
+    # Otro dispositivo con una edición más antigua pierde (LAST_WRITE_WINS)
+    stale = dict(make_op('doc-1', type='document', seconds=5), deviceId='device-2')
+    second = await svc.sync([stale], last_sync='', device_id='device-2')
+    assert not second['success']
+    assert second['conflicts'][0]['reason'] == 'CONFLICT'
+    assert second['conflicts'][0]['serverState']['deviceId'] == 'device-1'
+
+@pytest.mark.asyncio
+async def test_state_already_seen_is_not_a_conflict():
+    """Test un cambio de otro dispositivo que el cliente ya recibió no es conflicto."""
+    fakeredis = pytest.importorskip("fakeredis")
+    from src.services.sync_state import SyncStateStore
+
+    svc = SyncService(
+        change_log=Mock(),
+        idempotency=Mock(filter_applied=Mock(return_value=set())),
+        state_store=SyncStateStore(redis_client=fakeredis.FakeRedis())
+    )
+    svc._execute_operation = AsyncMock(return_value={})
+
+    first = await svc.sync([make_op('doc-1', type='document', seconds=10)], last_sync='', device_id='device-1')
+
+    # device-2 sincronizó después y edita sobre ese estado, aunque su reloj vaya atrasado
+    seen = dict(make_op('doc-1', type='document', seconds=5), deviceId='device-2')
+    second = await svc.sync([seen], last_sync=first['syncTimestamp'], device_id='device-2')
+    assert second['success']
+
+    # device-1 no ha visto el cambio de device-2: conflicto
+    stale = make_op('doc-1', type='document', seconds=1)
+    third = await svc.sync([stale], last_sync=first['syncTimestamp'], device_id='device-1')
+    assert not third['success']
+    assert third['conflicts'][0]['serverState']['deviceId'] == 'device-2'
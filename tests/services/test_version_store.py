@@ -0,0 +1,116 @@
+"""Tests para el almacén de versiones con cadena de deltas."""
+import copy
+import pytest
+from src.services.version_store import VersionStore, SNAPSHOT, DELTA
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def paragraph(text):
+    return {
+        'paragraph': {
+            'elements': [{'textRun': {'content': text + "\n", 'textStyle': {}}}],
+            'paragraphStyle': {'namedStyleType': 'NORMAL_TEXT'}
+        }
+    }
+
+def make_revisions(count):
+    """Revisiones sucesivas de una resolución con una edición cada una."""
+    content = {
+        'title': 'Resolución',
+        'body': {'content': [
+            paragraph(f"Considerando {i}: se tiene presente lo expuesto por la defensa.")
+            for i in range(200)
+        ]}
+    }
+    revisions = []
+    for i in range(count):
+        content = copy.deepcopy(content)
+        content['body']['content'][(i * 7) % 200] = paragraph(f"Considerando modificado en revisión {i}.")
+        revisions.append((f"rev-{i}", content))
+    return revisions
+
+@pytest.fixture
+def store():
+    """Fixture de almacén sobre Redis en memoria"""
+    store = VersionStore(redis_client=fakeredis.FakeRedis())
+    store.config['snapshot_interval'] = 5
+    return store
+
+def test_reconstructs_every_revision(store):
+    """Test que cualquier revisión se reconstruye exactamente"""
+    revisions = make_revisions(12)
+    for revision_id, content in revisions:
+        store.add_version('doc1', revision_id, content)
+
+    for revision_id, content in revisions:
+        assert store.get_version('doc1', revision_id) == content
+
+def test_snapshot_interval(store):
+    """Test que se guarda un snapshot cada N revisiones"""
+    for revision_id, content in make_revisions(12):
+        store.add_version('doc1', revision_id, content)
+
+    kinds = [v['kind'] for v in store.list_versions('doc1')]
+    assert [i for i, k in enumerate(kinds) if k == SNAPSHOT] == [0, 5, 10]
+    assert kinds.count(DELTA) == 9
+
+def test_interval_change_keeps_existing_chains(store):
+    """Test que cambiar el intervalo no impide reconstruir revisiones ya guardadas"""
+    revisions = make_revisions(12)
+    for revision_id, content in revisions[:7]:
+        store.add_version('doc1', revision_id, content)
+    store.config['snapshot_interval'] = 3
+    for revision_id, content in revisions[7:]:
+        store.add_version('doc1', revision_id, content)
+
+    for revision_id, content in revisions:
+        assert store.get_version('doc1', revision_id) == content
+    kinds = [v['kind'] for v in store.list_versions('doc1')]
+    assert [i for i, k in enumerate(kinds) if k == SNAPSHOT] == [0, 5, 8, 11]
+
+def test_storage_is_fraction_of_full_copies(store):
+    """Test que el historial ocupa bastante menos que copias completas"""
+    for revision_id, content in make_revisions(20):
+        store.add_version('doc1', revision_id, content)
+
+    stats = store.get_stats('doc1')
+    assert stats['versions'] == 20
+    assert stats['ratio'] < 0.5
+
+def test_add_existing_revision_is_idempotent(store):
+    """Test que registrar dos veces la misma revisión no duplica entradas"""
+    revision_id, content = make_revisions(1)[0]
+    first = store.add_version('doc1', revision_id, content, {'title': 'Resolución'})
+    second = store.add_version('doc1', revision_id, content)
+
+    assert first == second
+    assert len(store.list_versions('doc1')) == 1
+    assert store.has_version('doc1', revision_id)
+
+def test_unknown_revision(store):
+    """Test revisión no almacenada"""
+    assert store.get_version('doc1', 'missing') is None
+    assert not store.has_version('doc1', 'missing')
+
+def test_concurrent_writers_get_distinct_seqs(store, monkeypatch):
+    """Test que un escritor concurrente no reutiliza el seq ni la cabeza del otro"""
+    revisions = make_revisions(4)
+    other = VersionStore(redis_client=store.redis)
+    other.config['snapshot_interval'] = 5
+    for revision_id, content in revisions[:2]:
+        store.add_version('doc-1', revision_id, content)
+
+    compact = store._compact_changes
+    def interleave(changes):
+        # Otro worker escribe entre la lectura del seq y la escritura
+        if not other.has_version('doc-1', revisions[3][0]):
+            other.add_version('doc-1', *revisions[3])
+        return compact(changes)
+    monkeypatch.setattr(store, '_compact_changes', interleave)
+
+    entry = store.add_version('doc-1', *revisions[2])
+
+    assert [v['revision_id'] for v in store.list_versions('doc-1')] == ['rev-0', 'rev-1', 'rev-3', 'rev-2']
+    assert entry['seq'] == 3
+    for revision_id, content in revisions:
+        assert store.get_version('doc-1', revision_id) == content
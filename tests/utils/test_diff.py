@@ -0,0 +1,97 @@
+"""Tests para el motor de diferencias de documentos."""
+import random
+from src.utils.diff import calculate_diff, apply_patch, diff_opcodes
+
+def paragraph(text, bold=False, start=1):
+    return {
+        'startIndex': start,
+        'paragraph': {
+            'elements': [{'textRun': {'content': text, 'textStyle': {'bold': bold}}}],
+            'paragraphStyle': {'namedStyleType': 'NORMAL_TEXT'}
+        }
+    }
+
+def document(*elements):
+    return {'title': 'Sentencia', 'body': {'content': list(elements)}}
+
+def lcs_length(a, b):
+    previous = [0] * (len(b) + 1)
+    for x in a:
+        current = [0]
+        for j, y in enumerate(b):
+            current.append(previous[j] + 1 if x == y else max(previous[j + 1], current[j]))
+        previous = current
+    return previous[-1]
+
+def test_diff_opcodes_minimal():
+    """Test que los opcodes reconstruyen la secuencia con un LCS máximo"""
+    rng = random.Random(7)
+    for _ in range(300):
+        a = [rng.randint(0, 4) for _ in range(rng.randint(0, 25))]
+        b = [rng.randint(0, 4) for _ in range(rng.randint(0, 25))]
+        opcodes = diff_opcodes(a, b)
+
+        rebuilt = []
+        for tag, i1, i2, j1, j2 in opcodes:
+            if tag == 'equal':
+                assert a[i1:i2] == b[j1:j2]
+                rebuilt.extend(a[i1:i2])
+            else:
+                rebuilt.extend(b[j1:j2])
+        assert rebuilt == b
+        assert sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag == 'equal') == lcs_length(a, b)
+
+def test_word_level_modify():
+    """Test que un cambio de palabra produce un 'modify' compacto"""
+    old = document(paragraph("Se rechaza el recurso.\n"), paragraph("Notifíquese.\n"))
+    new = document(paragraph("Se acoge el recurso.\n", start=5), paragraph("Notifíquese.\n", start=30))
+
+    changes = calculate_diff(old, new)
+
+    assert [c['type'] for c in changes] == ['modify', 'equal']
+    assert changes[0]['runs'] == [[0, [['=', 2], ['-', 1, 'rechaza'], ['+', 'acoge'], ['=', 6]]]]
+    assert apply_patch(old, changes)['body']['content'][0]['paragraph']['elements'][0]['textRun']['content'] == "Se acoge el recurso.\n"
+
+def test_style_change_replaces_element():
+    """Test que un cambio de estilo reemplaza el elemento completo"""
+    old = document(paragraph("Considerando.\n"))
+    new = document(paragraph("Considerando.\n", bold=True))
+
+    changes = calculate_diff(old, new)
+
+    assert changes[0]['type'] == 'replace'
+    assert changes[0]['elements'][0]['paragraph']['elements'][0]['textRun']['textStyle']['bold'] is True
+
+def test_apply_patch_preserves_elements():
+    """Test que apply_patch reconstruye los elementos sin colapsarlos"""
+    old = document(
+        {'sectionBreak': {}},
+        paragraph("Primero.\n"),
+        paragraph("Segundo párrafo.\n"),
+        {'table': {'rows': 1, 'columns': 1}},
+        paragraph("Tercero.\n")
+    )
+    new = document(
+        {'sectionBreak': {}},
+        paragraph("Primero corregido.\n"),
+        paragraph("Insertado.\n", bold=True),
+        {'table': {'rows': 1, 'columns': 1}},
+        paragraph("Tercero.\n"),
+        paragraph("Final.\n")
+    )
+
+    patched = apply_patch(old, calculate_diff(old, new))
+
+    expected = [
+        {k: v for k, v in e.items() if k != 'startIndex'}
+        for e in new['body']['content']
+    ]
+    assert patched['body']['content'] == expected
+    assert patched['title'] == 'Sentencia'
+
+def test_empty_documents():
+    """Test diff de documentos vacíos"""
+    assert calculate_diff({}, {}) == []
+    changes = calculate_diff({}, document(paragraph("Nuevo.\n")))
+    assert changes[0]['type'] == 'insert'
+    assert changes[0]['content'] == "Nuevo.\n"